@@ -15,6 +15,7 @@ from test_steps_manager import TestStepsManager
 from test_users_manager import TestUsersManager
 from service_accounts_manager import ServiceAccountsManager
 from gmail_email_checker import GmailEmailChecker
+from screenshot_retention import start_scheduled_retention
 
 class SeleniumInboundTester:
     def __init__(self, root, user=None):
@@ -58,6 +59,9 @@ class SeleniumInboundTester:
             pass
         
         self.setup_ui()
+        
+        # Scheduled screenshot retention runs in the background once the UI is up
+        self.root.after(30000, lambda: start_scheduled_retention(self.db_manager.db_path))
     
     def setup_ui(self):
         """Setup the main UI with enhanced enterprise header and responsive design"""
@@ -3,18 +3,142 @@
 
 import requests
 import json
-import urllib.parse
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import threading
 import time
+from urllib.parse import urlparse
+from log_manager import get_logger
+
+logger = get_logger('api_auth')
+
+# Tokens are renewed this long before they expire (halfway through shorter lifetimes)
+REFRESH_AHEAD_SECONDS = 300
+TOKEN_TIMEOUT_SECONDS = 15
+FAILURE_RETRY_SECONDS = 60      # a failed token request is not retried for this long
+DEFAULT_TOKEN_LIFETIME = 3600   # when the endpoint does not send expires_in
+
+class TokenService:
+    """OAuth tokens from a service account's .ionapi token endpoint (pu + ot).
+
+    Tokens are requested over HTTP - credentials go in the POST body - and cached
+    per service account until shortly before they expire, then renewed with the
+    refresh token when there is one. A failed request is remembered for
+    FAILURE_RETRY_SECONDS, so an unreachable endpoint costs one timeout rather
+    than one per caller. shared_token_service is used by every APIAuthenticator,
+    so scenarios in a batch share one token per account.
+    """
+    
+    def __init__(self, http=None, clock=time.time):
+        self.http = http or requests
+        self.clock = clock
+        self._tokens = {}
+        self._failures = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def account_key(ionapi):
+        return (ionapi.get('pu', ''), ionapi.get('ti', ''), ionapi.get('ci', ''), ionapi.get('saak', ''))
+    
+    @staticmethod
+    def token_endpoint(ionapi):
+        return f"{ionapi.get('pu', '')}{ionapi.get('ot', '')}"
+    
+    def get_token(self, ionapi, force=False):
+        """Token dict (access_token, token_type, expires_at) for the account; raises when none can be had"""
+        key = self.account_key(ionapi)
+        with self._lock:
+            account_lock = self._locks.setdefault(key, threading.Lock())
+        
+        # Callers needing the same account wait for one request instead of each making their own
+        with account_lock:
+            token = self._tokens.get(key)
+            now = self.clock()
+            if token and not force and now < token['refresh_at']:
+                return token
+            failure = self._failures.get(key)
+            if failure and not force and now < failure[0]:
+                raise ValueError(f"Token request failed {int(now - failure[2])}s ago: {failure[1]}")
+            
+            fresh = None
+            if token and token.get('refresh_token') and now < token['expires_at']:
+                try:
+                    fresh = self._request(ionapi, {'grant_type': 'refresh_token', 'refresh_token': token['refresh_token']})
+                    fresh['refresh_token'] = fresh['refresh_token'] or token['refresh_token']
+                except (requests.RequestException, ValueError) as e:
+                    logger.warning("Token refresh failed, requesting a new token: %s", e)
+            if fresh is None:
+                try:
+                    fresh = self._request(ionapi, {'grant_type': 'password', 'username': ionapi.get('saak', ''),
+                                                   'password': ionapi.get('sask', '')})
+                except (requests.RequestException, ValueError) as e:
+                    self._failures[key] = (now + FAILURE_RETRY_SECONDS, e, now)
+                    raise
+            self._failures.pop(key, None)
+            self._tokens[key] = fresh
+            return fresh
+    
+    def invalidate(self, ionapi):
+        """Forget the account's token, e.g. after the API rejected it"""
+        with self._lock:
+            self._tokens.pop(self.account_key(ionapi), None)
+    
+    def _request(self, ionapi, grant):
+        started = self.clock()
+        data = dict(grant, client_id=ionapi.get('ci', ''), client_secret=ionapi.get('cs', ''))
+        response = self.http.post(self.token_endpoint(ionapi), data=data, timeout=TOKEN_TIMEOUT_SECONDS)
+        if response.status_code != 200:
+            raise ValueError(f"Token endpoint returned HTTP {response.status_code}: {response.text[:200]}")
+        payload = response.json()
+        if not payload.get('access_token'):
+            raise ValueError("Token endpoint response has no access_token")
+        
+        lifetime = int(payload.get('expires_in') or DEFAULT_TOKEN_LIFETIME)
+        logger.info("Obtained %s token for service account %s (expires in %ss)",
+                    grant['grant_type'], ionapi.get('saak', '')[:12], lifetime)
+        return {
+            'access_token': payload['access_token'],
+            'token_type': payload.get('token_type') or 'Bearer',
+            'refresh_token': payload.get('refresh_token'),
+            'expires_at': started + lifetime,
+            'refresh_at': started + lifetime - min(REFRESH_AHEAD_SECONDS, lifetime / 2)
+        }
+
+shared_token_service = TokenService()
+
+def authorization_header(token):
+    return {'Authorization': f"{token['token_type']} {token['access_token']}"}
+
+class IONAPIAuth(requests.auth.AuthBase):
+    """requests auth that sends the account's token to the ION API host only.
+
+    The token is looked up on every request, so a long-lived session picks up the
+    renewed token instead of sending an expired one; a 401 drops it from the cache.
+    """
+    
+    def __init__(self, token_service, ionapi):
+        self.token_service = token_service
+        self.ionapi = ionapi
+        self.host = urlparse(ionapi.get('iu', '')).netloc.lower()
+    
+    def __call__(self, request):
+        if urlparse(request.url).netloc.lower() == self.host:
+            request.headers.update(authorization_header(self.token_service.get_token(self.ionapi)))
+            request.register_hook('response', self._on_response)
+        return request
+    
+    def _on_response(self, response, **kwargs):
+        if response.status_code == 401:
+            logger.warning("ION API rejected the token, a new one is requested on the next call")
+            self.token_service.invalidate(self.ionapi)
+        return response
 
 class APIAuthenticator:
     """Handle API-based authentication for FSM using service account details"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, token_service=None):
         self.db_manager = db_manager
         self.service_account_data = None
+        self.token_service = token_service or shared_token_service
         
     def load_service_account(self, account_id):
         """Load service account data from database"""
@@ -28,69 +152,43 @@ class APIAuthenticator:
                     return True
             return False
         except Exception as e:
-            print(f"Error loading service account: {e}")
+            logger.error("Error loading service account %s: %s", account_id, e)
             return False
     
-    def get_api_token_url(self):
-        """Generate API token URL using service account credentials"""
+    def get_token(self, force=False):
+        """Cached ION API token for the loaded service account, or None"""
         if not self.service_account_data:
             return None
-            
         try:
-            # Extract values from service account: pu + ot + parameters
-            pu = self.service_account_data.get('pu', '')  # Base URL
-            ot = self.service_account_data.get('ot', '')  # Token endpoint
-            saak = self.service_account_data.get('saak', '')  # Username
-            sask = self.service_account_data.get('sask', '')  # Password
-            ci = self.service_account_data.get('ci', '')  # Client ID
-            cs = self.service_account_data.get('cs', '')  # Client Secret
-            
-            # Build URL: pu + ot + ? + parameters
-            base_url = f"{pu}{ot}"
-            
-            # URL encode the parameters
-            params = {
-                'username': saak,
-                'password': sask,
-                'client_id': ci,
-                'client_secret': cs,
-                'grant_type': 'password'
-            }
-            
-            # Build the complete URL
-            url_params = urllib.parse.urlencode(params)
-            return f"{base_url}?{url_params}"
-            
-        except Exception as e:
-            print(f"Error generating API token URL: {e}")
+            return self.token_service.get_token(self.service_account_data, force=force)
+        except (requests.RequestException, ValueError) as e:
+            logger.error("API token request failed: %s", e)
+            return None
+    
+    def api_base_url(self):
+        """ION API base URL for the tenant (iu/ti), for API calls"""
+        if not self.service_account_data:
+            return None
+        return f"{self.service_account_data.get('iu', '').rstrip('/')}/{self.service_account_data.get('ti', '')}"
+    
+    def api_session(self):
+        """requests.Session that authenticates its calls to the ION API host, or None"""
+        if not self.get_token():
             return None
+        session = requests.Session()
+        session.auth = IONAPIAuth(self.token_service, self.service_account_data)
+        return session
     
     def authenticate_with_api(self, driver):
-        """Perform API-based authentication by navigating to token URL"""
-        try:
-            token_url = self.get_api_token_url()
-            if not token_url:
-                return False
-                
-            print(f"Using API authentication...")
-            
-            # Navigate to the API token URL
-            driver.get(token_url)
-            time.sleep(3)
-            
-            # Check if we got a token response or if we're redirected to FSM
-            current_url = driver.current_url
-            
-            if "token" in current_url.lower() or "fsm" in current_url.lower():
-                print("API authentication successful!")
-                return True
-            else:
-                print("API authentication failed - unexpected response")
-                return False
-                
-        except Exception as e:
-            print(f"API authentication error: {e}")
+        """Obtain the account's token over HTTP so API steps can use it through api_session.
+
+        The token is deliberately not added to the browser: DevTools extra headers
+        go to every origin a page contacts, not just the ION API.
+        """
+        if not self.get_token():
             return False
+        logger.info("API authentication successful")
+        return True
     
     def get_available_service_accounts(self):
         """Get list of available service accounts"""
@@ -98,30 +196,45 @@ class APIAuthenticator:
             accounts = self.db_manager.get_service_accounts()
             return [(acc[0], acc[1]) for acc in accounts]  # (id, name)
         except Exception as e:
-            print(f"Error getting service accounts: {e}")
+            logger.error("Error getting service accounts: %s", e)
             return []
     
+    def select_service_account(self, account_id=None, tenant=None):
+        """Load the named account, or the one whose .ionapi tenant (ti) is the profile's tenant.
+
+        With neither given, a single stored account is used; otherwise the choice is
+        ambiguous and nothing is loaded.
+        """
+        if account_id:
+            return self.load_service_account(account_id)
+        service_accounts = self.get_available_service_accounts()
+        if tenant:
+            for candidate_id, _ in service_accounts:
+                if self.load_service_account(candidate_id) and \
+                        str(self.service_account_data.get('ti', '')).upper() == tenant.upper():
+                    return True
+            self.service_account_data = None
+            logger.warning("No service account for tenant %s", tenant)
+            return False
+        if len(service_accounts) == 1:
+            return self.load_service_account(service_accounts[0][0])
+        logger.warning("%s service accounts and no tenant to choose between them", len(service_accounts))
+        return False
+    
     def authenticate_scenario(self, driver, scenario_data):
-        """Authenticate a scenario using API if auto_login is enabled"""
+        """Authenticate a scenario using API if auto_login is enabled.
+
+        scenario_data may name the account (service_account_id) or the profile's tenant.
+        """
         try:
             # Check if scenario has auto_login enabled
             if not scenario_data.get('auto_login', False):
                 return False
-                
-            # Get the first available service account
-            service_accounts = self.get_available_service_accounts()
-            if not service_accounts:
-                print("No service accounts available for auto-login")
-                return False
-                
-            # Use the first service account
-            account_id = service_accounts[0][0]
-            if self.load_service_account(account_id):
+            
+            if self.select_service_account(scenario_data.get('service_account_id'), scenario_data.get('tenant')):
                 return self.authenticate_with_api(driver)
-            else:
-                print("Failed to load service account for auto-login")
-                return False
-                
+            logger.warning("No service account loaded for auto-login")
+            return False
         except Exception as e:
-            print(f"Scenario authentication error: {e}")
+            logger.error("Scenario authentication error: %s", e)
             return False
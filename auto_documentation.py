@@ -3,12 +3,285 @@
 
 import os
 import json
+import hashlib
+import sqlite3
+import threading
 import tkinter as tk
+from tkinter import ttk
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.shared import OxmlElement, qn
+from log_manager import get_logger
+
+logger = get_logger('auto_documentation')
+
+# Bump when the report writers change, so unchanged scenarios are written again once
+REPORT_FORMAT = 1
+# Fingerprint and file paths of each scenario's last reports, kept next to them
+MANIFEST_NAME = 'bulk_manifest.json'
+REPORT_KINDS = ('docx', 'markdown', 'json')
+# Below this many scenarios starting worker processes costs more than it saves
+PARALLEL_MIN_SCENARIOS = 4
+
+def load_scenario_data(conn, user_id, rice_profile, scenario_ids=None):
+    """Report data for a profile's scenarios (or only scenario_ids) in three queries, by scenario number"""
+    if scenario_ids is not None and not scenario_ids:
+        return []
+    cursor = conn.cursor()
+    
+    scenario_filter = ""
+    params = [user_id, str(rice_profile)]
+    if scenario_ids is not None:
+        scenario_filter = f"AND id IN ({','.join('?' * len(scenario_ids))})"
+        params.extend(scenario_ids)
+    cursor.execute(f"""
+        SELECT id, scenario_number, description, result, executed_at, created_at
+        FROM scenarios
+        WHERE user_id = ? AND rice_profile = ? {scenario_filter}
+        ORDER BY scenario_number
+    """, params)
+    scenarios = cursor.fetchall()
+    if not scenarios:
+        return []
+    
+    step_filter = ""
+    params = [user_id, str(rice_profile)]
+    if scenario_ids is not None:
+        step_filter = f"AND ss.scenario_number IN ({','.join('?' * len(scenarios))})"
+        params.extend(row[1] for row in scenarios)
+    cursor.execute(f"""
+        SELECT ss.scenario_number, ss.step_order, 
+               COALESCE(ts.name, ss.step_name) as step_name,
+               COALESCE(ts.step_type, ss.step_type) as step_type,
+               CASE 
+                   WHEN COALESCE(ts.step_type, ss.step_type) IN ('Wait', 'Text Input') 
+                   THEN COALESCE(NULLIF(ss.step_description, ''), NULLIF(ss.custom_value, 'None'), ts.default_value)
+                   ELSE COALESCE(ts.target, ss.step_target)
+               END as step_target,
+               ss.execution_status,
+               ss.screenshot_timestamp
+        FROM scenario_steps ss
+        LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
+        WHERE ss.user_id = ? AND ss.rice_profile = ? {step_filter}
+        ORDER BY ss.scenario_number, ss.step_order
+    """, params)
+    steps_by_scenario = {}
+    for step in cursor.fetchall():
+        steps_by_scenario.setdefault(step[0], []).append({
+            'order': step[1],
+            'name': step[2],
+            'type': step[3],
+            'target': step[4],
+            'status': step[5],
+            'screenshot_timestamp': step[6]
+        })
+    
+    cursor.execute("""
+        SELECT rp.name, gc.fsm_url, rp.client_name
+        FROM rice_profiles rp
+        LEFT JOIN global_config gc ON gc.user_id = rp.user_id
+        WHERE rp.id = ? AND rp.user_id = ?
+    """, (rice_profile, user_id))
+    profile_info = cursor.fetchone()
+    profile = {
+        'id': rice_profile,
+        'name': profile_info[0] if profile_info else 'Unknown',
+        'base_url': (profile_info[1] or '') if profile_info else '',
+        'description': (profile_info[2] or '') if profile_info else ''
+    }
+    
+    return [
+        {
+            'scenario': {
+                'id': scenario_id,
+                'number': number,
+                'description': description,
+                'result': result,
+                'executed_at': executed_at,
+                'created_at': created_at
+            },
+            'steps': steps_by_scenario.get(number, []),
+            'profile': profile
+        } for scenario_id, number, description, result, executed_at, created_at in scenarios
+    ]
+
+def scenario_fingerprint(scenario_data):
+    """Hash of everything a scenario's reports are written from"""
+    payload = json.dumps([REPORT_FORMAT, scenario_data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_scenario_reports(job):
+    """Write one scenario's DOCX, Markdown and JSON reports - runs in a worker process for bulk runs"""
+    scenario_data, reports_dir, generated = job
+    return {
+        'docx': write_docx_report(scenario_data, reports_dir, generated),
+        'markdown': write_markdown_report(scenario_data, reports_dir, generated),
+        'json': write_json_summary(scenario_data, reports_dir, generated),
+        'scenario': scenario_data['scenario']['description'],
+        'number': scenario_data['scenario']['number']
+    }
+
+def write_docx_report(scenario_data, reports_dir, generated):
+    """Generate DOCX report for scenario"""
+    try:
+        doc = Document()
+        
+        # Title
+        title = doc.add_heading(f"Scenario #{scenario_data['scenario']['number']} - Test Documentation", 0)
+        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Scenario Information
+        doc.add_heading('Scenario Information', level=1)
+        
+        info_table = doc.add_table(rows=6, cols=2)
+        info_table.style = 'Table Grid'
+        
+        info_data = [
+            ('Scenario Number', str(scenario_data['scenario']['number'])),
+            ('Description', scenario_data['scenario']['description']),
+            ('RICE Profile', scenario_data['profile']['name']),
+            ('Base URL', scenario_data['profile']['base_url']),
+            ('Status', scenario_data['scenario']['result'] or 'Not Run'),
+            ('Last Executed', scenario_data['scenario']['executed_at'] or 'Never')
+        ]
+        
+        for i, (label, value) in enumerate(info_data):
+            info_table.cell(i, 0).text = label
+            info_table.cell(i, 1).text = str(value)
+        
+        # Test Steps
+        doc.add_heading('Test Steps', level=1)
+        
+        if scenario_data['steps']:
+            steps_table = doc.add_table(rows=len(scenario_data['steps']) + 1, cols=5)
+            steps_table.style = 'Table Grid'
+            
+            # Headers
+            headers = ['Step', 'Name', 'Type', 'Target/Value', 'Status']
+            for i, header in enumerate(headers):
+                steps_table.cell(0, i).text = header
+            
+            # Step data
+            for i, step in enumerate(scenario_data['steps'], 1):
+                steps_table.cell(i, 0).text = str(step['order'])
+                steps_table.cell(i, 1).text = step['name'] or ''
+                steps_table.cell(i, 2).text = step['type'] or ''
+                steps_table.cell(i, 3).text = step['target'] or ''
+                steps_table.cell(i, 4).text = step['status'] or 'Pending'
+        else:
+            doc.add_paragraph('No steps defined for this scenario.')
+        
+        # Execution Summary
+        doc.add_heading('Execution Summary', level=1)
+        
+        total_steps = len(scenario_data['steps'])
+        completed_steps = len([s for s in scenario_data['steps'] if s['status'] == 'completed'])
+        
+        summary_para = doc.add_paragraph()
+        summary_para.add_run(f"Total Steps: {total_steps}\n")
+        summary_para.add_run(f"Completed Steps: {completed_steps}\n")
+        summary_para.add_run(f"Success Rate: {(completed_steps/total_steps*100):.1f}%\n" if total_steps > 0 else "Success Rate: N/A\n")
+        summary_para.add_run(f"Generated: {generated.strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # Save document
+        filename = f"Scenario_{scenario_data['scenario']['number']}_{generated.strftime('%Y%m%d_%H%M%S')}.docx"
+        doc_path = os.path.join(reports_dir, filename)
+        doc.save(doc_path)
+        
+        return doc_path
+    
+    except Exception as e:
+        logger.warning("DOCX generation for scenario %s failed: %s", scenario_data['scenario']['number'], e,
+                       exc_info=True)
+        return None
+
+def write_markdown_report(scenario_data, reports_dir, generated):
+    """Generate Markdown report for scenario"""
+    try:
+        md_content = []
+        
+        # Title
+        md_content.append(f"# Scenario #{scenario_data['scenario']['number']} - Test Documentation\n")
+        
+        # Scenario Information
+        md_content.append("## Scenario Information\n")
+        md_content.append(f"- **Scenario Number:** {scenario_data['scenario']['number']}")
+        md_content.append(f"- **Description:** {scenario_data['scenario']['description']}")
+        md_content.append(f"- **RICE Profile:** {scenario_data['profile']['name']}")
+        md_content.append(f"- **Base URL:** {scenario_data['profile']['base_url']}")
+        md_content.append(f"- **Status:** {scenario_data['scenario']['result'] or 'Not Run'}")
+        md_content.append(f"- **Last Executed:** {scenario_data['scenario']['executed_at'] or 'Never'}\n")
+        
+        # Test Steps
+        md_content.append("## Test Steps\n")
+        
+        if scenario_data['steps']:
+            md_content.append("| Step | Name | Type | Target/Value | Status |")
+            md_content.append("|------|------|------|--------------|--------|")
+            
+            for step in scenario_data['steps']:
+                md_content.append(f"| {step['order']} | {step['name'] or ''} | {step['type'] or ''} | {step['target'] or ''} | {step['status'] or 'Pending'} |")
+        else:
+            md_content.append("No steps defined for this scenario.")
+        
+        md_content.append("")
+        
+        # Execution Summary
+        md_content.append("## Execution Summary\n")
+        
+        total_steps = len(scenario_data['steps'])
+        completed_steps = len([s for s in scenario_data['steps'] if s['status'] == 'completed'])
+        
+        md_content.append(f"- **Total Steps:** {total_steps}")
+        md_content.append(f"- **Completed Steps:** {completed_steps}")
+        md_content.append(f"- **Success Rate:** {(completed_steps/total_steps*100):.1f}%" if total_steps > 0 else "- **Success Rate:** N/A")
+        md_content.append(f"- **Generated:** {generated.strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # Save markdown
+        filename = f"Scenario_{scenario_data['scenario']['number']}_{generated.strftime('%Y%m%d_%H%M%S')}.md"
+        md_path = os.path.join(reports_dir, filename)
+        
+        with open(md_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(md_content))
+        
+        return md_path
+    
+    except Exception as e:
+        logger.warning("Markdown generation for scenario %s failed: %s", scenario_data['scenario']['number'], e,
+                       exc_info=True)
+        return None
+
+def write_json_summary(scenario_data, reports_dir, generated):
+    """Generate JSON summary for scenario"""
+    try:
+        summary = {
+            'scenario': scenario_data['scenario'],
+            'profile': scenario_data['profile'],
+            'steps': scenario_data['steps'],
+            'summary': {
+                'total_steps': len(scenario_data['steps']),
+                'completed_steps': len([s for s in scenario_data['steps'] if s['status'] == 'completed']),
+                'success_rate': (len([s for s in scenario_data['steps'] if s['status'] == 'completed']) / len(scenario_data['steps']) * 100) if scenario_data['steps'] else 0,
+                'generated_at': generated.isoformat()
+            }
+        }
+        
+        # Save JSON
+        filename = f"Scenario_{scenario_data['scenario']['number']}_{generated.strftime('%Y%m%d_%H%M%S')}.json"
+        json_path = os.path.join(reports_dir, filename)
+        
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        
+        return json_path
+    
+    except Exception as e:
+        logger.warning("JSON generation for scenario %s failed: %s", scenario_data['scenario']['number'], e,
+                       exc_info=True)
+        return None
 
 class AutoDocumentation:
     """Automatic documentation generation for RICE Tester scenarios"""
@@ -31,122 +304,128 @@ class AutoDocumentation:
             if not scenario_data:
                 return None
             
-            # Generate DOCX report
-            doc_path = self._generate_docx_report(scenario_data)
-            
-            # Generate Markdown report
-            md_path = self._generate_markdown_report(scenario_data)
-            
-            # Generate JSON summary
-            json_path = self._generate_json_summary(scenario_data)
-            
-            return {
-                'docx': doc_path,
-                'markdown': md_path,
-                'json': json_path,
-                'scenario': scenario_data['scenario']['description']
-            }
+            # DOCX, Markdown and JSON reports
+            return render_scenario_reports((scenario_data, self.reports_dir, datetime.now()))
             
         except Exception as e:
             print(f"Documentation generation failed: {e}")
             return None
     
-    def generate_bulk_documentation(self, rice_profile):
-        """Generate documentation for all scenarios in a RICE profile"""
+    def generate_bulk_documentation(self, rice_profile, progress=None, cancel_event=None, force=False):
+        """Generate documentation for all scenarios in a RICE profile.
+
+        Scenario data is read in one pass and the reports are written in worker
+        processes. Scenarios whose data is unchanged since their last reports keep
+        those files unless force is set. progress(done, total) is called from the
+        calling thread; setting cancel_event stops before the remaining scenarios.
+        """
         try:
-            scenarios = self.db_manager.get_scenarios(rice_profile)
-            generated_docs = []
+            conn = sqlite3.connect(self.db_manager.db_path, timeout=30)
+            try:
+                scenarios = load_scenario_data(conn, self.db_manager.user_id, rice_profile)
+            finally:
+                conn.close()
             
-            for scenario in scenarios:
-                scenario_id = scenario[0]
-                doc_result = self.generate_scenario_documentation(scenario_id, rice_profile)
-                if doc_result:
-                    generated_docs.append(doc_result)
-            
-            # Generate summary report
-            summary_path = self._generate_bulk_summary(generated_docs, rice_profile)
+            manifest = self._load_manifest()
+            generated_docs = []
+            jobs = []
+            for scenario_data in scenarios:
+                key = f"{self.db_manager.user_id}:{rice_profile}:{scenario_data['scenario']['number']}"
+                fingerprint = scenario_fingerprint(scenario_data)
+                entry = manifest.get(key)
+                if (not force and entry and entry.get('fingerprint') == fingerprint
+                        and all(entry.get(kind) and os.path.exists(entry[kind]) for kind in REPORT_KINDS)):
+                    generated_docs.append({name: value for name, value in entry.items() if name != 'fingerprint'})
+                else:
+                    jobs.append((key, fingerprint, scenario_data))
+            
+            skipped = len(generated_docs)
+            done = skipped
+            failed = 0
+            if progress:
+                progress(done, len(scenarios))
+            
+            for (key, fingerprint, scenario_data), result in self._render_reports(jobs, cancel_event):
+                done += 1
+                if result and all(result[kind] for kind in REPORT_KINDS):
+                    generated_docs.append(result)
+                    manifest[key] = dict(result, fingerprint=fingerprint)
+                else:
+                    failed += 1
+                    manifest.pop(key, None)
+                if progress:
+                    progress(done, len(scenarios))
+            self._save_manifest(manifest)
+            
+            cancelled = done < len(scenarios)
+            generated_docs.sort(key=lambda doc_info: doc_info['number'])
+            # A cancelled run has no complete set to summarize
+            summary_path = None if cancelled else self._generate_bulk_summary(generated_docs, rice_profile)
+            logger.info("Bulk documentation for profile %s: %s written, %s unchanged, %s failed%s",
+                        rice_profile, len(generated_docs) - skipped, skipped, failed,
+                        " (cancelled)" if cancelled else "")
             
             return {
                 'individual_docs': generated_docs,
                 'summary_report': summary_path,
-                'total_scenarios': len(generated_docs)
+                'total_scenarios': len(generated_docs),
+                'written': len(generated_docs) - skipped,
+                'skipped': skipped,
+                'failed': failed,
+                'cancelled': cancelled
             }
             
         except Exception as e:
             print(f"Bulk documentation generation failed: {e}")
             return None
     
+    def _render_reports(self, jobs, cancel_event=None):
+        """Yield (job, result) as each scenario's reports are written, stopping once cancel_event is set"""
+        generated = datetime.now()
+        if len(jobs) < PARALLEL_MIN_SCENARIOS:
+            for job in jobs:
+                if cancel_event and cancel_event.is_set():
+                    return
+                yield job, render_scenario_reports((job[2], self.reports_dir, generated))
+            return
+        
+        pool = ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1))
+        try:
+            pending = {pool.submit(render_scenario_reports, (job[2], self.reports_dir, generated)): job
+                       for job in jobs}
+            while pending and not (cancel_event and cancel_event.is_set()):
+                # Short waits, so a cancel is noticed while a slow scenario is still rendering
+                finished, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning("Documentation for scenario %s failed: %s", job[2]['scenario']['number'], e)
+                        result = None
+                    yield job, result
+        finally:
+            # Scenarios not started yet are dropped; ones already rendering finish but are not recorded
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.reports_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_manifest(self, manifest):
+        manifest_path = os.path.join(self.reports_dir, MANIFEST_NAME)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    
     def _get_scenario_data(self, scenario_id, rice_profile):
         """Get comprehensive scenario data from database"""
         try:
-            cursor = self.db_manager.conn.cursor()
-            
-            # Get scenario info
-            cursor.execute("""
-                SELECT scenario_number, description, result, executed_at, created_at
-                FROM scenarios 
-                WHERE id = ? AND user_id = ?
-            """, (scenario_id, self.db_manager.user_id))
-            
-            scenario_info = cursor.fetchone()
-            if not scenario_info:
-                return None
-            
-            # Get scenario steps
-            cursor.execute("""
-                SELECT ss.step_order, 
-                       COALESCE(ts.name, ss.step_name) as step_name,
-                       COALESCE(ts.step_type, ss.step_type) as step_type,
-                       CASE 
-                           WHEN COALESCE(ts.step_type, ss.step_type) IN ('Wait', 'Text Input') 
-                           THEN COALESCE(NULLIF(ss.step_description, ''), NULLIF(ss.custom_value, 'None'), ts.default_value)
-                           ELSE COALESCE(ts.target, ss.step_target)
-                       END as step_target,
-                       ss.execution_status,
-                       ss.screenshot_timestamp
-                FROM scenario_steps ss
-                LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
-                WHERE ss.user_id = ? AND ss.rice_profile = ? AND ss.scenario_number = ?
-                ORDER BY ss.step_order
-            """, (self.db_manager.user_id, str(rice_profile), scenario_info[0]))
-            
-            steps = cursor.fetchall()
-            
-            # Get RICE profile info
-            cursor.execute("""
-                SELECT profile_name, base_url, description
-                FROM rice_profiles 
-                WHERE id = ? AND user_id = ?
-            """, (rice_profile, self.db_manager.user_id))
-            
-            profile_info = cursor.fetchone()
-            
-            return {
-                'scenario': {
-                    'id': scenario_id,
-                    'number': scenario_info[0],
-                    'description': scenario_info[1],
-                    'result': scenario_info[2],
-                    'executed_at': scenario_info[3],
-                    'created_at': scenario_info[4]
-                },
-                'steps': [
-                    {
-                        'order': step[0],
-                        'name': step[1],
-                        'type': step[2],
-                        'target': step[3],
-                        'status': step[4],
-                        'screenshot_timestamp': step[5]
-                    } for step in steps
-                ],
-                'profile': {
-                    'id': rice_profile,
-                    'name': profile_info[0] if profile_info else 'Unknown',
-                    'base_url': profile_info[1] if profile_info else '',
-                    'description': profile_info[2] if profile_info else ''
-                }
-            }
+            scenarios = load_scenario_data(self.db_manager.conn, self.db_manager.user_id, rice_profile, [scenario_id])
+            return scenarios[0] if scenarios else None
             
         except Exception as e:
             print(f"Error getting scenario data: {e}")
@@ -154,159 +433,15 @@ class AutoDocumentation:
     
     def _generate_docx_report(self, scenario_data):
         """Generate DOCX report for scenario"""
-        try:
-            doc = Document()
-            
-            # Title
-            title = doc.add_heading(f"Scenario #{scenario_data['scenario']['number']} - Test Documentation", 0)
-            title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            # Scenario Information
-            doc.add_heading('Scenario Information', level=1)
-            
-            info_table = doc.add_table(rows=6, cols=2)
-            info_table.style = 'Table Grid'
-            
-            info_data = [
-                ('Scenario Number', str(scenario_data['scenario']['number'])),
-                ('Description', scenario_data['scenario']['description']),
-                ('RICE Profile', scenario_data['profile']['name']),
-                ('Base URL', scenario_data['profile']['base_url']),
-                ('Status', scenario_data['scenario']['result'] or 'Not Run'),
-                ('Last Executed', scenario_data['scenario']['executed_at'] or 'Never')
-            ]
-            
-            for i, (label, value) in enumerate(info_data):
-                info_table.cell(i, 0).text = label
-                info_table.cell(i, 1).text = str(value)
-            
-            # Test Steps
-            doc.add_heading('Test Steps', level=1)
-            
-            if scenario_data['steps']:
-                steps_table = doc.add_table(rows=len(scenario_data['steps']) + 1, cols=5)
-                steps_table.style = 'Table Grid'
-                
-                # Headers
-                headers = ['Step', 'Name', 'Type', 'Target/Value', 'Status']
-                for i, header in enumerate(headers):
-                    steps_table.cell(0, i).text = header
-                
-                # Step data
-                for i, step in enumerate(scenario_data['steps'], 1):
-                    steps_table.cell(i, 0).text = str(step['order'])
-                    steps_table.cell(i, 1).text = step['name'] or ''
-                    steps_table.cell(i, 2).text = step['type'] or ''
-                    steps_table.cell(i, 3).text = step['target'] or ''
-                    steps_table.cell(i, 4).text = step['status'] or 'Pending'
-            else:
-                doc.add_paragraph('No steps defined for this scenario.')
-            
-            # Execution Summary
-            doc.add_heading('Execution Summary', level=1)
-            
-            total_steps = len(scenario_data['steps'])
-            completed_steps = len([s for s in scenario_data['steps'] if s['status'] == 'completed'])
-            
-            summary_para = doc.add_paragraph()
-            summary_para.add_run(f"Total Steps: {total_steps}\n")
-            summary_para.add_run(f"Completed Steps: {completed_steps}\n")
-            summary_para.add_run(f"Success Rate: {(completed_steps/total_steps*100):.1f}%\n" if total_steps > 0 else "Success Rate: N/A\n")
-            summary_para.add_run(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # Save document
-            filename = f"Scenario_{scenario_data['scenario']['number']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-            doc_path = os.path.join(self.reports_dir, filename)
-            doc.save(doc_path)
-            
-            return doc_path
-            
-        except Exception as e:
-            print(f"DOCX generation failed: {e}")
-            return None
+        return write_docx_report(scenario_data, self.reports_dir, datetime.now())
     
     def _generate_markdown_report(self, scenario_data):
         """Generate Markdown report for scenario"""
-        try:
-            md_content = []
-            
-            # Title
-            md_content.append(f"# Scenario #{scenario_data['scenario']['number']} - Test Documentation\n")
-            
-            # Scenario Information
-            md_content.append("## Scenario Information\n")
-            md_content.append(f"- **Scenario Number:** {scenario_data['scenario']['number']}")
-            md_content.append(f"- **Description:** {scenario_data['scenario']['description']}")
-            md_content.append(f"- **RICE Profile:** {scenario_data['profile']['name']}")
-            md_content.append(f"- **Base URL:** {scenario_data['profile']['base_url']}")
-            md_content.append(f"- **Status:** {scenario_data['scenario']['result'] or 'Not Run'}")
-            md_content.append(f"- **Last Executed:** {scenario_data['scenario']['executed_at'] or 'Never'}\n")
-            
-            # Test Steps
-            md_content.append("## Test Steps\n")
-            
-            if scenario_data['steps']:
-                md_content.append("| Step | Name | Type | Target/Value | Status |")
-                md_content.append("|------|------|------|--------------|--------|")
-                
-                for step in scenario_data['steps']:
-                    md_content.append(f"| {step['order']} | {step['name'] or ''} | {step['type'] or ''} | {step['target'] or ''} | {step['status'] or 'Pending'} |")
-            else:
-                md_content.append("No steps defined for this scenario.")
-            
-            md_content.append("")
-            
-            # Execution Summary
-            md_content.append("## Execution Summary\n")
-            
-            total_steps = len(scenario_data['steps'])
-            completed_steps = len([s for s in scenario_data['steps'] if s['status'] == 'completed'])
-            
-            md_content.append(f"- **Total Steps:** {total_steps}")
-            md_content.append(f"- **Completed Steps:** {completed_steps}")
-            md_content.append(f"- **Success Rate:** {(completed_steps/total_steps*100):.1f}%" if total_steps > 0 else "- **Success Rate:** N/A")
-            md_content.append(f"- **Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # Save markdown
-            filename = f"Scenario_{scenario_data['scenario']['number']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            md_path = os.path.join(self.reports_dir, filename)
-            
-            with open(md_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(md_content))
-            
-            return md_path
-            
-        except Exception as e:
-            print(f"Markdown generation failed: {e}")
-            return None
+        return write_markdown_report(scenario_data, self.reports_dir, datetime.now())
     
     def _generate_json_summary(self, scenario_data):
         """Generate JSON summary for scenario"""
-        try:
-            summary = {
-                'scenario': scenario_data['scenario'],
-                'profile': scenario_data['profile'],
-                'steps': scenario_data['steps'],
-                'summary': {
-                    'total_steps': len(scenario_data['steps']),
-                    'completed_steps': len([s for s in scenario_data['steps'] if s['status'] == 'completed']),
-                    'success_rate': (len([s for s in scenario_data['steps'] if s['status'] == 'completed']) / len(scenario_data['steps']) * 100) if scenario_data['steps'] else 0,
-                    'generated_at': datetime.now().isoformat()
-                }
-            }
-            
-            # Save JSON
-            filename = f"Scenario_{scenario_data['scenario']['number']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            json_path = os.path.join(self.reports_dir, filename)
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2, ensure_ascii=False)
-            
-            return json_path
-            
-        except Exception as e:
-            print(f"JSON generation failed: {e}")
-            return None
+        return write_json_summary(scenario_data, self.reports_dir, datetime.now())
     
     def _generate_bulk_summary(self, generated_docs, rice_profile):
         """Generate summary report for bulk documentation"""
@@ -348,7 +483,7 @@ class AutoDocumentation:
                 
                 # Scenario data
                 for i, doc_info in enumerate(generated_docs, 1):
-                    scenarios_table.cell(i, 0).text = f"Scenario #{i}"
+                    scenarios_table.cell(i, 0).text = f"Scenario #{doc_info.get('number', i)}"
                     scenarios_table.cell(i, 1).text = doc_info['scenario']
                     scenarios_table.cell(i, 2).text = "DOCX, Markdown, JSON"
             
@@ -376,6 +511,8 @@ class AutoDocumentation:
             
             cleaned_count = 0
             for filename in os.listdir(self.reports_dir):
+                if filename == MANIFEST_NAME:
+                    continue  # Entries for deleted reports are ignored anyway
                 file_path = os.path.join(self.reports_dir, filename)
                 if os.path.isfile(file_path):
                     file_time = os.path.getmtime(file_path)
@@ -413,3 +550,59 @@ def add_documentation_button_to_scenario(scenario_frame, scenario_id, rice_profi
                        cursor='hand2', bd=0, command=generate_docs)
     
     return doc_btn
+    
+    return doc_btn
+
+def run_bulk_documentation(parent, rice_profile, db_manager, show_popup_callback):
+    """Document every scenario of a profile behind a progress dialog with a Cancel button"""
+    doc_generator = AutoDocumentation(db_manager)
+    cancel_event = threading.Event()
+    
+    dialog = tk.Toplevel(parent)
+    dialog.title("Generating Documentation")
+    dialog.configure(bg='#ffffff')
+    dialog.geometry("420x150")
+    dialog.resizable(False, False)
+    dialog.transient(parent)
+    dialog.grab_set()
+    
+    status = tk.Label(dialog, text="Reading scenarios...", font=('Segoe UI', 10), bg='#ffffff', fg='#374151', anchor='w')
+    status.pack(fill='x', padx=20, pady=(20, 8))
+    progress_var = tk.DoubleVar()
+    ttk.Progressbar(dialog, variable=progress_var, maximum=100, length=380, mode='determinate').pack(padx=20)
+    
+    def cancel():
+        cancel_event.set()
+        cancel_btn.configure(state='disabled', text="Cancelling...")
+    
+    cancel_btn = tk.Button(dialog, text="Cancel", font=('Segoe UI', 9, 'bold'), bg='#6b7280', fg='#ffffff',
+                           relief='flat', padx=12, pady=4, cursor='hand2', bd=0, command=cancel)
+    cancel_btn.pack(pady=(12, 0))
+    dialog.protocol("WM_DELETE_WINDOW", cancel)
+    
+    def show(done, total):
+        status.configure(text=f"Scenarios: {done:,} of {total:,}")
+        progress_var.set(done * 100.0 / total if total else 100)
+    
+    def finish(result):
+        dialog.destroy()
+        if not result:
+            show_popup_callback("Generation Failed", "Failed to generate documentation. Please try again.", "error")
+            return
+        detail = f"{result['written']} written, {result['skipped']} unchanged"
+        if result['failed']:
+            detail += f", {result['failed']} failed"
+        if result['cancelled']:
+            show_popup_callback("Documentation Cancelled", f"Stopped before all scenarios were documented.\n\n{detail}", "warning")
+        else:
+            show_popup_callback("Documentation Generated",
+                                f"Documented {result['total_scenarios']} scenarios ({detail}).\n\nSaved to: {doc_generator.get_reports_directory()}",
+                                "success" if not result['failed'] else "warning")
+    
+    def worker():
+        result = doc_generator.generate_bulk_documentation(
+            rice_profile, progress=lambda done, total: dialog.after(0, lambda: show(done, total)),
+            cancel_event=cancel_event)
+        dialog.after(0, lambda: finish(result))
+    
+    threading.Thread(target=worker, daemon=True).start()
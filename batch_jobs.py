@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from log_manager import get_logger
+
+logger = get_logger('batch_jobs')
+
+# Run status: running -> completed | stopped | failed. The owning process touches a
+# running run's updated_at every OWNER_HEARTBEAT_SECONDS; a 'running' row not touched
+# for OWNER_STALE_SECONDS was interrupted (app or driver crash) and can be resumed.
+RUN_RUNNING = 'running'
+RUN_COMPLETED = 'completed'
+RUN_STOPPED = 'stopped'
+RUN_FAILED = 'failed'
+
+ITEM_PENDING = 'pending'
+ITEM_RUNNING = 'running'
+ITEM_PASSED = 'passed'
+ITEM_FAILED = 'failed'
+ITEM_SKIPPED = 'skipped'
+
+MODE_FULL = 'full'
+MODE_CHANGED = 'changed'
+
+# Who executes a run: the process that created it, or any execution worker (job_queue)
+DISPATCH_LOCAL = 'local'
+DISPATCH_QUEUE = 'queue'
+
+# Resolved step columns - the same scenario_steps/test_steps merge every executor uses
+RESOLVED_STEP_COLUMNS = """
+    ss.step_order,
+    COALESCE(ts.name, ss.step_name) as step_name,
+    COALESCE(ts.step_type, ss.step_type) as step_type,
+    COALESCE(ts.target, ss.step_target) as step_target,
+    CASE 
+        WHEN COALESCE(ts.step_type, ss.step_type) IN ('Text Input', 'Wait') 
+        THEN COALESCE(NULLIF(ss.step_description, ''), NULLIF(ss.custom_value, 'None'), ts.default_value)
+        ELSE COALESCE(ss.step_description, ts.description)
+    END as step_description,
+    COALESCE(ss.user_input_required, 0) as user_input_required
+"""
+
+OWNER_HEARTBEAT_SECONDS = 30
+OWNER_STALE_SECONDS = 120
+
+# (db_path, run_id) of the runs this process executes; the heartbeat thread keeps them fresh
+_active_runs = set()
+_active_lock = threading.Lock()
+_heartbeat_thread = None
+
+# A run no process is executing: finished, never claimed, or its owner stopped heartbeating
+UNOWNED_RUN = "(status != 'running' OR owner_pid IS NULL OR updated_at < datetime('now', ?))"
+
+def _stale_cutoff():
+    return f"-{OWNER_STALE_SECONDS} seconds"
+
+def _heartbeat():
+    """Touch every run this process owns until it owns none"""
+    global _heartbeat_thread
+    while True:
+        time.sleep(OWNER_HEARTBEAT_SECONDS)
+        with _active_lock:
+            runs = sorted(_active_runs)
+            if not runs:
+                _heartbeat_thread = None
+                return
+        for db_path, run_id in runs:
+            try:
+                conn = sqlite3.connect(db_path, timeout=30)
+                try:
+                    conn.execute("""
+                        UPDATE batch_runs SET updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND status = ? AND owner_pid = ?
+                    """, (run_id, RUN_RUNNING, os.getpid()))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning("Heartbeat for batch run %s failed: %s", run_id, e)
+
+# Resolved steps plus the group columns that go into a scenario's fingerprint
+STEP_ROWS_QUERY = f"""
+    SELECT ss.scenario_number, {RESOLVED_STEP_COLUMNS},
+           ts.group_id, g.group_name, g.description
+    FROM scenario_steps ss
+    LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
+    LEFT JOIN test_step_groups g ON ts.group_id = g.id
+    WHERE ss.user_id = ? AND ss.rice_profile = ? {{scenario_filter}}
+    ORDER BY ss.scenario_number, ss.step_order
+"""
+STEP_COLUMN_COUNT = 6  # step_order .. user_input_required, the row shape executors take
+
+DEFAULT_BROWSER_CONFIG = {'browser_type': 'chrome', 'incognito': False, 'second_screen': False}
+
+def _profile_tenant(cursor, rice_profile):
+    cursor.execute("SELECT tenant FROM rice_profiles WHERE id = ?", (rice_profile,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def _hash_scenarios(rows, tenant):
+    """{scenario_number: sha256 hex} over STEP_ROWS_QUERY rows, which arrive grouped by scenario"""
+    hashers = {}
+    for row in rows:
+        scenario_number = row[0]
+        hasher = hashers.get(scenario_number)
+        if hasher is None:
+            hasher = hashers[scenario_number] = hashlib.sha256()
+            hasher.update(json.dumps(['tenant', tenant]).encode('utf-8'))
+        hasher.update(json.dumps(list(row[1:]), default=str).encode('utf-8'))
+    
+    return {scenario_number: hasher.hexdigest() for scenario_number, hasher in hashers.items()}
+
+def compute_fingerprints(conn, user_id, rice_profile):
+    """Fingerprint every scenario of a profile in one query: {scenario_number: sha256 hex}.
+
+    The hash covers the resolved step list, the test-step groups those steps come
+    from and the profile's tenant, so editing any of them marks the scenario changed.
+    """
+    cursor = conn.cursor()
+    tenant = _profile_tenant(cursor, rice_profile)
+    cursor.execute(STEP_ROWS_QUERY.format(scenario_filter=""), (user_id, str(rice_profile)))
+    return _hash_scenarios(cursor.fetchall(), tenant)
+
+class BatchPlan:
+    """A batch's steps, fingerprints and configuration, loaded before the first scenario runs"""
+    
+    def __init__(self, steps, fingerprints, browser_config, tenant):
+        self.steps = steps                  # {scenario_number: [step rows in order]}
+        self.fingerprints = fingerprints    # {scenario_number: sha256 hex}
+        self.browser_config = browser_config
+        self.tenant = tenant
+    
+    def steps_for(self, scenario_number):
+        return self.steps.get(scenario_number, [])
+
+def load_batch_plan(conn, user_id, rice_profile, run_id=None):
+    """Load every step of a run's scenarios (the whole profile when run_id is None) in one ordered query.
+
+    Rows are grouped per scenario in memory and fingerprinted from the same rows, so
+    executing the batch needs no further step, config or fingerprint lookups.
+    """
+    cursor = conn.cursor()
+    tenant = _profile_tenant(cursor, rice_profile)
+    
+    cursor.execute("SELECT browser_type, second_screen, incognito FROM global_config WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    browser_config = dict(DEFAULT_BROWSER_CONFIG)
+    if row:
+        browser_config = {'browser_type': row[0] or 'chrome', 'incognito': bool(row[2]), 'second_screen': bool(row[1])}
+    
+    params = [user_id, str(rice_profile)]
+    scenario_filter = ""
+    if run_id is not None:
+        scenario_filter = "AND ss.scenario_number IN (SELECT scenario_number FROM batch_run_items WHERE run_id = ?)"
+        params.append(run_id)
+    cursor.execute(STEP_ROWS_QUERY.format(scenario_filter=scenario_filter), params)
+    rows = cursor.fetchall()
+    
+    steps = {}
+    for row in rows:
+        steps.setdefault(row[0], []).append(tuple(row[1:1 + STEP_COLUMN_COUNT]))
+    
+    logger.debug("Loaded %s steps for %s scenarios of profile %s", len(rows), len(steps), rice_profile)
+    return BatchPlan(steps, _hash_scenarios(rows, tenant), browser_config, tenant)
+
+def record_scenario_result(cursor, scenario_id, passed, fingerprint=None):
+    """Write a batch outcome to the scenario row; a pass records the fingerprint it passed with"""
+    if passed:
+        cursor.execute("""
+            UPDATE scenarios SET result = 'Passed', executed_at = CURRENT_TIMESTAMP, pass_fingerprint = ?
+            WHERE id = ?
+        """, (fingerprint, scenario_id))
+    else:
+        cursor.execute("""
+            UPDATE scenarios SET result = 'Failed', executed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (scenario_id,))
+
+class BatchJobStore:
+    """Persisted batch runs: an ordered scenario queue with per-scenario state.
+
+    Every call opens its own short-lived connection, so the store is safe to use
+    from the batch worker thread as well as the Tk thread.
+    """
+    
+    def __init__(self, db_path, user_id):
+        self.db_path = db_path
+        self.user_id = user_id
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def create_run(self, rice_profile, scenarios, mode='full'):
+        """Persist a new run and its scenario queue; scenarios are get_scenarios() rows"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO batch_runs (user_id, rice_profile, mode, status, total, owner_pid)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (self.user_id, str(rice_profile), mode, RUN_RUNNING, len(scenarios), os.getpid()))
+            run_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO batch_run_items (run_id, position, scenario_id, scenario_number, description, state)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(run_id, position, s[0], s[1], s[2], ITEM_PENDING) for position, s in enumerate(scenarios)])
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self._claim(run_id)
+        logger.info("Created batch run %s for profile %s (%s scenarios, mode=%s)",
+                    run_id, rice_profile, len(scenarios), mode)
+        return run_id
+    
+    def select_changed_scenarios(self, rice_profile, scenarios):
+        """Scenarios whose fingerprint changed since their last passing batch run, plus any not currently passing"""
+        conn = self._connect()
+        try:
+            fingerprints = compute_fingerprints(conn, self.user_id, rice_profile)
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, pass_fingerprint FROM scenarios WHERE user_id = ? AND rice_profile = ?",
+                           (self.user_id, str(rice_profile)))
+            passed_with = dict(cursor.fetchall())
+        finally:
+            conn.close()
+        
+        selected = []
+        for scenario in scenarios:
+            scenario_id, scenario_number, result = scenario[0], scenario[1], scenario[3]
+            stored = passed_with.get(scenario_id)
+            if result != 'Passed' or not stored or stored != fingerprints.get(scenario_number):
+                selected.append(scenario)
+        
+        logger.info("Changed-only selection for profile %s: %s of %s scenarios",
+                    rice_profile, len(selected), len(scenarios))
+        return selected
+    
+    def find_resumable_run(self, rice_profile):
+        """Latest unfinished run for the profile, or the latest run that ended with failures.
+
+        A run another process (GUI or headless runner) is still executing is not offered.
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT id, status, mode, total, created_at, updated_at, {UNOWNED_RUN} AS unowned FROM batch_runs
+                WHERE user_id = ? AND rice_profile = ? AND dispatch = ?
+                ORDER BY id DESC LIMIT 1
+            """, (_stale_cutoff(), self.user_id, str(rice_profile), DISPATCH_LOCAL))
+            run = cursor.fetchone()
+            if not run or not run['unowned']:
+                return None
+            
+            with _active_lock:
+                if (self.db_path, run['id']) in _active_runs:
+                    return None  # Still executing in this process
+            
+            counts = self._item_counts(cursor, run['id'])
+            remaining = counts[ITEM_PENDING] + counts[ITEM_RUNNING]
+            if run['status'] == RUN_COMPLETED and counts[ITEM_FAILED] == 0:
+                return None
+            if remaining == 0 and counts[ITEM_FAILED] == 0:
+                return None
+            
+            status = run['status']
+            if status == RUN_RUNNING:
+                status = 'interrupted'
+            
+            return {
+                'run_id': run['id'],
+                'status': status,
+                'mode': run['mode'],
+                'total': run['total'],
+                'passed': counts[ITEM_PASSED],
+                'failed': counts[ITEM_FAILED],
+                'skipped': counts[ITEM_SKIPPED],
+                'remaining': remaining,
+                'created_at': run['created_at'],
+                'updated_at': run['updated_at']
+            }
+        finally:
+            conn.close()
+    
+    def get_run(self, run_id):
+        """The saved run as a dict (id, rice_profile, mode, status, total, ...), or None"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM batch_runs WHERE id = ? AND user_id = ?", (run_id, self.user_id))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+    
+    def _item_counts(self, cursor, run_id):
+        counts = {ITEM_PENDING: 0, ITEM_RUNNING: 0, ITEM_PASSED: 0, ITEM_FAILED: 0, ITEM_SKIPPED: 0}
+        cursor.execute("SELECT state, COUNT(*) FROM batch_run_items WHERE run_id = ? GROUP BY state", (run_id,))
+        for state, count in cursor.fetchall():
+            counts[state] = count
+        return counts
+    
+    def resume_run(self, run_id):
+        """Re-open a saved run for execution by this process.
+
+        The claim is a single conditional UPDATE, so of two processes resuming the same
+        run only one gets it. Returns False if the run is still owned by a live process.
+        """
+        with _active_lock:
+            if (self.db_path, run_id) in _active_runs:
+                return False
+        conn = self._connect()
+        try:
+            cursor = conn.execute(f"""
+                UPDATE batch_runs SET status = ?, owner_pid = ?, finished_at = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND user_id = ? AND {UNOWNED_RUN}
+            """, (RUN_RUNNING, os.getpid(), run_id, self.user_id, _stale_cutoff()))
+            conn.commit()
+            claimed = cursor.rowcount == 1
+        finally:
+            conn.close()
+        
+        if not claimed:
+            logger.warning("Batch run %s is still being executed by another process", run_id)
+            return False
+        self._claim(run_id)
+        logger.info("Resuming batch run %s", run_id)
+        return True
+    
+    def get_queue(self, run_id, failures_only=False):
+        """Items still to execute, in run order, as (item_id, scenario_row) with scenario_row shaped like get_scenarios().
+
+        Normally that is everything not yet finished - including a scenario that was mid-flight
+        when the batch died. With failures_only it is just the scenarios that failed.
+        """
+        states = (ITEM_FAILED,) if failures_only else (ITEM_PENDING, ITEM_RUNNING)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT i.id, i.scenario_id, i.scenario_number, COALESCE(s.description, i.description), s.result, s.file_path
+                FROM batch_run_items i
+                LEFT JOIN scenarios s ON s.id = i.scenario_id
+                WHERE i.run_id = ? AND i.state IN ({','.join('?' * len(states))})
+                ORDER BY i.position
+            """, (run_id,) + states)
+            return [(row[0], tuple(row[1:])) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    
+    def get_counts(self, run_id):
+        conn = self._connect()
+        try:
+            return self._item_counts(conn.cursor(), run_id)
+        finally:
+            conn.close()
+    
+    def mark_item_running(self, item_id):
+        self._update_item(item_id, """
+            UPDATE batch_run_items SET state = ?, attempts = attempts + 1,
+                started_at = CURRENT_TIMESTAMP, finished_at = NULL, error = NULL
+            WHERE id = ?
+        """, (ITEM_RUNNING, item_id))
+    
+    def mark_item_result(self, item_id, state, error=None):
+        """Checkpoint a finished scenario (passed / failed / skipped)"""
+        self._update_item(item_id, """
+            UPDATE batch_run_items SET state = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (state, error, item_id))
+    
+    def _update_item(self, item_id, sql, params):
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            cursor.execute("""
+                UPDATE batch_runs SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = (SELECT run_id FROM batch_run_items WHERE id = ?)
+            """, (item_id,))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def finish_run(self, run_id, status):
+        """Close a run as completed, stopped or failed and release it"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE batch_runs SET status = ?, owner_pid = NULL,
+                    updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (status, run_id))
+            conn.commit()
+        finally:
+            conn.close()
+            with _active_lock:
+                _active_runs.discard((self.db_path, run_id))
+        logger.info("Batch run %s finished: %s", run_id, status)
+    
+    def _claim(self, run_id):
+        global _heartbeat_thread
+        with _active_lock:
+            _active_runs.add((self.db_path, run_id))
+            if _heartbeat_thread is None:
+                _heartbeat_thread = threading.Thread(target=_heartbeat, name='batch-run-heartbeat', daemon=True)
+                _heartbeat_thread.start()
@@ -4,6 +4,7 @@
 import tkinter as tk
 from tkinter import ttk
 import json
+import sqlite3
 
 class BulkOperationsManager:
     """Bulk operations for test steps - Phase 3 advanced features"""
@@ -338,35 +339,12 @@ class BulkOperationsManager:
     def apply_batch_edit(self, selected_steps, dialog):
         """Apply batch edit changes"""
         try:
-            cursor = self.db_manager.conn.cursor()
-            changes_made = 0
+            name_prefix = self.name_prefix.get().strip() if self.edit_name.get() else None
+            description = self.batch_description.get().strip() if self.edit_description.get() else None
             
-            for step_id in selected_steps:
-                updates = []
-                values = []
-                
-                if self.edit_name.get() and self.name_prefix.get().strip():
-                    # Get current name
-                    cursor.execute("SELECT name FROM test_steps WHERE id = ? AND user_id = ?", 
-                                  (step_id, self.db_manager.user_id))
-                    current_name = cursor.fetchone()[0]
-                    new_name = f"{self.name_prefix.get().strip()} {current_name}"
-                    updates.append("name = ?")
-                    values.append(new_name)
-                
-                if self.edit_description.get() and self.batch_description.get().strip():
-                    updates.append("description = ?")
-                    values.append(self.batch_description.get().strip())
-                
-                if updates:
-                    values.append(step_id)
-                    values.append(self.db_manager.user_id)
-                    
-                    query = f"UPDATE test_steps SET {', '.join(updates)} WHERE id = ? AND user_id = ?"
-                    cursor.execute(query, values)
-                    changes_made += 1
-            
-            self.db_manager.conn.commit()
+            # One statement for the whole selection, committed as a single transaction
+            changes_made = self.db_manager.bulk_update_test_steps(selected_steps, name_prefix=name_prefix,
+                                                                  description=description or None)
             dialog.destroy()
             
             if changes_made > 0:
@@ -387,30 +365,7 @@ class BulkOperationsManager:
             return
         
         try:
-            cursor = self.db_manager.conn.cursor()
-            duplicated = 0
-            
-            for step_id in selected:
-                # Get step data
-                cursor.execute("SELECT name, step_type, target, description, rice_profile_id FROM test_steps WHERE id = ? AND user_id = ?", 
-                              (step_id, self.db_manager.user_id))
-                step_data = cursor.fetchone()
-                
-                if step_data:
-                    name, step_type, target, description, rice_profile_id = step_data
-                    new_name = f"{name} (Copy)"
-                    
-                    # Get next order
-                    cursor.execute("SELECT COALESCE(MAX(step_order), 0) + 1 FROM test_steps WHERE user_id = ? AND group_id = ?", 
-                                  (self.db_manager.user_id, self.group_id))
-                    next_order = cursor.fetchone()[0]
-                    
-                    # Insert duplicate
-                    cursor.execute("INSERT INTO test_steps (user_id, rice_profile_id, name, step_type, target, description, group_id, step_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", 
-                                  (self.db_manager.user_id, rice_profile_id, new_name, step_type, target, description, self.group_id, next_order))
-                    duplicated += 1
-            
-            self.db_manager.conn.commit()
+            duplicated = self.db_manager.bulk_duplicate_test_steps(selected, self.group_id)
             
             if duplicated > 0:
                 self.show_popup("Success", f"✨ Duplicated {duplicated} steps successfully!", "success")
@@ -465,12 +420,7 @@ class BulkOperationsManager:
         
         def confirm_delete():
             try:
-                cursor = self.db_manager.conn.cursor()
-                for step_id in selected:
-                    cursor.execute("DELETE FROM test_steps WHERE id = ? AND user_id = ?", 
-                                  (step_id, self.db_manager.user_id))
-                
-                self.db_manager.conn.commit()
+                self.db_manager.bulk_delete_test_steps(selected)
                 confirm_dialog.destroy()
                 
                 self.show_popup("Success", f"✨ Deleted {len(selected)} steps successfully!", "success")
@@ -500,19 +450,209 @@ class BulkOperationsManager:
         self.show_popup("Feature", "Step sequence creation coming soon!", "info")
     
     def export_steps(self):
-        self.show_popup("Feature", "Step export functionality coming soon!", "info")
+        """Export the selected steps (or the whole group) as a library archive"""
+        from tkinter import filedialog
+        from step_library import export_library, run_with_progress
+        
+        path = filedialog.asksaveasfilename(parent=self.dialog, title="Export Steps",
+                                            defaultextension=".zip", filetypes=[("Step library", "*.zip")])
+        if not path:
+            return
+        
+        selected = self.get_selected_steps()
+        db_path = self.db_manager.db_path
+        user_id = self.db_manager.user_id
+        
+        def work(progress):
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                return export_library(conn, user_id, path, [self.group_id], selected or None, progress=progress)
+            finally:
+                conn.close()
+        
+        def done(counts, error):
+            if error:
+                self.show_popup("Error", f"Failed to export steps: {error}", "error")
+            else:
+                self.show_popup("Success", f"📋 Exported {counts['steps']} steps to {path}", "success")
+        
+        run_with_progress(self.dialog, "Exporting Steps", work, done)
     
     def import_steps(self):
-        self.show_popup("Feature", "Step import functionality coming soon!", "info")
+        """Import the steps of a library archive into this group"""
+        from tkinter import filedialog
+        from step_library import import_library, format_summary, run_with_progress
+        
+        path = filedialog.askopenfilename(parent=self.dialog, title="Import Steps",
+                                          filetypes=[("Step library", "*.zip")])
+        if not path:
+            return
+        
+        db_path = self.db_manager.db_path
+        user_id = self.db_manager.user_id
+        
+        def work(progress):
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                return import_library(conn, user_id, path, target_group_id=self.group_id, progress=progress)
+            finally:
+                conn.close()
+        
+        def done(summary, error):
+            if error:
+                self.show_popup("Error", f"Failed to import steps: {error}", "error")
+                return
+            self.show_popup("Import Complete", format_summary(summary), "success")
+            self.load_steps()
+            if self.callback:
+                self.callback(self.group_id)
+        
+        run_with_progress(self.dialog, "Importing Steps", work, done)
+    
+    def _analyze_library(self, group_id=None):
+        """Run the step library analysis; None (after an error popup) when it fails"""
+        from step_analysis import analyze_library
+        try:
+            return analyze_library(self.db_manager.conn, self.db_manager.user_id, group_id)
+        except Exception as e:
+            self.show_popup("Error", f"Failed to analyse steps: {str(e)}", "error")
+            return None
+    
+    def _show_report(self, title, color, lines, apply_label=None, apply_action=None):
+        """Scrollable findings list with an optional button that applies the proposed fix"""
+        report_dialog = tk.Toplevel(self.dialog)
+        report_dialog.title(title)
+        report_dialog.configure(bg='#ffffff')
+        report_dialog.geometry("700x480")
+        report_dialog.transient(self.dialog)
+        report_dialog.grab_set()
+        
+        try:
+            report_dialog.iconbitmap("infor_logo.ico")
+        except:
+            pass
+        
+        header_frame = tk.Frame(report_dialog, bg=color, height=50)
+        header_frame.pack(fill='x')
+        header_frame.pack_propagate(False)
+        
+        tk.Label(header_frame, text=title, font=('Segoe UI', 14, 'bold'), 
+                bg=color, fg='#ffffff').pack(expand=True)
+        
+        content_frame = tk.Frame(report_dialog, bg='#ffffff', padx=20, pady=15)
+        content_frame.pack(fill='both', expand=True)
+        
+        text_frame = tk.Frame(content_frame, bg='#ffffff')
+        text_frame.pack(fill='both', expand=True)
+        scrollbar = ttk.Scrollbar(text_frame, orient='vertical')
+        scrollbar.pack(side='right', fill='y')
+        text = tk.Text(text_frame, font=('Consolas', 9), bg='#f8fafc', fg='#374151', relief='solid', bd=1,
+                      wrap='none', yscrollcommand=scrollbar.set)
+        text.pack(side='left', fill='both', expand=True)
+        scrollbar.configure(command=text.yview)
+        text.insert('1.0', "\n".join(lines))
+        text.configure(state='disabled')
+        
+        btn_frame = tk.Frame(content_frame, bg='#ffffff')
+        btn_frame.pack(pady=(15, 0))
+        
+        if apply_action:
+            def apply():
+                report_dialog.destroy()
+                apply_action()
+            
+            tk.Button(btn_frame, text=apply_label, font=('Segoe UI', 10, 'bold'),
+                     bg='#10b981', fg='#ffffff', relief='flat', padx=15, pady=8,
+                     cursor='hand2', bd=0, command=apply).pack(side='left', padx=(0, 10))
+        
+        tk.Button(btn_frame, text="❌ Close", font=('Segoe UI', 10, 'bold'),
+                 bg='#6b7280', fg='#ffffff', relief='flat', padx=15, pady=8,
+                 cursor='hand2', bd=0, command=report_dialog.destroy).pack(side='left')
+    
+    def _apply_merges(self, merges):
+        try:
+            relinked, deleted = self.db_manager.merge_test_steps(merges)
+        except Exception as e:
+            self.show_popup("Error", f"Failed to merge duplicates: {str(e)}", "error")
+            return
+        
+        self.show_popup("Success", f"🧹 Merged {deleted} duplicate steps ({relinked} scenario steps relinked)", "success")
+        self.load_steps()
+        if self.callback:
+            self.callback(self.group_id)
     
     def remove_duplicates(self):
-        self.show_popup("Feature", "Duplicate detection coming soon!", "info")
+        """Find duplicates of this group's steps anywhere in the library and merge the in-group ones"""
+        report = self._analyze_library(self.group_id)
+        if report is None:
+            return
+        if not report.exact and not report.near:
+            self.show_popup("No Duplicates", "No duplicate steps found for this group", "info")
+            return
+        
+        merges = report.merges()
+        merged_ids = {duplicate_id for duplicate_ids in merges.values() for duplicate_id in duplicate_ids}
+        count = len(merged_ids)
+        
+        lines = []
+        for dup_set in report.exact:
+            lines.append("Exact duplicates")
+            for step in dup_set.steps:
+                note = "   -> merged" if step.id in merged_ids else ""
+                lines.append(f"    {step.label()}{note}")
+        for dup_set in report.near:
+            lines.append("Same action, different value - consider one step with a ${variable}")
+            lines.extend(f"    {step.label()}: {step.description or ''}" for step in dup_set.steps)
+        if report.exact and not count:
+            lines.append("")
+            lines.append("Copies in different groups are kept so each group stays complete.")
+        
+        self._show_report("🧹 Duplicate Steps", '#6366f1', lines,
+                          f"🧹 Merge {count} Duplicates" if count else None,
+                          (lambda: self._apply_merges(merges)) if count else None)
     
     def find_issues(self):
-        self.show_popup("Feature", "Issue detection coming soon!", "info")
+        """List problems with this group's steps"""
+        from step_analysis import (ISSUE_UNKNOWN_TYPE, ISSUE_MISSING_TARGET, ISSUE_INVALID_SELECTOR,
+                                   ISSUE_DEAD_SELECTOR, ISSUE_UNRESOLVED_VARIABLE, ISSUE_UNUSED)
+        
+        report = self._analyze_library(self.group_id)
+        if report is None:
+            return
+        if not report.issues:
+            self.show_popup("No Issues", "✨ No issues found in this group", "success")
+            return
+        
+        lines = []
+        for kind, heading in ((ISSUE_UNKNOWN_TYPE, "Unknown step type"), (ISSUE_MISSING_TARGET, "Missing target"),
+                              (ISSUE_INVALID_SELECTOR, "Invalid selector"), (ISSUE_DEAD_SELECTOR, "Dead selector"),
+                              (ISSUE_UNRESOLVED_VARIABLE, "Unresolved variable"), (ISSUE_UNUSED, "Unused step")):
+            issues = report.issues_of(kind)
+            if issues:
+                lines.append(f"{heading} ({len(issues)})")
+                lines.extend(f"    {issue}" for issue in issues)
+                lines.append("")
+        self._show_report("⚠️ Step Issues", '#f59e0b', lines)
     
     def auto_fix(self):
-        self.show_popup("Feature", "Auto-fix functionality coming soon!", "info")
+        """Merge exact duplicates within every group of the library in one transaction"""
+        report = self._analyze_library()
+        if report is None:
+            return
+        
+        merges = report.merges()
+        if not merges:
+            self.show_popup("Nothing to Fix", "No exact duplicates within a group were found", "info")
+            return
+        
+        labels = {step.id: step.label() for step in report.steps}
+        lines = []
+        for keeper_id, duplicate_ids in merges.items():
+            lines.append(f"Keep {labels[keeper_id]}")
+            lines.extend(f"    merge {labels[duplicate_id]}" for duplicate_id in duplicate_ids)
+        count = sum(len(duplicate_ids) for duplicate_ids in merges.values())
+        self._show_report("🔧 Auto-Fix", '#10b981', lines, f"🔧 Apply {count} Merges",
+                          lambda: self._apply_merges(merges))
     
     def apply_changes(self):
         """Apply all pending changes"""
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import sqlite3
+import tes070_store
 
 def center_dialog(dialog, width=None, height=None):
     """Center dialog using CSS-like positioning"""
@@ -32,10 +33,15 @@ import hashlib
 import base64
 
 class DatabaseManager:
-    def __init__(self, user_id, password_key="FSM_TESTER_KEY_2024"):
+    # test_steps.step_order is sparse: new steps land STEP_ORDER_GAP apart so a move
+    # rewrites only the moved row until two neighbours end up adjacent
+    STEP_ORDER_GAP = 1024
+    
+    def __init__(self, user_id, password_key="FSM_TESTER_KEY_2024", db_path=None):
         self.user_id = user_id
         self.password_key = password_key
-        self.db_path = os.path.join(os.path.dirname(__file__), 'fsm_tester.db')
+        # db_path lets execution workers point at a shared store instead of the local file
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), 'fsm_tester.db')
         self.conn = sqlite3.connect(self.db_path)
         self.init_database()
     
@@ -169,6 +175,13 @@ class DatabaseManager:
         except Exception:
             pass  # Column already exists
         
+        # Step fingerprint of the last passing batch run (drives "changed only" batches)
+        try:
+            cursor.execute("ALTER TABLE scenarios ADD COLUMN pass_fingerprint TEXT")
+            self.conn.commit()
+        except Exception:
+            pass  # Column already exists
+        
         # Add scenario_steps columns if they don't exist
         try:
             cursor.execute("ALTER TABLE scenario_steps ADD COLUMN step_name TEXT")
@@ -361,6 +374,55 @@ class DatabaseManager:
         except Exception:
             pass  # Migration already done or not needed
         
+        # TES-070 versions are stored as content-addressed docx parts (see tes070_store)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tes070_parts (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                compressed INTEGER NOT NULL DEFAULT 0,
+                content BLOB NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tes070_version_parts (
+                version_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                compress_type INTEGER NOT NULL,
+                part_hash TEXT NOT NULL,
+                PRIMARY KEY (version_id, position),
+                FOREIGN KEY (version_id) REFERENCES tes070_versions (id),
+                FOREIGN KEY (part_hash) REFERENCES tes070_parts (hash)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tes070_version_parts_hash ON tes070_version_parts (part_hash)")
+        
+        # Rendered TES-070 scenario sections, reused until their inputs change (see tes070_sections)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tes070_section_cache (
+                rice_profile TEXT NOT NULL,
+                scenario_number INTEGER NOT NULL,
+                section_key TEXT NOT NULL,
+                content BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (rice_profile, scenario_number)
+            )
+        """)
+        # Cached sections are stored as tes070_parts, like split versions (see tes070_store)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tes070_section_parts (
+                rice_profile TEXT NOT NULL,
+                scenario_number INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                compress_type INTEGER NOT NULL,
+                part_hash TEXT NOT NULL,
+                PRIMARY KEY (rice_profile, scenario_number, position),
+                FOREIGN KEY (part_hash) REFERENCES tes070_parts (hash)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tes070_section_parts_hash ON tes070_section_parts (part_hash)")
+        
         # Create TES-070 templates table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tes070_templates (
@@ -372,6 +434,113 @@ class DatabaseManager:
             )
         """)
         
+        # Batch runs: persisted run-all jobs so a crashed or stopped batch can resume
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS batch_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                rice_profile TEXT NOT NULL,
+                mode TEXT NOT NULL DEFAULT 'full',
+                status TEXT NOT NULL DEFAULT 'running',
+                total INTEGER NOT NULL DEFAULT 0,
+                owner_pid INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS batch_run_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                scenario_id INTEGER NOT NULL,
+                scenario_number INTEGER NOT NULL,
+                description TEXT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                FOREIGN KEY (run_id) REFERENCES batch_runs (id) ON DELETE CASCADE,
+                UNIQUE(run_id, position)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_batch_runs_profile ON batch_runs (user_id, rice_profile)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_batch_run_items_run ON batch_run_items (run_id, state)")
+        
+        # Job queue: runs dispatched to worker processes, whose items are leased with heartbeats
+        for table, column in (("batch_runs", "dispatch TEXT NOT NULL DEFAULT 'local'"),
+                              ("batch_runs", "max_attempts INTEGER NOT NULL DEFAULT 3"),
+                              ("batch_run_items", "lease_owner TEXT"),
+                              ("batch_run_items", "lease_expires_at REAL"),
+                              ("batch_run_items", "available_at REAL NOT NULL DEFAULT 0")):
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+                self.conn.commit()
+            except Exception:
+                pass  # Column already exists
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_batch_run_items_lease ON batch_run_items (state, available_at)")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS execution_workers (
+                worker_id TEXT PRIMARY KEY,
+                hostname TEXT,
+                pid INTEGER,
+                status TEXT NOT NULL DEFAULT 'idle',
+                current_item INTEGER,
+                jobs_done INTEGER NOT NULL DEFAULT 0,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                heartbeat_at REAL
+            )
+        """)
+        
+        # Background maintenance passes (screenshot retention) and what they reclaimed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                ran_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                reclaimed_bytes INTEGER DEFAULT 0,
+                summary TEXT
+            )
+        """)
+        
+        # Visual regression: reference frames from the last passing run and the latest diff per step
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS visual_baselines (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                rice_profile TEXT NOT NULL,
+                scenario_number INTEGER NOT NULL,
+                step_order INTEGER NOT NULL,
+                frame BLOB NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                UNIQUE(user_id, rice_profile, scenario_number, step_order)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS visual_diffs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                rice_profile TEXT NOT NULL,
+                scenario_number INTEGER NOT NULL,
+                step_order INTEGER NOT NULL,
+                run_id INTEGER,
+                score REAL NOT NULL,
+                changed_ratio REAL NOT NULL,
+                flagged BOOLEAN DEFAULT 0,
+                heatmap BLOB,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                UNIQUE(user_id, rice_profile, scenario_number, step_order)
+            )
+        """)
+        
         # Create tenants table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tenants (
@@ -592,6 +761,27 @@ class DatabaseManager:
         self.conn.commit()
         return cursor.lastrowid
     
+    def create_test_step_group_with_steps(self, group_name, description, steps, rice_profile_id=1):
+        """Create a group and its steps [(name, step_type, target, description), ...] in one transaction"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO test_step_groups (user_id, group_name, description)
+                VALUES (?, ?, ?)
+            """, (self.user_id, group_name, description))
+            group_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO test_steps (user_id, rice_profile_id, group_id, name, step_type, target, description, step_order)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(self.user_id, rice_profile_id, group_id, name, step_type, target, step_description,
+                   (index + 1) * self.STEP_ORDER_GAP)
+                  for index, (name, step_type, target, step_description) in enumerate(steps)])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return group_id
+    
     def delete_test_step_group(self, group_id):
         """Delete test step group and all its steps"""
         cursor = self.conn.cursor()
@@ -642,12 +832,7 @@ class DatabaseManager:
                 WHERE id = ? AND user_id = ?
             """, (name, step_type, target, description, group_id, step_id, self.user_id))
         else:
-            # Get next step_order for this group
-            cursor.execute("""
-                SELECT COALESCE(MAX(step_order), 0) + 1 FROM test_steps 
-                WHERE user_id = ? AND group_id = ?
-            """, (self.user_id, group_id))
-            next_order = cursor.fetchone()[0]
+            next_order = self.next_test_step_order(group_id)
             
             cursor.execute("""
                 INSERT INTO test_steps (user_id, rice_profile_id, name, step_type, target, description, group_id, step_order)
@@ -663,6 +848,132 @@ class DatabaseManager:
         cursor.execute("DELETE FROM test_steps WHERE id = ? AND user_id = ?", (step_id, self.user_id))
         self.conn.commit()
     
+    def next_test_step_order(self, group_id):
+        """step_order for a step appended to the group"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(MAX(step_order), 0) + ? FROM test_steps 
+            WHERE user_id = ? AND group_id = ?
+        """, (self.STEP_ORDER_GAP, self.user_id, group_id))
+        return cursor.fetchone()[0]
+    
+    def _run_bulk(self, sql, rows):
+        """executemany in one transaction; returns the number of rows changed"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(sql, rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return cursor.rowcount
+    
+    def bulk_update_test_steps(self, step_ids, name_prefix=None, description=None, step_type=None):
+        """Prefix names and/or overwrite description / type on many steps in one transaction"""
+        assignments = []
+        values = []
+        if name_prefix:
+            assignments.append("name = ? || ' ' || name")
+            values.append(name_prefix)
+        if description is not None:
+            assignments.append("description = ?")
+            values.append(description)
+        if step_type:
+            assignments.append("step_type = ?")
+            values.append(step_type)
+        if not assignments or not step_ids:
+            return 0
+        
+        return self._run_bulk(f"UPDATE test_steps SET {', '.join(assignments)} WHERE id = ? AND user_id = ?",
+                              [(*values, step_id, self.user_id) for step_id in step_ids])
+    
+    def bulk_duplicate_test_steps(self, step_ids, group_id, name_suffix=" (Copy)"):
+        """Copy steps to the end of a group, keeping their relative order"""
+        if not step_ids:
+            return 0
+        first_order = self.next_test_step_order(group_id)
+        return self._run_bulk("""
+            INSERT INTO test_steps (user_id, rice_profile_id, name, step_type, target, description, group_id, step_order)
+            SELECT user_id, rice_profile_id, name || ?, step_type, target, description, ?, ?
+            FROM test_steps WHERE id = ? AND user_id = ?
+        """, [(name_suffix, group_id, first_order + index * self.STEP_ORDER_GAP, step_id, self.user_id)
+              for index, step_id in enumerate(step_ids)])
+    
+    def bulk_delete_test_steps(self, step_ids):
+        return self._run_bulk("DELETE FROM test_steps WHERE id = ? AND user_id = ?",
+                              [(step_id, self.user_id) for step_id in step_ids])
+    
+    def merge_test_steps(self, merges):
+        """Fold duplicate steps into their keeper: {keeper_id: [duplicate ids]}.
+
+        Scenario steps are relinked to the keeper and the duplicates deleted, all in
+        one transaction. Returns (relinked scenario steps, deleted steps).
+        """
+        pairs = [(keeper_id, duplicate_id, self.user_id)
+                 for keeper_id, duplicate_ids in merges.items() for duplicate_id in duplicate_ids]
+        if not pairs:
+            return 0, 0
+        
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany("UPDATE scenario_steps SET test_step_id = ? WHERE test_step_id = ? AND user_id = ?", pairs)
+            relinked = cursor.rowcount
+            cursor.executemany("DELETE FROM test_steps WHERE id = ? AND user_id = ?",
+                               [(duplicate_id, user_id) for _, duplicate_id, user_id in pairs])
+            deleted = cursor.rowcount
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return relinked, deleted
+    
+    def move_test_step(self, group_id, step_id, target_index):
+        """Move a step to target_index within its group (0-based, display order).
+
+        Normally only the moved row is written, taking the midpoint of its new
+        neighbours' step_order. When they are adjacent (or legacy rows share one
+        order) the group is renumbered with STEP_ORDER_GAP spacing first.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id, step_order FROM test_steps
+            WHERE user_id = ? AND group_id = ?
+            ORDER BY COALESCE(step_order, id), id
+        """, (self.user_id, group_id))
+        rows = cursor.fetchall()
+        ids = [row[0] for row in rows]
+        if step_id not in ids:
+            return False
+        
+        others = [row for row in rows if row[0] != step_id]
+        target_index = max(0, min(target_index, len(others)))
+        
+        def new_order(neighbours):
+            before = neighbours[target_index - 1][1] if target_index > 0 else 0
+            if target_index >= len(neighbours):
+                return None if before is None else before + self.STEP_ORDER_GAP
+            after = neighbours[target_index][1]
+            if before is None or after is None or after - before < 2:
+                return None
+            return (before + after) // 2
+        
+        order = new_order(others)
+        try:
+            if order is None:
+                # No room between the neighbours - respace the group, then place the step
+                cursor.executemany("UPDATE test_steps SET step_order = ? WHERE id = ? AND user_id = ?",
+                                   [((index + 1) * self.STEP_ORDER_GAP, row_id, self.user_id)
+                                    for index, row_id in enumerate(ids)])
+                others = [(row[0], (ids.index(row[0]) + 1) * self.STEP_ORDER_GAP) for row in others]
+                order = new_order(others)
+            cursor.execute("UPDATE test_steps SET step_order = ? WHERE id = ? AND user_id = ?",
+                           (order, step_id, self.user_id))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return True
+    
     def get_scenarios(self, rice_profile_id):
         """Get scenarios for RICE profile"""
         cursor = self.conn.cursor()
@@ -940,33 +1251,39 @@ class DatabaseManager:
         """, (self.user_id, rice_profile_id))
         version_count = cursor.fetchone()[0]
         
-        # If we have 5 versions, delete the oldest one
-        if version_count >= 5:
-            cursor.execute("""
-                DELETE FROM tes070_versions 
-                WHERE user_id = ? AND rice_profile_id = ? 
-                AND id = (
+        try:
+            # If we have 5 versions, delete the oldest one (and any parts only it used)
+            if version_count >= 5:
+                cursor.execute("""
                     SELECT id FROM tes070_versions 
                     WHERE user_id = ? AND rice_profile_id = ? 
                     ORDER BY created_at ASC LIMIT 1
-                )
-            """, (self.user_id, rice_profile_id, self.user_id, rice_profile_id))
-        
-        # Get next version number
-        cursor.execute("""
-            SELECT COALESCE(MAX(version_number), 0) + 1 FROM tes070_versions 
-            WHERE user_id = ? AND rice_profile_id = ?
-        """, (self.user_id, rice_profile_id))
-        version_number = cursor.fetchone()[0]
-        
-        # Insert new version
-        cursor.execute("""
-            INSERT INTO tes070_versions (user_id, rice_profile_id, version_number, file_content, created_by)
-            VALUES (?, ?, ?, ?, ?)
-        """, (self.user_id, rice_profile_id, version_number, file_content, created_by))
-        
-        self.conn.commit()
-        return cursor.lastrowid
+                """, (self.user_id, rice_profile_id))
+                tes070_store.delete_versions(cursor, [row[0] for row in cursor.fetchall()])
+            
+            # Get next version number
+            cursor.execute("""
+                SELECT COALESCE(MAX(version_number), 0) + 1 FROM tes070_versions 
+                WHERE user_id = ? AND rice_profile_id = ?
+            """, (self.user_id, rice_profile_id))
+            version_number = cursor.fetchone()[0]
+            
+            # Split the docx into shared parts; anything that is not a zip is kept whole
+            parts = tes070_store.split_docx(file_content)
+            
+            cursor.execute("""
+                INSERT INTO tes070_versions (user_id, rice_profile_id, version_number, file_content, created_by)
+                VALUES (?, ?, ?, ?, ?)
+            """, (self.user_id, rice_profile_id, version_number, b'' if parts else file_content, created_by))
+            version_id = cursor.lastrowid
+            if parts:
+                tes070_store.store_parts(cursor, version_id, parts)
+            
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return version_id
     
     def get_tes070_versions(self, rice_profile_id):
         """Get all TES-070 versions for a RICE profile (latest 5)"""
@@ -1001,7 +1318,11 @@ class DatabaseManager:
             WHERE id = ? AND user_id = ?
         """, (version_id, self.user_id))
         result = cursor.fetchone()
-        return result[0] if result else None
+        if not result:
+            return None
+        if result[0]:
+            return result[0]  # Saved whole, before part storage
+        return tes070_store.load_docx(cursor, version_id)
     
     def save_tes070_template(self, template_format):
         """Save TES-070 name format template"""
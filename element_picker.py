@@ -2,13 +2,204 @@
 # -*- coding: utf-8 -*-
 
 import tkinter as tk
-from tkinter import ttk
-import time
 import threading
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+
+# Longest single in-page wait for a pick; the wait is re-armed until picking stops.
+# WebDriver runs one command at a time, so this also bounds how long Stop / Close
+# wait behind a pending pick.
+PICK_WAIT_SECONDS = 5
+
+# Installed once per document. Hover highlighting and the tooltip run entirely in the
+# page; a click ranks the element's selectors, checks each for uniqueness, and hands
+# the result to the pending WAIT_FOR_PICK_SCRIPT call (or keeps it for the next one).
+PICKER_SCRIPT = r"""
+if (!window.__ricePicker) {
+    const picker = window.__ricePicker = {active: true, selection: null, waiter: null};
+    
+    const overlay = document.createElement('div');
+    overlay.id = 'element-picker-overlay';
+    overlay.style.cssText = 'position: fixed; top: 0; left: 0; width: 100%; height: 100%;' +
+        'background: rgba(245, 158, 11, 0.1); z-index: 999999; pointer-events: none;' +
+        'border: 3px solid #f59e0b; box-sizing: border-box;';
+    document.body.appendChild(overlay);
+    
+    const tooltip = document.createElement('div');
+    tooltip.id = 'element-picker-tooltip';
+    tooltip.style.cssText = 'position: fixed; background: #1f2937; color: white; padding: 8px 12px;' +
+        'border-radius: 6px; font-family: monospace; font-size: 12px; z-index: 1000000;' +
+        'pointer-events: none; display: none; max-width: 300px; word-wrap: break-word;';
+    document.body.appendChild(tooltip);
+    
+    let lastHighlighted = null;
+    let lastHovered = null;
+    
+    function quote(value) {
+        return '"' + String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"') + '"';
+    }
+    
+    function getXPath(element) {
+        if (element.id) {
+            return '//*[@id=' + quote(element.id) + ']';
+        }
+        const parts = [];
+        while (element && element.nodeType === Node.ELEMENT_NODE) {
+            let index = 0;
+            let sibling = element.previousSibling;
+            while (sibling) {
+                if (sibling.nodeType === Node.ELEMENT_NODE && sibling.tagName === element.tagName) {
+                    index++;
+                }
+                sibling = sibling.previousSibling;
+            }
+            parts.unshift(element.tagName.toLowerCase() + (index > 0 ? '[' + (index + 1) + ']' : ''));
+            element = element.parentNode;
+        }
+        return '/' + parts.join('/');
+    }
+    
+    function countMatches(selector) {
+        try {
+            if (selector.type === 'XPath') {
+                return document.evaluate(selector.value, document, null,
+                    XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+            }
+            return document.querySelectorAll(selector.value).length;
+        } catch (e) {
+            return 0;  // Not a valid selector for this page
+        }
+    }
+    
+    // Unique selectors first, then the most stable kind; each checked against the live DOM
+    function rankSelectors(element) {
+        const selectors = [];
+        if (element.id) {
+            const cssId = window.CSS && CSS.escape ? '#' + CSS.escape(element.id) : '[id=' + quote(element.id) + ']';
+            selectors.push({type: 'ID', value: cssId, priority: /\d{3,}/.test(element.id) ? 4 : 1});
+        }
+        for (const attr of element.attributes) {
+            if (attr.name.startsWith('data-')) {
+                selectors.push({type: 'Data Attribute', value: '[' + attr.name + '=' + quote(attr.value) + ']', priority: 2});
+            }
+        }
+        if (element.name) {
+            selectors.push({type: 'Name', value: '[name=' + quote(element.name) + ']', priority: 3});
+        }
+        if (element.className && typeof element.className === 'string' && element.className.trim()) {
+            const classes = element.className.trim().split(/\s+/).map(c => window.CSS && CSS.escape ? CSS.escape(c) : c);
+            selectors.push({type: 'Class', value: element.tagName.toLowerCase() + '.' + classes.join('.'), priority: 5});
+        }
+        selectors.push({type: 'Tag', value: element.tagName.toLowerCase(), priority: 7});
+        selectors.push({type: 'XPath', value: getXPath(element), priority: 6});
+        
+        selectors.forEach(function(selector) {
+            selector.count = countMatches(selector);
+            selector.unique = selector.count === 1;
+        });
+        return selectors.sort((a, b) => (b.unique - a.unique) || (a.priority - b.priority));
+    }
+    
+    function isPickerElement(element) {
+        return element === overlay || element === tooltip;
+    }
+    
+    function highlightElement(element) {
+        if (lastHighlighted) {
+            lastHighlighted.style.outline = '';
+        }
+        element.style.outline = '3px solid #f59e0b';
+        element.style.outlineOffset = '2px';
+        lastHighlighted = element;
+    }
+    
+    function showTooltip(event, element) {
+        // Cheap label while hovering; full ranking happens once, on click
+        const label = element.id ? '#' + element.id : (element.name ? '[name="' + element.name + '"]' : element.tagName.toLowerCase());
+        tooltip.textContent = '';
+        [element.tagName, label, 'Click to select'].forEach(function(text, index) {
+            const line = document.createElement('div');
+            line.textContent = text;
+            if (index === 2) { line.style.cssText = 'font-size: 10px; opacity: 0.8;'; }
+            tooltip.appendChild(line);
+        });
+        tooltip.style.display = 'block';
+        tooltip.style.left = (event.clientX + 10) + 'px';
+        tooltip.style.top = (event.clientY - 10) + 'px';
+    }
+    
+    function hideTooltip() {
+        tooltip.style.display = 'none';
+    }
+    
+    function onMouseMove(e) {
+        if (!picker.active || isPickerElement(e.target)) return;
+        if (e.target !== lastHovered) {
+            lastHovered = e.target;
+            highlightElement(e.target);
+        }
+        showTooltip(e, e.target);
+    }
+    
+    function onClick(e) {
+        if (!picker.active || isPickerElement(e.target)) return;
+        e.preventDefault();
+        e.stopPropagation();
+        
+        const element = e.target;
+        picker.selection = {
+            tagName: element.tagName,
+            text: element.innerText || element.textContent || '',
+            selectors: rankSelectors(element),
+            attributes: Array.from(element.attributes).map(attr => ({name: attr.name, value: attr.value}))
+        };
+        
+        element.style.outline = '3px solid #10b981';
+        element.style.outlineOffset = '2px';
+        picker.remove();
+        
+        if (picker.waiter) {
+            const waiter = picker.waiter;
+            picker.waiter = null;
+            waiter(picker.selection);
+        }
+        return false;
+    }
+    
+    picker.remove = function() {
+        picker.active = false;
+        document.removeEventListener('mousemove', onMouseMove, true);
+        document.removeEventListener('click', onClick, true);
+        document.removeEventListener('mouseleave', hideTooltip);
+        overlay.remove();
+        tooltip.remove();
+    };
+    
+    document.addEventListener('mousemove', onMouseMove, true);
+    document.addEventListener('click', onClick, true);
+    document.addEventListener('mouseleave', hideTooltip);
+}
+"""
+
+# execute_async_script: resolves the moment the page reports a pick, or null after the
+# wait; {lost: true} when the document no longer has the picker (it navigated).
+WAIT_FOR_PICK_SCRIPT = r"""
+const done = arguments[arguments.length - 1];
+const picker = window.__ricePicker;
+if (!picker) { done({lost: true}); return; }
+if (picker.selection) { done(picker.selection); return; }
+if (!picker.active) { done(null); return; }
+const timer = setTimeout(function() { picker.waiter = null; done(null); }, arguments[0]);
+picker.waiter = function(selection) { clearTimeout(timer); done(selection); };
+"""
+
+REMOVE_PICKER_SCRIPT = r"""
+const picker = window.__ricePicker;
+if (picker) {
+    if (picker.active) { picker.remove(); }
+    if (picker.waiter) { picker.waiter(null); }
+    delete window.__ricePicker;
+}
+"""
 
 class VisualElementPicker:
     """Visual element picker for Phase 3 advanced features"""
@@ -18,6 +209,7 @@ class VisualElementPicker:
         self.show_popup = show_popup_callback
         self.driver = None
         self.picking = False
+        self.pick_session = None
         self.selected_element = None
         self.picker_dialog = None
     
@@ -116,7 +308,8 @@ class VisualElementPicker:
         self.launch_btn = tk.Button(controls_frame, text="🚀 Launch Browser", 
                                    font=('Segoe UI', 11, 'bold'), bg='#10b981', fg='#ffffff',
                                    relief='flat', padx=20, pady=10, cursor='hand2', bd=0,
-                                   command=self.launch_browser)\n        self.launch_btn.pack(side='left', padx=(0, 10))
+                                   command=self.launch_browser)
+        self.launch_btn.pack(side='left', padx=(0, 10))
         
         self.pick_btn = tk.Button(controls_frame, text="🎯 Start Picking", 
                                  font=('Segoe UI', 11, 'bold'), bg='#f59e0b', fg='#ffffff',
@@ -233,220 +426,7 @@ class VisualElementPicker:
             return
         
         try:
-            # Inject element picker JavaScript
-            self.driver.execute_script("""
-                if (!window.elementPickerActive) {
-                    window.elementPickerActive = true;
-                    window.selectedElementInfo = null;
-                    
-                    // Create overlay
-                    const overlay = document.createElement('div');
-                    overlay.id = 'element-picker-overlay';
-                    overlay.style.cssText = `
-                        position: fixed;
-                        top: 0;
-                        left: 0;
-                        width: 100%;
-                        height: 100%;
-                        background: rgba(245, 158, 11, 0.1);
-                        z-index: 999999;
-                        pointer-events: none;
-                        border: 3px solid #f59e0b;
-                        box-sizing: border-box;
-                    `;
-                    document.body.appendChild(overlay);
-                    
-                    // Create info tooltip
-                    const tooltip = document.createElement('div');
-                    tooltip.id = 'element-picker-tooltip';
-                    tooltip.style.cssText = `
-                        position: fixed;
-                        background: #1f2937;
-                        color: white;
-                        padding: 8px 12px;
-                        border-radius: 6px;
-                        font-family: monospace;
-                        font-size: 12px;
-                        z-index: 1000000;
-                        pointer-events: none;
-                        display: none;
-                        max-width: 300px;
-                        word-wrap: break-word;
-                    `;
-                    document.body.appendChild(tooltip);
-                    
-                    let lastHighlighted = null;
-                    
-                    function generateSelector(element) {
-                        const selectors = [];
-                        
-                        // ID selector (highest priority)
-                        if (element.id) {
-                            selectors.push({
-                                type: 'ID',
-                                value: '#' + element.id,
-                                priority: 1
-                            });
-                        }
-                        
-                        // Name attribute
-                        if (element.name) {
-                            selectors.push({
-                                type: 'Name',
-                                value: `[name="${element.name}"]`,
-                                priority: 2
-                            });
-                        }
-                        
-                        // Data attributes
-                        for (let attr of element.attributes) {
-                            if (attr.name.startsWith('data-')) {
-                                selectors.push({
-                                    type: 'Data Attribute',
-                                    value: `[${attr.name}="${attr.value}"]`,
-                                    priority: 3
-                                });
-                            }
-                        }
-                        
-                        // Class selector
-                        if (element.className && typeof element.className === 'string') {
-                            const classes = element.className.trim().split(/\\s+/);
-                            if (classes.length > 0 && classes[0]) {
-                                selectors.push({
-                                    type: 'Class',
-                                    value: '.' + classes.join('.'),
-                                    priority: 4
-                                });
-                            }
-                        }
-                        
-                        // Tag selector
-                        selectors.push({
-                            type: 'Tag',
-                            value: element.tagName.toLowerCase(),
-                            priority: 5
-                        });
-                        
-                        // XPath
-                        function getXPath(element) {
-                            if (element.id) {
-                                return `//*[@id="${element.id}"]`;
-                            }
-                            
-                            const parts = [];
-                            while (element && element.nodeType === Node.ELEMENT_NODE) {
-                                let index = 0;
-                                let sibling = element.previousSibling;
-                                while (sibling) {
-                                    if (sibling.nodeType === Node.ELEMENT_NODE && sibling.tagName === element.tagName) {
-                                        index++;
-                                    }
-                                    sibling = sibling.previousSibling;
-                                }
-                                
-                                const tagName = element.tagName.toLowerCase();
-                                const pathIndex = index > 0 ? `[${index + 1}]` : '';
-                                parts.unshift(tagName + pathIndex);
-                                element = element.parentNode;
-                            }
-                            
-                            return '/' + parts.join('/');
-                        }
-                        
-                        selectors.push({
-                            type: 'XPath',
-                            value: getXPath(element),
-                            priority: 6
-                        });
-                        
-                        return selectors.sort((a, b) => a.priority - b.priority);
-                    }
-                    
-                    function highlightElement(element) {
-                        if (lastHighlighted) {
-                            lastHighlighted.style.outline = '';
-                        }
-                        
-                        element.style.outline = '3px solid #f59e0b';
-                        element.style.outlineOffset = '2px';
-                        lastHighlighted = element;
-                    }
-                    
-                    function showTooltip(event, element) {
-                        const selectors = generateSelector(element);
-                        const primary = selectors[0];
-                        
-                        tooltip.innerHTML = `
-                            <div><strong>${element.tagName}</strong></div>
-                            <div>${primary.type}: ${primary.value}</div>
-                            <div style="font-size: 10px; opacity: 0.8;">Click to select</div>
-                        `;
-                        
-                        tooltip.style.display = 'block';
-                        tooltip.style.left = (event.clientX + 10) + 'px';
-                        tooltip.style.top = (event.clientY - 10) + 'px';
-                    }
-                    
-                    function hideTooltip() {
-                        tooltip.style.display = 'none';
-                    }
-                    
-                    // Mouse move handler
-                    document.addEventListener('mousemove', function(e) {
-                        if (!window.elementPickerActive) return;
-                        
-                        const element = e.target;
-                        if (element.id === 'element-picker-overlay' || element.id === 'element-picker-tooltip') {
-                            return;
-                        }
-                        
-                        highlightElement(element);
-                        showTooltip(e, element);
-                    });
-                    
-                    // Click handler
-                    document.addEventListener('click', function(e) {
-                        if (!window.elementPickerActive) return;
-                        
-                        e.preventDefault();
-                        e.stopPropagation();
-                        
-                        const element = e.target;
-                        if (element.id === 'element-picker-overlay' || element.id === 'element-picker-tooltip') {
-                            return;
-                        }
-                        
-                        const selectors = generateSelector(element);
-                        
-                        window.selectedElementInfo = {
-                            tagName: element.tagName,
-                            text: element.innerText || element.textContent || '',
-                            selectors: selectors,
-                            attributes: Array.from(element.attributes).map(attr => ({
-                                name: attr.name,
-                                value: attr.value
-                            }))
-                        };
-                        
-                        // Visual feedback
-                        element.style.outline = '3px solid #10b981';
-                        element.style.outlineOffset = '2px';
-                        
-                        hideTooltip();
-                        
-                        // Stop picking
-                        window.elementPickerActive = false;
-                        overlay.remove();
-                        tooltip.remove();
-                        
-                        return false;
-                    }, true);
-                    
-                    // Mouse leave handler
-                    document.addEventListener('mouseleave', hideTooltip);
-                }
-            """)
+            self.driver.execute_script(PICKER_SCRIPT)
             
             # Update UI
             self.picking = True
@@ -454,51 +434,60 @@ class VisualElementPicker:
             self.stop_btn.config(state='normal')
             self.picker_status.config(text="● Picking Mode")
             
-            # Start monitoring for selected element
-            self.monitor_selection()
+            # Wait for the page to push the selection
+            self.pick_session = object()
+            threading.Thread(target=self.wait_for_selection, args=(self.pick_session,), daemon=True).start()
             
         except Exception as e:
             self.show_popup("Error", f"Failed to start picking: {str(e)}", "error")
     
-    def monitor_selection(self):
-        """Monitor for element selection"""
-        if not self.driver or not self.picking:
-            return
-        
-        try:
-            # Check if element was selected
-            selected_info = self.driver.execute_script("return window.selectedElementInfo;")
-            
-            if selected_info:
-                self.selected_element = selected_info
-                self.display_element_info(selected_info)
-                self.stop_picking()
+    def wait_for_selection(self, session):
+        """Background thread: block in the page until an element is clicked"""
+        driver = self.driver
+        driver.set_script_timeout(PICK_WAIT_SECONDS + 5)
+        while self.pick_session is session:
+            try:
+                result = driver.execute_async_script(WAIT_FOR_PICK_SCRIPT, PICK_WAIT_SECONDS * 1000)
+                if result and result.get('lost') and self.pick_session is session:
+                    # The page navigated away - picker state went with it
+                    driver.execute_script(PICKER_SCRIPT)
+                    continue
+            except Exception as e:
+                if self.pick_session is session and self.picker_dialog:
+                    message = f"Element picking stopped: {str(e)}"
+                    self.picker_dialog.after(0, lambda: self.show_popup("Error", message, "error"))
+                    self.picker_dialog.after(0, self.stop_picking)
                 return
             
-            # Continue monitoring
-            if self.picking and hasattr(self, 'picker_dialog') and self.picker_dialog.winfo_exists():
-                self.picker_dialog.after(500, self.monitor_selection)
-                
-        except Exception as e:
-            print(f"Monitoring error: {e}")
-            if self.picking:
-                self.picker_dialog.after(1000, self.monitor_selection)
+            if self.pick_session is not session or not result or result.get('lost'):
+                continue
+            
+            self.picker_dialog.after(0, lambda: self.on_element_selected(result))
+            return
+    
+    def on_element_selected(self, selected_info):
+        """Selection pushed from the page"""
+        if not self.picking:
+            return
+        self.selected_element = selected_info
+        self.display_element_info(selected_info)
+        self.stop_picking()
     
     def stop_picking(self):
         """Stop element picking mode"""
         self.picking = False
+        self.pick_session = None
         
         if self.driver:
-            try:
-                self.driver.execute_script("""
-                    window.elementPickerActive = false;
-                    const overlay = document.getElementById('element-picker-overlay');
-                    const tooltip = document.getElementById('element-picker-tooltip');
-                    if (overlay) overlay.remove();
-                    if (tooltip) tooltip.remove();
-                """)
-            except:
-                pass
+            driver = self.driver
+            
+            def remove_picker():
+                # Queued behind any pending wait, so kept off the UI thread
+                try:
+                    driver.execute_script(REMOVE_PICKER_SCRIPT)
+                except:
+                    pass
+            threading.Thread(target=remove_picker, daemon=True).start()
         
         # Update UI
         self.pick_btn.config(state='normal', text="🎯 Start Picking")
@@ -548,6 +537,10 @@ class VisualElementPicker:
             tk.Label(sel_row, text=f"{selector['type']}:", font=('Segoe UI', 8, 'bold'), 
                     bg=sel_row['bg'], fg='#374151', width=15, anchor='w').pack(side='left')
             
+            matches = "unique" if selector.get('unique') else f"{selector.get('count', 0)} matches"
+            tk.Label(sel_row, text=matches, font=('Segoe UI', 8), bg=sel_row['bg'],
+                    fg='#10b981' if selector.get('unique') else '#ef4444', width=10, anchor='w').pack(side='left')
+            
             value_label = tk.Label(sel_row, text=selector['value'], font=('Segoe UI', 8), 
                                   bg=sel_row['bg'], fg='#6b7280', anchor='w')
             value_label.pack(side='left', fill='x', expand=True)
@@ -567,7 +560,7 @@ class VisualElementPicker:
         try:
             self.picker_dialog.clipboard_clear()
             self.picker_dialog.clipboard_append(text)
-            self.show_popup("Copied", f"Selector copied to clipboard", "success")
+            self.show_popup("Copied", "Selector copied to clipboard", "success")
         except Exception as e:
             self.show_popup("Error", f"Failed to copy: {str(e)}", "error")
     
@@ -590,12 +583,18 @@ class VisualElementPicker:
     
     def close_picker(self):
         """Close element picker"""
+        self.picking = False
+        self.pick_session = None
         if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass
+            driver = self.driver
             self.driver = None
+            
+            def quit_driver():
+                try:
+                    driver.quit()
+                except:
+                    pass
+            threading.Thread(target=quit_driver, daemon=True).start()
         
         if self.picker_dialog:
             self.picker_dialog.destroy()
\ No newline at end of file
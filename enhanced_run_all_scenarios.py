@@ -4,9 +4,15 @@
 import tkinter as tk
 from tkinter import ttk
 import time
+import sqlite3
 import threading
-from datetime import datetime
 from rice_dialogs import center_dialog
+from output_console import ExecutionConsole, EXECUTION_LOGGERS
+from database_manager import DatabaseManager
+from batch_jobs import (BatchJobStore, load_batch_plan, record_scenario_result, MODE_FULL, MODE_CHANGED,
+                        RUN_RUNNING, RUN_COMPLETED, RUN_STOPPED, RUN_FAILED,
+                        ITEM_PASSED, ITEM_FAILED, ITEM_SKIPPED, ITEM_PENDING, ITEM_RUNNING)
+from job_queue import JobQueue
 
 class EnhancedRunAllScenarios:
     def __init__(self, db_manager, show_popup_callback):
@@ -15,6 +21,11 @@ class EnhancedRunAllScenarios:
         self._rice_data_manager_ref = None
         self.execution_running = False
         self.stop_execution = False
+        self.console = None
+        self.job_store = BatchJobStore(db_manager.db_path, db_manager.user_id)
+        self.resume_request = None  # {'run_id', 'failures_only', 'count'} when continuing a saved run
+        self.job_queue = JobQueue(db_manager.db_path)
+        self.queued_run_id = None  # run handed to execution workers that this dialog is observing
     
     def set_rice_data_manager_ref(self, rice_data_manager):
         """Set reference to rice data manager for auto-refresh functionality"""
@@ -38,9 +49,79 @@ class EnhancedRunAllScenarios:
             self.show_popup("No Runnable Scenarios", "All scenarios have 'Not run' status. Please run individual scenarios first to validate they work.", "warning")
             return
         
+        self.resume_request = None
+        
+        # Offer to pick up an interrupted, stopped or partially failed batch
+        try:
+            resumable = self.job_store.find_resumable_run(current_profile)
+        except sqlite3.Error:
+            resumable = None
+        
+        if resumable:
+            self._show_resume_dialog(resumable, scenarios, current_profile)
+            return
+        
         # Show professional loading screen first
         self._show_loading_screen(scenarios, current_profile)
     
+    def _show_resume_dialog(self, run, scenarios, current_profile):
+        """Ask whether to resume a saved batch run, re-run its failures or start over"""
+        popup = tk.Toplevel()
+        popup.title("Resume Batch")
+        center_dialog(popup, 460, 290)
+        popup.configure(bg='#ffffff')
+        popup.grab_set()
+        
+        try:
+            popup.iconbitmap("infor_logo.ico")
+        except:
+            pass
+        
+        # Header
+        header_frame = tk.Frame(popup, bg='#3b82f6', height=50)
+        header_frame.pack(fill="x")
+        header_frame.pack_propagate(False)
+        
+        tk.Label(header_frame, text="⏯ Previous Batch Found", font=('Segoe UI', 14, 'bold'), 
+                bg='#3b82f6', fg='#ffffff').pack(expand=True)
+        
+        # Content
+        content_frame = tk.Frame(popup, bg='#ffffff', padx=20, pady=20)
+        content_frame.pack(fill="both", expand=True)
+        
+        details = (f"Batch run #{run['run_id']} was {run['status']} ({run['updated_at']}).\n\n"
+                   f"Passed: {run['passed']}   Failed: {run['failed']}   Remaining: {run['remaining']}\n"
+                   f"of {run['total']} scenarios")
+        tk.Label(content_frame, text=details, font=('Segoe UI', 10), bg='#ffffff', 
+                justify="center").pack(pady=(0, 20))
+        
+        btn_frame = tk.Frame(content_frame, bg='#ffffff')
+        btn_frame.pack()
+        
+        def choose(failures_only=None):
+            popup.destroy()
+            if failures_only is None:
+                self.resume_request = None
+                self._show_loading_screen(scenarios, current_profile)
+                return
+            count = run['failed'] if failures_only else run['remaining']
+            self.resume_request = {'run_id': run['run_id'], 'failures_only': failures_only, 'count': count}
+            self._show_loading_screen(scenarios, current_profile)
+        
+        if run['remaining']:
+            tk.Button(btn_frame, text="Resume", font=('Segoe UI', 10, 'bold'), bg='#10b981', fg='#ffffff', 
+                     relief='flat', padx=15, pady=6, cursor='hand2', bd=0, 
+                     command=lambda: choose(False)).pack(side="left", padx=(0, 10))
+        if run['failed']:
+            tk.Button(btn_frame, text="Re-run Failures", font=('Segoe UI', 10, 'bold'), bg='#f59e0b', fg='#ffffff', 
+                     relief='flat', padx=15, pady=6, cursor='hand2', bd=0, 
+                     command=lambda: choose(True)).pack(side="left", padx=(0, 10))
+        tk.Button(btn_frame, text="Start New", font=('Segoe UI', 10, 'bold'), bg='#3b82f6', fg='#ffffff', 
+                 relief='flat', padx=15, pady=6, cursor='hand2', bd=0, 
+                 command=lambda: choose(None)).pack(side="left", padx=(0, 10))
+        tk.Button(btn_frame, text="Cancel", font=('Segoe UI', 10, 'bold'), bg='#6b7280', fg='#ffffff', 
+                 relief='flat', padx=15, pady=6, cursor='hand2', bd=0, command=popup.destroy).pack(side="left")
+    
     def _show_loading_screen(self, scenarios, current_profile):
         """Show professional loading screen before execution"""
         loading_popup = tk.Toplevel()
@@ -79,7 +160,8 @@ class EnhancedRunAllScenarios:
         progress_label.pack(pady=(0, 20))
         
         # Info
-        info_label = tk.Label(content_frame, text=f"Found {len(scenarios)} scenarios to execute\nSmart login optimization enabled", 
+        scenario_count = self.resume_request['count'] if self.resume_request else len(scenarios)
+        info_label = tk.Label(content_frame, text=f"Found {scenario_count} scenarios to execute\nSmart login optimization enabled", 
                              font=('Segoe UI', 10), bg='#ffffff', fg='#6b7280', justify="center")
         info_label.pack()
         
@@ -142,7 +224,11 @@ class EnhancedRunAllScenarios:
         tk.Label(info_frame, text=f"📊 Execution Summary", 
                 font=('Segoe UI', 12, 'bold'), bg='#f8fafc', fg='#1e40af').pack(anchor="w")
         
-        tk.Label(info_frame, text=f"• Total Scenarios: {len(scenarios)}", 
+        scenario_count = self.resume_request['count'] if self.resume_request else len(scenarios)
+        total_text = f"• Total Scenarios: {scenario_count}"
+        if self.resume_request:
+            total_text += f" (resuming batch run #{self.resume_request['run_id']})"
+        tk.Label(info_frame, text=total_text, 
                 font=('Segoe UI', 10), bg='#f8fafc', fg='#374151').pack(anchor="w", pady=(5, 0))
         
         tk.Label(info_frame, text="• Smart Login: Only first scenario will perform login", 
@@ -161,7 +247,7 @@ class EnhancedRunAllScenarios:
         # Progress bar
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(progress_frame, variable=self.progress_var, 
-                                           maximum=len(scenarios), length=750)
+                                           maximum=max(scenario_count, 1), length=750)
         self.progress_bar.pack(fill="x", pady=(10, 5))
         
         # Progress text
@@ -200,6 +286,18 @@ class EnhancedRunAllScenarios:
                                   command=lambda: self._start_batch_execution(scenarios, current_profile))
         self.start_btn.pack(side="left", padx=(0, 15))
         
+        self.changed_btn = tk.Button(btn_frame, text="⚡ CHANGED ONLY", 
+                                    font=('Segoe UI', 10, 'bold'), bg='#3b82f6', fg='#ffffff', 
+                                    relief='flat', padx=20, pady=12, cursor='hand2', bd=0,
+                                    command=lambda: self._start_batch_execution(scenarios, current_profile, MODE_CHANGED))
+        self.changed_btn.pack(side="left", padx=(0, 15))
+        
+        self.workers_btn = tk.Button(btn_frame, text="📤 SEND TO WORKERS", 
+                                    font=('Segoe UI', 10, 'bold'), bg='#8b5cf6', fg='#ffffff', 
+                                    relief='flat', padx=20, pady=12, cursor='hand2', bd=0,
+                                    command=lambda: self._submit_to_workers(scenarios, current_profile))
+        self.workers_btn.pack(side="left", padx=(0, 15))
+        
         self.stop_btn = tk.Button(btn_frame, text="⏹ STOP", 
                                  font=('Segoe UI', 10, 'bold'), bg='#ef4444', fg='#ffffff', 
                                  relief='flat', padx=20, pady=12, cursor='hand2', bd=0,
@@ -211,6 +309,11 @@ class EnhancedRunAllScenarios:
                  cursor='hand2', bd=0, command=popup.destroy).pack(side="right")
         
         self.execution_popup = popup
+        
+        # Worker threads write here; the console flushes to the widget on the Tk thread
+        if self.console:
+            self.console.close()
+        self.console = ExecutionConsole(self.output_text, name="batch_execution", log_modules=EXECUTION_LOGGERS)
         self._add_initial_output()
     
     def _add_initial_output(self):
@@ -218,92 +321,116 @@ class EnhancedRunAllScenarios:
         self._add_output("=== RICE Tester Batch Execution System ===")
         self._add_output("Smart Login Optimization: ENABLED")
         self._add_output("Inter-scenario Delay: 3 seconds")
+        self._add_output("Changed Only: re-runs failures and scenarios whose steps, groups or tenant changed since their last pass")
         self._add_output("Ready to begin batch execution...")
         self._add_output("")
     
     def _add_output(self, message, color="#f9fafb"):
-        """Add message to output console"""
-        if hasattr(self, 'output_text') and self.output_text.winfo_exists():
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            formatted_message = f"[{timestamp}] {message}\n"
-            
-            self.output_text.config(state=tk.NORMAL)
-            self.output_text.insert(tk.END, formatted_message)
-            self.output_text.config(state=tk.DISABLED)
-            self.output_text.see(tk.END)
-            
-            if hasattr(self, 'execution_popup'):
-                self.execution_popup.update()
+        """Add message to output console (safe to call from the execution thread)"""
+        if self.console:
+            self.console.write(message)
     
-    def _start_batch_execution(self, scenarios, current_profile):
+    def _ui(self, callback, *args):
+        """Run a widget update on the Tk thread"""
+        if self.console:
+            self.console.post(callback, *args)
+    
+    def _start_batch_execution(self, scenarios, current_profile, mode=MODE_FULL):
         """Start the batch execution in a separate thread"""
         if self.execution_running:
             return
         
+        # Persist the run (or re-open a saved one) before anything executes
+        try:
+            failures_only = False
+            if self.resume_request:
+                run_id = self.resume_request['run_id']
+                failures_only = self.resume_request['failures_only']
+                if not self.job_store.resume_run(run_id):
+                    self.resume_request = None
+                    self.show_popup("Run In Progress", f"Batch run #{run_id} is still running in another window or the headless runner.", "warning")
+                    return
+            else:
+                if mode == MODE_CHANGED:
+                    scenarios = self.job_store.select_changed_scenarios(current_profile, scenarios)
+                    if not scenarios:
+                        self.show_popup("Nothing Changed", "All scenarios passed with their current steps - nothing to re-run.", "info")
+                        return
+                run_id = self.job_store.create_run(current_profile, scenarios, mode)
+            queue = self.job_store.get_queue(run_id, failures_only)
+        except sqlite3.Error as e:
+            self.show_popup("Error", f"Failed to prepare batch run: {str(e)}", "error")
+            return
+        
+        self.resume_request = None
         self.execution_running = True
         self.stop_execution = False
+        self.progress_bar.config(maximum=max(len(queue), 1))
         
         # Update UI
-        self.start_btn.config(state=tk.DISABLED, bg='#9ca3af')
-        self.stop_btn.config(state=tk.NORMAL, bg='#ef4444')
+        self._set_running_buttons()
         self.status_label.config(text="Running", fg='#10b981')
         
         # Start execution in separate thread
         execution_thread = threading.Thread(target=self._execute_scenarios_batch, 
-                                           args=(scenarios, current_profile))
+                                           args=(run_id, queue, current_profile))
         execution_thread.daemon = True
         execution_thread.start()
     
-    def _execute_scenarios_batch(self, scenarios, current_profile):
-        """Execute all scenarios with smart login handling"""
+    def _execute_scenarios_batch(self, run_id, queue, current_profile):
+        """Execute the run's queued scenarios with smart login handling, checkpointing each one"""
+        run_status = RUN_FAILED
+        # sqlite connections are bound to their creating thread - this worker gets its own
+        conn = None
+        batch_db_manager = None
         try:
-            self._add_output("🚀 Starting batch execution...")
-            self._add_output(f"Total scenarios to execute: {len(scenarios)}")
+            conn = sqlite3.connect(self.db_manager.db_path, timeout=30)
+            
+            self._add_output(f"🚀 Starting batch execution (run #{run_id})...")
+            self._add_output(f"Total scenarios to execute: {len(queue)}")
+            
+            # Every step of the run, browser config and pass fingerprints in one load - no
+            # per-scenario lookups once execution starts
+            plan = load_batch_plan(conn, self.db_manager.user_id, current_profile, run_id)
+            self._add_output(f"📦 Loaded {sum(len(steps) for steps in plan.steps.values())} steps "
+                             f"for {len(plan.steps)} scenarios")
+            
+            # One manager (and one schema check) for the whole batch, owned by this thread
+            batch_db_manager = DatabaseManager(self.db_manager.user_id, db_path=self.db_manager.db_path)
             
             successful_scenarios = 0
             failed_scenarios = 0
             login_performed = False
+            stopped = False
+            executed_numbers = []
             
-            for i, scenario in enumerate(scenarios):
+            for i, (item_id, scenario) in enumerate(queue):
                 if self.stop_execution:
                     self._add_output("⏹ Execution stopped by user")
+                    stopped = True
                     break
                 
                 scenario_id, scenario_number, description, current_result = scenario[:4]
+                description = description or ''
+                self.job_store.mark_item_running(item_id)
                 
                 self._add_output(f"")
                 self._add_output(f"{'='*50}")
-                self._add_output(f"📋 Scenario {i+1}/{len(scenarios)}: #{scenario_number}")
+                self._add_output(f"📋 Scenario {i+1}/{len(queue)}: #{scenario_number}")
                 self._add_output(f"Description: {description}")
                 
                 # Update progress
-                self.progress_var.set(i)
-                self.progress_text.config(text=f"Executing Scenario {i+1}/{len(scenarios)}: {description[:50]}...")
+                self._ui(self.progress_var.set, i)
+                self._ui(lambda text=f"Executing Scenario {i+1}/{len(queue)}: {description[:50]}...":
+                         self.progress_text.config(text=text))
                 
                 try:
-                    # Get scenario steps
-                    cursor = self.db_manager.conn.cursor()
-                    cursor.execute("""
-                        SELECT 
-                            ss.step_order,
-                            COALESCE(ts.name, ss.step_name) as step_name,
-                            COALESCE(ts.step_type, ss.step_type) as step_type,
-                            COALESCE(ts.target, ss.step_target) as step_target,
-                            CASE 
-                                WHEN COALESCE(ts.step_type, ss.step_type) IN ('Text Input', 'Wait') 
-                                THEN COALESCE(NULLIF(ss.step_description, ''), NULLIF(ss.custom_value, 'None'), ts.default_value)
-                                ELSE COALESCE(ss.step_description, ts.description)
-                            END as step_description,
-                            COALESCE(ss.user_input_required, 0) as user_input_required
-                        FROM scenario_steps ss
-                        LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
-                        WHERE ss.user_id = ? AND ss.rice_profile = ? AND ss.scenario_number = ?
-                        ORDER BY ss.step_order
-                    """, (self.db_manager.user_id, str(current_profile), scenario_number))
-                    steps = cursor.fetchall()
+                    cursor = conn.cursor()
+                    steps = plan.steps_for(scenario_number)
                     
                     if not steps:
                         self._add_output(f"⚠️ No steps found for scenario #{scenario_number}")
+                        self.job_store.mark_item_result(item_id, ITEM_SKIPPED, "No steps found")
                         continue
                     
                     # Smart login handling
@@ -318,18 +445,18 @@ class EnhancedRunAllScenarios:
                     
                     # Execute scenario with filtered steps
                     success = self._execute_single_scenario(scenario_id, scenario_number, 
-                                                          filtered_steps, current_profile)
+                                                          filtered_steps, current_profile,
+                                                          plan.browser_config, batch_db_manager)
+                    executed_numbers.append(scenario_number)
                     
                     if success:
                         successful_scenarios += 1
                         self._add_output(f"✅ Scenario #{scenario_number} completed successfully")
                         
                         # Update database
-                        cursor.execute("""
-                            UPDATE scenarios SET result = 'Passed', executed_at = CURRENT_TIMESTAMP 
-                            WHERE id = ?
-                        """, (scenario_id,))
-                        self.db_manager.conn.commit()
+                        record_scenario_result(cursor, scenario_id, True, plan.fingerprints.get(scenario_number))
+                        conn.commit()
+                        self.job_store.mark_item_result(item_id, ITEM_PASSED)
                     else:
                         failed_scenarios += 1
                         self._add_output(f"❌ Scenario #{scenario_number} failed")
@@ -339,10 +466,11 @@ class EnhancedRunAllScenarios:
                             UPDATE scenarios SET result = 'Failed', executed_at = CURRENT_TIMESTAMP 
                             WHERE id = ?
                         """, (scenario_id,))
-                        self.db_manager.conn.commit()
+                        conn.commit()
+                        self.job_store.mark_item_result(item_id, ITEM_FAILED, "Scenario failed")
                     
                     # Inter-scenario delay (except for last scenario)
-                    if i < len(scenarios) - 1 and not self.stop_execution:
+                    if i < len(queue) - 1 and not self.stop_execution:
                         self._add_output("⏱️ Waiting 3 seconds before next scenario...")
                         for delay_second in range(3):
                             if self.stop_execution:
@@ -356,46 +484,169 @@ class EnhancedRunAllScenarios:
                     
                     # Update database
                     try:
-                        cursor = self.db_manager.conn.cursor()
+                        cursor = conn.cursor()
                         cursor.execute("""
                             UPDATE scenarios SET result = 'Failed', executed_at = CURRENT_TIMESTAMP 
                             WHERE id = ?
                         """, (scenario_id,))
-                        self.db_manager.conn.commit()
+                        conn.commit()
+                        self.job_store.mark_item_result(item_id, ITEM_FAILED, str(e))
                     except:
                         pass
             
+            run_status = RUN_STOPPED if stopped else RUN_COMPLETED
+            counts = self.job_store.get_counts(run_id)
+            
+            self._check_visual_regression(run_id, current_profile, executed_numbers)
+            
             # Final summary
             self._add_output("")
             self._add_output("="*60)
-            self._add_output("🏁 BATCH EXECUTION COMPLETED")
+            self._add_output("⏸ BATCH EXECUTION STOPPED" if stopped else "🏁 BATCH EXECUTION COMPLETED")
             self._add_output(f"✅ Successful: {successful_scenarios}")
             self._add_output(f"❌ Failed: {failed_scenarios}")
-            self._add_output(f"📊 Total: {len(scenarios)}")
+            self._add_output(f"📊 Total: {len(queue)}")
+            self._add_output(f"💾 Run #{run_id}: {counts[ITEM_PASSED]} passed, {counts[ITEM_FAILED]} failed, "
+                             f"{counts[ITEM_PENDING] + counts[ITEM_RUNNING]} remaining")
+            if stopped:
+                self._add_output("Press START to continue from the next scenario")
             
             # Update final progress
-            self.progress_var.set(len(scenarios))
-            self.progress_text.config(text=f"Completed: {successful_scenarios} successful, {failed_scenarios} failed")
-            self.status_label.config(text="Completed", fg='#6b7280')
+            summary = f"{'Stopped' if stopped else 'Completed'}: {successful_scenarios} successful, {failed_scenarios} failed"
+            self._ui(self.progress_var.set, i if stopped else len(queue))
+            self._ui(lambda: self.progress_text.config(text=summary))
+            self._ui(lambda: self.status_label.config(text="Stopped" if stopped else "Completed", fg='#6b7280'))
             
             # Auto-refresh RICE List
-            try:
-                if hasattr(self, '_rice_data_manager_ref') and self._rice_data_manager_ref:
-                    self._add_output("🔄 Refreshing RICE List...")
-                    self._rice_data_manager_ref.refresh_rice_profiles_table()
-                    self._add_output("✅ RICE List refreshed")
-            except Exception as e:
-                self._add_output(f"⚠️ Failed to refresh RICE List: {str(e)}")
+            if hasattr(self, '_rice_data_manager_ref') and self._rice_data_manager_ref:
+                self._add_output("🔄 Refreshing RICE List...")
+                self._ui(self._refresh_rice_list)
         
         except Exception as e:
             self._add_output(f"💥 Critical error in batch execution: {str(e)}")
-            self.status_label.config(text="Error", fg='#ef4444')
+            self._ui(lambda: self.status_label.config(text="Error", fg='#ef4444'))
         
         finally:
+            if conn:
+                conn.close()
+            if batch_db_manager:
+                batch_db_manager.close()
+            try:
+                self.job_store.finish_run(run_id, run_status)
+            except sqlite3.Error as e:
+                self._add_output(f"⚠️ Failed to save batch run state: {str(e)}")
+            
+            # A stopped (or crashed) run continues where it left off on the next START
+            if run_status != RUN_COMPLETED:
+                self.resume_request = {'run_id': run_id, 'failures_only': False, 'count': 0}
+            
             # Reset UI
             self.execution_running = False
-            self.start_btn.config(state=tk.NORMAL, bg='#10b981')
-            self.stop_btn.config(state=tk.DISABLED, bg='#9ca3af')
+            self._ui(self._set_idle_buttons)
+    
+    def _set_running_buttons(self):
+        self.start_btn.config(state=tk.DISABLED, bg='#9ca3af')
+        self.changed_btn.config(state=tk.DISABLED, bg='#9ca3af')
+        self.workers_btn.config(state=tk.DISABLED, bg='#9ca3af')
+        self.stop_btn.config(state=tk.NORMAL, bg='#ef4444')
+    
+    def _set_idle_buttons(self):
+        self.start_btn.config(state=tk.NORMAL, bg='#10b981')
+        self.changed_btn.config(state=tk.NORMAL, bg='#3b82f6')
+        self.workers_btn.config(state=tk.NORMAL, bg='#8b5cf6')
+        self.stop_btn.config(state=tk.DISABLED, bg='#9ca3af')
+    
+    def _submit_to_workers(self, scenarios, current_profile):
+        """Queue the scenarios for execution workers and watch the run from this dialog"""
+        if self.execution_running:
+            return
+        try:
+            run_id = self.job_queue.submit(self.db_manager.user_id, current_profile, scenarios)
+        except sqlite3.Error as e:
+            self.show_popup("Error", f"Failed to queue batch run: {str(e)}", "error")
+            return
+        
+        self.resume_request = None
+        self.execution_running = True
+        self.queued_run_id = run_id
+        self.progress_bar.config(maximum=max(len(scenarios), 1))
+        self._set_running_buttons()
+        self.status_label.config(text="Queued", fg='#fbbf24')
+        
+        self._add_output(f"📤 Batch run #{run_id} queued for execution workers ({len(scenarios)} scenarios)")
+        self._add_output("Start workers with: python -m execution_worker")
+        self._poll_queued_run(run_id, None)
+    
+    def _poll_queued_run(self, run_id, last_seen):
+        """Observe a run the workers execute - progress, active workers and completion"""
+        if self.queued_run_id != run_id:
+            return
+        if not self.execution_popup.winfo_exists():
+            # Dialog closed - the workers carry on, this window just stops watching
+            self.queued_run_id = None
+            self.execution_running = False
+            return
+        try:
+            progress = self.job_queue.get_progress(run_id)
+            workers = self.job_queue.get_active_workers()
+        except sqlite3.Error as e:
+            self._add_output(f"⚠️ Could not read queue progress: {str(e)}")
+            self.execution_popup.after(5000, lambda: self._poll_queued_run(run_id, last_seen))
+            return
+        
+        done = progress.get(ITEM_PASSED, 0) + progress.get(ITEM_FAILED, 0) + progress.get(ITEM_SKIPPED, 0)
+        snapshot = (progress['status'], done, progress.get(ITEM_RUNNING, 0), len(workers))
+        if snapshot != last_seen:
+            self._add_output(f"📊 Run #{run_id}: {progress.get(ITEM_PASSED, 0)} passed, {progress.get(ITEM_FAILED, 0)} failed, "
+                             f"{progress.get(ITEM_RUNNING, 0)} running, {progress.get(ITEM_PENDING, 0)} pending - "
+                             f"{len(workers)} active worker(s)")
+            self.progress_var.set(done)
+            self.progress_text.config(text=f"{done}/{progress['total']} scenarios finished by workers")
+            if progress['status'] == RUN_RUNNING:
+                self.status_label.config(text="Running", fg='#10b981')
+        
+        if progress['status'] in (RUN_COMPLETED, RUN_STOPPED, RUN_FAILED) and not progress.get(ITEM_RUNNING):
+            self.queued_run_id = None
+            self.execution_running = False
+            self.status_label.config(text="Completed" if progress['status'] == RUN_COMPLETED else "Stopped", fg='#6b7280')
+            self._add_output(f"🏁 Batch run #{run_id} {progress['status']}")
+            self._set_idle_buttons()
+            if self._rice_data_manager_ref:
+                self._refresh_rice_list()
+            return
+        
+        self.execution_popup.after(3000, lambda: self._poll_queued_run(run_id, snapshot))
+    
+    def _check_visual_regression(self, run_id, current_profile, scenario_numbers):
+        """Compare this run's after screenshots with the last passing run and report UI changes"""
+        if not scenario_numbers:
+            return
+        try:
+            from visual_diff import VisualRegression
+            
+            self._add_output("")
+            self._add_output("🖼️ Comparing screenshots with the last passing run...")
+            regression = VisualRegression(self.db_manager.db_path, self.db_manager.user_id)
+            flagged = regression.check_scenarios(current_profile, scenario_numbers, run_id)
+            
+            if flagged:
+                for scenario_number, step_orders in sorted(flagged.items()):
+                    steps_text = ", ".join(str(step_order) for step_order in step_orders)
+                    self._add_output(f"⚠️ Visual change in scenario #{scenario_number}, step(s) {steps_text}")
+            else:
+                self._add_output("✅ No visual changes detected")
+        except ImportError as e:
+            self._add_output(f"⚠️ Visual diff unavailable: {str(e)}")
+        except Exception as e:
+            self._add_output(f"⚠️ Visual diff failed: {str(e)}")
+    
+    def _refresh_rice_list(self):
+        """Refresh the RICE list after a batch (Tk thread)"""
+        try:
+            self._rice_data_manager_ref.refresh_rice_profiles_table()
+            self._add_output("✅ RICE List refreshed")
+        except Exception as e:
+            self._add_output(f"⚠️ Failed to refresh RICE List: {str(e)}")
     
     def _filter_login_steps(self, steps, login_performed):
         """Filter out login steps if login was already performed"""
@@ -421,20 +672,26 @@ class EnhancedRunAllScenarios:
         else:
             return steps
     
-    def _execute_single_scenario(self, scenario_id, scenario_number, steps, current_profile):
+    def _execute_single_scenario(self, scenario_id, scenario_number, steps, current_profile,
+                                 browser_config=None, db_manager=None):
         """Execute a single scenario with the given steps"""
         try:
             from screenshot_executor import ScreenshotExecutor
             
-            executor = ScreenshotExecutor(self.db_manager.user_id, current_profile, scenario_number)
+            executor = ScreenshotExecutor(self.db_manager.user_id, current_profile, scenario_number,
+                                          db_manager=db_manager)
             
             def progress_callback(current_step, total_steps, step_name, message):
                 self._add_output(f"   Step {current_step}/{total_steps}: {step_name} - {message}")
             
             executor.set_progress_callback(progress_callback)
+            # Manual steps are asked on the Tk thread while this thread waits for the answer
+            console = self.console
+            executor.user_input_prompt = lambda step_name, step_description: console.ask(
+                executor.ask_user_input, step_name, step_description, self.execution_popup)
             
             # Execute with filtered steps
-            success = executor.execute_scenario_with_steps(steps)
+            success = executor.execute_scenario_with_steps(steps, browser_config)
             return success
             
         except Exception as e:
@@ -444,5 +701,13 @@ class EnhancedRunAllScenarios:
     def _stop_execution(self):
         """Stop the batch execution"""
         self.stop_execution = True
+        if self.queued_run_id:
+            try:
+                self.job_queue.cancel_run(self.queued_run_id)
+            except sqlite3.Error as e:
+                self._add_output(f"⚠️ Failed to cancel queued run: {str(e)}")
+                return
+            self._add_output("🛑 Stop requested - workers finish the scenarios they hold, the rest are not started")
+            return
         self._add_output("🛑 Stop requested - will complete current scenario and stop...")
         self.stop_btn.config(state=tk.DISABLED, bg='#9ca3af')
\ No newline at end of file
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Streaming evidence packs: every screenshot, step log and result of a scenario,
+RICE profile or batch run in one ZIP.
+
+    python -m evidence_export --profile 3 evidence.zip
+    python -m evidence_export --scenario 3:5 evidence.zip    # rice profile 3, scenario 5
+    python -m evidence_export --run 42 evidence.zip          # batch run 42
+
+Screenshots are copied from SQLite into the archive a chunk at a time with
+incremental BLOB reads (Connection.blobopen, or substr() reads where that is not
+available) and are never loaded whole. Step and scenario records are spooled to
+a temporary file while the screenshots are written, and steps.jsonl,
+scenarios.jsonl, manifest.json and index.html are streamed from it at the end,
+so memory use does not grow with the size of the pack.
+
+Screenshots are those stored with each step, i.e. from the scenario's latest
+execution; a run export adds the run's per-scenario outcome.
+"""
+
+import io
+import os
+import sys
+import html
+import json
+import base64
+import sqlite3
+import hashlib
+import zipfile
+import argparse
+import tempfile
+from datetime import datetime
+from screenshot_storage import IMAGE_SIGNATURES, REFERENCE_PREFIX, parse_reference, reference_timestamp
+from log_manager import get_logger
+
+logger = get_logger('evidence_export')
+
+EVIDENCE_FORMAT = 'rice-tester-evidence'
+EVIDENCE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+CHUNK_SIZE = 256 * 1024
+SLOTS = ('before', 'after')
+IMAGE_EXTENSIONS = dict(zip(IMAGE_SIGNATURES, ('png', 'jpg', 'gif', 'bmp')))
+
+STEPS_QUERY = """
+    SELECT ss.id, ss.step_order, COALESCE(ts.name, ss.step_name), COALESCE(ts.step_type, ss.step_type),
+           COALESCE(ts.target, ss.step_target), ss.step_description, ss.execution_status, ss.screenshot_timestamp,
+           length(ss.screenshot_before), length(ss.screenshot_after)
+    FROM scenario_steps ss
+    LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
+    WHERE ss.user_id = ? AND ss.rice_profile = ? AND ss.scenario_number = ?
+    ORDER BY ss.step_order
+"""
+
+def _in_clause(values):
+    return f"({','.join('?' * len(values))})"
+
+def _image_extension(data):
+    for signature, extension in IMAGE_EXTENSIONS.items():
+        if data.startswith(signature):
+            return extension
+    return 'bin'
+
+def _blob_chunks(conn, column, rowid, length):
+    """Raw stored bytes of one screenshot column, CHUNK_SIZE at a time"""
+    if hasattr(conn, 'blobopen'):
+        with conn.blobopen('scenario_steps', column, rowid, readonly=True) as blob:
+            while True:
+                chunk = blob.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+    else:
+        # substr() counts characters for legacy base64 text, which is ASCII either way
+        for offset in range(1, length + 1, CHUNK_SIZE):
+            chunk = conn.execute(f"SELECT substr({column}, ?, ?) FROM scenario_steps WHERE id = ?",
+                                 (offset, CHUNK_SIZE, rowid)).fetchone()[0]
+            yield chunk.encode('ascii') if isinstance(chunk, str) else bytes(chunk)
+
+def _base64_chunks(chunks):
+    """Decode legacy base64 screenshot text as it streams in"""
+    pending = b''
+    for chunk in chunks:
+        data = pending + b''.join(chunk.split())
+        usable = len(data) - len(data) % 4
+        pending = data[usable:]
+        if usable:
+            yield base64.b64decode(data[:usable])
+    if pending:
+        yield base64.b64decode(pending + b'=' * (-len(pending) % 4))
+
+def _image_chunks(conn, column, rowid, length):
+    """(first_chunk, iterator over the rest) of a stored image, or (reference bytes, None) for a frame reference"""
+    chunks = _blob_chunks(conn, column, rowid, length)
+    first = next(chunks, b'')
+    if first.startswith(REFERENCE_PREFIX):
+        return first, None
+    if not first[:8].startswith(IMAGE_SIGNATURES):
+        chunks = _base64_chunks(_chain(first, chunks))
+        first = next(chunks, b'')
+    return first, chunks
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+class _Spool:
+    """Step and scenario records parked on disk until the archive's index files are written"""
+    
+    def __init__(self):
+        self.file = tempfile.TemporaryFile('w+', encoding='utf-8')
+    
+    def add(self, kind, record):
+        self.file.write(json.dumps([kind, record], ensure_ascii=False) + '\n')
+    
+    def records(self, kind=None):
+        self.file.seek(0)
+        for line in self.file:
+            record_kind, record = json.loads(line)
+            if kind is None or record_kind == kind:
+                yield record_kind, record
+        self.file.seek(0, os.SEEK_END)
+    
+    def close(self):
+        self.file.close()
+
+class EvidenceExporter:
+    """Writes one evidence pack; use export_evidence()"""
+    
+    def __init__(self, conn, user_id, archive, spool, progress=None):
+        self.conn = conn
+        self.user_id = user_id
+        self.archive = archive
+        self.spool = spool
+        self.progress = progress
+        self.counts = {'scenarios': 0, 'steps': 0, 'screenshots': 0, 'bytes': 0}
+        self.total = 0
+        self.processed = 0
+    
+    def write_scenarios(self, rice_profile, scenarios):
+        """scenarios: iterable of scenario result dicts carrying at least 'scenario_number'"""
+        for scenario in scenarios:
+            self.spool.add('scenario', scenario)
+            self._write_steps(rice_profile, scenario['scenario_number'])
+            self.counts['scenarios'] += 1
+    
+    def _write_steps(self, rice_profile, scenario_number):
+        cursor = self.conn.cursor()
+        cursor.execute(STEPS_QUERY, (self.user_id, str(rice_profile), scenario_number))
+        written = {}     # (step_order, slot) -> archive entry, for frame references
+        row_ids = {}     # step_order -> (scenario_steps id, screenshot_timestamp), for references
+        steps = cursor.fetchall()  # Metadata only - no screenshot columns
+        for row in steps:
+            row_ids[row[1]] = (row[0], row[7])
+        
+        for (rowid, step_order, name, step_type, target, description, status, screenshot_timestamp,
+             before_length, after_length) in steps:
+            step = {
+                'scenario_number': scenario_number,
+                'step_order': step_order,
+                'name': name,
+                'step_type': step_type,
+                'target': target,
+                'description': description,
+                'status': status,
+                'screenshot_timestamp': screenshot_timestamp
+            }
+            for slot, length in zip(SLOTS, (before_length, after_length)):
+                step[slot] = self._write_screenshot(scenario_number, step_order, slot, rowid, length, written, row_ids)
+                if length:
+                    self.processed += 1
+                    if self.progress:
+                        self.progress('screenshots', self.processed, self.total)
+            self.spool.add('step', step)
+            self.counts['steps'] += 1
+    
+    def _write_screenshot(self, scenario_number, step_order, slot, rowid, length, written, row_ids, copy_of=None,
+                          column=None):
+        """Stream one screenshot into the archive; its file record, or None when there is none.
+
+        slot names the archive file; column is the slot read from row rowid, which
+        differs when a reference is copied from another step's frame.
+        """
+        if not length:
+            return None
+        column = column or slot
+        first, chunks = _image_chunks(self.conn, f"screenshot_{column}", rowid, length)
+        if chunks is None:
+            reference = parse_reference(first)
+            if copy_of is not None or reference is None or reference[1] not in SLOTS:
+                return None  # References never chain
+            target = row_ids.get(reference[0])
+            saved_at = reference_timestamp(first)
+            if target is None or (saved_at and str(target[1]) != saved_at):
+                return None  # Gone, or overwritten by a later run
+            if reference in written:
+                return dict(written[reference], reference=True)
+            referenced_row = target[0]
+            # Points at a frame not written yet - copy it here
+            referenced_length = self.conn.execute(
+                f"SELECT length(screenshot_{reference[1]}) FROM scenario_steps WHERE id = ?",
+                (referenced_row,)).fetchone()[0]
+            return self._write_screenshot(scenario_number, step_order, slot, referenced_row, referenced_length,
+                                          written, row_ids, copy_of=reference, column=reference[1])
+        if not first:
+            return None
+        
+        path = f"screenshots/scenario_{scenario_number}/step_{step_order}_{slot}.{_image_extension(first)}"
+        digest = hashlib.sha256()
+        size = 0
+        # Images are already compressed; storing them keeps the export I/O-bound
+        info = zipfile.ZipInfo(path, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        with self.archive.open(info, 'w', force_zip64=True) as out:
+            for chunk in _chain(first, chunks):
+                out.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        
+        record = {'path': path, 'size': size, 'sha256': digest.hexdigest()}
+        written[(step_order, slot)] = record
+        if copy_of is not None:
+            written.setdefault(copy_of, record)
+        self.counts['screenshots'] += 1
+        self.counts['bytes'] += size
+        return record
+    
+    def write_index(self, manifest):
+        """steps.jsonl, scenarios.jsonl, manifest.json and index.html, streamed from the spool"""
+        for kind, name in (('step', 'steps.jsonl'), ('scenario', 'scenarios.jsonl')):
+            with self._text_entry(name) as out:
+                for _, record in self.spool.records(kind):
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        
+        with self._text_entry(MANIFEST_NAME) as out:
+            header = json.dumps(dict(manifest, counts=self.counts), indent=2, ensure_ascii=False)
+            out.write(header[:-2] + ',\n  "files": [')
+            separator = '\n    '
+            for _, step in self.spool.records('step'):
+                for slot in SLOTS:
+                    record = step[slot]
+                    if record and not record.get('reference'):
+                        out.write(separator + json.dumps(record, ensure_ascii=False))
+                        separator = ',\n    '
+            out.write('\n  ]\n}\n')
+        
+        with self._text_entry('index.html') as out:
+            self._write_html(out, manifest)
+    
+    def _text_entry(self, name):
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return io.TextIOWrapper(self.archive.open(info, 'w', force_zip64=True), encoding='utf-8')
+    
+    def _write_html(self, out, manifest):
+        escape = lambda value: html.escape('' if value is None else str(value))
+        out.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">\n"
+                  f"<title>Evidence - {escape(manifest['title'])}</title>\n"
+                  "<style>body{font-family:'Segoe UI',sans-serif;margin:24px;color:#1f2937}"
+                  "table{border-collapse:collapse;width:100%;margin-bottom:24px}"
+                  "th,td{border:1px solid #e5e7eb;padding:6px;text-align:left;vertical-align:top;font-size:13px}"
+                  "th{background:#f8fafc}img{max-width:240px;border:1px solid #d1d5db}"
+                  ".Passed{color:#166534}.Failed{color:#dc2626}</style>\n</head><body>\n")
+        out.write(f"<h1>Evidence - {escape(manifest['title'])}</h1>\n"
+                  f"<p>Exported {escape(manifest['exported_at'])}: {self.counts['scenarios']} scenarios, "
+                  f"{self.counts['steps']} steps, {self.counts['screenshots']} screenshots</p>\n")
+        
+        in_table = False
+        for kind, record in self.spool.records():
+            if kind == 'scenario':
+                if in_table:
+                    out.write("</table>\n")
+                result = record.get('result') or 'Not Run'
+                out.write(f"<h2>Scenario #{escape(record['scenario_number'])} - {escape(record.get('description'))}</h2>\n"
+                          f"<p>Result: <b class=\"{escape(result)}\">{escape(result)}</b>"
+                          f" &middot; Executed: {escape(record.get('executed_at') or 'Never')}")
+                if 'run_state' in record:
+                    out.write(f" &middot; Run: {escape(record['run_state'])}, {escape(record['attempts'])} attempt(s)")
+                    if record.get('error'):
+                        out.write(f" &middot; Error: {escape(record['error'])}")
+                out.write("</p>\n<table><tr><th>Step</th><th>Name</th><th>Type</th><th>Target</th>"
+                          "<th>Status</th><th>Before</th><th>After</th></tr>\n")
+                in_table = True
+            else:
+                cells = [record['step_order'], record['name'], record['step_type'], record['target'],
+                         record['status'] or 'pending']
+                out.write("<tr>" + "".join(f"<td>{escape(cell)}</td>" for cell in cells))
+                for slot in SLOTS:
+                    image = record[slot]
+                    if image:
+                        src = escape(image['path'])
+                        out.write(f"<td><a href=\"{src}\"><img src=\"{src}\" loading=\"lazy\" alt=\"{slot}\"></a></td>")
+                    else:
+                        out.write("<td></td>")
+                out.write("</tr>\n")
+        if in_table:
+            out.write("</table>\n")
+        out.write("</body></html>\n")
+
+def _count_screenshots(conn, user_id, rice_profile, scenario_numbers):
+    params = [user_id, str(rice_profile)]
+    scenario_filter = ""
+    if scenario_numbers is not None:
+        scenario_filter = f"AND scenario_number IN {_in_clause(scenario_numbers)}"
+        params.extend(scenario_numbers)
+    return conn.execute(f"""
+        SELECT COALESCE(SUM((screenshot_before IS NOT NULL) + (screenshot_after IS NOT NULL)), 0)
+        FROM scenario_steps WHERE user_id = ? AND rice_profile = ? {scenario_filter}
+    """, params).fetchone()[0]
+
+def _scenario_results(conn, user_id, rice_profile, scenario_numbers):
+    params = [user_id, str(rice_profile)]
+    scenario_filter = ""
+    if scenario_numbers is not None:
+        scenario_filter = f"AND scenario_number IN {_in_clause(scenario_numbers)}"
+        params.extend(scenario_numbers)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT scenario_number, description, result, executed_at FROM scenarios
+        WHERE user_id = ? AND rice_profile = ? {scenario_filter}
+        ORDER BY scenario_number
+    """, params)
+    for scenario_number, description, result, executed_at in cursor:
+        yield {'scenario_number': scenario_number, 'description': description, 'result': result,
+               'executed_at': executed_at}
+
+def _run_results(conn, user_id, run_id):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT bri.scenario_number, COALESCE(s.description, bri.description), s.result, s.executed_at,
+               bri.state, bri.attempts, bri.error, bri.started_at, bri.finished_at
+        FROM batch_run_items bri
+        JOIN batch_runs br ON br.id = bri.run_id
+        LEFT JOIN scenarios s ON s.user_id = br.user_id AND s.rice_profile = br.rice_profile
+             AND s.scenario_number = bri.scenario_number
+        WHERE bri.run_id = ? AND br.user_id = ?
+        ORDER BY bri.position
+    """, (run_id, user_id))
+    for (scenario_number, description, result, executed_at, state, attempts, error,
+         started_at, finished_at) in cursor:
+        yield {'scenario_number': scenario_number, 'description': description, 'result': result,
+               'executed_at': executed_at, 'run_state': state, 'attempts': attempts, 'error': error,
+               'started_at': started_at, 'finished_at': finished_at}
+
+def export_evidence(conn, user_id, path, rice_profile=None, scenario_numbers=None, run_id=None, progress=None):
+    """Write an evidence pack for a profile, some of its scenarios, or a batch run.
+
+    Give rice_profile (optionally narrowed by scenario_numbers) or run_id.
+    progress(section, done, total) is called after every screenshot. Returns the
+    manifest's counts.
+    """
+    scope = {}
+    if run_id is not None:
+        row = conn.execute("SELECT rice_profile, mode, status, created_at, finished_at FROM batch_runs WHERE id = ? AND user_id = ?",
+                           (run_id, user_id)).fetchone()
+        if not row:
+            raise ValueError(f"Batch run {run_id} not found")
+        rice_profile = row[0]
+        scenario_numbers = [number for (number,) in conn.execute(
+            "SELECT scenario_number FROM batch_run_items WHERE run_id = ? ORDER BY position", (run_id,))]
+        scope = {'run_id': run_id, 'mode': row[1], 'status': row[2], 'created_at': row[3], 'finished_at': row[4]}
+        title = f"RICE profile {rice_profile}, batch run {run_id}"
+        scenarios = _run_results(conn, user_id, run_id)
+    elif rice_profile is not None:
+        scenario_numbers = list(scenario_numbers) if scenario_numbers is not None else None
+        if scenario_numbers is not None and len(scenario_numbers) == 1:
+            title = f"RICE profile {rice_profile}, scenario #{scenario_numbers[0]}"
+        else:
+            title = f"RICE profile {rice_profile}"
+        scenarios = _scenario_results(conn, user_id, rice_profile, scenario_numbers)
+    else:
+        raise ValueError("export_evidence needs a rice_profile or a run_id")
+    scope.update(rice_profile=str(rice_profile), scenario_numbers=scenario_numbers)
+    
+    manifest = {
+        'format': EVIDENCE_FORMAT,
+        'version': EVIDENCE_VERSION,
+        'title': title,
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+        'scope': scope
+    }
+    
+    temp_path = f"{path}.partial"
+    spool = _Spool()
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            exporter = EvidenceExporter(conn, user_id, archive, spool, progress)
+            exporter.total = _count_screenshots(conn, user_id, rice_profile, scenario_numbers)
+            exporter.write_scenarios(rice_profile, scenarios)
+            if progress:
+                progress('index', 0, 1)
+            exporter.write_index(manifest)
+            if progress:
+                progress('index', 1, 1)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        spool.close()
+    
+    logger.info("Exported evidence for %s to %s: %s", title, path, exporter.counts)
+    return exporter.counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m evidence_export',
+                                     description="Export screenshots, step logs and results as a ZIP evidence pack")
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument('--profile', help="RICE profile id")
+    scope.add_argument('--scenario', help="PROFILE:SCENARIO_NUMBER")
+    scope.add_argument('--run', type=int, help="batch run id")
+    parser.add_argument('output', help="ZIP file to write")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fsm_tester.db'),
+                        help="database to export from (default: the local fsm_tester.db)")
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    def progress(section, done, total):
+        if section == 'screenshots' and (done % 500 == 0 or done == total):
+            print(f"  {done:,} of {total:,} screenshots")
+    
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        if args.run is not None:
+            counts = export_evidence(conn, args.user_id, args.output, run_id=args.run, progress=progress)
+        elif args.scenario:
+            rice_profile, scenario_number = args.scenario.split(':', 1)
+            counts = export_evidence(conn, args.user_id, args.output, rice_profile, [int(scenario_number)],
+                                     progress=progress)
+        else:
+            counts = export_evidence(conn, args.user_id, args.output, args.profile, progress=progress)
+    except ValueError as e:
+        print(e)
+        return 1
+    finally:
+        conn.close()
+    
+    print(f"Exported {counts['scenarios']} scenarios, {counts['steps']} steps and {counts['screenshots']} "
+          f"screenshots ({counts['bytes'] / 1048576:.1f} MB) to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
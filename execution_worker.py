@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Execution worker: claims queued scenarios from the job queue and runs them.
+
+    python -m execution_worker                              # local fsm_tester.db, runs until stopped
+    python -m execution_worker --db \\\\share\\rice\\fsm_tester.db --exit-when-idle
+
+Start as many workers as the machine (or other machines sharing the database)
+can drive browsers for; each runs one scenario at a time.
+"""
+
+import os
+import sys
+import signal
+import sqlite3
+import argparse
+import threading
+from batch_jobs import load_batch_plan, ITEM_PASSED, ITEM_FAILED, ITEM_SKIPPED
+from job_queue import JobQueue, default_worker_id, DEFAULT_LEASE_SECONDS
+from log_manager import get_logger
+
+logger = get_logger('execution_worker')
+
+DEFAULT_POLL_SECONDS = 5
+
+class ExecutionWorker:
+    """Claim, execute and report loop for one worker process"""
+    
+    def __init__(self, db_path, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 poll_seconds=DEFAULT_POLL_SECONDS, headless=True, user_input_mode='fail'):
+        self.db_path = db_path
+        self.worker_id = worker_id or default_worker_id()
+        self.queue = JobQueue(db_path, lease_seconds)
+        self.poll_seconds = poll_seconds
+        self.headless = headless
+        self.user_input_mode = user_input_mode
+        self.stop_event = threading.Event()
+        self._plan = None           # (run_id, BatchPlan) for the run this worker last served
+        self._db_manager = None
+    
+    def stop(self):
+        """Finish the current scenario, then exit the loop"""
+        self.stop_event.set()
+    
+    def run(self, max_jobs=None, exit_when_idle=False):
+        """Process jobs until stopped; returns the number of scenarios executed"""
+        self.queue.register_worker(self.worker_id)
+        logger.info("Worker %s started on %s", self.worker_id, self.db_path)
+        done = 0
+        try:
+            while not self.stop_event.is_set() and (max_jobs is None or done < max_jobs):
+                try:
+                    job = self.queue.claim(self.worker_id)
+                except sqlite3.Error as e:
+                    logger.warning("Claim failed: %s", e)
+                    job = None
+                
+                if not job:
+                    if exit_when_idle:
+                        break
+                    self.queue.update_worker(self.worker_id, 'idle')
+                    self.stop_event.wait(self.poll_seconds)
+                    continue
+                
+                self.process(job)
+                done += 1
+        finally:
+            try:
+                self.queue.update_worker(self.worker_id, 'stopped')
+            except sqlite3.Error:
+                pass
+            logger.info("Worker %s stopped after %s scenario(s)", self.worker_id, done)
+        return done
+    
+    def process(self, job):
+        """Run one leased scenario, heartbeating while the browser works, and post the result"""
+        item_id = job['id']
+        self.queue.update_worker(self.worker_id, 'busy', item_id)
+        
+        lease_lost = threading.Event()
+        finished = threading.Event()
+        
+        def keep_lease():
+            while not finished.wait(self.queue.lease_seconds / 3):
+                try:
+                    if not self.queue.heartbeat(item_id, self.worker_id):
+                        lease_lost.set()
+                        logger.warning("Lease on item %s lost - another worker may take it over", item_id)
+                        return
+                except sqlite3.Error as e:
+                    logger.warning("Heartbeat failed for item %s: %s", item_id, e)
+        
+        heartbeat = threading.Thread(target=keep_lease, name=f'lease-{item_id}', daemon=True)
+        heartbeat.start()
+        try:
+            plan = self._plan_for(job)
+            steps = plan.steps_for(job['scenario_number'])
+            if not steps:
+                self.queue.complete(item_id, self.worker_id, ITEM_SKIPPED, "No steps found")
+                return
+            
+            success = self._execute(job, steps, plan.browser_config)
+            finished.set()
+            if lease_lost.is_set():
+                return
+            self.queue.complete(item_id, self.worker_id, ITEM_PASSED if success else ITEM_FAILED,
+                                None if success else "Scenario failed", plan.fingerprints.get(job['scenario_number']))
+            logger.info("Run %s scenario #%s %s", job['run_id'], job['scenario_number'],
+                        "passed" if success else "failed")
+        except Exception as e:
+            # Crashes (driver, database, network share) go back on the queue with backoff
+            logger.exception("Run %s scenario #%s crashed", job['run_id'], job['scenario_number'])
+            finished.set()
+            try:
+                self.queue.retry(item_id, self.worker_id, str(e))
+            except sqlite3.Error as db_error:
+                logger.warning("Could not hand item %s back: %s - its lease will expire", item_id, db_error)
+        finally:
+            finished.set()
+            heartbeat.join()
+            self.queue.update_worker(self.worker_id, 'idle', job_done=True)
+    
+    def _plan_for(self, job):
+        """The run's prefetched steps - loaded in one query the first time this worker serves the run"""
+        if self._plan is None or self._plan[0] != job['run_id']:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                self._plan = (job['run_id'], load_batch_plan(conn, job['user_id'], job['rice_profile'], job['run_id']))
+            finally:
+                conn.close()
+        return self._plan[1]
+    
+    def _execute(self, job, steps, browser_config):
+        from screenshot_executor import ScreenshotExecutor
+        from database_manager import DatabaseManager
+        
+        if self._db_manager is None or self._db_manager.user_id != job['user_id']:
+            if self._db_manager:
+                self._db_manager.close()
+            self._db_manager = DatabaseManager(job['user_id'], db_path=self.db_path)
+        
+        executor = ScreenshotExecutor(job['user_id'], job['rice_profile'], job['scenario_number'],
+                                      self.db_path, self._db_manager)
+        executor.headless = self.headless
+        executor.user_input_mode = self.user_input_mode
+        return executor.execute_scenario_with_steps(steps, browser_config)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m execution_worker',
+                                     description="Execute scenarios queued for RICE Tester workers")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fsm_tester.db'),
+                        help="database holding the job queue (default: the local fsm_tester.db)")
+    parser.add_argument('--worker-id', help="name shown to observers (default host:pid)")
+    parser.add_argument('--lease', type=int, default=DEFAULT_LEASE_SECONDS, help="lease length in seconds")
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS, help="seconds between claims when idle")
+    parser.add_argument('--max-jobs', type=int, help="exit after this many scenarios")
+    parser.add_argument('--exit-when-idle', action='store_true', help="exit once the queue is empty")
+    parser.add_argument('--user-input', choices=('fail', 'continue'), default='fail',
+                        help="what to do with manual user-input steps (default: fail the scenario)")
+    parser.add_argument('--show-browser', action='store_true', help="run with a visible browser window")
+    args = parser.parse_args(argv)
+    
+    worker = ExecutionWorker(args.db, args.worker_id, args.lease, args.poll,
+                             headless=not args.show_browser, user_input_mode=args.user_input)
+    
+    # Ctrl+C / service stop: finish the scenario in progress, leave the rest queued
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    
+    worker.run(args.max_jobs, args.exit_when_idle)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run scenarios, RICE profiles or saved batch runs without the GUI.
+
+    python -m headless_runner --user jdoe --profile 12 --workers 2 --json results.json --junit results.xml
+    python -m headless_runner --user 1 --profile 12 --scenario 3 --scenario 4
+    python -m headless_runner --user 1 --run 57 --failures-only
+
+Exit code is 0 when every scenario passed, 1 when any failed or the run was
+interrupted, and 2 when the run could not be started.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from database_manager import DatabaseManager
+from batch_jobs import BatchJobStore, load_batch_plan, record_scenario_result, \
+    MODE_FULL, MODE_CHANGED, DISPATCH_QUEUE, RUN_COMPLETED, RUN_STOPPED, RUN_FAILED, \
+    ITEM_PASSED, ITEM_FAILED, ITEM_SKIPPED
+from log_manager import get_logger
+
+logger = get_logger('headless_runner')
+
+USER_INPUT_MODES = ('fail', 'continue')
+
+def resolve_user_id(db_path, user):
+    """User id for a numeric id or a username, or None when unknown"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        cursor = conn.cursor()
+        if str(user).isdigit():
+            cursor.execute("SELECT id FROM users WHERE id = ?", (int(user),))
+        else:
+            cursor.execute("SELECT id FROM users WHERE LOWER(username) = LOWER(?)", (user,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except sqlite3.OperationalError:
+        # No users table yet (fresh database) - accept a numeric id as given
+        return int(user) if str(user).isdigit() else None
+    finally:
+        conn.close()
+
+class HeadlessRunner:
+    """Executes batch runs from the command line with a pool of headless browsers.
+
+    Runs go through the same persisted batch_runs queue as the Run All dialog, so a
+    CLI run can be resumed from the GUI and the other way round. Every scenario gets
+    its own browser, so login steps are never skipped the way the GUI batch does.
+    """
+    
+    def __init__(self, user_id, workers=1, user_input_mode='fail', headless=True, visual_diff=True, echo=print):
+        self.db_manager = DatabaseManager(user_id)
+        self.db_path = self.db_manager.db_path
+        self.user_id = user_id
+        self.workers = max(1, workers)
+        self.user_input_mode = user_input_mode
+        self.headless = headless
+        self.visual_diff = visual_diff
+        self.echo = echo
+        self.job_store = BatchJobStore(self.db_path, user_id)
+        self.stop_requested = False
+        self._echo_lock = threading.Lock()
+        self._thread_state = threading.local()  # per-worker-thread DatabaseManager
+    
+    def _say(self, message):
+        if self.echo:
+            with self._echo_lock:
+                self.echo(message)
+    
+    def run_profile(self, rice_profile, scenario_numbers=None, mode=MODE_FULL):
+        """Create and execute a new run for a profile (optionally only some scenario numbers)"""
+        scenarios = self.db_manager.get_scenarios(rice_profile)
+        if scenario_numbers:
+            wanted = set(scenario_numbers)
+            missing = wanted - {scenario[1] for scenario in scenarios}
+            if missing:
+                raise ValueError(f"Scenario(s) not found in profile {rice_profile}: "
+                                 f"{', '.join(str(number) for number in sorted(missing))}")
+            scenarios = [scenario for scenario in scenarios if scenario[1] in wanted]
+        if mode == MODE_CHANGED:
+            scenarios = self.job_store.select_changed_scenarios(rice_profile, scenarios)
+        if not scenarios:
+            self._say(f"Nothing to run for profile {rice_profile}")
+            return self._report(None, rice_profile, mode, [], time.time(), RUN_COMPLETED, {})
+        
+        run_id = self.job_store.create_run(rice_profile, scenarios, mode)
+        return self._execute_run(run_id, rice_profile, mode, self.job_store.get_queue(run_id))
+    
+    def run_saved(self, run_id, failures_only=False):
+        """Continue a saved batch run - its unfinished scenarios, or only its failures"""
+        run = self.job_store.get_run(run_id)
+        if not run:
+            raise ValueError(f"Batch run {run_id} not found")
+        if run['dispatch'] == DISPATCH_QUEUE:
+            raise ValueError(f"Batch run {run_id} is dispatched to execution workers")
+        if not self.job_store.resume_run(run_id):
+            raise ValueError(f"Batch run {run_id} is still running in another process")
+        queue = self.job_store.get_queue(run_id, failures_only)
+        return self._execute_run(run_id, run['rice_profile'], run['mode'], queue)
+    
+    def _execute_run(self, run_id, rice_profile, mode, queue):
+        started = time.time()
+        run_status = RUN_FAILED
+        results = []
+        visual_changes = {}
+        self._say(f"Run #{run_id}: {len(queue)} scenario(s) for profile {rice_profile}, "
+                  f"{self.workers} worker(s)")
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                plan = load_batch_plan(conn, self.user_id, rice_profile, run_id)
+            finally:
+                conn.close()
+            
+            pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='headless-run')
+            try:
+                futures = [pool.submit(self._run_item, rice_profile, plan, position, item_id, scenario)
+                           for position, (item_id, scenario) in enumerate(queue)]
+                for future in futures:
+                    result = future.result()
+                    if result:
+                        results.append(result)
+            except KeyboardInterrupt:
+                # Scenarios already in a browser finish; the rest stay pending for resume
+                self.stop_requested = True
+                self._say("Interrupted - finishing scenarios in progress, the rest stay queued")
+                pool.shutdown(wait=True, cancel_futures=True)
+                results = [future.result() for future in futures
+                           if future.done() and not future.cancelled() and future.result()]
+            finally:
+                pool.shutdown(wait=True)
+            
+            run_status = RUN_STOPPED if self.stop_requested or len(results) < len(queue) else RUN_COMPLETED
+            
+            executed = [result['scenario_number'] for result in results if result['status'] != 'skipped']
+            if self.visual_diff and executed:
+                visual_changes = self._check_visual_regression(run_id, rice_profile, executed)
+        finally:
+            self.job_store.finish_run(run_id, run_status)
+        
+        results.sort(key=lambda result: result['position'])
+        return self._report(run_id, rice_profile, mode, results, started, run_status, visual_changes)
+    
+    def _run_item(self, rice_profile, plan, position, item_id, scenario):
+        """Execute one queued scenario in its own browser and checkpoint the result"""
+        if self.stop_requested:
+            return None
+        
+        scenario_id, scenario_number, description = scenario[:3]
+        result = {
+            'position': position,
+            'scenario_id': scenario_id,
+            'scenario_number': scenario_number,
+            'description': description or '',
+            'status': 'failed',
+            'steps_total': 0,
+            'steps_executed': 0,
+            'failed_step': None,
+            'message': None,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': 0.0
+        }
+        started = time.time()
+        self.job_store.mark_item_running(item_id)
+        
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.cursor()
+            steps = plan.steps_for(scenario_number)
+            result['steps_total'] = len(steps)
+            
+            if not steps:
+                result['status'] = 'skipped'
+                result['message'] = "No steps found"
+                self.job_store.mark_item_result(item_id, ITEM_SKIPPED, result['message'])
+                return result
+            
+            try:
+                success = self._execute_scenario(rice_profile, scenario_number, steps, plan.browser_config, result)
+            except Exception as e:
+                logger.exception("Scenario %s crashed", scenario_number)
+                success = False
+                result['message'] = str(e)
+            
+            record_scenario_result(cursor, scenario_id, success, plan.fingerprints.get(scenario_number))
+            conn.commit()
+            if success:
+                result['status'] = 'passed'
+                self.job_store.mark_item_result(item_id, ITEM_PASSED)
+            else:
+                result['message'] = result['message'] or "Scenario failed"
+                self.job_store.mark_item_result(item_id, ITEM_FAILED, result['message'])
+        finally:
+            conn.close()
+            result['duration_seconds'] = round(time.time() - started, 2)
+            self._say(f"  #{scenario_number} {result['status'].upper()} ({result['duration_seconds']}s)"
+                      + (f" - {result['message']}" if result['status'] != 'passed' and result['message'] else ""))
+        return result
+    
+    def _execute_scenario(self, rice_profile, scenario_number, steps, browser_config, result):
+        from screenshot_executor import ScreenshotExecutor
+        
+        # sqlite connections belong to their thread, so each pool thread keeps its own manager
+        db_manager = getattr(self._thread_state, 'db_manager', None)
+        if db_manager is None:
+            db_manager = self._thread_state.db_manager = DatabaseManager(self.user_id, db_path=self.db_path)
+        
+        executor = ScreenshotExecutor(self.user_id, rice_profile, scenario_number, self.db_path, db_manager)
+        executor.headless = self.headless
+        executor.user_input_mode = self.user_input_mode
+        
+        def progress_callback(current_step, total_steps, step_name, message):
+            if message.startswith("[SUCCESS]"):
+                result['steps_executed'] = max(result['steps_executed'], current_step)
+            elif message.startswith("[FAILED]"):
+                result['failed_step'] = {'step': current_step, 'name': step_name}
+                result['message'] = message[len("[FAILED]"):].strip(" :") or None
+        
+        executor.set_progress_callback(progress_callback)
+        return executor.execute_scenario_with_steps(steps, browser_config)
+    
+    def _check_visual_regression(self, run_id, rice_profile, scenario_numbers):
+        try:
+            from visual_diff import VisualRegression
+            
+            regression = VisualRegression(self.db_path, self.user_id)
+            return regression.check_scenarios(rice_profile, scenario_numbers, run_id)
+        except Exception as e:
+            logger.warning("Visual diff skipped: %s", e)
+            return {}
+    
+    def _report(self, run_id, rice_profile, mode, results, started, run_status, visual_changes):
+        duration = time.time() - started
+        passed = sum(1 for result in results if result['status'] == 'passed')
+        failed = sum(1 for result in results if result['status'] == 'failed')
+        skipped = sum(1 for result in results if result['status'] == 'skipped')
+        durations = [result['duration_seconds'] for result in results if result['status'] != 'skipped']
+        
+        return {
+            'run_id': run_id,
+            'rice_profile': str(rice_profile),
+            'mode': mode,
+            'status': run_status,
+            'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'results': results,
+            'visual_changes': {str(number): steps for number, steps in visual_changes.items()},
+            'metrics': {
+                'total': len(results),
+                'passed': passed,
+                'failed': failed,
+                'skipped': skipped,
+                'workers': self.workers,
+                'duration_seconds': round(duration, 2),
+                'scenario_seconds_total': round(sum(durations), 2),
+                'scenario_seconds_avg': round(sum(durations) / len(durations), 2) if durations else 0.0,
+                'scenario_seconds_max': max(durations) if durations else 0.0,
+                'scenarios_per_minute': round(len(durations) * 60 / duration, 2) if duration > 0 else 0.0,
+                'steps_executed': sum(result['steps_executed'] for result in results)
+            }
+        }
+
+def write_json(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+
+def write_junit(report, path):
+    """JUnit XML: one testsuite per run, one testcase per scenario"""
+    metrics = report['metrics']
+    suites = ET.Element('testsuites', tests=str(metrics['total']), failures=str(metrics['failed']),
+                        skipped=str(metrics['skipped']), time=str(metrics['duration_seconds']))
+    suite = ET.SubElement(suites, 'testsuite', name=f"RICE profile {report['rice_profile']}",
+                          tests=str(metrics['total']), failures=str(metrics['failed']), errors='0',
+                          skipped=str(metrics['skipped']), time=str(metrics['duration_seconds']),
+                          timestamp=report['started_at'])
+    
+    properties = ET.SubElement(suite, 'properties')
+    for name in ('run_id', 'mode', 'status'):
+        ET.SubElement(properties, 'property', name=name, value=str(report[name]))
+    for name, value in metrics.items():
+        ET.SubElement(properties, 'property', name=f"metrics.{name}", value=str(value))
+    
+    for result in report['results']:
+        testcase = ET.SubElement(suite, 'testcase', classname=f"rice_profile_{report['rice_profile']}",
+                                 name=f"Scenario {result['scenario_number']}: {result['description']}",
+                                 time=str(result['duration_seconds']))
+        if result['status'] == 'failed':
+            failed_step = result['failed_step']
+            detail = f"Failed at step {failed_step['step']} ({failed_step['name']})" if failed_step else ""
+            failure = ET.SubElement(testcase, 'failure', message=result['message'] or "Scenario failed")
+            failure.text = detail
+        elif result['status'] == 'skipped':
+            ET.SubElement(testcase, 'skipped', message=result['message'] or "")
+        visual_steps = report['visual_changes'].get(str(result['scenario_number']))
+        if visual_steps:
+            ET.SubElement(testcase, 'system-out').text = \
+                f"Visual change at step(s) {', '.join(str(step) for step in visual_steps)}"
+    
+    tree = ET.ElementTree(suites)
+    ET.indent(tree)
+    tree.write(path, encoding='utf-8', xml_declaration=True)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m headless_runner',
+                                     description="Run RICE Tester scenarios without the GUI")
+    parser.add_argument('--user', required=True, help="user id or username that owns the scenarios")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--profile', help="RICE profile id to run")
+    target.add_argument('--run', type=int, help="saved batch run id to continue")
+    parser.add_argument('--scenario', type=int, action='append', help="scenario number within --profile (repeatable)")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="only scenarios that changed since their last pass or are not passing")
+    parser.add_argument('--failures-only', action='store_true', help="with --run: re-run only failed scenarios")
+    parser.add_argument('--workers', type=int, default=1, help="scenarios executed in parallel (default 1)")
+    parser.add_argument('--user-input', choices=USER_INPUT_MODES, default='fail',
+                        help="what to do with manual user-input steps (default: fail the scenario)")
+    parser.add_argument('--show-browser', action='store_true', help="run with a visible browser window")
+    parser.add_argument('--no-visual-diff', action='store_true', help="skip the screenshot comparison after the run")
+    parser.add_argument('--json', help="write results and metrics as JSON to this file")
+    parser.add_argument('--junit', help="write results as JUnit XML to this file")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.scenario and not args.profile:
+        parser.error("--scenario needs --profile")
+    if args.failures_only and args.run is None:
+        parser.error("--failures-only needs --run")
+    
+    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fsm_tester.db')
+    user_id = resolve_user_id(db_path, args.user)
+    if user_id is None:
+        print(f"Unknown user: {args.user}", file=sys.stderr)
+        return 2
+    
+    runner = HeadlessRunner(user_id, workers=args.workers, user_input_mode=args.user_input,
+                            headless=not args.show_browser, visual_diff=not args.no_visual_diff)
+    try:
+        if args.run is not None:
+            report = runner.run_saved(args.run, args.failures_only)
+        else:
+            report = runner.run_profile(args.profile, args.scenario,
+                                        MODE_CHANGED if args.changed_only else MODE_FULL)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Run not started: {e}", file=sys.stderr)
+        return 2
+    
+    if args.json:
+        write_json(report, args.json)
+    if args.junit:
+        write_junit(report, args.junit)
+    
+    metrics = report['metrics']
+    label = f"Run #{report['run_id']}" if report['run_id'] else "Run"
+    print(f"{label} {report['status']}: {metrics['passed']} passed, {metrics['failed']} failed, "
+          f"{metrics['skipped']} skipped in {metrics['duration_seconds']}s")
+    for number, steps in sorted(report['visual_changes'].items()):
+        print(f"  Visual change in scenario #{number}, step(s) {', '.join(str(step) for step in steps)}")
+    
+    return 0 if report['status'] == RUN_COMPLETED and metrics['failed'] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
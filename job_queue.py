@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import socket
+import sqlite3
+from batch_jobs import (record_scenario_result, MODE_FULL, DISPATCH_QUEUE, RUN_RUNNING, RUN_COMPLETED, RUN_STOPPED,
+                        ITEM_PENDING, ITEM_RUNNING, ITEM_PASSED, ITEM_FAILED, ITEM_SKIPPED)
+from log_manager import get_logger
+
+logger = get_logger('job_queue')
+
+# A queued run waits in 'queued' until the first worker claims one of its items
+RUN_QUEUED = 'queued'
+
+DEFAULT_LEASE_SECONDS = 300     # a scenario's lease; workers renew it every lease / 3
+DEFAULT_MAX_ATTEMPTS = 3        # claims per item before a crashing scenario is failed for good
+RETRY_BASE_SECONDS = 30         # backoff after a crashed attempt: 30s, 60s, 120s ... capped
+RETRY_MAX_SECONDS = 600
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def retry_delay(attempts):
+    """Seconds to wait before an item that crashed on its n-th attempt is offered again"""
+    return min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+class JobQueue:
+    """Durable scenario job queue on the batch_runs / batch_run_items tables.
+
+    Submitted runs are claimed one item at a time by execution workers, which may
+    be separate processes or machines sharing the database file. A claim is a lease:
+    the worker renews it with heartbeats, and an item whose lease runs out (worker
+    crashed or lost the share) is offered again until max_attempts is used up.
+    Scenario failures are final; only crashes and expired leases are retried.
+    """
+    
+    def __init__(self, db_path, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+    
+    def _connect(self):
+        # Autocommit - claims open their own BEGIN IMMEDIATE so only one worker wins an item
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def submit(self, user_id, rice_profile, scenarios, mode=MODE_FULL, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Queue a run for the workers; scenarios are get_scenarios() rows"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                INSERT INTO batch_runs (user_id, rice_profile, mode, status, total, dispatch, max_attempts)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (user_id, str(rice_profile), mode, RUN_QUEUED, len(scenarios), DISPATCH_QUEUE, max_attempts))
+            run_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO batch_run_items (run_id, position, scenario_id, scenario_number, description, state)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(run_id, position, s[0], s[1], s[2], ITEM_PENDING) for position, s in enumerate(scenarios)])
+            cursor.execute("COMMIT")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        logger.info("Queued batch run %s for profile %s (%s scenarios)", run_id, rice_profile, len(scenarios))
+        return run_id
+    
+    def claim(self, worker_id):
+        """Lease the next runnable item to worker_id; returns a job dict or None when the queue is empty"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Items whose worker died on the last allowed attempt are not offered again
+            cursor.execute("""
+                SELECT i.id, i.run_id FROM batch_run_items i
+                JOIN batch_runs r ON r.id = i.run_id
+                WHERE i.state = ? AND i.lease_owner IS NOT NULL AND i.lease_expires_at < ?
+                  AND i.attempts >= r.max_attempts
+            """, (ITEM_RUNNING, now))
+            exhausted = cursor.fetchall()
+            cursor.executemany("""
+                UPDATE batch_run_items SET state = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    finished_at = CURRENT_TIMESTAMP, error = 'Lease expired on final attempt (worker lost)'
+                WHERE id = ?
+            """, [(ITEM_FAILED, row['id']) for row in exhausted])
+            
+            cursor.execute("""
+                SELECT i.id, i.run_id, i.position, i.scenario_id, i.scenario_number, i.description, i.attempts,
+                       r.user_id, r.rice_profile, r.mode
+                FROM batch_run_items i
+                JOIN batch_runs r ON r.id = i.run_id
+                WHERE r.dispatch = ? AND r.status IN (?, ?)
+                  AND ((i.state = ? AND i.available_at <= ?)
+                       OR (i.state = ? AND i.lease_owner IS NOT NULL AND i.lease_expires_at < ?))
+                ORDER BY i.run_id, i.position
+                LIMIT 1
+            """, (DISPATCH_QUEUE, RUN_QUEUED, RUN_RUNNING, ITEM_PENDING, now, ITEM_RUNNING, now))
+            item = cursor.fetchone()
+            
+            if item:
+                cursor.execute("""
+                    UPDATE batch_run_items SET state = ?, lease_owner = ?, lease_expires_at = ?,
+                        attempts = attempts + 1, started_at = CURRENT_TIMESTAMP, finished_at = NULL, error = NULL
+                    WHERE id = ?
+                """, (ITEM_RUNNING, worker_id, now + self.lease_seconds, item['id']))
+                cursor.execute("""
+                    UPDATE batch_runs SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = ?
+                """, (RUN_RUNNING, item['run_id'], RUN_QUEUED))
+            
+            for run_id in {row['run_id'] for row in exhausted}:
+                self._finish_run_if_done(cursor, run_id)
+            cursor.execute("COMMIT")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        if not item:
+            return None
+        job = dict(item)
+        job['attempts'] += 1
+        logger.info("Worker %s claimed run %s scenario #%s (attempt %s)",
+                    worker_id, job['run_id'], job['scenario_number'], job['attempts'])
+        return job
+    
+    def heartbeat(self, item_id, worker_id):
+        """Extend the lease; False means the lease was lost and the result will not be accepted"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE batch_run_items SET lease_expires_at = ?
+                WHERE id = ? AND lease_owner = ? AND state = ?
+            """, (now + self.lease_seconds, item_id, worker_id, ITEM_RUNNING))
+            renewed = cursor.rowcount == 1
+            cursor.execute("UPDATE execution_workers SET heartbeat_at = ? WHERE worker_id = ?", (now, worker_id))
+            return renewed
+        finally:
+            conn.close()
+    
+    def complete(self, item_id, worker_id, state, error=None, fingerprint=None):
+        """Post a final result (passed / failed / skipped) and the scenario's outcome in one transaction.
+
+        Returns False, writing nothing, if the lease was lost meanwhile.
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                UPDATE batch_run_items SET state = ?, error = ?, finished_at = CURRENT_TIMESTAMP,
+                    lease_owner = NULL, lease_expires_at = NULL
+                WHERE id = ? AND lease_owner = ? AND state = ?
+            """, (state, error, item_id, worker_id, ITEM_RUNNING))
+            accepted = cursor.rowcount == 1
+            if accepted:
+                if state != ITEM_SKIPPED:
+                    cursor.execute("SELECT scenario_id FROM batch_run_items WHERE id = ?", (item_id,))
+                    record_scenario_result(cursor, cursor.fetchone()[0], state == ITEM_PASSED, fingerprint)
+                self._touch_and_finish(cursor, item_id)
+            cursor.execute("COMMIT")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        if not accepted:
+            logger.warning("Worker %s lost the lease on item %s - result discarded", worker_id, item_id)
+        return accepted
+    
+    def retry(self, item_id, worker_id, error):
+        """Hand a crashed item back with backoff, or fail it once its attempts are used up"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                SELECT i.attempts, r.max_attempts FROM batch_run_items i
+                JOIN batch_runs r ON r.id = i.run_id
+                WHERE i.id = ? AND i.lease_owner = ? AND i.state = ?
+            """, (item_id, worker_id, ITEM_RUNNING))
+            row = cursor.fetchone()
+            if not row:
+                cursor.execute("COMMIT")
+                return False
+            
+            if row['attempts'] >= row['max_attempts']:
+                cursor.execute("""
+                    UPDATE batch_run_items SET state = ?, error = ?, finished_at = CURRENT_TIMESTAMP,
+                        lease_owner = NULL, lease_expires_at = NULL
+                    WHERE id = ?
+                """, (ITEM_FAILED, error, item_id))
+            else:
+                cursor.execute("""
+                    UPDATE batch_run_items SET state = ?, error = ?, available_at = ?,
+                        lease_owner = NULL, lease_expires_at = NULL
+                    WHERE id = ?
+                """, (ITEM_PENDING, error, time.time() + retry_delay(row['attempts']), item_id))
+            self._touch_and_finish(cursor, item_id)
+            cursor.execute("COMMIT")
+            return True
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _touch_and_finish(self, cursor, item_id):
+        cursor.execute("SELECT run_id FROM batch_run_items WHERE id = ?", (item_id,))
+        run_id = cursor.fetchone()[0]
+        cursor.execute("UPDATE batch_runs SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (run_id,))
+        self._finish_run_if_done(cursor, run_id)
+    
+    def _finish_run_if_done(self, cursor, run_id):
+        cursor.execute("SELECT COUNT(*) FROM batch_run_items WHERE run_id = ? AND state IN (?, ?)",
+                       (run_id, ITEM_PENDING, ITEM_RUNNING))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("""
+                UPDATE batch_runs SET status = ?, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN (?, ?)
+            """, (RUN_COMPLETED, run_id, RUN_QUEUED, RUN_RUNNING))
+    
+    def cancel_run(self, run_id):
+        """Stop handing out a run's items; scenarios already leased finish normally"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE batch_runs SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN (?, ?)
+            """, (RUN_STOPPED, run_id, RUN_QUEUED, RUN_RUNNING))
+        finally:
+            conn.close()
+        logger.info("Batch run %s cancelled", run_id)
+    
+    def get_progress(self, run_id):
+        """Run status plus item counts by state, for observers polling a queued run"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, total FROM batch_runs WHERE id = ?", (run_id,))
+            run = cursor.fetchone()
+            if not run:
+                return None
+            progress = {'status': run['status'], 'total': run['total']}
+            cursor.execute("SELECT state, COUNT(*) FROM batch_run_items WHERE run_id = ? GROUP BY state", (run_id,))
+            progress.update({state: count for state, count in cursor.fetchall()})
+            return progress
+        finally:
+            conn.close()
+    
+    def register_worker(self, worker_id):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO execution_workers (worker_id, hostname, pid, status, heartbeat_at)
+                VALUES (?, ?, ?, 'idle', ?)
+            """, (worker_id, socket.gethostname(), os.getpid(), time.time()))
+        finally:
+            conn.close()
+    
+    def update_worker(self, worker_id, status, current_item=None, job_done=False):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE execution_workers SET status = ?, current_item = ?, heartbeat_at = ?,
+                    jobs_done = jobs_done + ?
+                WHERE worker_id = ?
+            """, (status, current_item, time.time(), int(job_done), worker_id))
+        finally:
+            conn.close()
+    
+    def get_active_workers(self, within_seconds=None):
+        """Workers that have checked in recently: [(worker_id, hostname, status, current_item, jobs_done)]"""
+        cutoff = time.time() - (within_seconds or self.lease_seconds)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT worker_id, hostname, status, current_item, jobs_done FROM execution_workers
+                WHERE status != 'stopped' AND heartbeat_at >= ?
+                ORDER BY worker_id
+            """, (cutoff,))
+            return [tuple(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Locator dry run: does a test step group or scenario still resolve on the current FSM build?
+
+    python -m locator_dry_run --group 12
+    python -m locator_dry_run --scenario 3:5 --apply-healed    # rice profile 3, scenario 5
+
+The step list is walked once. Navigate steps are followed and every selector used
+on the resulting page is checked in a single in-page call; nothing is clicked or
+typed, so elements that only appear after an interaction are reported missing.
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+from locator_fallback import LocatorFallback
+from scenario_plan import split_selectors, parse_get_text_target, parse_get_attribute_target, find_variables
+from log_manager import get_logger
+
+logger = get_logger('locator_dry_run')
+
+STATUS_OK = 'ok'
+STATUS_SLOW = 'slow'
+STATUS_AMBIGUOUS = 'ambiguous'
+STATUS_FALLBACK = 'fallback'
+STATUS_MISSING = 'missing'
+STATUS_SKIPPED = 'skipped'
+
+# Worst first, for reports
+STATUS_ORDER = (STATUS_MISSING, STATUS_FALLBACK, STATUS_AMBIGUOUS, STATUS_SLOW, STATUS_SKIPPED, STATUS_OK)
+
+DEFAULT_PAGE_TIMEOUT = 5      # seconds each page gets for its selectors to appear
+DEFAULT_SLOW_MS = 2000        # a selector that took longer than this to appear is reported slow
+
+NAVIGATE_TYPES = ("Navigate", "Web Navigation")
+# Step types whose healed locator can be written back to the step target
+HEALABLE_TYPES = ("Element Click", "Text Input")
+# Ids and class names that can be written as '#id' / '.class' without escaping
+CSS_IDENTIFIER = re.compile(r'^-?[A-Za-z_][\w-]*$')
+
+GROUP_STEPS_QUERY = """
+    SELECT step_order, name, step_type, target, id
+    FROM test_steps WHERE user_id = ? AND group_id = ?
+    ORDER BY step_order, id
+"""
+
+SCENARIO_STEPS_QUERY = """
+    SELECT ss.step_order, COALESCE(ts.name, ss.step_name), COALESCE(ts.step_type, ss.step_type),
+           COALESCE(ts.target, ss.step_target), ts.id
+    FROM scenario_steps ss
+    LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
+    WHERE ss.user_id = ? AND ss.rice_profile = ? AND ss.scenario_number = ?
+    ORDER BY ss.step_order
+"""
+
+def load_group_steps(conn, user_id, group_id):
+    """[(step_order, name, step_type, target, test_step_id)] for a test step group"""
+    return conn.execute(GROUP_STEPS_QUERY, (user_id, group_id)).fetchall()
+
+def load_scenario_steps(conn, user_id, rice_profile, scenario_number):
+    """Same rows for a scenario; test_step_id is None for steps copied rather than linked"""
+    return conn.execute(SCENARIO_STEPS_QUERY, (user_id, str(rice_profile), scenario_number)).fetchall()
+
+def step_selectors(step_type, target):
+    """Selectors a step looks up on the page, in the order the executor tries them"""
+    if step_type == "Element Click":
+        return split_selectors(target)
+    if step_type == "Text Input":
+        return [target.strip()] if (target or '').strip() else []
+    if step_type == "Get Text":
+        return parse_get_text_target(target)[0]
+    if step_type == "Get Attribute":
+        return parse_get_attribute_target(target)[0]
+    return []
+
+def xpath_literal(value):
+    """Quote a string for use in an XPath expression"""
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat('" + "', \"'\", '".join(value.split("'")) + "')"
+
+def candidate_to_target(candidate, step_type="Element Click"):
+    """Write a LocatorFallback candidate back in the target syntax the step's executor reads.
+
+    Element Click reads '//...' as XPath and anything else as CSS; Text Input only
+    understands '#id' and XPath, so its other candidates are converted to XPath.
+    Returns None when the candidate cannot be written for the step type.
+    """
+    by, value = candidate['by'], candidate['value']
+    css_allowed = step_type != "Text Input"
+    if by == 'id':
+        return '#' + value if CSS_IDENTIFIER.match(value) else f"//*[@id={xpath_literal(value)}]"
+    if by == 'xpath':
+        return value if value.startswith('//') else None
+    if by == 'class':
+        if css_allowed and CSS_IDENTIFIER.match(value):
+            return '.' + value
+        return f"//*[contains(concat(' ', normalize-space(@class), ' '), {xpath_literal(' ' + value + ' ')})]"
+    if by == 'tag':
+        if not CSS_IDENTIFIER.match(value):
+            return None
+        return value if css_allowed else '//' + value
+    # CSS selectors are not translated to XPath
+    return value if css_allowed else None
+
+class LocatorCheck:
+    """Outcome for one step's selectors on the page it runs on"""
+    
+    def __init__(self, step_order, name, step_type, target, test_step_id, page_url):
+        self.step_order = step_order
+        self.name = name
+        self.step_type = step_type
+        self.target = target
+        self.test_step_id = test_step_id
+        self.page_url = page_url
+        self.status = STATUS_SKIPPED
+        self.message = ''
+        self.matches = 0
+        self.found_ms = None
+        self.healed_target = None
+    
+    def __str__(self):
+        timing = f" in {self.found_ms} ms" if self.found_ms is not None else ""
+        return f"Step {self.step_order} '{self.name}' [{self.status}]{timing}: {self.message}"
+
+class DryRunReport:
+    def __init__(self):
+        self.pages = []         # [(url, load_ms)]
+        self.checks = []
+        self.elapsed = 0.0
+    
+    def counts(self):
+        counts = dict.fromkeys(STATUS_ORDER, 0)
+        for check in self.checks:
+            counts[check.status] += 1
+        return counts
+    
+    def problems(self):
+        return sorted((check for check in self.checks if check.status not in (STATUS_OK, STATUS_SKIPPED)),
+                      key=lambda check: (STATUS_ORDER.index(check.status), check.step_order))
+    
+    def healable(self):
+        return [check for check in self.checks if check.healed_target and check.test_step_id]
+    
+    def summary(self):
+        counts = self.counts()
+        detail = ", ".join(f"{count} {status}" for status, count in counts.items() if count)
+        return (f"{len(self.checks)} locators on {len(self.pages)} page(s) checked in {self.elapsed:.1f}s"
+                + (f": {detail}" if detail else ""))
+
+class LocatorDryRun:
+    """Walks a step list once, batch-checking each page's selectors"""
+    
+    def __init__(self, driver, page_timeout=DEFAULT_PAGE_TIMEOUT, slow_ms=DEFAULT_SLOW_MS, progress=None):
+        self.driver = driver
+        self.page_timeout = page_timeout
+        self.slow_ms = slow_ms
+        self.progress = progress
+        self.locator = LocatorFallback(driver, timeout=page_timeout)
+    
+    def run(self, steps):
+        """steps: [(step_order, name, step_type, target, test_step_id)] in execution order"""
+        report = DryRunReport()
+        started = time.time()
+        page_url = self._current_url()
+        page_checks = []
+        reachable = True
+        
+        for index, (step_order, name, step_type, target, test_step_id) in enumerate(steps, 1):
+            if step_type in NAVIGATE_TYPES:
+                self._check_page(page_checks, report)
+                page_checks = []
+                page_url, reachable = self._navigate(target, report)
+            elif step_selectors(step_type, target):
+                check = LocatorCheck(step_order, name, step_type, target, test_step_id, page_url)
+                report.checks.append(check)
+                if not reachable:
+                    check.message = "page could not be opened"
+                elif find_variables(target):
+                    check.message = "selector uses runtime variables"
+                else:
+                    page_checks.append(check)
+            if self.progress:
+                self.progress(index, len(steps))
+        
+        self._check_page(page_checks, report)
+        report.elapsed = time.time() - started
+        logger.info("Locator dry run: %s", report.summary())
+        return report
+    
+    def _current_url(self):
+        try:
+            return self.driver.current_url
+        except Exception:
+            return ''
+    
+    def _navigate(self, url, report):
+        if not url or find_variables(url):
+            logger.warning("Dry run cannot open '%s' - selectors up to the next navigation are skipped", url)
+            return url, False
+        started = time.time()
+        try:
+            self.driver.get(url)
+        except Exception as e:
+            logger.warning("Dry run could not open %s: %s", url, e)
+            return url, False
+        report.pages.append((url, int((time.time() - started) * 1000)))
+        return url, True
+    
+    def _check_page(self, checks, report):
+        """One in-page probe for every selector the page's steps use"""
+        if not checks:
+            return
+        candidate_lists = []
+        for check in checks:
+            candidates = []
+            seen = set()
+            for selector in step_selectors(check.step_type, check.target):
+                for candidate in self.locator.build_candidates(selector):
+                    if (candidate['by'], candidate['value']) not in seen:
+                        seen.add((candidate['by'], candidate['value']))
+                        candidates.append(candidate)
+            candidate_lists.append(candidates)
+        
+        for check, result in zip(checks, self.locator.probe_many(candidate_lists, self.page_timeout)):
+            self._classify(check, result)
+    
+    def _classify(self, check, result):
+        match = result['match']
+        check.matches = result['count']
+        check.found_ms = result['found_ms']
+        
+        if match is None:
+            check.status = STATUS_MISSING
+            check.message = f"no element matched within {self.page_timeout}s"
+        elif match['strategy'] != 'primary':
+            check.status = STATUS_FALLBACK
+            check.message = f"stored selector not found; fallback '{match['strategy']}' matched {match['value']}"
+            healed = None
+            if result['count'] == 1 and result['visible'] and check.step_type in HEALABLE_TYPES:
+                healed = candidate_to_target(match, check.step_type)
+            if healed:
+                check.healed_target = f"{healed}|{check.target}" if check.step_type == "Element Click" else healed
+        elif result['count'] > 1:
+            check.status = STATUS_AMBIGUOUS
+            check.message = f"{match['value']} matches {result['count']} elements"
+        elif not result['visible']:
+            check.status = STATUS_SLOW
+            check.message = f"{match['value']} is present but never became visible"
+        elif check.found_ms is not None and check.found_ms > self.slow_ms:
+            check.status = STATUS_SLOW
+            check.message = f"{match['value']} took {check.found_ms} ms to appear"
+        else:
+            check.status = STATUS_OK
+            check.message = match['value']
+
+def apply_healed_locators(conn, user_id, checks):
+    """Write healed targets back to their test steps in one transaction; returns rows updated"""
+    rows = {}
+    for check in checks:
+        if check.healed_target and check.test_step_id:
+            rows[check.test_step_id] = check.healed_target
+    if not rows:
+        return 0
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("UPDATE test_steps SET target = ? WHERE id = ? AND user_id = ?",
+                           [(target, step_id, user_id) for step_id, target in rows.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info("Healed locators of %s test steps", len(rows))
+    return len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m locator_dry_run',
+                                     description="Check that a step group or scenario's locators still resolve")
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument('--group', type=int, help="test step group id")
+    scope.add_argument('--scenario', help="PROFILE:SCENARIO_NUMBER")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fsm_tester.db'),
+                        help="database to read steps from (default: the local fsm_tester.db)")
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_PAGE_TIMEOUT, help="seconds per page")
+    parser.add_argument('--slow-ms', type=int, default=DEFAULT_SLOW_MS, help="report selectors slower than this")
+    parser.add_argument('--apply-healed', action='store_true',
+                        help="put uniquely matching fallback locators in front of the stored ones")
+    args = parser.parse_args(argv)
+    
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        if args.group is not None:
+            steps = load_group_steps(conn, args.user_id, args.group)
+        else:
+            rice_profile, scenario_number = args.scenario.split(':', 1)
+            steps = load_scenario_steps(conn, args.user_id, rice_profile, int(scenario_number))
+        if not steps:
+            print("No steps found")
+            return 1
+        
+        row = conn.execute("SELECT browser_type, incognito FROM global_config WHERE user_id = ?",
+                           (args.user_id,)).fetchone()
+        from selenium_manager import SeleniumManager
+        selenium_manager = SeleniumManager()
+        selenium_manager.create_driver(row[0] if row and row[0] else "chrome", bool(row and row[1]))
+        try:
+            report = LocatorDryRun(selenium_manager.driver, args.timeout, args.slow_ms).run(steps)
+        finally:
+            selenium_manager.close()
+        
+        print(report.summary())
+        for url, load_ms in report.pages:
+            print(f"  page {url} loaded in {load_ms} ms")
+        for check in report.problems():
+            print(f"  {check}")
+        if args.apply_healed:
+            print(f"Healed {apply_healed_locators(conn, args.user_id, report.healable())} step(s)")
+        return 1 if report.counts()[STATUS_MISSING] else 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
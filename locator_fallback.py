@@ -1,75 +1,321 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import logging
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import re
+import time
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from log_manager import get_logger
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+logger = get_logger('locator_fallback')
+
+# Shared by the probe scripts: resolve one {by, value} candidate to its elements
+# (null for an invalid locator) and check visibility.
+LOCATOR_RESOLVE_JS = """
+function resolve(c) {
+    try {
+        if (c.by === 'id') {
+            var el = document.getElementById(c.value);
+            return el ? [el] : [];
+        }
+        if (c.by === 'class') {
+            return Array.prototype.slice.call(document.getElementsByClassName(c.value));
+        }
+        if (c.by === 'tag') {
+            return Array.prototype.slice.call(document.getElementsByTagName(c.value));
+        }
+        if (c.by === 'css') {
+            return Array.prototype.slice.call(document.querySelectorAll(c.value));
+        }
+        if (c.by === 'xpath') {
+            var snap = document.evaluate(c.value, document, null,
+                                         XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var nodes = [];
+            for (var i = 0; i < snap.snapshotLength; i++) {
+                if (snap.snapshotItem(i).nodeType === 1) { nodes.push(snap.snapshotItem(i)); }
+            }
+            return nodes;
+        }
+    } catch (e) {
+        return null;
+    }
+    return [];
+}
+
+function isVisible(el) {
+    if (!el.getClientRects().length) { return false; }
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none';
+}
+"""
+
+# In-page probe: resolves every candidate locator inside the browser and polls
+# until the stored (primary) locator is visible. Fallbacks are only accepted once
+# the primary has had its grace period, so a loose fallback (a bare tag, text
+# match) cannot win while the real element is still rendering. Runs as an async
+# script so the whole lookup costs a single WebDriver round-trip.
+LOCATOR_PROBE_SCRIPT = LOCATOR_RESOLVE_JS + """
+var candidates = arguments[0];
+var timeoutMs = arguments[1];
+var pollMs = arguments[2];
+var graceMs = arguments[3];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+
+function probe() {
+    var hits = [];
+    var primaryVisible = null;
+    var firstVisible = null;
+    var firstPresent = null;
+    for (var i = 0; i < candidates.length; i++) {
+        var c = candidates[i];
+        var found = resolve(c);
+        if (found === null) {
+            hits.push({rank: i, strategy: c.strategy, by: c.by, value: c.value,
+                       count: 0, visible: 0, error: 'invalid locator'});
+            continue;
+        }
+        if (!found.length) { continue; }
+        var visible = found.filter(isVisible);
+        hits.push({rank: i, strategy: c.strategy, by: c.by, value: c.value,
+                   count: found.length, visible: visible.length});
+        if (firstVisible === null && visible.length) {
+            firstVisible = {rank: i, element: visible[0]};
+        }
+        if (primaryVisible === null && visible.length && c.strategy === 'primary') {
+            primaryVisible = {rank: i, element: visible[0]};
+        }
+        if (firstPresent === null) {
+            firstPresent = {rank: i, element: found[0]};
+        }
+    }
+    return {hits: hits, primary: primaryVisible, visible: firstVisible, present: firstPresent};
+}
+
+(function poll() {
+    var result = probe();
+    var elapsed = Date.now() - started;
+    var fallbackAllowed = elapsed >= graceMs;
+    if (result.primary || (fallbackAllowed && result.visible) || elapsed >= timeoutMs) {
+        var visibleMatch = result.primary || result.visible;
+        var match = visibleMatch || result.present;
+        done({
+            element: match ? match.element : null,
+            rank: match ? match.rank : -1,
+            visible: !!visibleMatch,
+            hits: result.hits.filter(function (h) { return h.count > 0 || h.error; }),
+            elapsed_ms: elapsed
+        });
+        return;
+    }
+    setTimeout(poll, pollMs);
+})();
+"""
+
+# Batch probe: checks the candidate lists of many targets on the current page in one
+# async call. Each target is settled when a 'primary' candidate shows a visible
+# match; the rest keep polling until the deadline. Reports per target the first
+# candidate that matched, its match count and how long it took to appear.
+BATCH_PROBE_SCRIPT = LOCATOR_RESOLVE_JS + """
+var targets = arguments[0];
+var timeoutMs = arguments[1];
+var pollMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+var results = targets.map(function () { return {rank: -1, count: 0, visible: 0, found_ms: null, settled: false}; });
+
+function check(index) {
+    var candidates = targets[index];
+    var result = results[index];
+    for (var i = 0; i < candidates.length; i++) {
+        var found = resolve(candidates[i]);
+        if (!found || !found.length) { continue; }
+        var visible = found.filter(isVisible).length;
+        if (result.found_ms === null) { result.found_ms = Date.now() - started; }
+        result.rank = i;
+        result.count = found.length;
+        result.visible = visible;
+        result.settled = visible > 0 && candidates[i].strategy === 'primary';
+        return;
+    }
+}
+
+(function poll() {
+    var pending = 0;
+    for (var i = 0; i < targets.length; i++) {
+        if (!results[i].settled) {
+            check(i);
+            if (!results[i].settled) { pending++; }
+        }
+    }
+    var elapsed = Date.now() - started;
+    if (!pending || elapsed >= timeoutMs) {
+        done({results: results, elapsed_ms: elapsed});
+        return;
+    }
+    setTimeout(poll, pollMs);
+})();
+"""
 
 class LocatorFallback:
     """Enhanced locator system with fallback strategies for robust element finding"""
     
-    def __init__(self, driver, timeout=10):
+    # Seconds the stored locator gets to show up before a fallback may be used
+    primary_grace = 5
+    
+    def __init__(self, driver, timeout=10, poll_interval=0.25):
         self.driver = driver
         self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.last_report = None
+        self._total_attempts = 0
+        self._fallback_used = 0
+        self._found = 0
+        # Candidate generators, in priority order. Each returns a list of
+        # (locator_type, value) pairs that the in-page probe resolves together.
         self.fallback_strategies = [
-            self._find_by_primary_locator,
-            self._find_by_id_fallback,
-            self._find_by_xpath_fallback,
-            self._find_by_text_fallback,
-            self._find_by_partial_text_fallback,
-            self._find_by_class_fallback,
-            self._find_by_tag_fallback
+            ('primary', self._primary_candidates),
+            ('id', self._id_candidates),
+            ('xpath', self._xpath_candidates),
+            ('text', self._text_candidates),
+            ('partial_text', self._partial_text_candidates),
+            ('class', self._class_candidates),
+            ('tag', self._tag_candidates)
         ]
     
     def find_element_with_fallback(self, target, step_name="Unknown Step"):
         """Find element using fallback strategies"""
-        logger.info(f"Attempting to find element for step: {step_name}")
-        logger.info(f"Primary target: {target}")
-        
-        for i, strategy in enumerate(self.fallback_strategies):
-            try:
-                element = strategy(target)
-                if element:
-                    if i > 0:
-                        logger.warning(f"Primary locator failed for '{step_name}'. Found using fallback strategy #{i}")
-                    else:
-                        logger.info(f"Element found using primary locator for '{step_name}'")
-                    return element
-            except Exception as e:
-                logger.debug(f"Strategy #{i} failed: {str(e)}")
-                continue
+        logger.debug("Attempting to find element for step: %s (primary target: %s)", step_name, target)
+        
+        self._total_attempts += 1
+        report = self.probe(target)
+        element = report['element']
+        
+        if element is not None:
+            self._found += 1
+            match = report['match']
+            if match['strategy'] != 'primary':
+                self._fallback_used += 1
+                logger.warning("Primary locator failed for '%s'. Found using fallback strategy '%s': %s",
+                               step_name, match['strategy'], match['value'])
+            else:
+                logger.debug("Element found using primary locator for '%s'", step_name)
+            if not report['visible']:
+                logger.warning("Element for '%s' is present but not visible", step_name)
+            return element
         
         # All strategies failed
         error_msg = f"Element not found: {step_name} (possible UI change). Target: {target}"
         logger.error(error_msg)
         raise NoSuchElementException(error_msg)
     
-    def _find_by_primary_locator(self, target):
-        """Find using the original locator strategy"""
-        wait = WebDriverWait(self.driver, self.timeout)
-        
+    def probe(self, target, timeout=None):
+        """Resolve every candidate locator for target in a single in-page call.
+
+        Returns a report dict with the matched element (the visible primary hit, the
+        first visible fallback once primary_grace has passed, or the first present
+        hit at the deadline), the matching candidate and a ranked list of every
+        candidate that matched anything.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        candidates = self.build_candidates(target)
+        started = time.time()
+        
+        try:
+            # Leave headroom so the in-page deadline fires before WebDriver gives up
+            self.driver.set_script_timeout(timeout + 5)
+            result = self.driver.execute_async_script(
+                LOCATOR_PROBE_SCRIPT, candidates,
+                int(timeout * 1000), int(self.poll_interval * 1000),
+                int(min(self.primary_grace, timeout) * 1000)
+            ) or {}
+        except TimeoutException:
+            result = {}
+        except WebDriverException as e:
+            logger.debug("Locator probe failed: %s", e)
+            result = {}
+        
+        rank = result.get('rank', -1)
+        report = {
+            'target': target,
+            'element': result.get('element'),
+            'visible': bool(result.get('visible')),
+            'match': candidates[rank] if 0 <= rank < len(candidates) else None,
+            'hits': result.get('hits', []),
+            'candidates': len(candidates),
+            'elapsed': time.time() - started
+        }
+        self.last_report = report
+        return report
+    
+    def probe_many(self, candidate_lists, timeout=None):
+        """Check many targets' candidate lists (from build_candidates) in one in-page call.
+
+        Returns one dict per list: the matching candidate (or None), its match
+        count, whether it is visible and the milliseconds until it appeared.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if not candidate_lists:
+            return []
+        
+        try:
+            self.driver.set_script_timeout(timeout + 5)
+            result = self.driver.execute_async_script(
+                BATCH_PROBE_SCRIPT, candidate_lists,
+                int(timeout * 1000), int(self.poll_interval * 1000)
+            ) or {}
+        except TimeoutException:
+            result = {}
+        except WebDriverException as e:
+            logger.debug("Batch locator probe failed: %s", e)
+            result = {}
+        
+        reports = []
+        for index, candidates in enumerate(candidate_lists):
+            found = (result.get('results') or [{}] * len(candidate_lists))[index]
+            rank = found.get('rank', -1)
+            reports.append({
+                'match': candidates[rank] if 0 <= rank < len(candidates) else None,
+                'count': found.get('count', 0),
+                'visible': bool(found.get('visible')),
+                'found_ms': found.get('found_ms')
+            })
+        return reports
+    
+    def build_candidates(self, target):
+        """Collect the ranked, de-duplicated candidate list from every strategy"""
+        candidates = []
+        seen = set()
+        for strategy_name, strategy in self.fallback_strategies:
+            try:
+                locators = strategy(target)
+            except Exception as e:
+                logger.debug("Strategy '%s' failed: %s", strategy_name, e)
+                continue
+            for by, value in locators:
+                if not value or (by, value) in seen:
+                    continue
+                seen.add((by, value))
+                candidates.append({'strategy': strategy_name, 'by': by, 'value': value})
+        return candidates
+    
+    def _primary_candidates(self, target):
+        """Candidates for the original locator strategy"""
         # Parse click type modifiers
         clean_target = self._clean_target(target)
         
         # Determine locator strategy
         if clean_target.startswith('#'):
-            return wait.until(EC.presence_of_element_located((By.ID, clean_target[1:])))
+            return [('id', clean_target[1:])]
         elif clean_target.startswith('.'):
-            return wait.until(EC.presence_of_element_located((By.CLASS_NAME, clean_target[1:])))
+            return [('class', clean_target[1:])]
         elif clean_target.startswith('//'):
-            return wait.until(EC.presence_of_element_located((By.XPATH, clean_target)))
+            return [('xpath', clean_target)]
         elif '[name=' in clean_target or '[id=' in clean_target or '[class=' in clean_target:
-            return wait.until(EC.presence_of_element_located((By.XPATH, clean_target)))
+            return [('xpath', clean_target)]
         else:
-            return wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, clean_target)))
+            return [('css', clean_target)]
     
-    def _find_by_id_fallback(self, target):
+    def _id_candidates(self, target):
         """Fallback: Try to find by ID if target contains ID-like patterns"""
         clean_target = self._clean_target(target)
         
@@ -78,7 +324,6 @@ class LocatorFallback:
         
         if 'id=' in clean_target:
             # Extract from xpath: //input[@id='username'] -> username
-            import re
             id_match = re.search(r"id=['\"]([^'\"]+)['\"]", clean_target)
             if id_match:
                 potential_ids.append(id_match.group(1))
@@ -98,20 +343,11 @@ class LocatorFallback:
             f"{base_name}Field"
         ])
         
-        wait = WebDriverWait(self.driver, 2)  # Shorter timeout for fallbacks
-        
-        for potential_id in potential_ids:
-            try:
-                return wait.until(EC.presence_of_element_located((By.ID, potential_id)))
-            except TimeoutException:
-                continue
-        
-        return None
+        return [('id', potential_id) for potential_id in potential_ids]
     
-    def _find_by_xpath_fallback(self, target):
+    def _xpath_candidates(self, target):
         """Fallback: Generate XPath alternatives"""
         clean_target = self._clean_target(target)
-        wait = WebDriverWait(self.driver, 2)
         
         # Generate XPath alternatives
         xpath_alternatives = []
@@ -144,18 +380,11 @@ class LocatorFallback:
                 f"//*[contains(@class, '{clean_target}')]"
             ])
         
-        for xpath in xpath_alternatives:
-            try:
-                return wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
-            except TimeoutException:
-                continue
-        
-        return None
+        return [('xpath', xpath) for xpath in xpath_alternatives]
     
-    def _find_by_text_fallback(self, target):
+    def _text_candidates(self, target):
         """Fallback: Find by text content"""
         clean_target = self._clean_target(target)
-        wait = WebDriverWait(self.driver, 2)
         
         # Extract potential text from target
         potential_texts = []
@@ -170,32 +399,20 @@ class LocatorFallback:
             if text.lower() in clean_target.lower():
                 potential_texts.append(text)
         
-        # Try finding by exact text
+        # Try button first, then any element
+        candidates = []
         for text in potential_texts:
-            try:
-                # Try button first, then any element
-                xpath_options = [
-                    f"//button[text()='{text}']",
-                    f"//input[@value='{text}']",
-                    f"//*[text()='{text}']",
-                    f"//a[text()='{text}']"
-                ]
-                
-                for xpath in xpath_options:
-                    try:
-                        return wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
-                    except TimeoutException:
-                        continue
-                        
-            except TimeoutException:
-                continue
-        
-        return None
+            candidates.extend([
+                ('xpath', f"//button[text()='{text}']"),
+                ('xpath', f"//input[@value='{text}']"),
+                ('xpath', f"//*[text()='{text}']"),
+                ('xpath', f"//a[text()='{text}']")
+            ])
+        return candidates
     
-    def _find_by_partial_text_fallback(self, target):
+    def _partial_text_candidates(self, target):
         """Fallback: Find by partial text content"""
         clean_target = self._clean_target(target)
-        wait = WebDriverWait(self.driver, 2)
         
         # Extract keywords from target
         keywords = []
@@ -204,30 +421,19 @@ class LocatorFallback:
             words = clean_target.replace('-', ' ').replace('_', ' ').split()
             keywords.extend([word for word in words if len(word) > 2])
         
+        candidates = []
         for keyword in keywords:
-            try:
-                xpath_options = [
-                    f"//button[contains(text(), '{keyword}')]",
-                    f"//input[contains(@value, '{keyword}')]",
-                    f"//*[contains(text(), '{keyword}')]",
-                    f"//a[contains(text(), '{keyword}')]"
-                ]
-                
-                for xpath in xpath_options:
-                    try:
-                        return wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
-                    except TimeoutException:
-                        continue
-                        
-            except TimeoutException:
-                continue
-        
-        return None
+            candidates.extend([
+                ('xpath', f"//button[contains(text(), '{keyword}')]"),
+                ('xpath', f"//input[contains(@value, '{keyword}')]"),
+                ('xpath', f"//*[contains(text(), '{keyword}')]"),
+                ('xpath', f"//a[contains(text(), '{keyword}')]")
+            ])
+        return candidates
     
-    def _find_by_class_fallback(self, target):
+    def _class_candidates(self, target):
         """Fallback: Try common class patterns"""
         clean_target = self._clean_target(target)
-        wait = WebDriverWait(self.driver, 2)
         
         # Generate potential class names
         potential_classes = []
@@ -243,18 +449,11 @@ class LocatorFallback:
                 f"{base_name}-field"
             ])
         
-        for class_name in potential_classes:
-            try:
-                return wait.until(EC.presence_of_element_located((By.CLASS_NAME, class_name)))
-            except TimeoutException:
-                continue
-        
-        return None
+        return [('class', class_name) for class_name in potential_classes]
     
-    def _find_by_tag_fallback(self, target):
+    def _tag_candidates(self, target):
         """Fallback: Find by common tag types"""
         clean_target = self._clean_target(target)
-        wait = WebDriverWait(self.driver, 1)  # Very short timeout
         
         # If target suggests a specific element type
         tag_hints = {
@@ -264,23 +463,14 @@ class LocatorFallback:
             'submit': ['input[type="submit"]', 'button[type="submit"]']
         }
         
+        candidates = []
         target_lower = clean_target.lower()
         for hint, tags in tag_hints.items():
             if hint in target_lower:
                 for tag in tags:
-                    try:
-                        if '[' in tag:
-                            # CSS selector
-                            return wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, tag)))
-                        else:
-                            # Tag name
-                            elements = wait.until(EC.presence_of_all_elements_located((By.TAG_NAME, tag)))
-                            if elements:
-                                return elements[0]  # Return first match
-                    except TimeoutException:
-                        continue
-        
-        return None
+                    # CSS selector when the hint carries attributes, tag name otherwise
+                    candidates.append(('css', tag) if '[' in tag else ('tag', tag))
+        return candidates
     
     def _clean_target(self, target):
         """Remove click type modifiers from target"""
@@ -291,11 +481,17 @@ class LocatorFallback:
     
     def get_fallback_report(self):
         """Get report of fallback usage for analytics"""
-        # This could be expanded to track fallback usage statistics
+        success_rate = (self._found / self._total_attempts * 100) if self._total_attempts else 100.0
         return {
-            'total_attempts': getattr(self, '_total_attempts', 0),
-            'fallback_used': getattr(self, '_fallback_used', 0),
-            'success_rate': getattr(self, '_success_rate', 100.0)
+            'total_attempts': self._total_attempts,
+            'fallback_used': self._fallback_used,
+            'success_rate': success_rate,
+            'last_probe': {
+                'target': self.last_report['target'],
+                'match': self.last_report['match'],
+                'hits': self.last_report['hits'],
+                'elapsed': self.last_report['elapsed']
+            } if self.last_report else None
         }
 
 # Integration helper for selenium_manager.py
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import itertools
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+LOG_FILE = 'rice_tester.log'
+LOG_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logging_config.json')
+ROOT_LOGGER = 'rice_tester'
+
+DEFAULT_CONFIG = {
+    'level': 'INFO',            # default level for every module
+    'console_level': 'WARNING', # what still reaches stdout/stderr
+    'modules': {},              # per-module overrides, e.g. {"screenshot_steps": "DEBUG"}
+    'max_bytes': 5 * 1024 * 1024,
+    'backup_count': 5,
+    'ring_size': 2000
+}
+
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the most recent log lines in memory so execution consoles can tail them"""
+    
+    def __init__(self, capacity=2000):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self.sequence = 0
+        self._records_lock = threading.Lock()
+    
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._records_lock:
+            self.sequence += 1
+            self.records.append((self.sequence, record.levelname, record.name, line))
+    
+    def latest_sequence(self):
+        """Sequence of the newest entry, to start reading from"""
+        with self._records_lock:
+            return self.sequence
+    
+    def read_since(self, sequence):
+        """Return entries (sequence, level, logger, line) newer than `sequence` - poll with the last one seen"""
+        with self._records_lock:
+            newer = self.sequence - sequence
+            if newer <= 0:
+                return []
+            # Sequences are consecutive, so the newer entries are the last ones
+            return list(itertools.islice(self.records, max(len(self.records) - newer, 0), None))
+
+class SafeConsoleHandler(logging.StreamHandler):
+    """Console handler that degrades unencodable characters instead of raising (Windows cp1252 consoles)"""
+    
+    def emit(self, record):
+        try:
+            message = self.format(record)
+            encoding = getattr(self.stream, 'encoding', None) or 'ascii'
+            message = message.encode(encoding, 'replace').decode(encoding)
+            self.stream.write(message + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+_setup_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_ring_buffer = None
+_console_handler = None
+
+def _load_config():
+    """Defaults, then logging_config.json, then RICE_LOG_LEVEL / RICE_LOG_LEVELS environment overrides"""
+    config = dict(DEFAULT_CONFIG)
+    config['modules'] = {}
+    
+    if os.path.exists(LOG_CONFIG_FILE):
+        try:
+            with open(LOG_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                file_config = json.load(f)
+            config.update({k: v for k, v in file_config.items() if k != 'modules'})
+            config['modules'].update(file_config.get('modules', {}))
+        except Exception as e:
+            sys.stderr.write(f"Failed to read {LOG_CONFIG_FILE}: {e}\n")
+    
+    if os.environ.get('RICE_LOG_LEVEL'):
+        config['level'] = os.environ['RICE_LOG_LEVEL']
+    
+    # RICE_LOG_LEVELS="screenshot_steps=DEBUG,rice_data_core=WARNING"
+    for item in os.environ.get('RICE_LOG_LEVELS', '').split(','):
+        if '=' in item:
+            module, level = item.split('=', 1)
+            config['modules'][module.strip()] = level.strip()
+    
+    return config
+
+def _level(value, default=logging.INFO):
+    """Accept 'DEBUG'/'debug'/10 style levels, falling back to default for unknown names"""
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    return level if isinstance(level, int) else default
+
+def setup_logging(log_dir=None):
+    """Configure the shared logging pipeline once per process (safe to call repeatedly)"""
+    global _listener, _queue_handler, _ring_buffer, _console_handler
+    
+    with _setup_lock:
+        if _listener is not None:
+            return logging.getLogger(ROOT_LOGGER)
+        
+        config = _load_config()
+        formatter = logging.Formatter(LOG_FORMAT, datefmt='%H:%M:%S')
+        handlers = []
+        
+        log_dir = log_dir or LOG_DIR
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            file_handler = RotatingFileHandler(os.path.join(log_dir, LOG_FILE),
+                                               maxBytes=config['max_bytes'],
+                                               backupCount=config['backup_count'],
+                                               encoding='utf-8', delay=True)
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handlers.append(file_handler)
+        except OSError as e:
+            sys.stderr.write(f"File logging disabled: {e}\n")
+        
+        _ring_buffer = RingBufferHandler(config['ring_size'])
+        _ring_buffer.setFormatter(formatter)
+        handlers.append(_ring_buffer)
+        
+        _console_handler = SafeConsoleHandler(sys.stdout)
+        _console_handler.setLevel(_level(config['console_level'], logging.WARNING))
+        _console_handler.setFormatter(formatter)
+        handlers.append(_console_handler)
+        
+        # Callers only enqueue; file and console I/O happen on the listener thread
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(_level(config['level']))
+        root.propagate = False
+        _queue_handler = QueueHandler(log_queue)
+        root.addHandler(_queue_handler)
+        
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        
+        for module, level in config['modules'].items():
+            logging.getLogger(f"{ROOT_LOGGER}.{module}").setLevel(_level(level))
+        
+        return root
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+            _listener.stop()
+            _listener = None
+            _queue_handler = None
+
+def get_logger(module_name):
+    """Logger for a module, e.g. get_logger('screenshot_steps')"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{module_name}")
+
+def set_module_level(module_name, level):
+    """Change one module's level at runtime (e.g. from a debug toggle)"""
+    get_logger(module_name).setLevel(_level(level))
+
+def set_console_level(level):
+    setup_logging()
+    _console_handler.setLevel(_level(level, logging.WARNING))
+
+def get_ring_buffer():
+    """The in-memory handler holding recent log lines"""
+    setup_logging()
+    return _ring_buffer
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import logging
+import threading
+import tkinter as tk
+from datetime import datetime
+from log_manager import LOG_DIR, ROOT_LOGGER, get_logger, get_ring_buffer
+
+logger = get_logger('output_console')
+
+# Modules that log while a scenario runs; execution dialogs show their warnings
+EXECUTION_LOGGERS = ('screenshot_core', 'screenshot_steps', 'locator_fallback', 'api_auth',
+                     'batch_jobs', 'execution_worker')
+
+class ExecutionConsole:
+    """Thread-safe, bounded live output for execution dialogs.
+
+    Worker threads call write() / post(); only the Tk thread touches the widget,
+    on a timer, in batches. Scrollback is capped at max_lines and the full log is
+    spilled to disk so nothing is lost when old lines are trimmed. Records the
+    log_modules loggers write at log_level or above are tailed from the log ring
+    buffer into the same output.
+    """
+    
+    def __init__(self, text_widget, name="execution", max_lines=1000, flush_interval=100,
+                 max_batch=500, spill_dir=None, log_modules=(), log_level=logging.WARNING):
+        self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.messages = queue.SimpleQueue()
+        self.callbacks = queue.SimpleQueue()
+        self.line_count = int(text_widget.index('end-1c').split('.')[0]) - 1
+        self.closed = False
+        self._after_id = None
+        
+        self._log_names = {f"{ROOT_LOGGER}.{module}" for module in log_modules}
+        self._log_level = log_level
+        self._ring = get_ring_buffer() if self._log_names else None
+        self._log_sequence = self._ring.latest_sequence() if self._ring else 0
+        
+        self.spill_path = None
+        self._spill_file = None
+        try:
+            spill_dir = spill_dir or LOG_DIR
+            os.makedirs(spill_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.spill_path = os.path.join(spill_dir, f"{name}_{stamp}.log")
+            self._spill_file = open(self.spill_path, 'a', encoding='utf-8', buffering=64 * 1024)
+        except OSError as e:
+            logger.warning("Console spill file disabled: %s", e)
+        
+        self._schedule()
+    
+    def write(self, message):
+        """Queue a line for display - safe to call from any thread"""
+        if not self.closed:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            self.messages.put(f"[{timestamp}] {message}\n")
+    
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread at the next flush - use for any other widget update"""
+        if not self.closed:
+            self.callbacks.put((callback, args))
+    
+    def ask(self, callback, *args):
+        """Run callback(*args) on the Tk thread and wait for its result - for worker threads.
+
+        Returns None if the console closes before the callback has run.
+        """
+        answered = threading.Event()
+        result = []
+        
+        def run():
+            try:
+                result.append(callback(*args))
+            finally:
+                answered.set()
+        
+        self.post(run)
+        while not answered.wait(0.2):
+            if self.closed:
+                return None
+        return result[0] if result else None
+    
+    def _schedule(self):
+        try:
+            self._after_id = self.text_widget.after(self.flush_interval, self.flush)
+        except tk.TclError:
+            self.close()
+    
+    def flush(self):
+        """Drain queued lines and callbacks into the widget (Tk thread only)"""
+        self._after_id = None
+        try:
+            if not self.text_widget.winfo_exists():
+                self.close()
+                return
+        except tk.TclError:
+            self.close()
+            return
+        
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        batch.extend(self._log_lines())
+        
+        if batch:
+            self._append(batch)
+        
+        while True:
+            try:
+                callback, args = self.callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except tk.TclError:
+                pass  # Widget was destroyed between post and flush
+            except Exception as e:
+                logger.warning("Console callback failed: %s", e)
+        
+        if not self.closed:
+            self._schedule()
+    
+    def _log_lines(self):
+        """Lines the tailed loggers added to the ring buffer since the last flush"""
+        if not self._ring:
+            return []
+        entries = self._ring.read_since(self._log_sequence)
+        if entries:
+            self._log_sequence = entries[-1][0]
+        return [line + '\n' for _, level, name, line in entries
+                if name in self._log_names and logging.getLevelName(level) >= self._log_level]
+    
+    def _append(self, batch):
+        text = ''.join(batch)
+        
+        if self._spill_file:
+            try:
+                self._spill_file.write(text)
+            except OSError:
+                pass
+        
+        # Keep only the tail of an oversized batch; the rest is already on disk
+        if len(batch) > self.max_lines:
+            batch = batch[-self.max_lines:]
+            text = ''.join(batch)
+        
+        widget = self.text_widget
+        previous_state = widget.cget('state')
+        widget.config(state=tk.NORMAL)
+        widget.insert(tk.END, text)
+        self.line_count += text.count('\n')
+        
+        excess = self.line_count - self.max_lines
+        if excess > 0:
+            widget.delete('1.0', f'{excess + 1}.0')
+            self.line_count -= excess
+        
+        widget.config(state=previous_state)
+        widget.see(tk.END)
+    
+    def close(self):
+        """Stop the flush timer and close the spill file"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._after_id:
+            try:
+                self.text_widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+        if self._spill_file:
+            # Lines that never reached the widget still belong in the full log
+            try:
+                while True:
+                    self._spill_file.write(self.messages.get_nowait())
+            except (queue.Empty, OSError):
+                pass
+            self._spill_file.close()
+            self._spill_file = None
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gc
+import os
+import importlib.util
+import glob
+import time
+import shutil
+import sqlite3
+from screenshot_storage import is_binary_image, recompress_screenshot, DEFAULT_JPEG_QUALITY
+from log_manager import get_logger
+
+logger = get_logger('performance_optimizer')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = 'fsm_tester.db'
+
+# Indexes behind the hot per-profile / per-scenario lookups
+INDEXES = [
+    ("idx_scenarios_profile", "scenarios (user_id, rice_profile, scenario_number)"),
+    ("idx_scenario_steps_scenario", "scenario_steps (user_id, rice_profile, scenario_number, step_order)"),
+    ("idx_test_steps_group", "test_steps (group_id, step_order)"),
+    ("idx_test_steps_profile", "test_steps (user_id, rice_profile_id)"),
+]
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024.0
+
+def _path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class RICEPerformanceOptimizer:
+    """Database and disk maintenance behind the Performance Optimizer dialog.
+
+    Every task returns a stats dict with before/after numbers and a one-line
+    'summary'; the latest results are also kept in self.results.
+    """
+    
+    def __init__(self, db_path=None, app_dir=None, temp_max_age_days=7, report_max_age_days=30,
+                 keep_backups=2, jpeg_quality=DEFAULT_JPEG_QUALITY, batch_size=200):
+        self.app_dir = app_dir or APP_DIR
+        self.db_path = db_path or os.path.join(self.app_dir, DB_FILE)
+        self.temp_max_age_days = temp_max_age_days
+        self.report_max_age_days = report_max_age_days
+        self.keep_backups = keep_backups
+        self.jpeg_quality = jpeg_quality
+        self.batch_size = batch_size
+        self.results = {}
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _db_stats(self, cursor):
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        freelist = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        return page_size * page_count, page_size * freelist
+    
+    def optimize_database(self):
+        """Create missing indexes, refresh planner statistics and reclaim free pages"""
+        start = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            size_before, free_before = self._db_stats(cursor)
+            
+            existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            indexes_created = 0
+            for name, definition in INDEXES:
+                if definition.split(' ')[0] not in existing:
+                    continue
+                if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone():
+                    continue
+                try:
+                    cursor.execute(f"CREATE INDEX {name} ON {definition}")
+                    indexes_created += 1
+                except sqlite3.OperationalError as e:
+                    logger.warning("Skipped index %s: %s", name, e)
+            conn.commit()
+            
+            cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA optimize")
+            
+            # Incremental vacuum only works once auto_vacuum is INCREMENTAL, and switching
+            # an existing database over takes one full VACUUM
+            auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum != 2:
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.commit()
+                conn.isolation_level = None
+                cursor.execute("VACUUM")
+                conn.isolation_level = ''
+                vacuum_mode = 'full (converted to incremental)'
+            else:
+                cursor.execute("PRAGMA incremental_vacuum")
+                cursor.fetchall()
+                vacuum_mode = 'incremental'
+            conn.commit()
+            
+            size_after, free_after = self._db_stats(cursor)
+        finally:
+            conn.close()
+        
+        stats = {
+            'size_before': size_before,
+            'size_after': size_after,
+            'free_before': free_before,
+            'free_after': free_after,
+            'indexes_created': indexes_created,
+            'vacuum': vacuum_mode,
+            'seconds': round(time.time() - start, 2),
+            'summary': f"{_format_bytes(size_before)} → {_format_bytes(size_after)}, "
+                       f"{indexes_created} indexes created, {vacuum_mode} vacuum"
+        }
+        self.results['database'] = stats
+        logger.info("Database optimization: %s", stats['summary'])
+        return stats
+    
+    def _remove(self, path):
+        size = _path_size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return size
+    
+    def cleanup_temp_files(self):
+        """Remove stray email screenshots, old updater backups and old generated reports"""
+        now = time.time()
+        temp_cutoff = now - self.temp_max_age_days * 86400
+        report_cutoff = now - self.report_max_age_days * 86400
+        removed = 0
+        freed = 0
+        errors = 0
+        
+        candidates = []
+        
+        # Email check screenshots are written to the working directory and never read back
+        for folder in {self.app_dir, os.getcwd()}:
+            for path in glob.glob(os.path.join(folder, 'email_screenshot_step_*.png')):
+                if os.path.getmtime(path) < temp_cutoff:
+                    candidates.append(path)
+        
+        # Updater backups: keep the newest few regardless of age
+        backups = sorted((p for p in glob.glob(os.path.join(self.app_dir, 'backup_*')) if os.path.isdir(p)),
+                         key=os.path.getmtime, reverse=True)
+        for path in backups[self.keep_backups:]:
+            if os.path.getmtime(path) < temp_cutoff:
+                candidates.append(path)
+        
+        # Generated documentation output
+        for folder_name in ('reports', 'docs'):
+            folder = os.path.join(self.app_dir, folder_name)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if os.path.isfile(path) and os.path.getmtime(path) < report_cutoff:
+                    candidates.append(path)
+        
+        for path in candidates:
+            try:
+                freed += self._remove(path)
+                removed += 1
+            except OSError as e:
+                errors += 1
+                logger.warning("Could not remove %s: %s", path, e)
+        
+        stats = {
+            'files_removed': removed,
+            'bytes_freed': freed,
+            'errors': errors,
+            'summary': f"{removed} items removed, {_format_bytes(freed)} freed"
+                       + (f", {errors} could not be removed" if errors else "")
+        }
+        self.results['cleanup'] = stats
+        logger.info("Temp cleanup: %s", stats['summary'])
+        return stats
+    
+    def optimize_screenshots(self):
+        """Recompress legacy base64 PNG screenshots to binary JPEG, in batches"""
+        if importlib.util.find_spec('PIL') is None:
+            # Recompression needs Pillow
+            stats = {'converted': 0, 'bytes_before': 0, 'bytes_after': 0,
+                     'summary': "Skipped - Pillow is not installed"}
+            self.results['screenshots'] = stats
+            return stats
+        
+        converted = 0
+        failed = 0
+        bytes_before = 0
+        bytes_after = 0
+        last_rowid = 0
+        
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            while True:
+                cursor.execute("""
+                    SELECT rowid, screenshot_before, screenshot_after FROM scenario_steps
+                    WHERE rowid > ? AND (screenshot_before IS NOT NULL OR screenshot_after IS NOT NULL)
+                    ORDER BY rowid LIMIT ?
+                """, (last_rowid, self.batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                updates = []
+                for rowid, before, after in rows:
+                    last_rowid = rowid
+                    new_values = []
+                    changed = False
+                    for value in (before, after):
+                        if value and not is_binary_image(value):
+                            try:
+                                new_value, was_changed = recompress_screenshot(value, self.jpeg_quality)
+                            except Exception as e:
+                                failed += 1
+                                logger.debug("Screenshot recompression failed for row %s: %s", rowid, e)
+                                new_value, was_changed = value, False
+                            if was_changed:
+                                bytes_before += len(value)
+                                bytes_after += len(new_value)
+                                converted += 1
+                                changed = True
+                            new_values.append(new_value)
+                        else:
+                            new_values.append(value)
+                    if changed:
+                        updates.append((new_values[0], new_values[1], rowid))
+                
+                if updates:
+                    cursor.executemany("UPDATE scenario_steps SET screenshot_before = ?, screenshot_after = ? WHERE rowid = ?",
+                                       updates)
+                    conn.commit()
+        finally:
+            conn.close()
+        
+        stats = {
+            'converted': converted,
+            'failed': failed,
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'summary': f"{converted} screenshots recompressed, {_format_bytes(bytes_before)} → {_format_bytes(bytes_after)}"
+                       + (f", {failed} unreadable" if failed else "")
+        }
+        self.results['screenshots'] = stats
+        logger.info("Screenshot optimization: %s", stats['summary'])
+        return stats
+    
+    def optimize_memory_usage(self):
+        """Drop cached execution plans, release SQLite page cache and run a full GC"""
+        from scenario_plan import clear_plan_cache
+        
+        plans_cleared = clear_plan_cache()
+        
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA shrink_memory")
+        finally:
+            conn.close()
+        
+        objects_before = len(gc.get_objects())
+        collected = gc.collect()
+        objects_after = len(gc.get_objects())
+        
+        stats = {
+            'plans_cleared': plans_cleared,
+            'gc_collected': collected,
+            'objects_before': objects_before,
+            'objects_after': objects_after,
+            'summary': f"{collected} unreachable objects collected, {plans_cleared} cached plans released"
+        }
+        self.results['memory'] = stats
+        logger.info("Memory optimization: %s", stats['summary'])
+        return stats
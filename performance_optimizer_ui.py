@@ -4,27 +4,7 @@
 import tkinter as tk
 from tkinter import ttk
 import threading
-import time
-import sys
-import os
-
-# Add Temp path for performance optimizer
-temp_path = os.path.join(os.path.dirname(__file__), 'Temp')
-if temp_path not in sys.path:
-    sys.path.insert(0, temp_path)
-
-try:
-    from performance_optimizer import RICEPerformanceOptimizer
-except ImportError as e:
-    print(f"Import error: {e}")
-    print(f"Temp path: {temp_path}")
-    print(f"Files in temp: {os.listdir(temp_path) if os.path.exists(temp_path) else 'Temp folder not found'}")
-    # Create a dummy optimizer for testing
-    class RICEPerformanceOptimizer:
-        def optimize_database(self): pass
-        def cleanup_temp_files(self): pass
-        def optimize_screenshots(self): pass
-        def optimize_memory_usage(self): pass
+from performance_optimizer import RICEPerformanceOptimizer
 
 class PerformanceOptimizerUI:
     def __init__(self, parent, show_popup_callback):
@@ -91,13 +71,14 @@ class PerformanceOptimizerUI:
         # Tasks list
         self.tasks = [
             ("🗃️ Database Optimization", "Create indexes, vacuum, and analyze database"),
-            ("🧹 Cleanup Temporary Files", "Remove files older than 7 days"),
-            ("📸 Optimize Screenshots", "Clean old screenshots and compress storage"),
-            ("💾 Memory Analysis", "Analyze and optimize memory usage patterns")
+            ("🧹 Cleanup Temporary Files", "Email screenshots, updater backups and old reports"),
+            ("📸 Optimize Screenshots", "Recompress legacy base64 screenshots to JPEG"),
+            ("💾 Memory Analysis", "Release cached plans and run garbage collection")
         ]
         
         self.task_frames = []
         self.task_status = []
+        self.task_details = []
         
         for i, (title, description) in enumerate(self.tasks):
             # Task container
@@ -126,6 +107,7 @@ class PerformanceOptimizerUI:
             
             self.task_frames.append(task_container)
             self.task_status.append(status_label)
+            self.task_details.append(desc_label)
         
         # Progress bar
         self.progress_frame = tk.Frame(content_frame, bg='#ffffff')
@@ -179,27 +161,22 @@ class PerformanceOptimizerUI:
         """Run optimization steps with visual progress"""
         try:
             total_steps = len(self.tasks)
+            task_methods = [self.optimizer.optimize_database, self.optimizer.cleanup_temp_files,
+                            self.optimizer.optimize_screenshots, self.optimizer.optimize_memory_usage]
+            self.failed_tasks = []
             
             for i, (title, description) in enumerate(self.tasks):
                 # Update current task status
                 self.dialog.after(0, lambda idx=i: self.update_task_status(idx, "running"))
-                self.dialog.after(0, lambda: self.progress_label.configure(text=f"Running: {title}"))
-                
-                # Simulate work and run actual optimization
-                if i == 0:  # Database optimization
-                    self.optimizer.optimize_database()
-                elif i == 1:  # Cleanup
-                    self.optimizer.cleanup_temp_files()
-                elif i == 2:  # Screenshots
-                    self.optimizer.optimize_screenshots()
-                elif i == 3:  # Memory analysis
-                    self.optimizer.optimize_memory_usage()
+                self.dialog.after(0, lambda t=title: self.progress_label.configure(text=f"Running: {t}"))
                 
-                # Add visual delay for better UX
-                time.sleep(1)
-                
-                # Mark as complete
-                self.dialog.after(0, lambda idx=i: self.update_task_status(idx, "complete"))
+                # One failing task should not stop the rest of the maintenance
+                try:
+                    stats = task_methods[i]()
+                    self.dialog.after(0, lambda idx=i, s=stats: self.update_task_status(idx, "complete", s['summary']))
+                except Exception as e:
+                    self.failed_tasks.append(title)
+                    self.dialog.after(0, lambda idx=i, err=str(e): self.update_task_status(idx, "failed", err))
                 
                 # Update progress
                 progress = ((i + 1) / total_steps) * 100
@@ -211,17 +188,28 @@ class PerformanceOptimizerUI:
         except Exception as e:
             self.dialog.after(0, lambda: self.optimization_error(str(e)))
     
-    def update_task_status(self, task_index, status):
-        """Update visual status of a task"""
+    def update_task_status(self, task_index, status, detail=None):
+        """Update visual status of a task (detail replaces the description with the task's result)"""
         if status == "running":
             self.task_status[task_index].configure(text="⚡", fg='#f59e0b')
             self.task_frames[task_index].configure(bg='#fef3c7', highlightbackground='#f59e0b', highlightthickness=2)
         elif status == "complete":
             self.task_status[task_index].configure(text="✅", fg='#059669')
             self.task_frames[task_index].configure(bg='#d1fae5', highlightbackground='#059669', highlightthickness=2)
+        elif status == "failed":
+            self.task_status[task_index].configure(text="❌", fg='#ef4444')
+            self.task_frames[task_index].configure(bg='#fee2e2', highlightbackground='#ef4444', highlightthickness=2)
+        
+        if detail:
+            self.task_details[task_index].configure(text=detail[:80], fg='#1f2937')
     
     def optimization_complete(self):
         """Handle optimization completion"""
+        if self.failed_tasks:
+            self.progress_label.configure(text=f"⚠️ Completed with {len(self.failed_tasks)} failed task(s)")
+            self.start_btn.configure(text="🔁 Run Again", bg='#f59e0b', state='normal')
+            return
+        
         self.progress_label.configure(text="✅ Optimization completed successfully!")
         self.start_btn.configure(text="✅ Completed", bg='#059669', state='disabled')
         
@@ -236,6 +224,9 @@ class PerformanceOptimizerUI:
     def show_success_and_close(self):
         """Show success message and close dialog"""
         self.dialog.destroy()
+        labels = [('database', 'Database'), ('cleanup', 'Temp files'), ('screenshots', 'Screenshots'), ('memory', 'Memory')]
+        details = "\n".join(f"• {label}: {self.optimizer.results[key]['summary']}" 
+                            for key, label in labels if key in self.optimizer.results)
         self.show_popup("Success", 
-                       "Performance optimization completed successfully!\n\n• Database indexes created\n• Temporary files cleaned\n• Screenshots optimized\n• Memory usage improved", 
+                       f"Performance optimization completed successfully!\n\n{details}", 
                        "success")
\ No newline at end of file
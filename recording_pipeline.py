@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import json
+
+# A click followed by a page load within this many seconds caused that load
+CLICK_NAVIGATION_SECONDS = 10
+# Repeated clicks on the same element closer together than this are one click
+DOUBLE_CLICK_SECONDS = 0.5
+# Fallback selectors kept behind the most stable one for Element Click steps
+MAX_CLICK_SELECTORS = 3
+
+NO_OP_CLICK_TARGETS = ('BODY', 'HTML')
+TEST_ATTRIBUTES = ('data-testid', 'data-test', 'data-test-id', 'data-qa', 'data-cy', 'data-automation-id')
+STATE_CLASSES = ('active', 'hover', 'focus', 'focused', 'selected', 'disabled', 'open', 'expanded', 'checked')
+
+# ids / values a framework generated at runtime and will not reproduce on the next load
+_GENERATED = re.compile(r'\d{3,}|^(ext-gen|ext-comp|ember|react|uid|ui-id|gwt-uid|j_id)|[0-9a-f]{8}-[0-9a-f]{4}|:', re.I)
+_ATTRIBUTE = re.compile(r'^\[([\w-]+)="(.*)"\]$')
+
+def selector_stability(selector):
+    """Score 0-100 for how likely a recorded CSS selector is to find the same element next run"""
+    if not selector:
+        return 0
+    if selector.startswith('#'):
+        return 30 if _GENERATED.search(selector[1:]) else 100
+    attribute = _ATTRIBUTE.match(selector)
+    if attribute:
+        name, value = attribute.groups()
+        if name in TEST_ATTRIBUTES:
+            return 95
+        if name == 'name':
+            return 25 if _GENERATED.search(value) else 80
+        return 25 if _GENERATED.search(value) else 65
+    if selector.startswith('.'):
+        classes = [c for c in selector.split('.') if c]
+        state = sum(1 for c in classes if c.lower() in STATE_CLASSES)
+        return max(10, 45 - 5 * len(classes) - 15 * state)
+    return 5  # Bare tag name - matches the first element of its kind
+
+def rank_selectors(target, alternatives):
+    """Recorded selectors, most stable first (recording order breaks ties)"""
+    candidates = []
+    for selector in [target] + list(alternatives or []):
+        if selector and selector not in candidates:
+            candidates.append(selector)
+    return sorted(candidates, key=lambda s: -selector_stability(s))
+
+def _same_element(step, other):
+    return step['target'] == other['target'] or step['target'] in (other.get('alternatives') or [])
+
+class CoalesceStats:
+    def __init__(self, raw):
+        self.raw = raw
+        self.merged_inputs = 0
+        self.redirects = 0
+        self.click_navigations = 0
+        self.no_op_clicks = 0
+        self.empty_inputs = 0
+    
+    @property
+    def removed(self):
+        return (self.merged_inputs + self.redirects + self.click_navigations + self.no_op_clicks
+                + self.empty_inputs)
+    
+    def summary(self):
+        parts = [(self.merged_inputs, "merged keystrokes"), (self.redirects, "redirect hops"),
+                 (self.click_navigations, "click-driven page loads"), (self.no_op_clicks, "no-op clicks"),
+                 (self.empty_inputs, "empty inputs")]
+        detail = ", ".join(f"{count} {label}" for count, label in parts if count)
+        return f"{self.raw} recorded events -> {self.raw - self.removed} steps" + (f" ({detail})" if detail else "")
+
+def coalesce_steps(recorded_steps):
+    """Collapse capture noise in a raw recording; returns (steps, CoalesceStats).
+
+    - consecutive Text Input events on one field become the final value
+    - a Navigate straight after another (redirect chain) is dropped, keeping the first URL
+    - a Navigate shortly after a Click is the click's result: the click waits for the page instead
+    - clicks on the page body, repeated clicks and focus clicks before typing or choosing
+      an option are dropped
+    """
+    stats = CoalesceStats(len(recorded_steps))
+    steps = []
+    
+    for raw in recorded_steps:
+        step = dict(raw)
+        action = step['action']
+        previous = steps[-1] if steps else None
+        
+        if action == "Text Input":
+            if not step.get('value'):
+                stats.empty_inputs += 1
+                continue
+            if previous and previous['action'] == "Text Input" and _same_element(step, previous):
+                previous['value'] = step['value']
+                stats.merged_inputs += 1
+                continue
+            if previous and previous['action'] == "Click" and _same_element(step, previous):
+                # Clicking into the field is implied by typing into it
+                steps.pop()
+                stats.no_op_clicks += 1
+        
+        elif action == "Click":
+            if (step['target'] or '').upper() in NO_OP_CLICK_TARGETS:
+                stats.no_op_clicks += 1
+                continue
+            if (previous and previous['action'] == "Click" and _same_element(step, previous)
+                    and step['timestamp'] - previous['timestamp'] < DOUBLE_CLICK_SECONDS):
+                stats.no_op_clicks += 1
+                continue
+        
+        elif action == "Select Option":
+            if previous and previous['action'] == "Click" and _same_element(step, previous):
+                # Opening the dropdown is part of choosing from it
+                steps.pop()
+                stats.no_op_clicks += 1
+        
+        elif action == "Navigate":
+            if previous and previous['action'] == "Navigate":
+                stats.redirects += 1
+                continue
+            if (previous and previous['action'] == "Click"
+                    and step['timestamp'] - previous['timestamp'] <= CLICK_NAVIGATION_SECONDS):
+                previous['wait_condition'] = 'page_load'
+                stats.click_navigations += 1
+                continue
+        
+        steps.append(step)
+    
+    return steps, stats
+
+def _label(text, limit=40):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+def to_test_steps(steps):
+    """Map coalesced recorder steps onto executable test step rows (name, step_type, target, description)"""
+    rows = []
+    for number, step in enumerate(steps, 1):
+        action = step['action']
+        ranked = rank_selectors(step['target'], step.get('alternatives'))
+        best = ranked[0] if ranked else step['target']
+        value = step.get('value') or ''
+        
+        if action == "Navigate":
+            rows.append((f"Step {number}: Navigate", "Navigate", step['target'], f"Navigate to {step['target']}"))
+        elif action == "Click":
+            # Element Click tries pipe-separated selectors in order
+            target = '|'.join(ranked[:MAX_CLICK_SELECTORS]) or step['target']
+            label = _label(value) or best
+            rows.append((f"Step {number}: Click '{label}'", "Element Click", target, f"Click {label}"))
+        elif action == "Text Input":
+            # Text Input types its description into the target
+            rows.append((f"Step {number}: Enter {_label(best)}", "Text Input", best, value))
+        elif action == "Select Option":
+            script = ("var el = document.querySelector(%s); el.value = %s; "
+                      "el.dispatchEvent(new Event('change', {bubbles: true}));"
+                      % (json.dumps(best), json.dumps(step.get('option_value') or value)))
+            rows.append((f"Step {number}: Select '{_label(value)}'", "JavaScript Execute", script,
+                         f"Select '{value}' in {best}"))
+        else:
+            rows.append((f"Step {number}: {action}", action, best, f"{action} on {best}" + (f" with value '{value}'" if value else "")))
+    return rows
+
+def normalize_recording(recorded_steps):
+    """Raw recording -> (test step rows ready for bulk insert, CoalesceStats)"""
+    steps, stats = coalesce_steps(recorded_steps)
+    return to_test_steps(steps), stats
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Recorder event transport between the browser and SmartRecording.
+
+A recorder script is registered once per browser session and reports every
+click, input and navigation as a console message. RecorderTransport drains
+those messages from the browser log on an adaptive poll, so events survive
+page navigations and nothing has to be re-injected.
+"""
+
+import json
+from log_manager import get_logger
+
+logger = get_logger('recording_transport')
+
+EVENT_PREFIX = '__RICE_EVENT__'
+
+# Poll interval for the browser log: short while events are arriving, backing off when idle
+ACTIVE_POLL_MS = 150
+IDLE_POLL_MS = 1500
+
+# Registered with Page.addScriptToEvaluateOnNewDocument, so it is in place before any page
+# script runs on every document (including ones reached by redirects) - never re-injected.
+# Events are pushed the moment they happen as console messages, which chromedriver buffers
+# across navigations until Python drains them; nothing is kept in page state that a
+# navigation could wipe. Top-level document only, as replay does not switch frames.
+RECORDER_SCRIPT = r"""
+(function() {
+    if (window.top !== window || window.__riceRecorder) { return; }
+    window.__riceRecorder = true;
+
+    var documentId = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+    var sequence = 0;
+    var pendingInputs = {};
+    var lastHighlighted = null;
+
+    function emit(event) {
+        event.doc = documentId;
+        event.seq = ++sequence;
+        event.timestamp = Date.now();
+        console.log('__RICE_EVENT__' + JSON.stringify(event));
+    }
+
+    function generateSmartSelector(element) {
+        var selectors = [];
+        if (element.id) {
+            selectors.push('#' + element.id);
+        }
+        for (var i = 0; i < element.attributes.length; i++) {
+            var attr = element.attributes[i];
+            if (attr.name.indexOf('data-') === 0) {
+                selectors.push('[' + attr.name + '="' + attr.value + '"]');
+            }
+        }
+        if (element.name) {
+            selectors.push('[name="' + element.name + '"]');
+        }
+        if (typeof element.className === 'string' && element.className) {
+            var classes = element.className.split(' ').filter(function(c) { return c.length > 0; });
+            if (classes.length > 0) {
+                selectors.push('.' + classes.join('.'));
+            }
+        }
+        return {
+            primary: selectors[0] || element.tagName,
+            alternatives: selectors,
+            tagName: element.tagName,
+            text: element.innerText || element.value || element.placeholder || '',
+            type: element.type || 'element'
+        };
+    }
+
+    function highlightElement(element) {
+        if (lastHighlighted && lastHighlighted.style) {
+            lastHighlighted.style.outline = '';
+        }
+        element.style.outline = '3px solid #ff6b35';
+        element.style.outlineOffset = '2px';
+        lastHighlighted = element;
+        setTimeout(function() { if (element.style) { element.style.outline = ''; } }, 2000);
+    }
+
+    function isTextField(element) {
+        return element && (element.tagName === 'INPUT' || element.tagName === 'TEXTAREA');
+    }
+
+    function flushInput(key) {
+        var input = pendingInputs[key];
+        delete pendingInputs[key];
+        if (input && input.value) {
+            emit({
+                type: 'Text Input',
+                selector: input.selector.primary,
+                alternatives: input.selector.alternatives,
+                text: input.value,
+                elementType: input.selector.type,
+                tagName: input.selector.tagName,
+                waitCondition: 'element_visible'
+            });
+        }
+    }
+
+    function flushAllInputs() {
+        for (var key in pendingInputs) {
+            flushInput(key);
+        }
+    }
+
+    function emitNavigate() {
+        emit({type: 'Navigate', selector: location.href, text: '', waitCondition: 'page_load'});
+    }
+
+    document.addEventListener('input', function(e) {
+        if (isTextField(e.target)) {
+            var selector = generateSmartSelector(e.target);
+            pendingInputs[selector.primary] = {value: e.target.value, selector: selector};
+        }
+    }, true);
+
+    // Typed text is recorded once the field loses focus
+    document.addEventListener('blur', function(e) {
+        if (isTextField(e.target)) {
+            flushInput(generateSmartSelector(e.target).primary);
+        }
+    }, true);
+
+    // Capture phase, so the click is recorded before the page's own handlers can navigate away
+    document.addEventListener('click', function(e) {
+        if (!e.target) { return; }
+        flushAllInputs();
+        if (e.target.tagName === 'INPUT' && e.target.type !== 'submit' && e.target.type !== 'button') {
+            return;  // Focus clicks on fields are not steps
+        }
+        highlightElement(e.target);
+        var selector = generateSmartSelector(e.target);
+        emit({
+            type: 'Click',
+            selector: selector.primary,
+            alternatives: selector.alternatives,
+            text: selector.text,
+            elementType: selector.type,
+            tagName: selector.tagName,
+            coordinates: {x: e.clientX, y: e.clientY},
+            waitCondition: 'element_clickable'
+        });
+    }, true);
+
+    document.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter' && isTextField(e.target)) {
+            flushInput(generateSmartSelector(e.target).primary);
+        }
+    }, true);
+
+    document.addEventListener('change', function(e) {
+        if (!e.target) { return; }
+        if (e.target.tagName === 'SELECT') {
+            highlightElement(e.target);
+            var selector = generateSmartSelector(e.target);
+            emit({
+                type: 'Select Option',
+                selector: selector.primary,
+                alternatives: selector.alternatives,
+                text: e.target.selectedIndex >= 0 ? e.target.options[e.target.selectedIndex].text : '',
+                value: e.target.value,
+                waitCondition: 'element_visible'
+            });
+        } else if (e.target.type === 'file') {
+            highlightElement(e.target);
+            var fileSelector = generateSmartSelector(e.target);
+            emit({
+                type: 'File Upload',
+                selector: fileSelector.primary,
+                alternatives: fileSelector.alternatives,
+                text: Array.prototype.map.call(e.target.files, function(f) { return f.name; }).join(', '),
+                waitCondition: 'element_visible'
+            });
+        }
+    }, true);
+
+    window.addEventListener('pagehide', flushAllInputs, true);
+    window.addEventListener('beforeunload', flushAllInputs, true);
+
+    // In-page (history API / hash) navigations do not load a new document
+    ['pushState', 'replaceState'].forEach(function(name) {
+        var original = history[name];
+        history[name] = function() {
+            var result = original.apply(this, arguments);
+            flushAllInputs();
+            emitNavigate();
+            return result;
+        };
+    });
+    window.addEventListener('popstate', emitNavigate);
+    window.addEventListener('hashchange', emitNavigate);
+
+    emitNavigate();
+})();
+"""
+
+def enable_event_log(browser_options, browser_type='chrome'):
+    """Ask the driver to buffer console messages - must be set before the driver starts"""
+    browser_options.set_capability('goog:loggingPrefs', {'browser': 'ALL'})
+    if browser_type == 'edge':
+        browser_options.set_capability('ms:loggingPrefs', {'browser': 'ALL'})
+
+def parse_log_entry(entry):
+    """Recorded event carried by a browser log entry, or None for other console output"""
+    message = entry.get('message', '')
+    start = message.find(EVENT_PREFIX)
+    if start < 0:
+        return None
+    try:
+        if start > 0 and message[start - 1] == '"':
+            # chromedriver quotes string arguments: 'url line:col "__RICE_EVENT__{\"type\": ...}"'
+            payload = json.loads(message[start - 1:])
+        else:
+            payload = message[start:]
+        return json.loads(payload[len(EVENT_PREFIX):])
+    except ValueError:
+        logger.warning("Unreadable recorder event: %s", message[:200])
+        return None
+
+class RecorderTransport:
+    """Ordered stream of recorded events pushed from the browser.
+
+    The recorder script is registered for every new document once, when
+    recording starts. poll() costs a single round-trip that drains whatever the
+    browser pushed since the last call; the caller schedules it at
+    next_poll_ms(), which backs off while the page is idle.
+    """
+    
+    def __init__(self, driver):
+        self.driver = driver
+        self.idle_polls = 0
+        self._seen = set()
+        self._script_id = None
+    
+    def start(self):
+        """Register the recorder for every document loaded from now on - call before navigating"""
+        result = self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': RECORDER_SCRIPT})
+        self._script_id = result.get('identifier') if isinstance(result, dict) else None
+    
+    def poll(self):
+        """Events pushed since the last poll, in the order they happened"""
+        try:
+            entries = self.driver.get_log('browser')
+        except Exception as e:
+            logger.warning("Reading recorder events failed: %s", e)
+            entries = []
+        
+        events = []
+        for entry in entries:
+            event = parse_log_entry(entry)
+            if not event:
+                continue
+            key = (event.get('doc'), event.get('seq'))
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            events.append(event)
+        
+        self.idle_polls = 0 if events else self.idle_polls + 1
+        return events
+    
+    def next_poll_ms(self):
+        return min(IDLE_POLL_MS, ACTIVE_POLL_MS * (2 ** min(self.idle_polls, 4)))
+    
+    def stop(self):
+        """Final drain before the browser closes, so the last actions are not lost"""
+        events = self.poll()
+        if self._script_id:
+            try:
+                self.driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': self._script_id})
+            except Exception:
+                pass
+        return events
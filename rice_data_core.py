@@ -5,9 +5,14 @@ import tkinter as tk
 from tkinter import ttk
 import os
 import re
+import logging
 from rice_pagination import PaginationManager
 from rice_dialogs import RiceDialogs, center_dialog
 from rice_scenario_manager import ScenarioManager
+from screenshot_storage import screenshot_bytes, resolve_references
+from log_manager import get_logger
+
+logger = get_logger('rice_data_core')
 
 class RiceDataManager:
     def __init__(self, db_manager, show_popup_callback, rice_manager_ref=None, rice_ui_ref=None):
@@ -149,6 +154,9 @@ class RiceDataManager:
         # Create popup menu with left-aligned labels
         menu = tk.Menu(button, tearoff=0, font=('Segoe UI', 9))
         menu.add_command(label="📋 Duplicate", command=lambda: self.duplicate_rice_profile(profile_id))
+        menu.add_command(label="📦 Export Evidence",
+                         command=lambda: self._export_evidence(button.winfo_toplevel(), profile_id,
+                                                               default_name=f"evidence_profile_{profile_id}"))
         menu.add_separator()
         menu.add_command(label="🗑️ Delete", command=lambda: self.delete_rice_profile(profile_id))
         
@@ -256,7 +264,7 @@ class RiceDataManager:
         
         # Clear existing profiles
         existing_widgets = ui_components['rice_scroll_frame'].winfo_children()
-        print(f"DEBUG: Clearing {len(existing_widgets)} existing widgets")
+        logger.debug("Clearing %s existing widgets", len(existing_widgets))
         for widget in existing_widgets:
             widget.destroy()
         
@@ -282,9 +290,9 @@ class RiceDataManager:
             # Client filter removed - users linked to single client
             client_filter = ""
                     
-            print(f"DEBUG: Extracted filters - Search: '{search_term}', Type: '{type_filter}'")
+            logger.debug("Extracted filters - Search: '%s', Type: '%s'", search_term, type_filter)
         except Exception as e:
-            print(f"DEBUG: Error extracting search terms: {e}")
+            logger.warning("Error extracting search terms: %s", e)
             # Fallback to empty filters
             search_term = ""
             type_filter = ""
@@ -299,25 +307,26 @@ class RiceDataManager:
         filtered_count = len(profiles)
         
         # Debug output
-        print(f"DEBUG: Loading RICE profiles for user_id={self.db_manager.user_id}")
-        print(f"DEBUG: Found {filtered_count} profiles, total={total_profiles}")
-        print(f"DEBUG: Search='{search_term}', Type='{type_filter}'")
-        print(f"DEBUG: No pagination - showing all records")
-        for i, profile in enumerate(profiles):
-            print(f"DEBUG: Profile {i}: {profile}")
+        logger.debug("Loading RICE profiles for user_id=%s", self.db_manager.user_id)
+        logger.debug("Found %s profiles, total=%s", filtered_count, total_profiles)
+        logger.debug("Search='%s', Type='%s'", search_term, type_filter)
+        logger.debug("No pagination - showing all records")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, profile in enumerate(profiles):
+                logger.debug("Profile %s: %s", i, profile)
         
         # No pagination - showing all records with scroll
         
         # Create profile rows or show empty state
         if profiles:
-            print(f"DEBUG: Creating {len(profiles)} profile rows")
+            logger.debug("Creating %s profile rows", len(profiles))
             first_profile_id = None
             first_rice_id = None
             first_row_widget = None
             
             for i, profile in enumerate(profiles):
                 row_widget = self._create_rice_profile_row(ui_components['rice_scroll_frame'], profile, i)
-                print(f"DEBUG: Created row {i} widget: {row_widget}")
+                logger.debug("Created row %s widget: %s", i, row_widget)
                 
                 # Store first profile for auto-selection
                 if i == 0:
@@ -334,14 +343,14 @@ class RiceDataManager:
             
             # Calculate content height and adjust canvas
             content_height = len(profiles) * 35  # 35px per row
-            print(f"DEBUG: Calculated content height: {content_height}px")
+            logger.debug("Calculated content height: %spx", content_height)
             if hasattr(self, '_rice_ui_ref') and self._rice_ui_ref:
                 # Use after_idle to ensure UI is ready before height calculation
                 ui_components['rice_scroll_frame'].after_idle(
                     lambda: self._rice_ui_ref.adjust_rice_canvas_height(content_height)
                 )
             else:
-                print("DEBUG: No _rice_ui_ref available for height adjustment")
+                logger.debug("No _rice_ui_ref available for height adjustment")
             
             # Update search results count and hide loading
             def _update_ui():
@@ -353,7 +362,7 @@ class RiceDataManager:
             
             ui_components['rice_scroll_frame'].after_idle(_update_ui)
         else:
-            print("DEBUG: No profiles found, showing empty state")
+            logger.debug("No profiles found, showing empty state")
             # Clear current selection and scenarios when no profiles match
             self.current_profile = None
             self.selected_rice_profile = None
@@ -665,26 +674,26 @@ class RiceDataManager:
             """, (self.db_manager.user_id,))
             types = ["All"] + [row[0] for row in cursor.fetchall()]
             
-            print(f"DEBUG: Found types for filter: {types}")
+            logger.debug("Found types for filter: %s", types)
             
             # Update type filter dropdown directly from ui_components
             if 'rice_type_filter' in ui_components:
                 try:
                     ui_components['rice_type_filter']['values'] = types
-                    print(f"DEBUG: Updated type filter with {len(types)} options")
+                    logger.debug("Updated type filter with %s options", len(types))
                 except Exception as e:
-                    print(f"DEBUG: Could not update type filter: {e}")
+                    logger.warning("Could not update type filter: %s", e)
             
             # Also try to update via rice_ui_ref if available
             if hasattr(self, '_rice_ui_ref') and self._rice_ui_ref and hasattr(self._rice_ui_ref, 'rice_type_filter'):
                 try:
                     self._rice_ui_ref.rice_type_filter['values'] = types
-                    print(f"DEBUG: Updated type filter via rice_ui_ref")
+                    logger.debug("Updated type filter via rice_ui_ref")
                 except Exception as e:
-                    print(f"DEBUG: Could not update type filter via rice_ui_ref: {e}")
+                    logger.warning("Could not update type filter via rice_ui_ref: %s", e)
                         
         except Exception as e:
-            print(f"DEBUG: Error in _update_filter_options: {e}")
+            logger.warning("Error in _update_filter_options: %s", e)
             # Ignore errors during filter update
             pass
     
@@ -968,7 +977,7 @@ class RiceDataManager:
             cursor.execute("""
                 SELECT COALESCE(ts.name, ss.step_name) as step_name, 
                        ss.screenshot_before, ss.screenshot_after, ss.step_order,
-                       COALESCE(ts.step_type, ss.step_type) as step_type
+                       COALESCE(ts.step_type, ss.step_type) as step_type, ss.screenshot_timestamp
                 FROM scenario_steps ss
                 LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
                 WHERE ss.user_id = ? AND ss.rice_profile = ? AND ss.scenario_number = (
@@ -976,7 +985,8 @@ class RiceDataManager:
                 )
                 ORDER BY ss.step_order
             """, (self.db_manager.user_id, str(self.current_profile), scenario_id, self.db_manager.user_id))
-            screenshots = cursor.fetchall()
+            screenshots = [row[:5] for row in resolve_references(cursor.fetchall(), order_index=3, before_index=1,
+                                                                   after_index=2, timestamp_index=5)]
             
             if not screenshots:
                 self.show_popup("No Screenshots", "No screenshots found for this scenario.", "warning")
@@ -1147,11 +1157,10 @@ class RiceDataManager:
                     
                     try:
                         # Load and display image with better sizing
-                        import base64
                         from PIL import Image, ImageTk
                         from io import BytesIO
                         
-                        image_data = base64.b64decode(before_screenshot)
+                        image_data = screenshot_bytes(before_screenshot)
                         image = Image.open(BytesIO(image_data))
                         
                         # Better thumbnail sizing based on layout
@@ -1196,11 +1205,10 @@ class RiceDataManager:
                     
                     try:
                         # Load and display image with better sizing
-                        import base64
                         from PIL import Image, ImageTk
                         from io import BytesIO
                         
-                        image_data = base64.b64decode(after_screenshot)
+                        image_data = screenshot_bytes(after_screenshot)
                         image = Image.open(BytesIO(image_data))
                         
                         # Better thumbnail sizing based on layout
@@ -1238,11 +1246,12 @@ class RiceDataManager:
             button_container = tk.Frame(action_frame, bg='#ffffff')
             button_container.pack(expand=True)
             
-            # Export button (future feature)
+            # Export button - streams the scenario's evidence from the database, not the images shown here
             export_btn = tk.Button(button_container, text="📤 Export Screenshots", 
                                   font=('Segoe UI', 10, 'bold'), bg='#3b82f6', fg='#ffffff', 
                                   relief='flat', padx=20, pady=10, cursor='hand2', bd=0,
-                                  command=lambda: self.show_popup("Feature", "Export functionality coming soon!", "info"))
+                                  command=lambda: self._export_evidence(popup, self.current_profile, [scenario_number],
+                                                                        f"evidence_scenario_{scenario_number}"))
             export_btn.pack(side='left', padx=(0, 10))
             
             # Close button with enhanced styling
@@ -1285,10 +1294,40 @@ class RiceDataManager:
         except Exception as e:
             self.show_popup("Error", f"Failed to load screenshots: {str(e)}", "error")
     
+    def _export_evidence(self, parent, rice_profile, scenario_numbers=None, default_name="evidence"):
+        """Export screenshots, step logs and results as a ZIP evidence pack"""
+        import sqlite3
+        from tkinter import filedialog
+        from evidence_export import export_evidence
+        from step_library import run_with_progress
+        
+        path = filedialog.asksaveasfilename(parent=parent, title="Export Evidence", defaultextension=".zip",
+                                            initialfile=f"{default_name}.zip", filetypes=[("Evidence pack", "*.zip")])
+        if not path:
+            return
+        
+        db_path = self.db_manager.db_path
+        user_id = self.db_manager.user_id
+        
+        def work(progress):
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                return export_evidence(conn, user_id, path, rice_profile, scenario_numbers, progress=progress)
+            finally:
+                conn.close()
+        
+        def done(counts, error):
+            if error:
+                self.show_popup("Error", f"Failed to export evidence: {error}", "error")
+            else:
+                self.show_popup("Success", f"📦 Exported {counts['screenshots']} screenshots from "
+                                f"{counts['steps']} steps to {path}", "success")
+        
+        run_with_progress(parent, "Exporting Evidence", work, done)
+    
     def _enlarge_screenshot(self, screenshot_data, title):
         """Show enlarged screenshot in a separate window"""
         try:
-            import base64
             from PIL import Image, ImageTk
             from io import BytesIO
             
@@ -1306,7 +1345,7 @@ class RiceDataManager:
                 pass
             
             # Load and display full-size image
-            image_data = base64.b64decode(screenshot_data)
+            image_data = screenshot_bytes(screenshot_data)
             image = Image.open(BytesIO(image_data))
             
             # Scale to fit window while maintaining aspect ratio
@@ -3,9 +3,12 @@
 
 import tkinter as tk
 import os
+import sqlite3
+import threading
 import traceback
-from datetime import datetime
+from batch_jobs import record_scenario_result
 from rice_dialogs import center_dialog
+from output_console import ExecutionConsole, EXECUTION_LOGGERS
 
 class ScenarioExecution:
     def __init__(self, db_manager, show_popup_callback):
@@ -207,15 +210,14 @@ class ScenarioExecution:
                              wrap=tk.WORD, state=tk.DISABLED)
         output_text.pack(fill="both", expand=True, pady=(10, 0))
         
+        # Execution runs on a worker thread; the console batches its output onto the Tk thread
+        console = ExecutionConsole(output_text, name=f"scenario_{scenario_number}", log_modules=EXECUTION_LOGGERS)
+        
         def add_output(message, color="#f9fafb"):
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            formatted_message = f"[{timestamp}] {message}\n"
-            
-            output_text.config(state=tk.NORMAL)
-            output_text.insert(tk.END, formatted_message)
-            output_text.config(state=tk.DISABLED)
-            output_text.see(tk.END)
-            popup.update()
+            console.write(message)
+        
+        def ui(callback, *args):
+            console.post(callback, *args)
         
         add_output("=== RICE Tester Professional Execution ===")
         add_output(f"Scenario: #{scenario_number} - {description}")
@@ -238,8 +240,11 @@ class ScenarioExecution:
             add_output("🚀 Starting professional execution...")
             progress_label.config(text="Starting execution...", fg='#dc2626')
             status_indicator.config(text="Running", fg='#10b981')
-            popup.update()
             
+            worker = threading.Thread(target=run_execution, daemon=True)
+            worker.start()
+        
+        def run_execution():
             try:
                 from screenshot_executor import ScreenshotExecutor
                 add_output("Creating execution engine...")
@@ -256,41 +261,63 @@ class ScenarioExecution:
                     else:
                         display_message = f"Step {current_step}/{total_steps}: {step_name} - {message}"
                     
-                    progress_label.config(text=display_message, fg='#dc2626')
-                    popup.update()
+                    ui(lambda: progress_label.config(text=display_message, fg='#dc2626'))
                 
                 add_output("Setting up progress monitoring...")
                 executor.set_progress_callback(progress_callback)
+                # Manual steps are asked on the Tk thread while this thread waits for the answer
+                executor.user_input_prompt = lambda step_name, step_description: console.ask(
+                    executor.ask_user_input, step_name, step_description, popup)
                 add_output("🎯 Starting scenario execution...")
                 
                 # Execute scenario
                 success = executor.execute_scenario()
                 add_output(f"Execution completed. Success: {success}")
+                error_msg = None
                 
-                # Final status update
-                cursor = self.db_manager.conn.cursor()
-                if success:
-                    progress_label.config(text="✅ Execution completed successfully!", fg='#10b981')
-                    status_indicator.config(text="Success", fg='#10b981')
-                    add_output("🎉 EXECUTION SUCCESSFUL")
-                    cursor.execute("""
-                        UPDATE scenarios SET result = 'Passed', executed_at = CURRENT_TIMESTAMP 
-                        WHERE id = ?
-                    """, (scenario_id,))
-                    self.db_manager.conn.commit()
+            except Exception as e:
+                success, error_msg = False, str(e)
+            
+            # The result is saved here, not in the posted callback, so it survives the
+            # dialog being closed mid-run
+            saved = save_result(success)
+            ui(finish_execution, success, error_msg, saved)
+        
+        def save_result(success):
+            """Record Passed/Failed on the worker thread's own connection, as batch runs do"""
+            try:
+                conn = sqlite3.connect(self.db_manager.db_path, timeout=30)
+                try:
+                    record_scenario_result(conn.cursor(), scenario_id, success)
+                    conn.commit()
+                finally:
+                    conn.close()
+                return True
+            except sqlite3.Error as e:
+                add_output(f"⚠️ Could not save the scenario result: {e}")
+                return False
+        
+        def finish_execution(success, error_msg, saved):
+            nonlocal execution_running
+            if error_msg:
+                add_output(f"💥 EXECUTION ERROR: {error_msg}")
+                progress_label.config(text=f"Error: {error_msg}", fg='#ef4444')
+                status_indicator.config(text="Error", fg='#ef4444')
+            elif success:
+                progress_label.config(text="✅ Execution completed successfully!", fg='#10b981')
+                status_indicator.config(text="Success", fg='#10b981')
+                add_output("🎉 EXECUTION SUCCESSFUL")
+                if saved:
                     add_output("✅ Scenario status updated to Passed")
-                else:
-                    progress_label.config(text="❌ Execution failed", fg='#ef4444')
-                    status_indicator.config(text="Failed", fg='#ef4444')
-                    add_output("❌ EXECUTION FAILED")
-                    cursor.execute("""
-                        UPDATE scenarios SET result = 'Failed', executed_at = CURRENT_TIMESTAMP 
-                        WHERE id = ?
-                    """, (scenario_id,))
-                    self.db_manager.conn.commit()
+            else:
+                progress_label.config(text="❌ Execution failed", fg='#ef4444')
+                status_indicator.config(text="Failed", fg='#ef4444')
+                add_output("❌ EXECUTION FAILED")
+                if saved:
                     add_output("📝 Scenario status updated to Failed")
-                
-                # Auto-refresh RICE List
+            
+            # Auto-refresh RICE List
+            if not error_msg:
                 try:
                     if hasattr(self, '_rice_data_manager_ref') and self._rice_data_manager_ref:
                         add_output("🔄 Refreshing RICE List...")
@@ -298,19 +325,6 @@ class ScenarioExecution:
                         add_output("✅ RICE List refreshed")
                 except Exception as refresh_error:
                     add_output(f"⚠️ Failed to refresh RICE List: {refresh_error}")
-                    
-            except Exception as e:
-                error_msg = str(e)
-                add_output(f"💥 EXECUTION ERROR: {error_msg}")
-                progress_label.config(text=f"Error: {error_msg}", fg='#ef4444')
-                status_indicator.config(text="Error", fg='#ef4444')
-                
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute("""
-                    UPDATE scenarios SET result = 'Failed', executed_at = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                """, (scenario_id,))
-                self.db_manager.conn.commit()
             
             execution_running = False
             add_output("=== EXECUTION COMPLETED ===")
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ${cache_key} references inside step values
+VARIABLE_PATTERN = re.compile(r'\$\{([^}]+)\}')
+
+KNOWN_STEP_TYPES = (
+    "Navigate", "Web Navigation", "Element Click", "Text Input", "JavaScript Execute",
+    "Wait", "Get Text", "Get Attribute", "Email Check"
+)
+
+# Step types that need a target (selector, URL or script) to do anything
+TARGET_REQUIRED_TYPES = (
+    "Navigate", "Web Navigation", "Element Click", "Text Input", "JavaScript Execute",
+    "Get Text", "Get Attribute", "Email Check"
+)
+
+DEFAULT_WAIT_SECONDS = 2
+
+def detect_step_type(step_name, step_target, step_description):
+    """Detect step type based on step name and content"""
+    if not step_name:
+        return "Unknown"
+    
+    step_name_lower = step_name.lower()
+    
+    # Navigation steps
+    if any(keyword in step_name_lower for keyword in ["navigate", "page", "go to"]):
+        return "Navigate"
+    
+    # Click steps
+    if any(keyword in step_name_lower for keyword in ["click", "button", "select"]):
+        return "Element Click"
+    
+    # Text input steps
+    if any(keyword in step_name_lower for keyword in ["enter", "input", "type", "search"]) and "${" in str(step_description):
+        return "Text Input"
+    
+    # Get text steps
+    if any(keyword in step_name_lower for keyword in ["get", "capture", "extract", "workunit", "work unit"]):
+        return "Get Text"
+    
+    # Wait steps
+    if any(keyword in step_name_lower for keyword in ["wait", "pause"]):
+        return "Wait"
+    
+    # JavaScript steps
+    if any(keyword in step_name_lower for keyword in ["press enter", "javascript", "script"]):
+        return "JavaScript Execute"
+    
+    # Default based on content
+    if step_target and ("http" in str(step_target) or "://" in str(step_target)):
+        return "Navigate"
+    
+    return "Element Click"  # Default fallback
+
+def split_selectors(selector):
+    """Split a click selector list - pipe separated takes precedence over comma separated"""
+    if not selector:
+        return []
+    if '|' in selector:
+        return [s.strip() for s in selector.split('|') if s.strip()]
+    return [s.strip() for s in selector.split(',') if s.strip()]
+
+def parse_get_text_target(selector):
+    """Parse 'selectors | CACHE:name' into (selectors, cache_name)"""
+    cache_name = None
+    actual_selector = selector or ''
+    
+    if ' | CACHE:' in actual_selector:
+        parts = actual_selector.split(' | CACHE:')
+        actual_selector = parts[0].strip()
+        cache_name = parts[1].strip() if len(parts) > 1 else None
+        # Pipes are reserved for the cache suffix here, so only commas separate selectors
+        selectors = [s.strip() for s in actual_selector.split(',')] if ',' in actual_selector else [actual_selector.strip()]
+    elif '|' in actual_selector:
+        selectors = [s.strip() for s in actual_selector.split('|')]
+    elif ',' in actual_selector:
+        selectors = [s.strip() for s in actual_selector.split(',')]
+    else:
+        selectors = [actual_selector.strip()]
+    
+    return [s for s in selectors if s], cache_name or None
+
+def parse_get_attribute_target(selector):
+    """Parse 'selectors | attribute | CACHE:name' into (selectors, attribute, cache_name)"""
+    parts = (selector or '').split(' | ')
+    actual_selector = parts[0].strip()
+    attribute_name = parts[1].strip() if len(parts) > 1 else 'href'
+    
+    cache_name = None
+    if len(parts) > 2 and parts[2].startswith('CACHE:'):
+        cache_name = parts[2].replace('CACHE:', '').strip() or None
+    
+    if ',' in actual_selector:
+        selectors = [s.strip() for s in actual_selector.split(',')]
+    else:
+        selectors = [actual_selector.strip()]
+    
+    return [s for s in selectors if s], attribute_name, cache_name
+
+def parse_wait_seconds(duration):
+    """Parse a Wait value ('3' or legacy 'Time (seconds): 3'); None if unparseable"""
+    try:
+        if isinstance(duration, str) and duration.startswith('Time (seconds):'):
+            return float(duration.split(':')[1].strip())
+        return float(duration)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def parse_email_check_target(step_target):
+    """Parse 'SEARCH:criteria | CONTENT:a,b | TIMEOUT:60' into a parameter dict"""
+    params = {'search': '', 'content': [], 'timeout': 60}
+    
+    if step_target:
+        for part in step_target.split(" | "):
+            if part.startswith("SEARCH:"):
+                params['search'] = part.replace("SEARCH:", "").strip()
+            elif part.startswith("CONTENT:"):
+                content_str = part.replace("CONTENT:", "").strip()
+                if content_str:
+                    params['content'] = [c.strip() for c in content_str.split(",")]
+            elif part.startswith("TIMEOUT:"):
+                try:
+                    params['timeout'] = int(part.replace("TIMEOUT:", "").strip())
+                except ValueError:
+                    params['timeout'] = 60
+    
+    return params
+
+def find_variables(text):
+    """Return the ${...} variable names referenced in text, in order"""
+    if not text or '${' not in str(text):
+        return []
+    return VARIABLE_PATTERN.findall(str(text))
+
+def default_cache_key(position, step_name):
+    """Cache key used by Get Text / Get Attribute steps without a CACHE: suffix"""
+    return f"step_{position}_{(step_name or '').replace(' ', '_')}"
+
+class PlannedStep:
+    """A single validated step with its type resolved and parameters pre-parsed"""
+    
+    def __init__(self, position, step_order, step_name, step_type, step_target,
+                 step_description, user_input_required, type_detected=False):
+        self.position = position
+        self.step_order = step_order
+        self.step_name = step_name or ''
+        self.step_type = step_type
+        self.step_target = step_target
+        self.step_description = step_description
+        self.user_input_required = bool(user_input_required)
+        self.type_detected = type_detected
+        self.params = {}
+        self.variables = []
+        self.produces = None
+    
+    def as_tuple(self):
+        """Legacy 6-tuple layout used by the execution dialogs and batch filters"""
+        return (self.step_order, self.step_name, self.step_type, self.step_target,
+                self.step_description, self.user_input_required)
+    
+    def __repr__(self):
+        return f"PlannedStep({self.position}, {self.step_type!r}, {self.step_name!r})"
+
+class ExecutionPlan:
+    """Compiled, validated form of a scenario's step list"""
+    
+    def __init__(self, plan_hash, steps, errors, warnings):
+        self.plan_hash = plan_hash
+        self.steps = steps
+        self.errors = errors
+        self.warnings = warnings
+    
+    @property
+    def is_valid(self):
+        return not self.errors
+    
+    def __len__(self):
+        return len(self.steps)
+    
+    def __iter__(self):
+        return iter(self.steps)
+    
+    def summary(self):
+        """One-line description for progress output"""
+        return (f"{len(self.steps)} steps, {len(self.errors)} errors, "
+                f"{len(self.warnings)} warnings (plan {self.plan_hash[:12]})")
+
+def normalize_step(step_data):
+    """Accept a 6-tuple/list, dict or PlannedStep and return the raw 6 fields"""
+    if isinstance(step_data, PlannedStep):
+        return step_data.as_tuple()
+    if isinstance(step_data, dict):
+        return (step_data.get('step_order'), step_data.get('step_name'), step_data.get('step_type'),
+                step_data.get('step_target'), step_data.get('step_description'),
+                step_data.get('user_input_required', 0))
+    if isinstance(step_data, (tuple, list)) and len(step_data) >= 6:
+        return tuple(step_data[:6])
+    raise ValueError(f"Invalid step data format: {step_data!r}")
+
+def plan_hash(steps):
+    """Stable hash of a step list (after normalization)"""
+    payload = json.dumps([list(normalize_step(step)) for step in steps], default=str, ensure_ascii=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def compile_step(step_data, position=1):
+    """Compile one step; returns (PlannedStep, errors, warnings)"""
+    step_order, step_name, step_type, step_target, step_description, user_input_required = normalize_step(step_data)
+    errors = []
+    warnings = []
+    label = f"Step {position} ({step_name or 'unnamed'})"
+    
+    type_detected = step_type is None
+    if type_detected:
+        step_type = detect_step_type(step_name, step_target, step_description)
+        warnings.append(f"{label}: no step type stored, detected '{step_type}'")
+    
+    step = PlannedStep(position, step_order, step_name, step_type, step_target,
+                       step_description, user_input_required, type_detected)
+    
+    if step.user_input_required:
+        # Manual steps are completed by the tester, nothing to parse
+        return step, errors, warnings
+    
+    if step_type not in KNOWN_STEP_TYPES:
+        errors.append(f"{label}: unknown step type '{step_type}'")
+        return step, errors, warnings
+    
+    if step_type in TARGET_REQUIRED_TYPES and not (step_target or '').strip():
+        errors.append(f"{label}: '{step_type}' step has no target")
+    
+    if step_type in ("Navigate", "Web Navigation"):
+        step.params = {'url': step_target}
+    elif step_type == "Element Click":
+        name_lower = step.step_name.lower()
+        step.params = {
+            'selectors': split_selectors(step_target),
+            'right_click': "right-click" in name_lower or "right click" in name_lower
+        }
+    elif step_type == "Text Input":
+        step.params = {'selector': step_target, 'value': step_description}
+        step.variables = find_variables(step_description)
+    elif step_type == "JavaScript Execute":
+        script = step_target or ''
+        step.params = {'script': script,
+                       'enter_key': "enter" in script.lower() or "keydown" in script.lower()}
+    elif step_type == "Wait":
+        seconds = parse_wait_seconds(step_description)
+        if seconds is None:
+            warnings.append(f"{label}: cannot parse wait time '{step_description}', "
+                            f"will wait {DEFAULT_WAIT_SECONDS}s")
+            seconds = DEFAULT_WAIT_SECONDS
+        step.params = {'seconds': seconds}
+    elif step_type == "Get Text":
+        selectors, cache_name = parse_get_text_target(step_target)
+        step.params = {'selectors': selectors, 'cache_name': cache_name}
+        step.produces = cache_name or default_cache_key(position, step.step_name)
+    elif step_type == "Get Attribute":
+        selectors, attribute, cache_name = parse_get_attribute_target(step_target)
+        step.params = {'selectors': selectors, 'attribute': attribute, 'cache_name': cache_name}
+        step.produces = cache_name or default_cache_key(position, step.step_name)
+    elif step_type == "Email Check":
+        step.params = parse_email_check_target(step_target)
+        if not step.params['search']:
+            errors.append(f"{label}: Email Check has no SEARCH: criteria")
+    
+    return step, errors, warnings
+
+def compile_plan(steps):
+    """Compile a full step list, checking that variables are produced before use"""
+    compiled = []
+    errors = []
+    warnings = []
+    produced = {}
+    
+    for position, step_data in enumerate(steps, 1):
+        try:
+            step, step_errors, step_warnings = compile_step(step_data, position)
+        except ValueError as e:
+            errors.append(f"Step {position}: {e}")
+            continue
+        
+        for variable in step.variables:
+            if variable not in produced:
+                errors.append(f"Step {position} ({step.step_name}): variable '${{{variable}}}' "
+                              f"is not captured by any earlier step")
+        
+        if step.produces:
+            if step.produces in produced:
+                warnings.append(f"Step {position} ({step.step_name}): overwrites '{step.produces}' "
+                                f"captured by step {produced[step.produces]}")
+            produced[step.produces] = position
+        
+        compiled.append(step)
+        errors.extend(step_errors)
+        warnings.extend(step_warnings)
+    
+    return compiled, errors, warnings
+
+class PlanCache:
+    """Thread-safe LRU cache of compiled plans keyed by step-list hash"""
+    
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_plan(self, steps):
+        """Return the compiled ExecutionPlan for steps, compiling on first use"""
+        key = plan_hash(steps)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        
+        compiled, errors, warnings = compile_plan(steps)
+        plan = ExecutionPlan(key, compiled, errors, warnings)
+        
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+    
+    def clear(self):
+        with self._lock:
+            count = len(self._plans)
+            self._plans.clear()
+        return count
+
+# Shared across executors so batch runs reuse plans between scenarios and reruns
+_plan_cache = PlanCache()
+
+def get_execution_plan(steps):
+    """Compile (or fetch from cache) the execution plan for a step list"""
+    return _plan_cache.get_plan(steps)
+
+def clear_plan_cache():
+    """Drop every cached plan; returns how many were released"""
+    return _plan_cache.clear()
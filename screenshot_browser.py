@@ -13,6 +13,10 @@ from selenium.webdriver.edge.service import Service as EdgeService
 class BrowserManager:
     """Browser creation and management functionality"""
     
+    # Headless runs (CLI / build box): no window, fixed viewport, no shared debugging port
+    headless = False
+    headless_window_size = "1920,1080"
+    
     def create_driver(self, browser_type, incognito, second_screen):
         """Create browser driver with specified options"""
         try:
@@ -41,7 +45,12 @@ class BrowserManager:
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--remote-debugging-port=9222")
+        if self.headless:
+            # A fixed debugging port would collide between parallel headless browsers
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument(f"--window-size={self.headless_window_size}")
+        else:
+            chrome_options.add_argument("--remote-debugging-port=9222")
         
         # Try system ChromeDriver first, then local
         try:
@@ -56,6 +65,9 @@ class BrowserManager:
             else:
                 raise Exception("ChromeDriver not found")
         
+        if self.headless:
+            return driver
+        
         if second_screen:
             driver.set_window_position(1920, 0)
         
@@ -73,6 +85,9 @@ class BrowserManager:
         edge_options.add_argument("--no-sandbox")
         edge_options.add_argument("--disable-dev-shm-usage")
         edge_options.add_argument("--disable-gpu")
+        if self.headless:
+            edge_options.add_argument("--headless=new")
+            edge_options.add_argument(f"--window-size={self.headless_window_size}")
         
         # Try system EdgeDriver first, then local
         try:
@@ -87,6 +102,9 @@ class BrowserManager:
             else:
                 raise Exception("EdgeDriver not found")
         
+        if self.headless:
+            return driver
+        
         if second_screen:
             driver.set_window_position(1920, 0)
         
@@ -7,31 +7,47 @@ os.system('chcp 65001 >nul 2>&1')  # Set Windows console to UTF-8
 import sqlite3
 import base64
 import time
-import tkinter as tk
-from tkinter import messagebox
+import threading
 from datetime import datetime
 from api_auth import APIAuthenticator
 from screenshot_browser import BrowserManager
 from screenshot_steps import StepExecutor
 from screenshot_utils import ScreenshotUtils
+from scenario_plan import get_execution_plan
+from screenshot_storage import FrameDeduplicator, DEFAULT_DEDUPE_DISTANCE
+from log_manager import get_logger
+
+logger = get_logger('screenshot_core')
 
 class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
     """Core screenshot executor functionality"""
     
-    def __init__(self, user_id, rice_profile_id, scenario_number):
+    # Max dHash bit distance for a capture to be stored as a reference to the previous frame (-1 disables)
+    frame_dedupe_distance = DEFAULT_DEDUPE_DISTANCE
+    
+    # Manual steps: 'prompt' shows a dialog; unattended runs use 'continue' or 'fail'
+    user_input_mode = 'prompt'
+    
+    # Callable(step_name, step_description) -> bool that asks on the Tk thread, for executors run on a worker thread
+    user_input_prompt = None
+    
+    def __init__(self, user_id, rice_profile_id, scenario_number, db_path=None, db_manager=None):
         self.user_id = user_id
         self.rice_profile_id = str(rice_profile_id)
         self.scenario_number = scenario_number
         self.driver = None
-        self.db_path = 'fsm_tester.db'
+        self.db_path = db_path or 'fsm_tester.db'
         self.progress_callback = None
+        self.frame_deduper = FrameDeduplicator(self.frame_dedupe_distance)
         
         # Initialize parent classes
         StepExecutor.__init__(self)
         
-        # Initialize API authenticator
-        from database_manager import DatabaseManager
-        self.db_manager = DatabaseManager(user_id)
+        # Initialize API authenticator - batches pass one shared manager instead of one per scenario
+        if db_manager is None:
+            from database_manager import DatabaseManager
+            db_manager = DatabaseManager(user_id, db_path=db_path)
+        self.db_manager = db_manager
         self.api_auth = APIAuthenticator(self.db_manager)
     
     def set_progress_callback(self, callback):
@@ -39,12 +55,8 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
         self.progress_callback = callback
     
     def safe_print(self, message):
-        """Safely print messages with Unicode handling"""
-        try:
-            safe_message = message.encode('ascii', 'replace').decode('ascii')
-            print(safe_message)
-        except Exception as e:
-            print(f"[UNICODE ERROR] {str(e)}")
+        """Log an executor message (console encoding is handled by the log handler)"""
+        logger.info("%s", message)
         
     def capture_screenshot(self):
         """Capture screenshot and return as base64"""
@@ -54,12 +66,18 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
             screenshot = self.driver.get_screenshot_as_png()
             return base64.b64encode(screenshot).decode('utf-8')
         except Exception as e:
-            self.safe_print(f"Screenshot capture failed: {e}")
+            logger.warning("Screenshot capture failed: %s", e)
             return None
     
     def save_screenshot_to_db(self, step_order, screenshot_before=None, screenshot_after=None, status="completed"):
         """Save screenshots to database using composite key"""
-        conn = sqlite3.connect(self.db_path)
+        # A before-frame matching the previous step's after-frame is stored as a reference to it
+        saved_at = str(datetime.now())
+        screenshot_before = self.frame_deduper.store(step_order, 'before', screenshot_before, saved_at)
+        screenshot_after = self.frame_deduper.store(step_order, 'after', screenshot_after, saved_at)
+        
+        # Parallel workers write to the same file - wait out their locks as the job queue does
+        conn = sqlite3.connect(self.db_path, timeout=30)
         cursor = conn.cursor()
         
         try:
@@ -68,52 +86,101 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
                 SET screenshot_before = ?, screenshot_after = ?, 
                     screenshot_timestamp = ?, execution_status = ?
                 WHERE user_id = ? AND rice_profile = ? AND scenario_number = ? AND step_order = ?
-            ''', (screenshot_before, screenshot_after, datetime.now(), status, 
+            ''', (screenshot_before, screenshot_after, saved_at, status, 
                   self.user_id, self.rice_profile_id, self.scenario_number, step_order))
             conn.commit()
-            self.safe_print(f"Screenshots saved for step {step_order}")
+            logger.debug("Screenshots saved for step %s", step_order)
         except Exception as e:
-            self.safe_print(f"Database save failed: {e}")
+            logger.warning("Database save failed: %s", e)
         finally:
             conn.close()
     
     def wait_for_user_input(self, step_name, step_description):
         """Show dialog and wait for user input"""
+        if self.user_input_mode != 'prompt':
+            proceed = self.user_input_mode == 'continue'
+            logger.warning("User input step '%s' in unattended run - %s", step_name,
+                           "continuing without it" if proceed else "failing the scenario")
+            return proceed
+        
+        if self.user_input_prompt:
+            return bool(self.user_input_prompt(step_name, step_description))
+        if threading.current_thread() is not threading.main_thread():
+            # Tk may only be used from the thread that owns the interpreter
+            logger.error("User input step '%s' on a worker thread without a prompt - failing the scenario", step_name)
+            return False
+        
+        # Imported here so unattended runs work on machines without Tk
+        import tkinter as tk
+        
         root = tk.Tk()
         root.withdraw()
+        try:
+            return self.ask_user_input(step_name, step_description, root)
+        finally:
+            root.destroy()
+    
+    @staticmethod
+    def ask_user_input(step_name, step_description, parent=None):
+        """OK/Cancel dialog for a manual step (Tk thread only)"""
+        from tkinter import messagebox
         
-        result = messagebox.askokcancel(
+        return messagebox.askokcancel(
             "User Input Required",
             f"Step: {step_name}\n\n"
             f"Description: {step_description}\n\n"
             f"Please complete this step manually, then click OK to continue.\n"
-            f"Click Cancel to stop execution."
+            f"Click Cancel to stop execution.",
+            parent=parent
         )
+    
+    def prepare_execution_plan(self, steps):
+        """Compile steps into a validated execution plan; returns None if the plan has errors"""
+        # Every execution starts a fresh frame-reference chain
+        self.frame_deduper.reset()
+        
+        plan = get_execution_plan(steps)
+        logger.info("Execution plan: %s", plan.summary())
         
-        root.destroy()
-        return result
+        for warning in plan.warnings:
+            logger.warning("[PLAN WARNING] %s", warning)
+        
+        if not plan.is_valid:
+            for error in plan.errors:
+                logger.error("[PLAN ERROR] %s", error)
+            if self.progress_callback:
+                self.progress_callback(0, len(plan), "Validation",
+                                       f"[FAILED] {len(plan.errors)} invalid step(s): {plan.errors[0]}")
+            return None
+        
+        return plan
     
-    def execute_scenario_with_shared_browser(self, shared_driver=None):
+    def execute_scenario_with_shared_browser(self, shared_driver=None, plan=None):
         """Execute scenario with shared browser session"""
         if shared_driver:
             self.driver = shared_driver
         
-        # Get scenario steps
-        steps = self.get_scenario_steps(self.user_id, self.rice_profile_id, self.scenario_number)
-        if not steps:
-            self.safe_print("No steps found for scenario")
-            return False
+        if plan is None:
+            # Get scenario steps
+            steps = self.get_scenario_steps(self.user_id, self.rice_profile_id, self.scenario_number)
+            if not steps:
+                logger.warning("No steps found for scenario")
+                return False
+            
+            plan = self.prepare_execution_plan(steps)
+            if not plan:
+                return False
         
-        total_steps = len(steps)
-        self.safe_print(f"Executing {total_steps} steps...")
+        total_steps = len(plan)
+        logger.info("Executing %s steps...", total_steps)
         
         # Update progress
         if self.progress_callback:
             self.progress_callback(0, total_steps, "Starting", "Launching browser and starting execution...")
         
         success = True
-        for i, step_data in enumerate(steps, 1):
-            if not self.execute_step(step_data, i, total_steps):
+        for i, step in enumerate(plan, 1):
+            if not self.execute_step(step, i, total_steps):
                 success = False
                 break
         
@@ -132,6 +199,17 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
     
     def execute_scenario(self):
         """Execute scenario with new browser instance"""
+        # Validate the steps before paying for a browser launch
+        steps = self.get_scenario_steps(self.user_id, self.rice_profile_id, self.scenario_number)
+        if not steps:
+            logger.warning("No steps found for scenario")
+            return False
+        
+        plan = self.prepare_execution_plan(steps)
+        if not plan:
+            self.update_scenario_status(self.user_id, self.rice_profile_id, self.scenario_number, "failed")
+            return False
+        
         # Get browser configuration
         config = self.get_browser_config(self.user_id, self.rice_profile_id)
         
@@ -143,11 +221,11 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
         )
         
         if not self.driver:
-            self.safe_print("Failed to create browser driver")
+            logger.error("Failed to create browser driver")
             return False
         
         try:
-            return self.execute_scenario_with_shared_browser(self.driver)
+            return self.execute_scenario_with_shared_browser(self.driver, plan)
         finally:
             if self.driver:
                 try:
@@ -156,10 +234,16 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
                     pass
                 self.driver = None
     
-    def execute_scenario_with_steps(self, custom_steps):
+    def execute_scenario_with_steps(self, custom_steps, browser_config=None):
         """Execute scenario with custom filtered steps (for batch execution)"""
-        # Get browser configuration
-        config = self.get_browser_config(self.user_id, self.rice_profile_id)
+        # Compile once up front - identical step lists reuse the cached plan across batch runs
+        plan = self.prepare_execution_plan(custom_steps)
+        if not plan:
+            self.update_scenario_status(self.user_id, self.rice_profile_id, self.scenario_number, "failed")
+            return False
+        
+        # Get browser configuration (batches load it once up front)
+        config = browser_config or self.get_browser_config(self.user_id, self.rice_profile_id)
         
         # Create browser driver
         self.driver = self.create_driver(
@@ -169,38 +253,20 @@ class ScreenshotExecutorCore(BrowserManager, StepExecutor, ScreenshotUtils):
         )
         
         if not self.driver:
-            self.safe_print("Failed to create browser driver")
+            logger.error("Failed to create browser driver")
             return False
         
         try:
-            total_steps = len(custom_steps)
-            self.safe_print(f"Executing {total_steps} custom steps...")
+            total_steps = len(plan)
+            logger.info("Executing %s custom steps...", total_steps)
             
             # Update progress
             if self.progress_callback:
                 self.progress_callback(0, total_steps, "Starting", "Launching browser and starting execution...")
             
             success = True
-            for i, step_data in enumerate(custom_steps, 1):
-                # Convert step data to expected format if needed
-                if len(step_data) >= 6:
-                    step_order, step_name, step_type, step_target, step_description, user_input_required = step_data
-                    
-                    # Create step data in expected format
-                    formatted_step = {
-                        'step_order': step_order,
-                        'step_name': step_name,
-                        'step_type': step_type,
-                        'step_target': step_target,
-                        'step_description': step_description,
-                        'user_input_required': user_input_required
-                    }
-                    
-                    if not self.execute_step(formatted_step, i, total_steps):
-                        success = False
-                        break
-                else:
-                    self.safe_print(f"Invalid step data format: {step_data}")
+            for i, step in enumerate(plan, 1):
+                if not self.execute_step(step, i, total_steps):
                     success = False
                     break
             
@@ -9,9 +9,9 @@ from screenshot_core import ScreenshotExecutorCore
 class ScreenshotExecutor(ScreenshotExecutorCore):
     """Main screenshot executor - modular architecture for memory optimization"""
     
-    def __init__(self, user_id, rice_profile_id, scenario_number):
+    def __init__(self, user_id, rice_profile_id, scenario_number, db_path=None, db_manager=None):
         """Initialize with all modular components"""
-        super().__init__(user_id, rice_profile_id, scenario_number)
+        super().__init__(user_id, rice_profile_id, scenario_number, db_path, db_manager)
         self.safe_print(f"ScreenshotExecutor initialized for user {user_id}, profile {rice_profile_id}, scenario {scenario_number}")
 
 if __name__ == "__main__":
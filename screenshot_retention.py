@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import importlib.util
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from screenshot_storage import downsample_screenshot
+import tes070_store
+from log_manager import get_logger
+
+logger = get_logger('screenshot_retention')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RETENTION_CONFIG_FILE = os.path.join(APP_DIR, 'retention_config.json')
+
+DEFAULT_POLICY = {
+    'enabled': True,
+    'interval_hours': 24,           # how often the scheduled pass runs
+    'full_resolution_days': 7,      # passed runs newer than this keep full-size screenshots
+                                    # (older ones too, until a stored TES-070 holds them)
+    'thumbnail_max_size': 480,      # longest edge of downsampled screenshots
+    'thumbnail_quality': 60,
+    'drop_after_days': 90,          # screenshots older than this are removed (step rows stay)
+    'keep_tes070_versions': 5,      # TES-070 docx versions kept per RICE profile
+    'batch_size': 200
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def load_policy():
+    """Defaults overlaid with retention_config.json"""
+    policy = dict(DEFAULT_POLICY)
+    if os.path.exists(RETENTION_CONFIG_FILE):
+        try:
+            with open(RETENTION_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                policy.update(json.load(f))
+        except Exception as e:
+            logger.warning("Failed to read %s: %s", RETENTION_CONFIG_FILE, e)
+    return policy
+
+class ScreenshotRetention:
+    """Tiered screenshot retention for scenario_steps and TES-070 versions.
+
+    Failed scenarios and recent runs keep full resolution. Older passed runs are
+    downsampled to thumbnails once a saved TES-070 version holds their full-size
+    copies, and anything past drop_after_days loses its image data. Step rows, statuses and timestamps are never deleted, so history counts
+    stay intact.
+    """
+    
+    def __init__(self, db_path, policy=None):
+        self.db_path = db_path
+        self.policy = policy or load_policy()
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def is_due(self):
+        """True when retention is enabled and the last pass is older than interval_hours"""
+        if not self.policy.get('enabled', True):
+            return False
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(ran_at) FROM maintenance_runs WHERE task = 'screenshot_retention'")
+            last_run = cursor.fetchone()[0]
+        finally:
+            conn.close()
+        if not last_run:
+            return True
+        # ran_at is CURRENT_TIMESTAMP, i.e. UTC
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.policy['interval_hours'])
+        return last_run < cutoff.strftime(TIMESTAMP_FORMAT)
+    
+    def apply(self):
+        """Run every retention tier once and return the reclaimed-space report"""
+        now = datetime.now()
+        full_cutoff = (now - timedelta(days=self.policy['full_resolution_days'])).strftime(TIMESTAMP_FORMAT)
+        drop_cutoff = (now - timedelta(days=self.policy['drop_after_days'])).strftime(TIMESTAMP_FORMAT)
+        
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            size_before = self._file_size(cursor)
+            
+            dropped, dropped_bytes = self._drop_expired(conn, drop_cutoff)
+            downsampled, downsampled_bytes = self._downsample_passed(conn, full_cutoff, drop_cutoff)
+            versions_removed, version_bytes = self._prune_tes070_versions(conn)
+            sections_removed, section_bytes = self._prune_section_cache(conn)
+            
+            # Hand freed pages back to the filesystem when the database allows it
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                cursor.execute("PRAGMA incremental_vacuum")
+                cursor.fetchall()
+            size_after = self._file_size(cursor)
+            
+            reclaimed = dropped_bytes + downsampled_bytes + version_bytes + section_bytes
+            report = {
+                'screenshots_dropped': dropped,
+                'screenshots_downsampled': downsampled,
+                'tes070_versions_removed': versions_removed,
+                'tes070_sections_removed': sections_removed,
+                'reclaimed_bytes': reclaimed,
+                'db_size_before': size_before,
+                'db_size_after': size_after,
+                'summary': f"{dropped} dropped, {downsampled} downsampled, {versions_removed} TES-070 versions removed, "
+                           f"{sections_removed} cached sections removed, {reclaimed / (1024 * 1024):.1f} MB reclaimed"
+            }
+            cursor.execute("INSERT INTO maintenance_runs (task, reclaimed_bytes, summary) VALUES (?, ?, ?)",
+                           ('screenshot_retention', reclaimed, report['summary']))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        logger.info("Screenshot retention: %s", report['summary'])
+        return report
+    
+    def _file_size(self, cursor):
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        return page_size * page_count
+    
+    def _drop_expired(self, conn, drop_cutoff):
+        """Remove image data older than the drop cutoff, keeping the step rows"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(screenshot_before) + COUNT(screenshot_after),
+                   COALESCE(SUM(LENGTH(screenshot_before)), 0) + COALESCE(SUM(LENGTH(screenshot_after)), 0)
+            FROM scenario_steps
+            WHERE screenshot_timestamp < ? AND (screenshot_before IS NOT NULL OR screenshot_after IS NOT NULL)
+        """, (drop_cutoff,))
+        count, size = cursor.fetchone()
+        if count:
+            cursor.execute("""
+                UPDATE scenario_steps SET screenshot_before = NULL, screenshot_after = NULL
+                WHERE screenshot_timestamp < ? AND (screenshot_before IS NOT NULL OR screenshot_after IS NOT NULL)
+            """, (drop_cutoff,))
+            conn.commit()
+        return count, size
+    
+    def _downsample_passed(self, conn, full_cutoff, drop_cutoff):
+        """Thumbnail screenshots of passed scenarios whose run is older than the full-resolution window.
+
+        scenario_steps only holds each scenario's latest run, so these frames are the
+        evidence a regenerated TES-070 would embed. Only runs captured before the
+        profile's newest saved TES-070 version are touched; that version keeps the
+        full-size images.
+        """
+        if importlib.util.find_spec('PIL') is None:
+            logger.info("Pillow not installed - skipping thumbnail tier")
+            return 0, 0
+        
+        max_size = self.policy['thumbnail_max_size']
+        quality = self.policy['thumbnail_quality']
+        cursor = conn.cursor()
+        downsampled = 0
+        saved = 0
+        last_rowid = 0
+        
+        while True:
+            cursor.execute("""
+                SELECT ss.rowid, ss.screenshot_before, ss.screenshot_after
+                FROM scenario_steps ss
+                JOIN scenarios s ON s.user_id = ss.user_id AND s.rice_profile = ss.rice_profile
+                                AND s.scenario_number = ss.scenario_number
+                WHERE ss.rowid > ? AND s.result = 'Passed'
+                  AND ss.screenshot_timestamp < ? AND ss.screenshot_timestamp >= ?
+                  AND (ss.screenshot_before IS NOT NULL OR ss.screenshot_after IS NOT NULL)
+                  AND EXISTS (
+                      -- screenshot_timestamp is local time, created_at is UTC
+                      SELECT 1 FROM tes070_versions tv
+                      WHERE tv.user_id = ss.user_id AND tv.rice_profile_id = CAST(ss.rice_profile AS INTEGER)
+                        AND tv.created_at >= datetime(ss.screenshot_timestamp, 'utc')
+                  )
+                ORDER BY ss.rowid LIMIT ?
+            """, (last_rowid, full_cutoff, drop_cutoff, self.policy['batch_size']))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            updates = []
+            for rowid, before, after in rows:
+                last_rowid = rowid
+                new_values = []
+                changed = False
+                for value in (before, after):
+                    new_value = value
+                    if value:
+                        try:
+                            new_value, was_changed = downsample_screenshot(value, max_size, quality)
+                        except Exception as e:
+                            logger.debug("Could not downsample screenshot in row %s: %s", rowid, e)
+                            was_changed = False
+                        if was_changed:
+                            downsampled += 1
+                            saved += len(value) - len(new_value)
+                            changed = True
+                    new_values.append(new_value)
+                if changed:
+                    updates.append((new_values[0], new_values[1], rowid))
+            
+            if updates:
+                cursor.executemany("UPDATE scenario_steps SET screenshot_before = ?, screenshot_after = ? WHERE rowid = ?",
+                                   updates)
+                conn.commit()
+        
+        return downsampled, saved
+    
+    def _prune_tes070_versions(self, conn):
+        """Keep only the newest keep_tes070_versions docx versions per RICE profile"""
+        keep = self.policy['keep_tes070_versions']
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, LENGTH(file_content) FROM (
+                SELECT id, file_content,
+                       ROW_NUMBER() OVER (PARTITION BY user_id, rice_profile_id
+                                          ORDER BY version_number DESC, id DESC) AS rank
+                FROM tes070_versions
+            ) WHERE rank > ?
+        """, (keep,))
+        expired = cursor.fetchall()
+        # Whole-docx versions free their blob; part-stored ones free the parts nothing else shares
+        freed = sum(row[1] or 0 for row in expired) + tes070_store.delete_versions(cursor, [row[0] for row in expired])
+        
+        # Older versions saved as whole docx files move to shared part storage a few at a time
+        converted, saved = tes070_store.split_legacy_versions(cursor, self.policy['batch_size'] // 10)
+        if converted:
+            logger.info("Moved %s TES-070 versions to part storage, %s bytes saved", converted, saved)
+        conn.commit()
+        return len(expired), freed + max(saved, 0)
+
+    def _prune_section_cache(self, conn):
+        """Drop cached TES-070 sections of deleted scenarios and the parts only they used"""
+        cursor = conn.cursor()
+        removed, freed = tes070_store.prune_section_cache(cursor)
+        conn.commit()
+        return removed, freed
+
+def start_scheduled_retention(db_path):
+    """Run the retention pass on a background thread if it is due (call at startup)"""
+    def run():
+        try:
+            retention = ScreenshotRetention(db_path)
+            if retention.is_due():
+                retention.apply()
+        except Exception as e:
+            logger.warning("Scheduled screenshot retention failed: %s", e)
+    
+    thread = threading.Thread(target=run, name='screenshot-retention', daemon=True)
+    thread.start()
+    return thread
@@ -13,6 +13,12 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from urllib.parse import urlparse
+from scenario_plan import PlannedStep, VARIABLE_PATTERN, compile_step, detect_step_type, split_selectors, \
+    parse_get_text_target, parse_get_attribute_target, parse_wait_seconds, parse_email_check_target, \
+    default_cache_key, DEFAULT_WAIT_SECONDS
+from log_manager import get_logger
+
+logger = get_logger('screenshot_steps')
 
 class StepExecutor:
     """Step execution functionality"""
@@ -23,17 +29,18 @@ class StepExecutor:
     
     def execute_step(self, step_data, current_step=1, total_steps=1):
         """Execute a single step with screenshots and progress updates"""
-        step_order, step_name, step_type, step_target, step_description, user_input_required = step_data
-        
-        print(f"[STEP DEBUG] Raw step data: {step_data}")
-        print(f"[STEP DEBUG] Step {current_step}: name='{step_name}', type='{step_type}', target='{step_target}', desc='{step_description}'")
+        # Raw rows are compiled on the fly; plans from scenario_plan arrive pre-parsed
+        step = step_data if isinstance(step_data, PlannedStep) else compile_step(step_data, current_step)[0]
+        step_order = step.step_order
+        step_name = step.step_name
+        step_type = step.step_type
+        step_description = step.step_description
+        user_input_required = step.user_input_required
         
-        # Force step type detection if None
-        if step_type is None:
-            step_type = self._detect_step_type(step_name, step_target, step_description)
-            print(f"[STEP DEBUG] Detected step type: '{step_type}'")
+        logger.debug("[STEP DEBUG] Step %s: name='%s', type='%s', target='%s', desc='%s'",
+                     current_step, step_name, step_type, step.step_target, step_description)
         
-        self.safe_print(f"Executing Step {current_step}/{total_steps}: {step_name}")
+        logger.info("Executing Step %s/%s: %s", current_step, total_steps, step_name)
         
         # Update progress if callback is available
         if self.progress_callback:
@@ -52,8 +59,8 @@ class StepExecutor:
                 return True
             
             # Execute step based on type
-            print(f"[STEP EXECUTION] About to execute step type: '{step_type}'")
-            success = self._execute_step_by_type(step_type, step_target, step_description, step_name, current_step, total_steps)
+            logger.debug("[STEP EXECUTION] About to execute step type: '%s'", step_type)
+            success = self._execute_step_by_type(step, current_step, total_steps)
             
             # Capture after screenshot with proper timing (skip for Wait steps)
             if step_type == "Wait":
@@ -89,7 +96,7 @@ class StepExecutor:
             return success
             
         except Exception as e:
-            self.safe_print(f"Step execution failed: {e}")
+            logger.error("Step execution failed: %s", e)
             screenshot_after = self.capture_screenshot()
             self.save_screenshot_to_db(step_order, screenshot_before, screenshot_after, "failed")
             
@@ -98,31 +105,35 @@ class StepExecutor:
             
             return False
     
-    def _execute_step_by_type(self, step_type, step_target, step_description, step_name, current_step, total_steps):
-        """Execute step based on its type"""
+    def _execute_step_by_type(self, step, current_step, total_steps):
+        """Execute step based on its type, using the parameters parsed at compile time"""
+        step_type = step.step_type
+        step_target = step.step_target
+        step_name = step.step_name
+        params = step.params
         try:
             if step_type in ["Navigate", "Web Navigation"]:
                 return self._execute_navigate(step_target, step_name, current_step, total_steps)
             elif step_type == "Element Click":
-                return self._execute_element_click(step_target, step_name, current_step, total_steps)
+                return self._execute_element_click(step_target, step_name, current_step, total_steps, params)
             elif step_type == "Text Input":
-                return self._execute_text_input(step_target, step_description, step_name, current_step, total_steps)
+                return self._execute_text_input(step_target, step.step_description, step_name, current_step, total_steps)
             elif step_type == "JavaScript Execute":
                 return self._execute_javascript(step_target, step_name, current_step, total_steps)
             elif step_type == "Wait":
                 # For Wait steps, the wait time is in step_description (from custom_value)
-                return self._execute_wait(step_description)
+                return self._execute_wait(step.step_description, params.get('seconds'))
             elif step_type == "Get Text":
-                return self._execute_get_text(step_target, step_name, current_step, total_steps)
+                return self._execute_get_text(step_target, step_name, current_step, total_steps, params)
             elif step_type == "Get Attribute":
-                return self._execute_get_attribute(step_target, step_name, current_step, total_steps)
+                return self._execute_get_attribute(step_target, step_name, current_step, total_steps, params)
             elif step_type == "Email Check":
-                return self._execute_email_check(step_target, step_name, current_step, total_steps)
+                return self._execute_email_check(step_target, step_name, current_step, total_steps, params)
             else:
-                self.safe_print(f"Unknown step type: {step_type}")
+                logger.warning("Unknown step type: %s", step_type)
                 return False
         except Exception as e:
-            self.safe_print(f"Step type execution failed: {e}")
+            logger.warning("Step type execution failed: %s", e)
             return False
     
     def _execute_navigate(self, url, step_name, current_step, total_steps):
@@ -133,20 +144,20 @@ class StepExecutor:
         try:
             # Check if driver exists
             if not self.driver:
-                self.safe_print("No browser driver available")
+                logger.warning("No browser driver available")
                 return False
             
             # Check if already on the same page
             try:
                 current_url = self.driver.current_url
                 if self._urls_match(current_url, url):
-                    self.safe_print(f"Already on target page: {url}")
+                    logger.info("Already on target page: %s", url)
                     return True
             except:
                 # If we can't get current URL, continue with navigation
                 pass
             
-            self.safe_print(f"Navigating to: {url}")
+            logger.info("Navigating to: %s", url)
             self.driver.get(url)
             
             # Wait for page load with timeout
@@ -154,43 +165,41 @@ class StepExecutor:
                 WebDriverWait(self.driver, 30).until(
                     lambda driver: driver.execute_script("return document.readyState") == "complete"
                 )
-                self.safe_print(f"Navigation successful to: {url}")
+                logger.info("Navigation successful to: %s", url)
                 return True
             except TimeoutException:
-                self.safe_print(f"Navigation timeout for: {url}, but continuing...")
+                logger.warning("Navigation timeout for: %s, but continuing...", url)
                 return True  # Continue execution even if timeout
                 
         except Exception as e:
-            self.safe_print(f"Navigation failed for {url}: {str(e)}")
-            import traceback
-            self.safe_print(f"Navigation traceback: {traceback.format_exc()}")
+            logger.warning("Navigation failed for %s: %s", url, e)
+            logger.debug("Navigation traceback", exc_info=True)
             return False
     
-    def _execute_element_click(self, selector, step_name, current_step, total_steps):
+    def _execute_element_click(self, selector, step_name, current_step, total_steps, params=None):
         """Execute element click step"""
         if self.progress_callback:
             self.progress_callback(current_step, total_steps, step_name, "Clicking element...")
         
         try:
-            # Check for right-click
-            is_right_click = "right-click" in step_name.lower() or "right click" in step_name.lower()
+            if params:
+                is_right_click = params['right_click']
+                selectors = params['selectors']
+            else:
+                # Check for right-click
+                is_right_click = "right-click" in step_name.lower() or "right click" in step_name.lower()
+                selectors = split_selectors(selector)
             
             if is_right_click:
-                return self._execute_right_click(selector, step_name, current_step, total_steps)
+                return self._execute_right_click(selectors, step_name, current_step, total_steps)
             else:
-                return self._execute_left_click(selector)
+                return self._execute_left_click(selectors)
         except Exception as e:
-            self.safe_print(f"Element click failed: {e}")
+            logger.warning("Element click failed: %s", e)
             return False
     
-    def _execute_left_click(self, selector):
-        """Execute left click on element"""
-        # Handle both comma and pipe separated selectors
-        if '|' in selector:
-            selectors = [s.strip() for s in selector.split('|')]
-        else:
-            selectors = [s.strip() for s in selector.split(',')]
-        
+    def _execute_left_click(self, selectors):
+        """Execute left click on the first clickable selector"""
         for sel in selectors:
             try:
                 # Determine selector type and use appropriate locator
@@ -212,14 +221,8 @@ class StepExecutor:
         
         return False
     
-    def _execute_right_click(self, selector, step_name, current_step, total_steps):
-        """Execute right-click on element"""
-        # Handle both comma and pipe separated selectors
-        if '|' in selector:
-            selectors = [s.strip() for s in selector.split('|')]
-        else:
-            selectors = [s.strip() for s in selector.split(',')]
-        
+    def _execute_right_click(self, selectors, step_name, current_step, total_steps):
+        """Execute right-click on the first clickable selector"""
         for sel in selectors:
             try:
                 # Determine selector type and use appropriate locator
@@ -269,13 +272,13 @@ class StepExecutor:
             element.click()
             time.sleep(0.5)
             element.clear()
-            print(f"[VARIABLE USAGE] Original text: '{text_value}' -> Processed text: '{processed_text}'")
-            print(f"[CACHE STATUS] Available variables: {list(self.step_cache.keys())}")
+            logger.debug("[VARIABLE USAGE] Original text: '%s' -> Processed text: '%s'", text_value, processed_text)
+            logger.debug("[CACHE STATUS] Available variables: %s", self.step_cache.keys())
             element.send_keys(processed_text)
             return True
                 
         except Exception as e:
-            self.safe_print(f"Text input failed: {e}")
+            logger.warning("Text input failed: %s", e)
             return False
     
     def _execute_javascript(self, script, step_name, current_step, total_steps):
@@ -297,7 +300,7 @@ class StepExecutor:
             
             return True
         except Exception as e:
-            self.safe_print(f"JavaScript execution failed: {e}")
+            logger.warning("JavaScript execution failed: %s", e)
             return False
     
     def _execute_enter_key(self):
@@ -342,50 +345,36 @@ class StepExecutor:
                 except:
                     return False
     
-    def _execute_wait(self, duration):
+    def _execute_wait(self, duration, wait_time=None):
         """Execute wait step - duration should be the actual wait time from custom_value"""
-        try:
-            # For Wait steps, duration parameter contains the actual wait time (from custom_value)
-            if isinstance(duration, str) and duration.startswith('Time (seconds):'):
-                # Handle old format "Time (seconds): 3"
-                wait_time = float(duration.split(':')[1].strip())
-            else:
-                # Handle new format - direct value "3"
-                wait_time = float(duration)
-            
-            print(f"[WAIT DEBUG] Waiting for {wait_time} seconds...")
-            time.sleep(wait_time)
-            return True
-        except Exception as e:
-            print(f"[WAIT ERROR] Failed to parse wait time '{duration}': {e}")
-            time.sleep(2)  # Default wait
-            return True
+        if wait_time is None:
+            # Handles both "3" and the old "Time (seconds): 3" format
+            wait_time = parse_wait_seconds(duration)
+        
+        if wait_time is None:
+            logger.warning("[WAIT ERROR] Failed to parse wait time '%s'", duration)
+            wait_time = DEFAULT_WAIT_SECONDS  # Default wait
+        
+        logger.debug("[WAIT DEBUG] Waiting for %s seconds...", wait_time)
+        time.sleep(wait_time)
+        return True
     
-    def _execute_get_text(self, selector, step_name, current_step, total_steps):
+    def _execute_get_text(self, selector, step_name, current_step, total_steps, params=None):
         """Execute get text step and cache the value"""
         if self.progress_callback:
             self.progress_callback(current_step, total_steps, step_name, "Getting text...")
         
         try:
-            # Parse selector and cache name
-            cache_name = None
-            actual_selector = selector
-            
-            if ' | CACHE:' in selector:
-                parts = selector.split(' | CACHE:')
-                actual_selector = parts[0].strip()
-                cache_name = parts[1].strip() if len(parts) > 1 else None
-                self.safe_print(f"[CACHE CONFIG] Custom cache name specified: '{cache_name}'")
+            # Parse selector and cache name (already done when the step comes from a plan)
+            if params:
+                selectors, cache_name = params['selectors'], params['cache_name']
             else:
-                self.safe_print(f"[CACHE CONFIG] No custom cache name, will use default pattern")
+                selectors, cache_name = parse_get_text_target(selector)
             
-            # Handle both comma and pipe separated selectors
-            if '|' in actual_selector and ' | CACHE:' not in selector:
-                selectors = [s.strip() for s in actual_selector.split('|')]
-            elif ',' in actual_selector:
-                selectors = [s.strip() for s in actual_selector.split(',')]
+            if cache_name:
+                logger.debug("[CACHE CONFIG] Custom cache name specified: '%s'", cache_name)
             else:
-                selectors = [actual_selector.strip()]
+                logger.debug("[CACHE CONFIG] No custom cache name, will use default pattern")
             
             for sel in selectors:
                 try:
@@ -403,24 +392,24 @@ class StepExecutor:
                     
                     # Get the text content
                     text_value = element.text.strip()
-                    self.safe_print(f"[GET TEXT] Extracted: '{text_value or '[EMPTY]'}' from: {sel}")
+                    logger.info("[GET TEXT] Extracted: '%s' from: %s", text_value or '[EMPTY]', sel)
                     
                     # Log the extracted value (especially for work unit)
                     if "work unit" in step_name.lower() or "workunit" in step_name.lower():
-                        self.safe_print(f"EXTRACTED WORK UNIT: '{text_value or '[BLANK]'}'")
+                        logger.info("EXTRACTED WORK UNIT: '%s'", text_value or '[BLANK]')
                     
                     # Cache the value with custom name or default
                     if cache_name:
                         cache_key = cache_name
-                        self.safe_print(f"[CACHE KEY] Using custom cache key: '{cache_key}'")
+                        logger.debug("[CACHE KEY] Using custom cache key: '%s'", cache_key)
                     else:
-                        cache_key = f"step_{current_step}_{step_name.replace(' ', '_')}"
-                        self.safe_print(f"[CACHE KEY] Generated default cache key: '{cache_key}'")
+                        cache_key = default_cache_key(current_step, step_name)
+                        logger.debug("[CACHE KEY] Generated default cache key: '%s'", cache_key)
                     
                     self.step_cache[cache_key] = text_value
                     
-                    print(f"[VARIABLE CAPTURE] Text retrieved: '{text_value}' -> cached as '{cache_key}'")
-                    print(f"[CACHE STATUS] Current cache contents: {self.step_cache}")
+                    logger.debug("[VARIABLE CAPTURE] Text retrieved: '%s' -> cached as '%s'", text_value, cache_key)
+                    logger.debug("[CACHE STATUS] Current cache contents: %s", self.step_cache)
                     
                     # Update progress with captured value
                     if self.progress_callback:
@@ -428,42 +417,35 @@ class StepExecutor:
                     
                     # Special logging for workunit capture
                     if 'workunit' in step_name.lower():
-                        print(f"[WORKUNIT CAPTURE] *** WORKUNIT CAPTURED: '{text_value}' as key '{cache_key}' ***")
-                        print(f"[WORKUNIT CACHE] Available for variable replacement: ${{{cache_key}}}")
+                        logger.debug("[WORKUNIT CAPTURE] *** WORKUNIT CAPTURED: '%s' as key '%s' ***", text_value, cache_key)
+                        logger.debug("[WORKUNIT CACHE] Available for variable replacement: ${%s}", cache_key)
                     return True
                     
                 except Exception as e:
-                    self.safe_print(f"Selector '{sel}' failed: {e}")
+                    logger.debug("Selector '%s' failed: %s", sel, e)
                     continue
             
-            self.safe_print("All selectors failed for Get Text step")
+            logger.warning("All selectors failed for Get Text step")
             return False
             
         except Exception as e:
-            self.safe_print(f"Get Text execution failed: {e}")
+            logger.warning("Get Text execution failed: %s", e)
             return False
     
-    def _execute_get_attribute(self, selector, step_name, current_step, total_steps):
+    def _execute_get_attribute(self, selector, step_name, current_step, total_steps, params=None):
         """Execute get attribute step and cache the value"""
         if self.progress_callback:
             self.progress_callback(current_step, total_steps, step_name, "Getting attribute...")
         
         try:
             # Parse selector, attribute, and cache name
-            parts = selector.split(' | ')
-            actual_selector = parts[0].strip()
-            attribute_name = parts[1].strip() if len(parts) > 1 else 'href'
-            
-            cache_name = None
-            if len(parts) > 2 and parts[2].startswith('CACHE:'):
-                cache_name = parts[2].replace('CACHE:', '').strip()
-                print(f"[CACHE CONFIG] Custom cache name specified: '{cache_name}'")
-            
-            # Handle multiple selectors
-            if ',' in actual_selector:
-                selectors = [s.strip() for s in actual_selector.split(',')]
+            if params:
+                selectors, attribute_name, cache_name = params['selectors'], params['attribute'], params['cache_name']
             else:
-                selectors = [actual_selector.strip()]
+                selectors, attribute_name, cache_name = parse_get_attribute_target(selector)
+            
+            if cache_name:
+                logger.debug("[CACHE CONFIG] Custom cache name specified: '%s'", cache_name)
             
             for sel in selectors:
                 try:
@@ -485,54 +467,51 @@ class StepExecutor:
                     # Cache the value if cache name provided
                     if cache_name:
                         cache_key = cache_name
-                        print(f"[CACHE KEY] Using custom cache key: '{cache_key}'")
+                        logger.debug("[CACHE KEY] Using custom cache key: '%s'", cache_key)
                     else:
-                        cache_key = f"step_{current_step}_{step_name.replace(' ', '_')}"
-                        print(f"[CACHE KEY] Generated default cache key: '{cache_key}'")
+                        cache_key = default_cache_key(current_step, step_name)
+                        logger.debug("[CACHE KEY] Generated default cache key: '%s'", cache_key)
                     
                     self.step_cache[cache_key] = attr_value or ''
                     
-                    print(f"[ATTRIBUTE CAPTURE] Attribute '{attribute_name}' retrieved: '{attr_value}' -> cached as '{cache_key}'")
-                    print(f"[CACHE STATUS] Current cache contents: {self.step_cache}")
+                    logger.debug("[ATTRIBUTE CAPTURE] Attribute '%s' retrieved: '%s' -> cached as '%s'", attribute_name, attr_value, cache_key)
+                    logger.debug("[CACHE STATUS] Current cache contents: %s", self.step_cache)
                     return True
                     
                 except Exception as e:
-                    self.safe_print(f"Selector '{sel}' failed: {e}")
+                    logger.debug("Selector '%s' failed: %s", sel, e)
                     continue
             
-            self.safe_print("All selectors failed for Get Attribute step")
+            logger.warning("All selectors failed for Get Attribute step")
             return False
             
         except Exception as e:
-            self.safe_print(f"Get Attribute execution failed: {e}")
+            logger.warning("Get Attribute execution failed: %s", e)
             return False
     
     def _replace_cached_values(self, text):
         """Replace cached value references in text with actual values"""
         if not text or not self.step_cache:
-            print(f"[VARIABLE DEBUG] No text or empty cache - text: '{text}', cache: {self.step_cache}")
+            logger.debug("[VARIABLE DEBUG] No text or empty cache - text: '%s', cache: %s", text, self.step_cache)
             return text
         
         # Replace patterns like ${step_3_Get_Column_Value} with cached values
-        import re
-        pattern = r'\$\{([^}]+)\}'
-        
         def replace_match(match):
             cache_key = match.group(1)
             cached_value = self.step_cache.get(cache_key, match.group(0))
-            print(f"[VARIABLE REPLACE] Looking for '{cache_key}' -> Found: '{cached_value}'")
+            logger.debug("[VARIABLE REPLACE] Looking for '%s' -> Found: '%s'", cache_key, cached_value)
             
             # Special logging for workunit replacement
             if 'workunit' in cache_key.lower():
-                print(f"[WORKUNIT REPLACE] *** REPLACING WORKUNIT VARIABLE ***")
-                print(f"[WORKUNIT REPLACE] Variable: ${{{cache_key}}} -> Value: '{cached_value}'")
+                logger.debug("[WORKUNIT REPLACE] *** REPLACING WORKUNIT VARIABLE ***")
+                logger.debug("[WORKUNIT REPLACE] Variable: ${%s} -> Value: '%s'", cache_key, cached_value)
                 if cached_value == match.group(0):  # No replacement happened
-                    print(f"[WORKUNIT ERROR] Variable not found in cache! Available keys: {list(self.step_cache.keys())}")
+                    logger.warning("[WORKUNIT ERROR] Variable not found in cache! Available keys: %s", self.step_cache.keys())
             
             return cached_value
         
-        result = re.sub(pattern, replace_match, text)
-        print(f"[VARIABLE FINAL] '{text}' -> '{result}'")
+        result = VARIABLE_PATTERN.sub(replace_match, text)
+        logger.debug("[VARIABLE FINAL] '%s' -> '%s'", text, result)
         return result
     
     def _wait_for_loading(self):
@@ -565,69 +544,22 @@ class StepExecutor:
     
     def _detect_step_type(self, step_name, step_target, step_description):
         """Detect step type based on step name and content"""
-        if not step_name:
-            return "Unknown"
-        
-        step_name_lower = step_name.lower()
-        
-        # Navigation steps
-        if any(keyword in step_name_lower for keyword in ["navigate", "page", "go to"]):
-            return "Navigate"
-        
-        # Click steps
-        if any(keyword in step_name_lower for keyword in ["click", "button", "select"]):
-            return "Element Click"
-        
-        # Text input steps
-        if any(keyword in step_name_lower for keyword in ["enter", "input", "type", "search"]) and "${" in str(step_description):
-            return "Text Input"
-        
-        # Get text steps
-        if any(keyword in step_name_lower for keyword in ["get", "capture", "extract", "workunit", "work unit"]):
-            return "Get Text"
-        
-        # Wait steps
-        if any(keyword in step_name_lower for keyword in ["wait", "pause"]):
-            return "Wait"
-        
-        # JavaScript steps
-        if any(keyword in step_name_lower for keyword in ["press enter", "javascript", "script"]):
-            return "JavaScript Execute"
-        
-        # Default based on content
-        if step_target and ("http" in str(step_target) or "://" in str(step_target)):
-            return "Navigate"
-        
-        return "Element Click"  # Default fallback
+        return detect_step_type(step_name, step_target, step_description)
     
-    def _execute_email_check(self, step_target, step_name, current_step, total_steps):
+    def _execute_email_check(self, step_target, step_name, current_step, total_steps, params=None):
         """Execute email check step using Gmail API"""
         if self.progress_callback:
             self.progress_callback(current_step, total_steps, step_name, "Checking email...")
         
         try:
             # Parse step target: "SEARCH:criteria | CONTENT:expected | TIMEOUT:60"
-            search_criteria = ""
-            expected_content = []
-            timeout = 60
-            
-            if step_target:
-                parts = step_target.split(" | ")
-                for part in parts:
-                    if part.startswith("SEARCH:"):
-                        search_criteria = part.replace("SEARCH:", "").strip()
-                    elif part.startswith("CONTENT:"):
-                        content_str = part.replace("CONTENT:", "").strip()
-                        if content_str:
-                            expected_content = [c.strip() for c in content_str.split(",")]
-                    elif part.startswith("TIMEOUT:"):
-                        try:
-                            timeout = int(part.replace("TIMEOUT:", "").strip())
-                        except:
-                            timeout = 60
+            params = params or parse_email_check_target(step_target)
+            search_criteria = params['search']
+            expected_content = params['content']
+            timeout = params['timeout']
             
             if not search_criteria:
-                self.safe_print("No search criteria provided for email check")
+                logger.warning("No search criteria provided for email check")
                 return False
             
             # Initialize Gmail checker
@@ -643,25 +575,25 @@ class StepExecutor:
                 # Verify email with content
                 success = gmail_checker.verify_email_content(search_criteria, expected_content, timeout)
                 if success:
-                    self.safe_print(f"Email found with expected content: {expected_content}")
+                    logger.info("Email found with expected content: %s", expected_content)
                 else:
-                    self.safe_print(f"Email not found or missing expected content: {expected_content}")
+                    logger.warning("Email not found or missing expected content: %s", expected_content)
             else:
                 # Just check for email existence
                 email_data = gmail_checker.check_email_notification(search_criteria, timeout)
                 success = email_data is not None
                 if success:
-                    self.safe_print(f"Email found: {email_data.get('subject', 'No subject')}")
+                    logger.info("Email found: %s", email_data.get('subject', 'No subject'))
                     
                     # Create email screenshot for documentation
                     try:
                         screenshot_path = f"email_screenshot_step_{current_step}.png"
                         gmail_checker.capture_email_content(email_data, screenshot_path)
-                        self.safe_print(f"Email screenshot saved: {screenshot_path}")
+                        logger.info("Email screenshot saved: %s", screenshot_path)
                     except Exception as e:
-                        self.safe_print(f"Email screenshot failed: {e}")
+                        logger.warning("Email screenshot failed: %s", e)
                 else:
-                    self.safe_print(f"No email found matching criteria: {search_criteria}")
+                    logger.info("No email found matching criteria: %s", search_criteria)
             
             # Update progress with result
             if self.progress_callback:
@@ -673,7 +605,7 @@ class StepExecutor:
             return success
             
         except Exception as e:
-            self.safe_print(f"Email check failed: {e}")
+            logger.warning("Email check failed: %s", e)
             if self.progress_callback:
                 self.progress_callback(current_step, total_steps, step_name, f"❌ Error: {str(e)}")
             return False
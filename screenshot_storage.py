@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import binascii
+from io import BytesIO
+
+# Screenshots were historically stored as base64 PNG text; the optimizer rewrites
+# them as binary JPEG. Readers go through screenshot_bytes() to accept both.
+IMAGE_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'\xff\xd8\xff',        # JPEG
+    b'GIF8',                # GIF
+    b'BM',                  # BMP
+)
+
+DEFAULT_JPEG_QUALITY = 80
+
+# A before-frame that matches the previous step's after-frame (nothing ran between
+# the two captures) is stored as a reference to it:
+# b'SSREF:<step_order>:<before|after>:<screenshot_timestamp of that row>'. A reference
+# always points at a stored image, never at another reference, and only resolves
+# while the row still holds the frame saved at that timestamp - a partial rerun
+# that overwrites it leaves the reference unresolved rather than showing the new frame.
+# References written before the timestamp was added have only step order and slot.
+REFERENCE_PREFIX = b'SSREF:'
+DEFAULT_HASH_SIZE = 16        # dHash grid -> 256-bit hash
+DEFAULT_DEDUPE_DISTANCE = 3   # max differing hash bits for two frames to count as the same
+
+def is_binary_image(value):
+    """True when value already holds raw image bytes (not base64 text)"""
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    return isinstance(value, (bytes, bytearray)) and value[:8].startswith(IMAGE_SIGNATURES)
+
+def screenshot_bytes(value):
+    """Raw image bytes for a stored screenshot (binary or legacy base64), or None"""
+    if not value:
+        return None
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    if is_reference(value):
+        return None  # Resolve with resolve_references() first
+    if is_binary_image(value):
+        return bytes(value)
+    try:
+        return base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+def recompress_screenshot(value, quality=DEFAULT_JPEG_QUALITY):
+    """Re-encode a stored screenshot as binary JPEG; returns (new_bytes, changed)"""
+    from PIL import Image
+    
+    data = screenshot_bytes(value)
+    if not data:
+        return value, False
+    
+    image = Image.open(BytesIO(data))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    compressed = output.getvalue()
+    
+    # Keep the original when re-encoding does not actually save space
+    original_size = len(value) if value else 0
+    if len(compressed) >= original_size:
+        return value, False
+    return compressed, True
+
+def downsample_screenshot(value, max_size, quality=DEFAULT_JPEG_QUALITY):
+    """Shrink a stored screenshot so its longest edge is max_size; returns (new_bytes, changed)"""
+    from PIL import Image
+    
+    data = screenshot_bytes(value)
+    if not data:
+        return value, False
+    
+    image = Image.open(BytesIO(data))
+    if max(image.size) <= max_size:
+        return value, False
+    
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue(), True
+
+def make_reference(step_order, slot, saved_at=None):
+    reference = f"{step_order}:{slot}" + (f":{saved_at}" if saved_at else "")
+    return REFERENCE_PREFIX + reference.encode('ascii')
+
+def is_reference(value):
+    return isinstance(value, (bytes, bytearray)) and value.startswith(REFERENCE_PREFIX)
+
+def parse_reference(value):
+    """(step_order, slot) for a frame reference, or None for a stored image"""
+    if not is_reference(value):
+        return None
+    step_order, slot = bytes(value[len(REFERENCE_PREFIX):]).decode('ascii').split(':', 2)[:2]
+    return int(step_order), slot
+
+def reference_timestamp(value):
+    """screenshot_timestamp the referenced row must still have, or None for older references"""
+    parts = bytes(value[len(REFERENCE_PREFIX):]).decode('ascii').split(':', 2)
+    return parts[2] if len(parts) > 2 else None
+
+def resolve_references(rows, order_index, before_index, after_index, timestamp_index=None):
+    """Replace frame references in one scenario's step rows with the frames they point to.
+
+    With timestamp_index, a reference whose row has since been saved again resolves to None.
+    """
+    frames = {}
+    stamps = {}
+    for row in rows:
+        frames[(row[order_index], 'before')] = row[before_index]
+        frames[(row[order_index], 'after')] = row[after_index]
+        if timestamp_index is not None:
+            stamps[row[order_index]] = row[timestamp_index]
+    
+    resolved = []
+    for row in rows:
+        row = list(row)
+        for index in (before_index, after_index):
+            reference = parse_reference(row[index])
+            if reference:
+                saved_at = reference_timestamp(row[index])
+                if saved_at and timestamp_index is not None and str(stamps.get(reference[0])) != saved_at:
+                    row[index] = None  # Overwritten by a later run
+                else:
+                    row[index] = frames.get(reference)
+        resolved.append(tuple(row))
+    return resolved
+
+def frame_hash(value, hash_size=DEFAULT_HASH_SIZE):
+    """Difference hash (dHash) of a screenshot, computed on a downscaled greyscale copy"""
+    from PIL import Image
+    
+    data = screenshot_bytes(value)
+    if not data:
+        return None
+    image = Image.open(BytesIO(data))
+    image.draft('L', (hash_size * 8, hash_size * 8))  # JPEG decodes at reduced scale
+    pixels = list(image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX).getdata())
+    
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+class FrameDeduplicator:
+    """Turns a before-frame that matches the previous step's after-frame into a reference.
+
+    After-frames are always stored: they are the evidence of what a step did, and
+    a typed value or ticked box can change too few pixels to move the hash.
+    """
+    
+    def __init__(self, max_distance=DEFAULT_DEDUPE_DISTANCE, hash_size=DEFAULT_HASH_SIZE):
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.reset()
+    
+    def reset(self):
+        """Start a new run - references never cross scenario executions"""
+        self.last_hash = None
+        self.last_origin = None
+        self.stored = 0
+        self.referenced = 0
+    
+    def store(self, step_order, slot, value, saved_at=None):
+        """Value to persist for this frame: the frame itself or a reference to the previous after-frame.
+
+        saved_at is the screenshot_timestamp written with this step's row.
+        """
+        previous_hash, previous_origin = self.last_hash, self.last_origin
+        self.last_hash = None  # Only the very next before-frame may point at an after-frame
+        if not value or self.max_distance is None or self.max_distance < 0:
+            return value
+        try:
+            current_hash = frame_hash(value, self.hash_size)
+        except Exception:
+            current_hash = None
+        
+        if slot != 'before':
+            self.last_hash = current_hash
+            self.last_origin = (step_order, slot, saved_at)
+            self.stored += 1
+            return value
+        
+        if (current_hash is not None and previous_hash is not None
+                and bin(current_hash ^ previous_hash).count('1') <= self.max_distance):
+            self.referenced += 1
+            return make_reference(*previous_origin)
+        self.stored += 1
+        return value
@@ -4,17 +4,10 @@
 import tkinter as tk
 from tkinter import ttk
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.keys import Keys
 import time
-import json
 import base64
-import io
-from PIL import Image
-import threading
+from recording_transport import RecorderTransport, enable_event_log
+from recording_pipeline import normalize_recording
 
 class SmartRecording:
     def __init__(self, db_manager, show_popup_callback):
@@ -28,6 +21,8 @@ class SmartRecording:
         self.wait_conditions = []  # Smart wait detection
         self.last_screenshot = None
         self.step_counter = 0
+        self.transport = None
+        self.last_navigate_url = None
         
     def show_smart_recording_dialog(self):
         """Enhanced Smart Recording interface with Phase 2 improvements"""
@@ -569,6 +564,9 @@ class SmartRecording:
                 if browser_config.get('window_x') and browser_config.get('window_y'):
                     browser_options.add_argument(f"--window-position={browser_config['window_x']},{browser_config['window_y']}")
             
+            # Recorded events travel through the driver's console log buffer
+            enable_event_log(browser_options, browser_type)
+            
             # Initialize browser driver based on config
             if browser_type == 'edge':
                 self.driver = webdriver.Edge(options=browser_options)
@@ -589,6 +587,10 @@ class SmartRecording:
                 print(f"Window positioning error: {e}")
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
+            # The recorder is registered once for every page the browser loads from here on
+            self.transport = RecorderTransport(self.driver)
+            self.transport.start()
+            
             # Navigate to URL
             self.driver.get(url)
             
@@ -596,6 +598,7 @@ class SmartRecording:
             self.recording = True
             self.recorded_steps = []
             self.step_counter = 0
+            self.last_navigate_url = None
             self.recording_start_time = time.time()
             self.steps_listbox.delete(0, tk.END)
             
@@ -613,6 +616,7 @@ class SmartRecording:
             
             # Add initial navigation step
             self.add_step("Navigate", url, "")
+            self.last_navigate_url = url
             
             # Start monitoring (simplified approach)
             self.monitor_interactions()
@@ -621,277 +625,46 @@ class SmartRecording:
             self.show_popup("Error", f"Failed to start recording: {str(e)}", "error")
     
     def monitor_interactions(self):
-        """Advanced interaction monitoring with AI-powered element detection"""
-        if not self.recording or not self.driver:
+        """Drain the events the browser pushed since the last call and record them"""
+        if not self.recording or not self.driver or not self.transport:
             return
         
         try:
-            # Get current URL
-            current_url = self.driver.current_url
-            
-            # Check for page changes and record pending inputs
-            if hasattr(self, 'last_url') and self.last_url != current_url:
-                # Record any pending inputs before page change
-                try:
-                    self.driver.execute_script("""
-                        // Record all pending inputs before navigation
-                        for (var selectorKey in window.currentInputs || {}) {
-                            var inputData = window.currentInputs[selectorKey];
-                            if (inputData && inputData.value) {
-                                window.recordedEvents.push({
-                                    type: 'Text Input',
-                                    selector: inputData.selector.primary,
-                                    alternatives: inputData.selector.alternatives,
-                                    text: inputData.value,
-                                    elementType: inputData.selector.type,
-                                    tagName: inputData.selector.tagName,
-                                    timestamp: Date.now(),
-                                    waitCondition: 'element_visible'
-                                });
-                            }
-                        }
-                        window.currentInputs = {};
-                    """)
-                except:
-                    pass
-                
-                self.add_advanced_step("Navigate", current_url, "", wait_condition="page_load")
-            self.last_url = current_url
-            
-            # Advanced JavaScript injection for comprehensive event capture
-            self.driver.execute_script("""
-                if (!window.advancedRecordingSetup) {
-                    window.advancedRecordingSetup = true;
-                    window.recordedEvents = [];
-                    window.lastHighlighted = null;
-                    
-                    // Advanced selector generation
-                    function generateSmartSelector(element) {
-                        var selectors = [];
-                        
-                        // Priority 1: ID (most reliable)
-                        if (element.id) {
-                            selectors.push('#' + element.id);
-                        }
-                        
-                        // Priority 2: Data attributes
-                        for (var attr of element.attributes) {
-                            if (attr.name.startsWith('data-')) {
-                                selectors.push('[' + attr.name + '="' + attr.value + '"]');
-                            }
-                        }
-                        
-                        // Priority 3: Name attribute
-                        if (element.name) {
-                            selectors.push('[name="' + element.name + '"]');
-                        }
-                        
-                        // Priority 4: Class combinations
-                        if (element.className) {
-                            var classes = element.className.split(' ').filter(c => c.length > 0);
-                            if (classes.length > 0) {
-                                selectors.push('.' + classes.join('.'));
-                            }
-                        }
-                        
-                        return {
-                            primary: selectors[0] || element.tagName,
-                            alternatives: selectors,
-                            tagName: element.tagName,
-                            text: element.innerText || element.value || element.placeholder || '',
-                            type: element.type || 'element'
-                        };
-                    }
-                    
-                    // Element highlighting
-                    function highlightElement(element) {
-                        if (window.lastHighlighted) {
-                            window.lastHighlighted.style.outline = '';
-                        }
-                        element.style.outline = '3px solid #ff6b35';
-                        element.style.outlineOffset = '2px';
-                        window.lastHighlighted = element;
-                        
-                        setTimeout(() => {
-                            if (element.style) element.style.outline = '';
-                        }, 2000);
-                    }
-                    
-                    // Smart click capture with focus-driven input recording
-                    document.addEventListener('click', function(e) {
-                        if (e.target) {
-                            // Record any pending input from previously focused element
-                            if (document.activeElement && document.activeElement !== e.target) {
-                                var prevElement = document.activeElement;
-                                if ((prevElement.tagName === 'INPUT' || prevElement.tagName === 'TEXTAREA') && prevElement.value) {
-                                    var prevSelector = generateSmartSelector(prevElement);
-                                    
-                                    // Remove previous input events for this element
-                                    window.recordedEvents = window.recordedEvents.filter(event => 
-                                        !(event.type === 'Text Input' && event.selector === prevSelector.primary)
-                                    );
-                                    
-                                    window.recordedEvents.push({
-                                        type: 'Text Input',
-                                        selector: prevSelector.primary,
-                                        alternatives: prevSelector.alternatives,
-                                        text: prevElement.value,
-                                        elementType: prevSelector.type,
-                                        tagName: prevSelector.tagName,
-                                        timestamp: Date.now(),
-                                        waitCondition: 'element_visible'
-                                    });
-                                }
-                            }
-                            
-                            // Skip clicks on input fields (just for focus)
-                            if (e.target.tagName === 'INPUT' && e.target.type !== 'submit' && e.target.type !== 'button') {
-                                return;
-                            }
-                            
-                            highlightElement(e.target);
-                            var selector = generateSmartSelector(e.target);
-                            
-                            window.recordedEvents.push({
-                                type: 'Click',
-                                selector: selector.primary,
-                                alternatives: selector.alternatives,
-                                text: selector.text,
-                                elementType: selector.type,
-                                tagName: selector.tagName,
-                                coordinates: { x: e.clientX, y: e.clientY },
-                                timestamp: Date.now(),
-                                waitCondition: 'element_clickable'
-                            });
-                        }
-                    });
-                    
-                    // Event-driven text input capture
-                    var currentInputs = {};
-                    
-                    // Track input changes
-                    document.addEventListener('input', function(e) {
-                        if (e.target && (e.target.tagName === 'INPUT' || e.target.tagName === 'TEXTAREA')) {
-                            var selector = generateSmartSelector(e.target);
-                            currentInputs[selector.primary] = {
-                                element: e.target,
-                                value: e.target.value,
-                                selector: selector
-                            };
-                        }
-                    });
-                    
-                    // Record input when focus leaves element
-                    document.addEventListener('blur', function(e) {
-                        if (e.target && (e.target.tagName === 'INPUT' || e.target.tagName === 'TEXTAREA')) {
-                            var selector = generateSmartSelector(e.target);
-                            var inputData = currentInputs[selector.primary];
-                            
-                            if (inputData && inputData.value) {
-                                // Remove previous input events for this element
-                                window.recordedEvents = window.recordedEvents.filter(event => 
-                                    !(event.type === 'Text Input' && event.selector === selector.primary)
-                                );
-                                
-                                window.recordedEvents.push({
-                                    type: 'Text Input',
-                                    selector: selector.primary,
-                                    alternatives: selector.alternatives,
-                                    text: inputData.value,
-                                    elementType: selector.type,
-                                    tagName: selector.tagName,
-                                    timestamp: Date.now(),
-                                    waitCondition: 'element_visible'
-                                });
-                            }
-                        }
-                    }, true);
-                    
-                    // Record all pending inputs before page unload
-                    window.addEventListener('beforeunload', function() {
-                        for (var selectorKey in currentInputs) {
-                            var inputData = currentInputs[selectorKey];
-                            if (inputData && inputData.value) {
-                                window.recordedEvents.push({
-                                    type: 'Text Input',
-                                    selector: inputData.selector.primary,
-                                    alternatives: inputData.selector.alternatives,
-                                    text: inputData.value,
-                                    elementType: inputData.selector.type,
-                                    tagName: inputData.selector.tagName,
-                                    timestamp: Date.now(),
-                                    waitCondition: 'element_visible'
-                                });
-                            }
-                        }
-                    });
-                    
-                    // Dropdown/Select detection
-                    document.addEventListener('change', function(e) {
-                        if (e.target && e.target.tagName === 'SELECT') {
-                            highlightElement(e.target);
-                            var selector = generateSmartSelector(e.target);
-                            var selectedText = e.target.options[e.target.selectedIndex].text;
-                            
-                            window.recordedEvents.push({
-                                type: 'Select Option',
-                                selector: selector.primary,
-                                alternatives: selector.alternatives,
-                                text: selectedText,
-                                value: e.target.value,
-                                timestamp: Date.now(),
-                                waitCondition: 'element_visible'
-                            });
-                        }
-                    });
-                    
-                    // File upload detection
-                    document.addEventListener('change', function(e) {
-                        if (e.target && e.target.type === 'file') {
-                            highlightElement(e.target);
-                            var selector = generateSmartSelector(e.target);
-                            
-                            window.recordedEvents.push({
-                                type: 'File Upload',
-                                selector: selector.primary,
-                                alternatives: selector.alternatives,
-                                text: Array.from(e.target.files).map(f => f.name).join(', '),
-                                timestamp: Date.now(),
-                                waitCondition: 'element_visible'
-                            });
-                        }
-                    });
-                }
-            """)
-            
-            # Get recorded events
-            events = self.driver.execute_script("return window.recordedEvents || [];")
-            
-            # Process new events with advanced features
-            if hasattr(self, 'last_event_count'):
-                new_events = events[self.last_event_count:]
-                for event in new_events:
-                    self.add_advanced_step(
-                        event['type'], 
-                        event['selector'], 
-                        event['text'],
-                        alternatives=event.get('alternatives', []),
-                        wait_condition=event.get('waitCondition', 'none'),
-                        element_type=event.get('elementType', 'element')
-                    )
-            
-            self.last_event_count = len(events)
-            
-            # Schedule next check with optimized polling
-            if self.recording:
-                self.dialog.after(800, self.monitor_interactions)  # Slower polling for efficiency
-                
+            for event in self.transport.poll():
+                self.record_event(event)
         except Exception as e:
             print(f"Advanced monitoring error: {e}")
-            if self.recording:
-                self.dialog.after(1000, self.monitor_interactions)
+        
+        # Polls back off while the page is idle
+        if self.recording:
+            self.dialog.after(self.transport.next_poll_ms(), self.monitor_interactions)
     
-    def add_advanced_step(self, action, target, value, alternatives=None, wait_condition='none', element_type='element'):
+    def record_event(self, event):
+        """Turn one pushed recorder event into a step"""
+        # When it happened in the browser, not when it was drained
+        event_time = event['timestamp'] / 1000.0 if event.get('timestamp') else None
+        if event['type'] == 'Navigate':
+            url = event.get('selector') or ''
+            # Each loaded page reports itself; only real moves to another page are steps
+            if not url.startswith('http') or url == self.last_navigate_url:
+                return
+            self.last_navigate_url = url
+            self.add_advanced_step("Navigate", url, "", wait_condition="page_load", timestamp=event_time)
+            return
+        
+        self.add_advanced_step(
+            event['type'], 
+            event.get('selector') or '', 
+            event.get('text') or '',
+            alternatives=event.get('alternatives', []),
+            wait_condition=event.get('waitCondition', 'none'),
+            element_type=event.get('elementType', 'element'),
+            timestamp=event_time,
+            option_value=event.get('value')
+        )
+    
+    def add_advanced_step(self, action, target, value, alternatives=None, wait_condition='none', element_type='element',
+                          timestamp=None, option_value=None):
         """Add advanced recorded step with screenshots and smart features"""
         self.step_counter += 1
         
@@ -905,11 +678,14 @@ class SmartRecording:
             "alternatives": alternatives or [],
             "wait_condition": wait_condition,
             "element_type": element_type,
-            "timestamp": time.time(),
+            "timestamp": timestamp or time.time(),
             "step_id": self.step_counter,
             "screenshot_before": screenshot_before
         }
         
+        if option_value is not None:
+            step["option_value"] = option_value
+        
         # Add smart assertions for certain actions
         if action == "Click" and "submit" in target.lower():
             step["assertion"] = "page_change_expected"
@@ -979,6 +755,14 @@ class SmartRecording:
         self.recording = False
         
         if self.driver:
+            # Pick up whatever was pushed after the last poll before the browser goes away
+            if self.transport:
+                try:
+                    for event in self.transport.stop():
+                        self.record_event(event)
+                except Exception as e:
+                    print(f"Final event drain error: {e}")
+                self.transport = None
             try:
                 self.driver.quit()
             except:
@@ -1075,42 +859,14 @@ class SmartRecording:
             save_btn.config(state='disabled', text='Saving...')
             
             try:
-                # Save group using correct database structure
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute("""
-                    INSERT INTO test_step_groups (user_id, group_name, description)
-                    VALUES (?, ?, ?)
-                """, (self.db_manager.user_id, group_name, description))
-                
-                group_id = cursor.lastrowid
-                
-                # Convert recorded steps to test steps
-                for i, step in enumerate(self.recorded_steps):
-                    step_name = f"Step {i+1}: {step['action']}"
-                    step_description = f"{step['action']} on {step['target']}"
-                    if step['value']:
-                        step_description += f" with value '{step['value']}'"
-                    
-                    cursor.execute("""
-                        INSERT INTO test_steps (user_id, rice_profile_id, group_id, name, step_type, target, description)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (self.db_manager.user_id, 1, group_id, step_name, step['action'], step['target'], step_description))
-                
-                self.db_manager.conn.commit()
+                # Coalesce capture noise, then save the group and its steps in one transaction
+                rows, stats = normalize_recording(self.recorded_steps)
+                self.db_manager.create_test_step_group_with_steps(group_name, description, rows)
                 save_dialog.destroy()
-                self.show_popup("Success", f"✨ Recording saved as '{group_name}' with {len(self.recorded_steps)} steps", "success")
+                self.show_popup("Success", f"✨ Recording saved as '{group_name}' with {len(rows)} steps\n\n{stats.summary()}", "success")
                 
                 # Reset UI after successful save
-                # Clear recorded steps
-        self.recorded_steps = []
-        self.step_counter = 0
-        self.steps_listbox.delete(0, tk.END)
-        self.status_label.config(text="Steps cleared - Ready to record", fg='#10b981')
-        self.step_count_label.config(text="(0 steps)")
-        self.steps_count.config(text="Steps: 0")
-        self.last_action.config(text="Last Action: None")
-        self.save_btn.config(state='disabled')
-                self.save_btn.config(state='disabled')
+                self.clear_steps()
                 
             except Exception as e:
                 save_btn.config(state='normal', text='💾 Save')
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Duplicate and issue detection for the test step library.
+
+Every step is reduced to a normalized form (canonical type, cleaned target,
+value template) and bucketed by hash, so exact and near duplicates are found
+in one linear pass however many groups the library spans.
+"""
+
+import re
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+from scenario_plan import (VARIABLE_PATTERN, KNOWN_STEP_TYPES, TARGET_REQUIRED_TYPES, split_selectors,
+                           parse_get_text_target, parse_get_attribute_target, find_variables)
+from log_manager import get_logger
+
+logger = get_logger('step_analysis')
+
+ISSUE_UNKNOWN_TYPE = 'unknown_type'
+ISSUE_MISSING_TARGET = 'missing_target'
+ISSUE_INVALID_SELECTOR = 'invalid_selector'
+ISSUE_DEAD_SELECTOR = 'dead_selector'
+ISSUE_UNRESOLVED_VARIABLE = 'unresolved_variable'
+ISSUE_UNUSED = 'unused'
+
+SELECTOR_TYPES = ("Element Click", "Text Input", "Get Text", "Get Attribute")
+CAPTURE_TYPES = ("Get Text", "Get Attribute")
+
+_WHITESPACE = re.compile(r'\s+')
+_DEFAULT_CACHE_KEY = re.compile(r'^step_\d+_(.+)$')
+
+def _collapse(text):
+    return _WHITESPACE.sub(' ', (text or '').strip())
+
+def normalize_type(step_type):
+    return "Navigate" if step_type == "Web Navigation" else (step_type or '')
+
+def normalize_selector(selector):
+    """Whitespace and quote style do not change what a selector matches"""
+    return _collapse(selector).replace("'", '"').replace(' > ', '>').replace(' >', '>').replace('> ', '>')
+
+def normalize_url(url):
+    parts = urlsplit(_collapse(url))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+
+def normalize_target(step_type, target):
+    """Cleaned target as a tuple of parts (selectors, URL, script, ...)"""
+    step_type = normalize_type(step_type)
+    if step_type == "Navigate":
+        return (normalize_url(target),)
+    if step_type == "Element Click":
+        return tuple(normalize_selector(s) for s in split_selectors(target))
+    if step_type == "Get Text":
+        selectors, cache_name = parse_get_text_target(target)
+        return tuple(normalize_selector(s) for s in selectors) + (f"CACHE:{cache_name or ''}",)
+    if step_type == "Get Attribute":
+        selectors, attribute, cache_name = parse_get_attribute_target(target)
+        return tuple(normalize_selector(s) for s in selectors) + (attribute, f"CACHE:{cache_name or ''}")
+    if step_type == "Text Input":
+        return (normalize_selector(target),)
+    return (_collapse(target),)
+
+def value_template(value):
+    """Value with literal text generalised to '*' but ${variables} kept"""
+    parts = VARIABLE_PATTERN.split(_collapse(value))
+    # split() alternates literal text and variable names
+    return ''.join(('${%s}' % part) if index % 2 else ('*' if part else '')
+                   for index, part in enumerate(parts))
+
+def _digest(*parts):
+    return hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def selector_problem(selector):
+    """Why a CSS / XPath selector cannot match anything, or None"""
+    if not selector:
+        return "empty selector"
+    depth = {'(': 0, '[': 0}
+    closing = {')': '(', ']': '['}
+    quote = None
+    for char in selector:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char in depth:
+            depth[char] += 1
+        elif char in closing:
+            depth[closing[char]] -= 1
+            if depth[closing[char]] < 0:
+                return f"unbalanced '{char}'"
+    if quote:
+        return "unterminated quote"
+    for opener, count in depth.items():
+        if count:
+            return f"unbalanced '{opener}'"
+    if selector.startswith('/') and '//' not in selector[1:] and selector.count('/') > 6:
+        return "absolute XPath - breaks on any layout change"
+    return None
+
+def choose_keeper(steps):
+    """The step duplicates are merged into: the most used by scenarios, then the oldest"""
+    return max(steps, key=lambda step: (step.usage, -step.id))
+
+class StepRecord:
+    """One library step with its normalized keys"""
+    
+    def __init__(self, step_id, group_id, group_name, name, step_type, target, description):
+        self.id = step_id
+        self.group_id = group_id
+        self.group_name = group_name
+        self.name = name
+        self.step_type = step_type
+        self.target = target
+        self.description = description
+        self.usage = 0
+        
+        canonical_type = normalize_type(step_type)
+        cleaned = normalize_target(step_type, target)
+        self.exact_key = _digest(canonical_type, *cleaned, '\x1e', _collapse(description))
+        # Same action on the same element, whatever literal value it types / waits for
+        self.near_key = _digest(canonical_type, cleaned[0].lower() if cleaned else '', value_template(description))
+    
+    def label(self):
+        return f"#{self.id} '{self.name}' ({self.group_name})"
+
+class DuplicateSet:
+    """Steps sharing a normalized key; keeper is the one the others would be merged into"""
+    
+    def __init__(self, kind, steps, keeper):
+        self.kind = kind
+        self.steps = steps
+        self.keeper = keeper
+    
+    @property
+    def duplicates(self):
+        return [step for step in self.steps if step is not self.keeper]
+
+class Issue:
+    def __init__(self, kind, step, message):
+        self.kind = kind
+        self.step = step
+        self.message = message
+    
+    def __str__(self):
+        return f"{self.step.label()}: {self.message}"
+
+class LibraryReport:
+    def __init__(self, steps, exact, near, issues):
+        self.steps = steps
+        self.exact = exact
+        self.near = near
+        self.issues = issues
+    
+    def merges(self):
+        """{keeper_id: [duplicate ids]} for exact duplicates within the same group - safe to auto-apply.
+
+        Copies in different groups are left alone; each group keeps one.
+        """
+        merges = {}
+        for dup_set in self.exact:
+            by_group = {}
+            for step in dup_set.steps:
+                by_group.setdefault(step.group_id, []).append(step)
+            for steps in by_group.values():
+                if len(steps) > 1:
+                    keeper = choose_keeper(steps)
+                    merges[keeper.id] = [step.id for step in steps if step is not keeper]
+        return merges
+    
+    def issues_of(self, kind):
+        return [issue for issue in self.issues if issue.kind == kind]
+
+class StepAnalyzer:
+    """Loads a user's step library and scenario usage in two scans and analyses it"""
+    
+    def __init__(self, conn, user_id):
+        self.conn = conn
+        self.user_id = user_id
+    
+    def _load_steps(self, cursor):
+        cursor.execute("""
+            SELECT ts.id, ts.group_id, COALESCE(g.group_name, 'No group'), ts.name, ts.step_type, ts.target, ts.description
+            FROM test_steps ts
+            LEFT JOIN test_step_groups g ON g.id = ts.group_id
+            WHERE ts.user_id = ?
+            ORDER BY ts.id
+        """, (self.user_id,))
+        return [StepRecord(*row) for row in cursor.fetchall()]
+    
+    def _load_usage(self, cursor):
+        """Scenario references per step id, copied-field references, and per-step run outcomes"""
+        usage = {}
+        copies = set()
+        outcomes = {}
+        cursor.execute("""
+            SELECT test_step_id, step_name, step_target, execution_status
+            FROM scenario_steps WHERE user_id = ?
+        """, (self.user_id,))
+        for test_step_id, step_name, step_target, status in cursor:
+            if test_step_id is not None:
+                usage[test_step_id] = usage.get(test_step_id, 0) + 1
+                if status in ('completed', 'failed'):
+                    passed, failed = outcomes.get(test_step_id, (0, 0))
+                    outcomes[test_step_id] = (passed + (status == 'completed'), failed + (status == 'failed'))
+            elif step_name:
+                # Older scenarios copy the step's fields instead of linking to it
+                copies.add((step_name, step_target or ''))
+        return usage, copies, outcomes
+    
+    def analyze(self, group_id=None):
+        """Analyse the whole library; group_id keeps only findings that involve that group"""
+        cursor = self.conn.cursor()
+        steps = self._load_steps(cursor)
+        usage, copies, outcomes = self._load_usage(cursor)
+        for step in steps:
+            step.usage = usage.get(step.id, 0)
+        
+        exact_buckets = {}
+        near_buckets = {}
+        for step in steps:
+            exact_buckets.setdefault(step.exact_key, []).append(step)
+            near_buckets.setdefault(step.near_key, []).append(step)
+        
+        exact = [DuplicateSet('exact', bucket, choose_keeper(bucket))
+                 for bucket in exact_buckets.values() if len(bucket) > 1]
+        exact_ids = {step.id for dup_set in exact for step in dup_set.duplicates}
+        # Near duplicates: one representative per exact variant, reported when variants differ
+        near = []
+        for bucket in near_buckets.values():
+            variants = {}
+            for step in bucket:
+                variants.setdefault(step.exact_key, step)
+            if len(variants) > 1:
+                distinct = list(variants.values())
+                near.append(DuplicateSet('near', distinct, choose_keeper(distinct)))
+        
+        issues = self._find_issues(steps, usage, copies, outcomes, exact_ids)
+        
+        if group_id is not None:
+            exact = [dup_set for dup_set in exact if any(step.group_id == group_id for step in dup_set.steps)]
+            near = [dup_set for dup_set in near if any(step.group_id == group_id for step in dup_set.steps)]
+            issues = [issue for issue in issues if issue.step.group_id == group_id]
+        
+        logger.info("Analysed %s steps: %s exact and %s near duplicate sets, %s issues",
+                    len(steps), len(exact), len(near), len(issues))
+        return LibraryReport(steps, exact, near, issues)
+    
+    def _find_issues(self, steps, usage, copies, outcomes, exact_ids):
+        issues = []
+        
+        # Every variable the library can produce: explicit CACHE: names and default step_<n>_<name> keys
+        produced = set()
+        capture_names = set()
+        for step in steps:
+            if step.step_type == "Get Text":
+                cache_name = parse_get_text_target(step.target)[1]
+            elif step.step_type == "Get Attribute":
+                cache_name = parse_get_attribute_target(step.target)[2]
+            else:
+                continue
+            if cache_name:
+                produced.add(cache_name)
+            capture_names.add((step.name or '').replace(' ', '_'))
+        
+        for step in steps:
+            if step.step_type not in KNOWN_STEP_TYPES:
+                issues.append(Issue(ISSUE_UNKNOWN_TYPE, step, f"unknown step type '{step.step_type}'"))
+                continue
+            
+            if step.step_type in TARGET_REQUIRED_TYPES and not (step.target or '').strip():
+                issues.append(Issue(ISSUE_MISSING_TARGET, step, f"'{step.step_type}' step has no target"))
+            elif step.step_type in SELECTOR_TYPES:
+                selectors = normalize_target(step.step_type, step.target)
+                if step.step_type in CAPTURE_TYPES:
+                    selectors = selectors[:-2] if step.step_type == "Get Attribute" else selectors[:-1]
+                for selector in selectors:
+                    problem = selector_problem(selector)
+                    if problem:
+                        issues.append(Issue(ISSUE_INVALID_SELECTOR, step, f"selector {selector!r}: {problem}"))
+                        break
+            
+            passed, failed = outcomes.get(step.id, (0, 0))
+            if failed and not passed:
+                issues.append(Issue(ISSUE_DEAD_SELECTOR, step,
+                                    f"failed in all {failed} scenario step(s) that ran it, never passed"))
+            
+            for variable in find_variables(step.description) + find_variables(step.target):
+                default_key = _DEFAULT_CACHE_KEY.match(variable)
+                if variable in produced or (default_key and default_key.group(1) in capture_names):
+                    continue
+                issues.append(Issue(ISSUE_UNRESOLVED_VARIABLE, step,
+                                    f"'${{{variable}}}' is not captured by any Get Text / Get Attribute step"))
+            
+            if step.id not in exact_ids and not usage.get(step.id) and (step.name, step.target or '') not in copies:
+                issues.append(Issue(ISSUE_UNUSED, step, "not used by any scenario"))
+        
+        return issues
+
+def analyze_library(conn, user_id, group_id=None):
+    return StepAnalyzer(conn, user_id).analyze(group_id)
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Streaming import/export of test step libraries.
+
+A library archive is a zip holding manifest.json plus one JSON Lines file per
+section (groups, steps, templates, scenarios, scenario_steps). Sections are
+written and read a row at a time and inserted in batches, so a library of any
+size moves in constant memory. Ids inside an archive are only references
+between its own rows; they are remapped to fresh ids on import.
+"""
+
+import io
+import os
+import json
+import sqlite3
+import zipfile
+import threading
+from datetime import datetime
+from log_manager import get_logger
+
+logger = get_logger('step_library')
+
+LIBRARY_FORMAT = 'rice-tester-library'
+LIBRARY_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+SECTIONS = ('groups', 'steps', 'templates', 'scenarios', 'scenario_steps')
+BATCH_SIZE = 500
+
+# What to do when an imported group, scenario or template already exists
+CONFLICT_RENAME = 'rename'   # import alongside it under a new name / scenario number
+CONFLICT_SKIP = 'skip'       # keep the existing one, drop the imported one (and its steps)
+CONFLICT_MERGE = 'merge'     # groups: append the steps; scenarios and templates: replace
+CONFLICT_POLICIES = (CONFLICT_RENAME, CONFLICT_SKIP, CONFLICT_MERGE)
+
+# Scenario steps inserted outside the page designer use page 1, as elsewhere in the app
+DEFAULT_FSM_PAGE_ID = 1
+
+def _section_file(section):
+    return f"{section}.jsonl"
+
+def _in_clause(values):
+    return f"({','.join('?' * len(values))})"
+
+def template_records(templates):
+    """Flatten a StepTemplateManager.templates dict into one record per template"""
+    for category, items in (templates or {}).get('categories', {}).items():
+        for template in items:
+            yield dict(template, category=category)
+
+def export_library(conn, user_id, path, group_ids=(), step_ids=None, rice_profiles=(), templates=None,
+                   progress=None):
+    """Write test step groups, their steps, scenarios and templates to a library archive.
+
+    step_ids narrows the exported steps of group_ids to a selection. templates is
+    a StepTemplateManager.templates dict. progress(section, done, total) is called
+    after every batch. Returns the manifest's counts.
+    """
+    group_ids = list(group_ids or ())
+    rice_profiles = [str(profile) for profile in rice_profiles or ()]
+    cursor = conn.cursor()
+    
+    group_filter = f"user_id = ? AND id IN {_in_clause(group_ids)}"
+    step_filter = f"user_id = ? AND group_id IN {_in_clause(group_ids)}"
+    step_params = [user_id] + group_ids
+    if step_ids:
+        step_filter += f" AND id IN {_in_clause(step_ids)}"
+        step_params += list(step_ids)
+    scenario_filter = f"user_id = ? AND rice_profile IN {_in_clause(rice_profiles)}"
+    scenario_step_filter = f"ss.user_id = ? AND ss.rice_profile IN {_in_clause(rice_profiles)}"
+    scenario_params = [user_id] + rice_profiles
+    
+    def count(table, where, params):
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+        return cursor.fetchone()[0]
+    
+    totals = {
+        'groups': count('test_step_groups', group_filter, [user_id] + group_ids) if group_ids else 0,
+        'steps': count('test_steps', step_filter, step_params) if group_ids else 0,
+        'templates': sum(len(items) for items in (templates or {}).get('categories', {}).values()),
+        'scenarios': count('scenarios', scenario_filter, scenario_params) if rice_profiles else 0,
+        'scenario_steps': count('scenario_steps', scenario_filter, scenario_params) if rice_profiles else 0
+    }
+    
+    def rows_for(section):
+        if section == 'groups' and group_ids:
+            cursor.execute(f"""
+                SELECT id, group_name, description FROM test_step_groups
+                WHERE {group_filter} ORDER BY id
+            """, [user_id] + group_ids)
+            keys = ('id', 'group_name', 'description')
+        elif section == 'steps' and group_ids:
+            cursor.execute(f"""
+                SELECT id, group_id, name, step_type, target, description FROM test_steps
+                WHERE {step_filter} ORDER BY group_id, COALESCE(step_order, id), id
+            """, step_params)
+            keys = ('id', 'group_id', 'name', 'step_type', 'target', 'description')
+        elif section == 'templates':
+            yield from template_records(templates)
+            return
+        elif section == 'scenarios' and rice_profiles:
+            cursor.execute(f"""
+                SELECT rice_profile, scenario_number, description, auto_login FROM scenarios
+                WHERE {scenario_filter} ORDER BY rice_profile, scenario_number
+            """, scenario_params)
+            keys = ('rice_profile', 'scenario_number', 'description', 'auto_login')
+        elif section == 'scenario_steps' and rice_profiles:
+            # Carry the library step's fields too, so the scenario still runs when that step is not imported
+            cursor.execute(f"""
+                SELECT ss.rice_profile, ss.scenario_number, ss.step_order,
+                       COALESCE(ss.step_name, ts.name), COALESCE(ss.step_type, ts.step_type),
+                       COALESCE(ss.step_target, ts.target), COALESCE(ss.step_description, ts.description),
+                       ss.test_step_id, ss.custom_value, ss.user_input_required
+                FROM scenario_steps ss
+                LEFT JOIN test_steps ts ON ts.id = ss.test_step_id
+                WHERE {scenario_step_filter}
+                ORDER BY ss.rice_profile, ss.scenario_number, ss.step_order
+            """, scenario_params)
+            keys = ('rice_profile', 'scenario_number', 'step_order', 'step_name', 'step_type',
+                    'step_target', 'step_description', 'test_step_id', 'custom_value', 'user_input_required')
+        else:
+            return
+        
+        while True:
+            batch = cursor.fetchmany(BATCH_SIZE)
+            if not batch:
+                return
+            for row in batch:
+                yield dict(zip(keys, row))
+    
+    temp_path = f"{path}.partial"
+    counts = {}
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for section in SECTIONS:
+                written = 0
+                with io.TextIOWrapper(archive.open(_section_file(section), 'w'), encoding='utf-8') as out:
+                    for record in rows_for(section):
+                        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                        written += 1
+                        if progress and written % BATCH_SIZE == 0:
+                            progress(section, written, totals[section])
+                counts[section] = written
+                if progress:
+                    progress(section, written, totals[section])
+            
+            archive.writestr(MANIFEST_NAME, json.dumps({
+                'format': LIBRARY_FORMAT,
+                'version': LIBRARY_VERSION,
+                'exported_at': datetime.now().isoformat(timespec='seconds'),
+                'counts': counts
+            }, indent=2))
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    logger.info("Exported library to %s: %s", path, counts)
+    return counts
+
+def read_manifest(archive):
+    """Manifest of an open library archive; ValueError when it is not one"""
+    try:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    except (KeyError, ValueError):
+        raise ValueError("Not a RICE Tester library archive (manifest.json missing or unreadable)")
+    if manifest.get('format') != LIBRARY_FORMAT:
+        raise ValueError("Not a RICE Tester library archive")
+    if manifest.get('version', 0) > LIBRARY_VERSION:
+        raise ValueError(f"Library version {manifest['version']} is newer than this RICE Tester supports")
+    return manifest
+
+def _records(archive, section):
+    if _section_file(section) not in archive.namelist():
+        return
+    with io.TextIOWrapper(archive.open(_section_file(section)), encoding='utf-8') as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+def _batches(records, size=BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class LibraryImporter:
+    """Imports a library archive in one transaction, remapping ids and resolving conflicts.
+
+    Steps can be sent to one existing group (target_group_id) instead of
+    recreating the archive's groups; scenarios can be retargeted to another
+    RICE profile. Templates are merged into the given templates dict, which the
+    caller saves. sections limits which parts of the archive are read.
+    """
+    
+    def __init__(self, conn, user_id, conflict=CONFLICT_RENAME, target_group_id=None, rice_profile=None,
+                 rice_profile_id=None, templates=None, progress=None, sections=SECTIONS):
+        if conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy: {conflict}")
+        self.conn = conn
+        self.user_id = user_id
+        self.conflict = conflict
+        self.target_group_id = target_group_id
+        self.rice_profile = str(rice_profile) if rice_profile is not None else None
+        self.rice_profile_id = rice_profile_id
+        self.templates = templates
+        self.progress = progress
+        self.sections = sections
+        self.summary = {
+            'groups': 0, 'steps': 0, 'templates': 0, 'scenarios': 0, 'scenario_steps': 0,
+            'skipped': 0, 'conflicts': []
+        }
+    
+    def _conflict(self, description):
+        # Keep the summary small however many clashes there are
+        if len(self.summary['conflicts']) < 50:
+            self.summary['conflicts'].append(description)
+    
+    def _report(self, section, done, total):
+        if self.progress:
+            self.progress(section, done, total)
+    
+    def run(self, path):
+        with zipfile.ZipFile(path) as archive:
+            manifest = read_manifest(archive)
+            totals = manifest.get('counts', {})
+            
+            def records(section):
+                return _records(archive, section) if section in self.sections else iter(())
+            
+            if any(section in self.sections for section in ('groups', 'steps', 'scenarios', 'scenario_steps')):
+                cursor = self.conn.cursor()
+                if self.conn.in_transaction:
+                    self.conn.commit()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS library_step_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+                    cursor.execute("DELETE FROM temp.library_step_map")
+                    
+                    groups = self._import_groups(cursor, records('groups'), totals.get('groups', 0))
+                    self._import_steps(cursor, records('steps'), groups, totals.get('steps', 0))
+                    scenarios = self._import_scenarios(cursor, records('scenarios'), totals.get('scenarios', 0))
+                    self._import_scenario_steps(cursor, records('scenario_steps'), scenarios,
+                                                totals.get('scenario_steps', 0))
+                    cursor.execute("DROP TABLE temp.library_step_map")
+                    self.conn.commit()
+                except Exception:
+                    self.conn.rollback()
+                    raise
+            
+            # Templates live in step_templates.json, outside the database transaction
+            if self.templates is not None:
+                self.import_templates(records('templates'), totals.get('templates', 0))
+        
+        logger.info("Imported library %s: %s", path,
+                    {key: value for key, value in self.summary.items() if key != 'conflicts'})
+        return self.summary
+    
+    def _import_groups(self, cursor, records, total):
+        """{archive group id: destination group id, or None when skipped}"""
+        groups = {}
+        done = 0
+        for record in records:
+            done += 1
+            if self.target_group_id is not None:
+                groups[record['id']] = self.target_group_id
+                continue
+            
+            name = record['group_name']
+            cursor.execute("SELECT id FROM test_step_groups WHERE user_id = ? AND group_name = ?",
+                           (self.user_id, name))
+            existing = cursor.fetchone()
+            if existing:
+                self._conflict(f"Group '{name}'")
+                if self.conflict == CONFLICT_SKIP:
+                    groups[record['id']] = None
+                    self.summary['skipped'] += 1
+                    continue
+                if self.conflict == CONFLICT_MERGE:
+                    groups[record['id']] = existing[0]
+                    continue
+                name = self._free_group_name(cursor, name)
+            
+            cursor.execute("INSERT INTO test_step_groups (user_id, group_name, description) VALUES (?, ?, ?)",
+                           (self.user_id, name, record.get('description')))
+            groups[record['id']] = cursor.lastrowid
+            self.summary['groups'] += 1
+        self._report('groups', done, total)
+        return groups
+    
+    def _free_group_name(self, cursor, name):
+        candidate = f"{name} (imported)"
+        suffix = 2
+        while True:
+            cursor.execute("SELECT 1 FROM test_step_groups WHERE user_id = ? AND group_name = ?",
+                           (self.user_id, candidate))
+            if not cursor.fetchone():
+                return candidate
+            candidate = f"{name} (imported {suffix})"
+            suffix += 1
+    
+    def _default_rice_profile_id(self, cursor):
+        if self.rice_profile_id is None:
+            cursor.execute("SELECT id FROM rice_profiles WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
+                           (self.user_id,))
+            row = cursor.fetchone()
+            self.rice_profile_id = row[0] if row else 1
+        return self.rice_profile_id
+    
+    def _import_steps(self, cursor, records, groups, total):
+        from database_manager import DatabaseManager
+        
+        gap = DatabaseManager.STEP_ORDER_GAP
+        rice_profile_id = self._default_rice_profile_id(cursor)
+        next_order = {}   # destination group -> step_order for its next imported step
+        done = 0
+        
+        for batch in _batches(records):
+            done += len(batch)
+            rows = []
+            old_ids = []
+            for record in batch:
+                group_id = groups.get(record['group_id'], self.target_group_id)
+                if group_id is None:
+                    continue
+                if group_id not in next_order:
+                    cursor.execute("SELECT COALESCE(MAX(step_order), 0) + ? FROM test_steps WHERE user_id = ? AND group_id = ?",
+                                   (gap, self.user_id, group_id))
+                    next_order[group_id] = cursor.fetchone()[0]
+                rows.append((self.user_id, rice_profile_id, group_id, record['name'], record['step_type'],
+                             record.get('target') or '', record.get('description'), next_order[group_id]))
+                next_order[group_id] += gap
+                old_ids.append(record['id'])
+            
+            if rows:
+                # Ids are handed out in insert order under our write lock, so the rows above the
+                # previous maximum are exactly this batch
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM test_steps")
+                previous_max = cursor.fetchone()[0]
+                cursor.executemany("""
+                    INSERT INTO test_steps (user_id, rice_profile_id, group_id, name, step_type, target, description, step_order)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                cursor.execute("SELECT id FROM test_steps WHERE id > ? ORDER BY id", (previous_max,))
+                new_ids = [row[0] for row in cursor.fetchall()]
+                if len(new_ids) != len(old_ids):
+                    raise sqlite3.DatabaseError("Step ids could not be remapped - another writer interleaved")
+                cursor.executemany("INSERT OR REPLACE INTO temp.library_step_map (old_id, new_id) VALUES (?, ?)",
+                                   zip(old_ids, new_ids))
+                self.summary['steps'] += len(rows)
+            self.summary['skipped'] += len(batch) - len(rows)
+            self._report('steps', done, total)
+    
+    def _import_scenarios(self, cursor, records, total):
+        """{(archive profile, number): (profile, number), or None when skipped}"""
+        scenarios = {}
+        done = 0
+        for record in records:
+            done += 1
+            profile = self.rice_profile or str(record['rice_profile'])
+            number = record['scenario_number']
+            cursor.execute("SELECT id FROM scenarios WHERE user_id = ? AND rice_profile = ? AND scenario_number = ?",
+                           (self.user_id, profile, number))
+            existing = cursor.fetchone()
+            key = (str(record['rice_profile']), record['scenario_number'])
+            
+            if existing:
+                self._conflict(f"Scenario {profile} #{number}")
+                if self.conflict == CONFLICT_SKIP:
+                    scenarios[key] = None
+                    self.summary['skipped'] += 1
+                    continue
+                if self.conflict == CONFLICT_MERGE:
+                    cursor.execute("DELETE FROM scenario_steps WHERE user_id = ? AND rice_profile = ? AND scenario_number = ?",
+                                   (self.user_id, profile, number))
+                    cursor.execute("UPDATE scenarios SET description = ?, auto_login = ?, result = NULL WHERE id = ?",
+                                   (record['description'], record.get('auto_login') or 0, existing[0]))
+                    scenarios[key] = (profile, number)
+                    self.summary['scenarios'] += 1
+                    continue
+                cursor.execute("SELECT COALESCE(MAX(scenario_number), 0) + 1 FROM scenarios WHERE user_id = ? AND rice_profile = ?",
+                               (self.user_id, profile))
+                number = cursor.fetchone()[0]
+            
+            cursor.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description, auto_login) VALUES (?, ?, ?, ?, ?)",
+                           (self.user_id, profile, number, record['description'], record.get('auto_login') or 0))
+            scenarios[key] = (profile, number)
+            self.summary['scenarios'] += 1
+        self._report('scenarios', done, total)
+        return scenarios
+    
+    def _import_scenario_steps(self, cursor, records, scenarios, total):
+        done = 0
+        for batch in _batches(records):
+            done += len(batch)
+            rows = []
+            for record in batch:
+                destination = scenarios.get((str(record['rice_profile']), record['scenario_number']))
+                if destination is None:
+                    continue
+                rows.append((self.user_id, destination[0], destination[1], record['step_order'], DEFAULT_FSM_PAGE_ID,
+                             record.get('step_name'), record.get('step_type'), record.get('step_target'),
+                             record.get('step_description'), record.get('test_step_id'), record.get('custom_value'),
+                             record.get('user_input_required') or 0))
+            # Library steps imported with this archive are relinked; others keep their copied fields
+            cursor.executemany("""
+                INSERT INTO scenario_steps (user_id, rice_profile, scenario_number, step_order, fsm_page_id,
+                                            step_name, step_type, step_target, step_description, test_step_id,
+                                            custom_value, user_input_required, execution_status)
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT new_id FROM temp.library_step_map WHERE old_id = ?), ?, ?, 'pending'
+            """, rows)
+            self.summary['scenario_steps'] += len(rows)
+            self._report('scenario_steps', done, total)
+    
+    def import_templates(self, records, total=0):
+        """Merge template records into self.templates; also used for plain template JSON files"""
+        categories = self.templates.setdefault('categories', {})
+        done = 0
+        for record in records:
+            done += 1
+            category = record.pop('category', None) or "📥 Imported"
+            items = categories.setdefault(category, [])
+            existing = next((index for index, item in enumerate(items) if item.get('name') == record.get('name')), None)
+            if existing is not None:
+                self._conflict(f"Template '{record.get('name')}'")
+                if self.conflict == CONFLICT_SKIP:
+                    self.summary['skipped'] += 1
+                    continue
+                if self.conflict == CONFLICT_MERGE:
+                    items[existing] = record
+                    self.summary['templates'] += 1
+                    continue
+                names = {item.get('name') for item in items}
+                name = f"{record.get('name')} (imported)"
+                suffix = 2
+                while name in names:
+                    name = f"{record.get('name')} (imported {suffix})"
+                    suffix += 1
+                record['name'] = name
+            items.append(record)
+            self.summary['templates'] += 1
+        self._report('templates', done, total)
+        return self.summary
+
+def import_library(conn, user_id, path, conflict=CONFLICT_RENAME, **options):
+    """Import a library archive; returns a summary of what was added, skipped and clashed"""
+    return LibraryImporter(conn, user_id, conflict, **options).run(path)
+
+def format_summary(summary):
+    """One popup-sized description of an import summary"""
+    parts = [f"{summary[key]} {label}" for key, label in
+             (('groups', "groups"), ('steps', "steps"), ('scenarios', "scenarios"),
+              ('scenario_steps', "scenario steps"), ('templates', "templates")) if summary.get(key)]
+    text = "Imported " + (", ".join(parts) if parts else "nothing")
+    if summary.get('skipped'):
+        text += f"\nSkipped {summary['skipped']} existing item(s)"
+    if summary.get('conflicts'):
+        text += "\n\nConflicts:\n" + "\n".join(summary['conflicts'][:8])
+        if len(summary['conflicts']) > 8:
+            text += "\n..."
+    return text
+
+def run_with_progress(parent, title, work, on_done):
+    """Run work(progress) on a background thread behind a small progress dialog.
+
+    work receives a progress(section, done, total) callback and should open its
+    own database connection; on_done(result, error) is called on the Tk thread.
+    """
+    import tkinter as tk
+    from tkinter import ttk
+    
+    dialog = tk.Toplevel(parent)
+    dialog.title(title)
+    dialog.configure(bg='#ffffff')
+    dialog.geometry("420x130")
+    dialog.resizable(False, False)
+    dialog.transient(parent)
+    dialog.grab_set()
+    
+    status = tk.Label(dialog, text="Starting...", font=('Segoe UI', 10), bg='#ffffff', fg='#374151', anchor='w')
+    status.pack(fill='x', padx=20, pady=(20, 8))
+    progress_var = tk.DoubleVar()
+    ttk.Progressbar(dialog, variable=progress_var, maximum=100, length=380, mode='determinate').pack(padx=20)
+    
+    def show(section, done, total):
+        status.configure(text=f"{section.replace('_', ' ').capitalize()}: {done:,} of {total:,}")
+        progress_var.set(done * 100.0 / total if total else 100)
+    
+    def report(section, done, total):
+        dialog.after(0, lambda: show(section, done, total))
+    
+    def finish(result, error):
+        dialog.destroy()
+        on_done(result, error)
+    
+    def worker():
+        try:
+            result = work(report)
+        except Exception as e:
+            logger.exception("%s failed", title)
+            dialog.after(0, lambda err=e: finish(None, err))
+            return
+        dialog.after(0, lambda: finish(result, None))
+    
+    threading.Thread(target=worker, daemon=True).start()
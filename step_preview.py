@@ -343,6 +343,104 @@ class StepPreview:
         if self.preview_window:
             self.preview_window.destroy()
             self.preview_window = None
+    
+    def run_dry_run(self, steps, title, conn, user_id, parent_window=None, on_close=None):
+        """Check every locator of a group / scenario step list in one browser pass and show the report"""
+        if not self.selenium_manager.driver:
+            self.show_popup("Dry Run Error", "Browser not initialized. Please start browser first.", "error")
+            return False
+        
+        window = tk.Toplevel(parent_window) if parent_window else tk.Toplevel()
+        window.title(f"🧪 Locator Dry Run - {title}")
+        center_dialog(window, 760, 520)
+        window.configure(bg='#ffffff')
+        
+        try:
+            window.iconbitmap("infor_logo.ico")
+        except:
+            pass
+        
+        header_frame = tk.Frame(window, bg='#3b82f6', height=60)
+        header_frame.pack(fill="x")
+        header_frame.pack_propagate(False)
+        tk.Label(header_frame, text=f"🧪 Locator Dry Run - {title}", 
+                font=('Segoe UI', 14, 'bold'), bg='#3b82f6', fg='#ffffff').pack(expand=True)
+        
+        content_frame = tk.Frame(window, bg='#ffffff', padx=20, pady=15)
+        content_frame.pack(fill="both", expand=True)
+        
+        progress_bar = ttk.Progressbar(content_frame, mode='determinate', maximum=max(len(steps), 1))
+        progress_bar.pack(fill="x", pady=(0, 8))
+        status_label = tk.Label(content_frame, text=f"🔍 Checking {len(steps)} steps...", 
+                               font=('Segoe UI', 10), bg='#ffffff', fg='#6b7280', anchor='w')
+        status_label.pack(fill="x", pady=(0, 8))
+        
+        columns = ('step', 'status', 'time', 'detail')
+        tree = ttk.Treeview(content_frame, columns=columns, show='headings', height=14)
+        for column, heading, width in (('step', 'Step', 200), ('status', 'Status', 80),
+                                       ('time', 'ms', 60), ('detail', 'Detail', 380)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor='w')
+        tree.pack(fill="both", expand=True, pady=(0, 10))
+        
+        button_frame = tk.Frame(content_frame, bg='#ffffff')
+        button_frame.pack(fill="x")
+        heal_btn = tk.Button(button_frame, text="🩹 Apply Healed Locators", font=('Segoe UI', 10, 'bold'),
+                            bg='#10b981', fg='#ffffff', relief='flat', padx=15, pady=8,
+                            cursor='hand2', bd=0, state='disabled')
+        heal_btn.pack(side="left", padx=(0, 10))
+        
+        def close():
+            window.destroy()
+            if on_close:
+                on_close()
+        
+        tk.Button(button_frame, text="Close", font=('Segoe UI', 10, 'bold'),
+                 bg='#6b7280', fg='#ffffff', relief='flat', padx=15, pady=8,
+                 cursor='hand2', bd=0, command=close).pack(side="left")
+        window.protocol("WM_DELETE_WINDOW", close)
+        
+        def show_report(report, error):
+            if not window.winfo_exists():
+                return
+            if error:
+                status_label.config(text=f"❌ Dry run failed: {error}", fg='#ef4444')
+                return
+            progress_bar['value'] = progress_bar['maximum']
+            problems = report.problems()
+            status_label.config(text=("✅ " if not problems else "⚠️ ") + report.summary(),
+                               fg='#10b981' if not problems else '#f59e0b')
+            for check in problems:
+                tree.insert('', 'end', values=(f"{check.step_order}. {check.name}", check.status,
+                                               '' if check.found_ms is None else check.found_ms, check.message))
+            for url, load_ms in report.pages:
+                tree.insert('', 'end', values=("Page load", "page", load_ms, url))
+            
+            healable = report.healable()
+            if healable:
+                def apply():
+                    from locator_dry_run import apply_healed_locators
+                    count = apply_healed_locators(conn, user_id, healable)
+                    heal_btn.config(state='disabled')
+                    self.show_popup("Locators Healed", f"Updated the target of {count} step(s)", "success")
+                heal_btn.config(state='normal', text=f"🩹 Apply {len(healable)} Healed Locator(s)", command=apply)
+        
+        def progress(done, total):
+            window.after(0, lambda: progress_bar.config(value=done))
+        
+        def work():
+            from locator_dry_run import LocatorDryRun
+            try:
+                report = LocatorDryRun(self.selenium_manager.driver, progress=progress).run(steps)
+            except Exception as e:
+                message = str(e)
+                window.after(0, lambda: show_report(None, message))
+                return
+            window.after(0, lambda: show_report(report, None))
+        
+        import threading
+        threading.Thread(target=work, daemon=True).start()
+        return True
 
 # Integration helper for test_steps_methods.py
 def add_preview_button_to_step_form(form_frame, step_data, selenium_manager, show_popup_callback):
@@ -514,5 +514,26 @@ class StepTemplateManager:
         self.show_popup("Feature", "Custom template creation coming soon!", "info")
     
     def import_templates(self):
-        """Import templates from file"""
-        self.show_popup("Feature", "Template import/export coming soon!", "info")
\ No newline at end of file
+        """Import templates from a step library archive or a step_templates.json file"""
+        from tkinter import filedialog
+        from step_library import LibraryImporter, template_records, format_summary
+        
+        path = filedialog.askopenfilename(parent=self.dialog, title="Import Templates",
+                                          filetypes=[("Step library", "*.zip"), ("Template file", "*.json")])
+        if not path:
+            return
+        
+        try:
+            importer = LibraryImporter(None, self.db_manager.user_id, templates=self.templates, sections=('templates',))
+            if path.lower().endswith('.json'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    summary = importer.import_templates(template_records(json.load(f)))
+            else:
+                summary = importer.run(path)
+        except Exception as e:
+            self.show_popup("Error", f"Failed to import templates: {str(e)}", "error")
+            return
+        
+        self.save_templates()
+        self.load_categories()
+        self.show_popup("Import Complete", format_summary(summary), "success")
\ No newline at end of file
@@ -10,8 +10,166 @@ from docx.enum.table import WD_TABLE_ALIGNMENT
 import tkinter as tk
 from tkinter import filedialog
 from database_manager import DatabaseManager
+from screenshot_storage import screenshot_bytes, resolve_references
+from tes070_sections import SectionCache, section_key, save_section, append_section
+from log_manager import get_logger
 
+logger = get_logger('tes070_generator')
 
+def render_scenario_section(doc, fr_number, description, result, executed_at, steps_data, tenant_label):
+    """Write one scenario's FR section (overview, steps table with screenshots, validation) into doc"""
+    # FR section header
+    doc.add_heading(f'{fr_number}\t{description}', 2)
+    
+    # Test execution overview
+    doc.add_paragraph(f"Test Scenario: {description}")
+    doc.add_paragraph(f"Execution Method: Automated Selenium Testing Framework")
+    doc.add_paragraph(f"Test Result: {result}")
+    doc.add_paragraph(f"Execution Date: {executed_at or datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')}")
+    doc.add_paragraph()  # Empty line
+    
+    if steps_data:
+        # Near-duplicate frames are stored as references to an earlier frame
+        steps_data = resolve_references(steps_data, order_index=0, before_index=4, after_index=2, timestamp_index=5)
+        
+        # Filter out wait steps and reorder
+        filtered_steps = []
+        for step_order, step_desc, screenshot_b64, step_type, _, _ in steps_data:
+            if step_desc:
+                step_lower = step_desc.lower()
+                # Skip wait steps (by step_type only) and empty/generic steps
+                step_type_lower = (step_type or '').lower()
+                is_wait_step = 'wait' in step_type_lower
+                
+                if not is_wait_step and len(step_desc.strip()) > 5:
+                    # Format step description properly
+                    formatted_desc = step_desc
+                    
+                    # Use step_type to determine action description, fallback to content analysis
+                    if step_type and step_type.strip():
+                        step_type_lower = step_type.lower()
+                        if 'navigate' in step_type_lower:
+                            if step_desc.lower().startswith('navigate to '):
+                                formatted_desc = step_desc
+                            else:
+                                formatted_desc = f"Navigate to {step_desc}"
+                        elif 'click' in step_type_lower:
+                            if step_desc.lower().startswith('click '):
+                                formatted_desc = step_desc
+                            else:
+                                formatted_desc = f"Click {step_desc}"
+                        elif 'input' in step_type_lower or 'text' in step_type_lower:
+                            if 'workunit' in step_desc.lower() or 'work unit' in step_desc.lower():
+                                formatted_desc = "Enter Workunit"
+                            elif step_desc.lower() == 'password':
+                                formatted_desc = "Enter password"
+                            elif '@' in step_desc and '.' in step_desc and ' ' not in step_desc.strip():
+                                formatted_desc = f"Enter username: {step_desc}"
+                            else:
+                                formatted_desc = f"Enter {step_desc}"
+                        elif 'select' in step_type_lower or 'dropdown' in step_type_lower:
+                            formatted_desc = f"Select {step_desc}"
+                        else:
+                            formatted_desc = f"{step_type}: {step_desc}"
+                    else:
+                        # Fallback: analyze step description content
+                        if 'navigate' in step_lower or 'page' in step_lower:
+                            if step_desc.lower().startswith('navigate to '):
+                                formatted_desc = step_desc
+                            else:
+                                formatted_desc = f"Navigate to {step_desc}"
+                        elif 'click' in step_lower or 'button' in step_lower:
+                            if step_desc.lower().startswith('click '):
+                                formatted_desc = step_desc
+                            else:
+                                formatted_desc = f"Click {step_desc}"
+                        elif '@' in step_desc and '.' in step_desc and ' ' not in step_desc.strip():
+                            formatted_desc = f"Enter username: {step_desc}"
+                        elif 'workunit' in step_lower or 'work unit' in step_lower:
+                            formatted_desc = "Enter Workunit"
+                        elif step_desc.lower() == 'password':
+                            formatted_desc = "Enter password"
+                        elif len(step_desc.strip()) < 10 and not any(action in step_lower for action in ['navigate', 'click', 'select']):
+                            formatted_desc = f"Enter {step_desc}"
+                        else:
+                            formatted_desc = step_desc
+                    
+                    filtered_steps.append((formatted_desc, screenshot_b64))
+        
+        if filtered_steps:
+            # Add detailed test steps section
+            doc.add_heading("Test Execution Steps", 3)
+            
+            # Create steps table for better organization
+            steps_table = doc.add_table(rows=1, cols=3)
+            steps_table.style = 'Table Grid'
+            
+            # Table headers
+            hdr_cells = steps_table.rows[0].cells
+            hdr_cells[0].text = 'Step #'
+            hdr_cells[1].text = 'Action Description'
+            hdr_cells[2].text = 'Screenshot'
+            
+            # Add each step with proper numbering
+            for j, (step_desc, screenshot_b64) in enumerate(filtered_steps, 1):
+                row_cells = steps_table.add_row().cells
+                row_cells[0].text = str(j)
+                row_cells[1].text = step_desc
+                
+                if screenshot_b64:
+                    try:
+                        # Decode and insert screenshot
+                        from io import BytesIO
+                        
+                        # Stored as binary JPEG or legacy base64 PNG
+                        screenshot_data = screenshot_bytes(screenshot_b64)
+                        screenshot_stream = BytesIO(screenshot_data)
+                        
+                        # Add screenshot to document with proper sizing
+                        paragraph = row_cells[2].paragraphs[0]
+                        run = paragraph.runs[0] if paragraph.runs else paragraph.add_run()
+                        run.add_picture(screenshot_stream, width=Inches(2.5))
+                    
+                    except Exception as e:
+                        row_cells[2].text = f"Screenshot available (Error loading: {str(e)[:50]}...)"
+                else:
+                    row_cells[2].text = "No screenshot captured"
+            
+            doc.add_paragraph()  # Empty line after table
+            
+            # Add test validation section
+            doc.add_heading("Test Validation", 3)
+            validation_para = doc.add_paragraph()
+            if result == "Passed":
+                validation_para.add_run("✓ Test Passed: ").bold = True
+                validation_para.add_run("All test steps executed successfully without errors. Expected functionality verified.")
+            else:
+                validation_para.add_run("✗ Test Failed: ").bold = True
+                validation_para.add_run("Test execution encountered errors. See Section 4 Problems for detailed analysis.")
+            
+            # Add technical details
+            doc.add_paragraph()
+            tech_details = doc.add_paragraph()
+            tech_details.add_run("Technical Details:").bold = True
+            doc.add_paragraph(f"• Total Steps Executed: {len(filtered_steps)}")
+            doc.add_paragraph(f"• Screenshots Captured: {sum(1 for _, ss in filtered_steps if ss)}")
+            doc.add_paragraph(f"• Test Environment: {tenant_label}")
+            doc.add_paragraph(f"• Browser: Chrome (Selenium WebDriver)")
+        
+        else:
+            doc.add_paragraph("No actionable steps recorded (only wait/delay steps found).")
+            doc.add_paragraph("Test executed via automated framework with minimal user interaction.")
+    else:
+        doc.add_paragraph("Test Execution Summary:")
+        doc.add_paragraph("• Test executed via automated Selenium framework")
+        doc.add_paragraph("• No detailed step-by-step recording available")
+        doc.add_paragraph("• Test validation based on final result status")
+    
+    # Add separator between FR sections
+    doc.add_paragraph()
+    separator = doc.add_paragraph("─" * 80)
+    separator.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph()
 
 def create_tes070_from_scratch(rice_profile, show_popup=None, current_user=None, db_manager=None):
     """Generate TES-070 from scratch with full control over sections"""
@@ -349,19 +507,14 @@ def create_tes070_from_scratch(rice_profile, show_popup=None, current_user=None,
         )
         
         # Create FR sections only for scenarios that exist
+        # Scenario sections are rendered once per distinct input and spliced in from the cache
+        section_cache = SectionCache(conn)
+        tenant_label = tenant_name if tenant_name != 'Tenant Not Set' else 'TAMICS10_AX1'
+        reused_sections = 0
+        
         for i, (rice_prof, scenario_num, description, result, executed_at) in enumerate(scenarios):
             fr_number = f"FR 1.{i+1}"
             
-            # FR section header
-            doc.add_heading(f'{fr_number}\t{description}', 2)
-            
-            # Test execution overview
-            doc.add_paragraph(f"Test Scenario: {description}")
-            doc.add_paragraph(f"Execution Method: Automated Selenium Testing Framework")
-            doc.add_paragraph(f"Test Result: {result}")
-            doc.add_paragraph(f"Execution Date: {executed_at or datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')}")
-            doc.add_paragraph()  # Empty line
-            
             # Get steps from database
             cursor.execute("""
                 SELECT ss.step_order, 
@@ -376,7 +529,9 @@ def create_tes070_from_scratch(rice_profile, show_popup=None, current_user=None,
                            ELSE ss.step_description
                        END as step_description,
                        ss.screenshot_after, 
-                       COALESCE(ts.step_type, ss.step_type)
+                       COALESCE(ts.step_type, ss.step_type),
+                       ss.screenshot_before,
+                       ss.screenshot_timestamp
                 FROM scenario_steps ss
                 LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
                 WHERE ss.rice_profile = ? AND ss.scenario_number = ?
@@ -399,7 +554,9 @@ def create_tes070_from_scratch(rice_profile, show_popup=None, current_user=None,
                                ELSE ss.step_description
                            END as step_description,
                            ss.screenshot_after, 
-                           COALESCE(ts.step_type, ss.step_type)
+                           COALESCE(ts.step_type, ss.step_type),
+                           ss.screenshot_before,
+                           ss.screenshot_timestamp
                     FROM scenario_steps ss
                     LEFT JOIN test_steps ts ON ss.test_step_id = ts.id
                     WHERE ss.rice_profile = ? AND ss.scenario_number = ?
@@ -407,146 +564,19 @@ def create_tes070_from_scratch(rice_profile, show_popup=None, current_user=None,
                 """, (actual_rice_id, scenario_num))
                 steps_data = cursor.fetchall()
             
-            if steps_data:
-                # Filter out wait steps and reorder
-                filtered_steps = []
-                for step_order, step_desc, screenshot_b64, step_type in steps_data:
-                    if step_desc:
-                        step_lower = step_desc.lower()
-                        # Skip wait steps (by step_type only) and empty/generic steps
-                        step_type_lower = (step_type or '').lower()
-                        is_wait_step = 'wait' in step_type_lower
-                        
-                        if not is_wait_step and len(step_desc.strip()) > 5:
-                            # Format step description properly
-                            formatted_desc = step_desc
-                            
-                            # Use step_type to determine action description, fallback to content analysis
-                            if step_type and step_type.strip():
-                                step_type_lower = step_type.lower()
-                                if 'navigate' in step_type_lower:
-                                    if step_desc.lower().startswith('navigate to '):
-                                        formatted_desc = step_desc
-                                    else:
-                                        formatted_desc = f"Navigate to {step_desc}"
-                                elif 'click' in step_type_lower:
-                                    if step_desc.lower().startswith('click '):
-                                        formatted_desc = step_desc
-                                    else:
-                                        formatted_desc = f"Click {step_desc}"
-                                elif 'input' in step_type_lower or 'text' in step_type_lower:
-                                    if 'workunit' in step_desc.lower() or 'work unit' in step_desc.lower():
-                                        formatted_desc = "Enter Workunit"
-                                    elif step_desc.lower() == 'password':
-                                        formatted_desc = "Enter password"
-                                    elif '@' in step_desc and '.' in step_desc and ' ' not in step_desc.strip():
-                                        formatted_desc = f"Enter username: {step_desc}"
-                                    else:
-                                        formatted_desc = f"Enter {step_desc}"
-                                elif 'select' in step_type_lower or 'dropdown' in step_type_lower:
-                                    formatted_desc = f"Select {step_desc}"
-                                else:
-                                    formatted_desc = f"{step_type}: {step_desc}"
-                            else:
-                                # Fallback: analyze step description content
-                                if 'navigate' in step_lower or 'page' in step_lower:
-                                    if step_desc.lower().startswith('navigate to '):
-                                        formatted_desc = step_desc
-                                    else:
-                                        formatted_desc = f"Navigate to {step_desc}"
-                                elif 'click' in step_lower or 'button' in step_lower:
-                                    if step_desc.lower().startswith('click '):
-                                        formatted_desc = step_desc
-                                    else:
-                                        formatted_desc = f"Click {step_desc}"
-                                elif '@' in step_desc and '.' in step_desc and ' ' not in step_desc.strip():
-                                    formatted_desc = f"Enter username: {step_desc}"
-                                elif 'workunit' in step_lower or 'work unit' in step_lower:
-                                    formatted_desc = "Enter Workunit"
-                                elif step_desc.lower() == 'password':
-                                    formatted_desc = "Enter password"
-                                elif len(step_desc.strip()) < 10 and not any(action in step_lower for action in ['navigate', 'click', 'select']):
-                                    formatted_desc = f"Enter {step_desc}"
-                                else:
-                                    formatted_desc = step_desc
-                            
-                            filtered_steps.append((formatted_desc, screenshot_b64))
-                
-                if filtered_steps:
-                    # Add detailed test steps section
-                    doc.add_heading("Test Execution Steps", 3)
-                    
-                    # Create steps table for better organization
-                    steps_table = doc.add_table(rows=1, cols=3)
-                    steps_table.style = 'Table Grid'
-                    
-                    # Table headers
-                    hdr_cells = steps_table.rows[0].cells
-                    hdr_cells[0].text = 'Step #'
-                    hdr_cells[1].text = 'Action Description'
-                    hdr_cells[2].text = 'Screenshot'
-                    
-                    # Add each step with proper numbering
-                    for j, (step_desc, screenshot_b64) in enumerate(filtered_steps, 1):
-                        row_cells = steps_table.add_row().cells
-                        row_cells[0].text = str(j)
-                        row_cells[1].text = step_desc
-                        
-                        if screenshot_b64:
-                            try:
-                                # Decode and insert screenshot
-                                import base64
-                                from io import BytesIO
-                                
-                                # Decode base64 screenshot
-                                screenshot_data = base64.b64decode(screenshot_b64)
-                                screenshot_stream = BytesIO(screenshot_data)
-                                
-                                # Add screenshot to document with proper sizing
-                                paragraph = row_cells[2].paragraphs[0]
-                                run = paragraph.runs[0] if paragraph.runs else paragraph.add_run()
-                                run.add_picture(screenshot_stream, width=Inches(2.5))
-                                
-                            except Exception as e:
-                                row_cells[2].text = f"Screenshot available (Error loading: {str(e)[:50]}...)"
-                        else:
-                            row_cells[2].text = "No screenshot captured"
-                    
-                    doc.add_paragraph()  # Empty line after table
-                    
-                    # Add test validation section
-                    doc.add_heading("Test Validation", 3)
-                    validation_para = doc.add_paragraph()
-                    if result == "Passed":
-                        validation_para.add_run("✓ Test Passed: ").bold = True
-                        validation_para.add_run("All test steps executed successfully without errors. Expected functionality verified.")
-                    else:
-                        validation_para.add_run("✗ Test Failed: ").bold = True
-                        validation_para.add_run("Test execution encountered errors. See Section 4 Problems for detailed analysis.")
-                    
-                    # Add technical details
-                    doc.add_paragraph()
-                    tech_details = doc.add_paragraph()
-                    tech_details.add_run("Technical Details:").bold = True
-                    doc.add_paragraph(f"• Total Steps Executed: {len(filtered_steps)}")
-                    doc.add_paragraph(f"• Screenshots Captured: {sum(1 for _, ss in filtered_steps if ss)}")
-                    doc.add_paragraph(f"• Test Environment: {tenant_name if tenant_name != 'Tenant Not Set' else 'TAMICS10_AX1'}")
-                    doc.add_paragraph(f"• Browser: Chrome (Selenium WebDriver)")
-                    
-                else:
-                    doc.add_paragraph("No actionable steps recorded (only wait/delay steps found).")
-                    doc.add_paragraph("Test executed via automated framework with minimal user interaction.")
+            key = section_key(fr_number, tenant_label, description, result, executed_at, steps_data)
+            section = section_cache.get(rice_prof, scenario_num, key)
+            if section is None:
+                section_doc = Document()
+                render_scenario_section(section_doc, fr_number, description, result, executed_at, steps_data, tenant_label)
+                section = save_section(section_doc)
+                section_cache.put(rice_prof, scenario_num, key, section)
             else:
-                doc.add_paragraph("Test Execution Summary:")
-                doc.add_paragraph("• Test executed via automated Selenium framework")
-                doc.add_paragraph("• No detailed step-by-step recording available")
-                doc.add_paragraph("• Test validation based on final result status")
-            
-            # Add separator between FR sections
-            doc.add_paragraph()
-            separator = doc.add_paragraph("─" * 80)
-            separator.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            doc.add_paragraph()
+                reused_sections += 1
+            append_section(doc, section)
+        
+        conn.commit()
+        logger.info("TES-070 for %s: %s of %s scenario sections reused from cache", rice_profile, reused_sections, len(scenarios))
         
         # Section 4: Problems and Issues Analysis
         doc.add_heading('4\tProblems and Issues Analysis', 1)
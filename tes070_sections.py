@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import copy
+import json
+import hashlib
+from io import BytesIO
+from docx import Document
+from docx.oxml.ns import qn
+import tes070_store
+from log_manager import get_logger
+
+logger = get_logger('tes070_sections')
+
+# Bump when render_scenario_section changes what it writes, so cached sections are rebuilt
+SECTION_FORMAT = 1
+
+def section_key(fr_number, tenant_label, description, result, executed_at, steps_data):
+    """Hash of everything a scenario section is rendered from - screenshots by content"""
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([SECTION_FORMAT, fr_number, tenant_label, description, result, executed_at],
+                             default=str).encode('utf-8'))
+    for row in steps_data:
+        for value in row:
+            if isinstance(value, memoryview):
+                value = value.tobytes()
+            if isinstance(value, (bytes, bytearray)):
+                hasher.update(b'B%d:' % len(value))
+                hasher.update(hashlib.sha256(value).digest())
+            else:
+                encoded = json.dumps(value, default=str).encode('utf-8')
+                hasher.update(b'J%d:' % len(encoded) + encoded)
+        hasher.update(b'\x1e')
+    return hasher.hexdigest()
+
+def save_section(section_doc):
+    """Serialize a rendered section document for the cache"""
+    buffer = BytesIO()
+    section_doc.save(buffer)
+    return buffer.getvalue()
+
+def append_section(doc, section_bytes):
+    """Splice a cached section's body into doc, re-embedding its images under doc's relationships.
+
+    Drawing ids (wp:docPr) are numbered per document, so the section's are renumbered
+    after doc's - Word rejects a document with duplicates.
+    """
+    section_doc = Document(BytesIO(section_bytes))
+    section_part = section_doc.part
+    body = doc.element.body
+    # Body content goes ahead of the main document's final section properties
+    sect_pr = body.find(qn('w:sectPr'))
+    images = {}
+    next_id = doc.part.next_id
+    for element in section_doc.element.body.iterchildren():
+        if element.tag == qn('w:sectPr'):
+            continue  # Page setup belongs to the main document
+        element = copy.deepcopy(element)
+        for blip in element.iter(qn('a:blip')):
+            old_rid = blip.get(qn('r:embed'))
+            if old_rid not in images:
+                image_blob = section_part.related_parts[old_rid].blob
+                images[old_rid] = doc.part.get_or_add_image(BytesIO(image_blob))[0]
+            blip.set(qn('r:embed'), images[old_rid])
+        for doc_pr in element.iter(qn('wp:docPr')):
+            doc_pr.set('id', str(next_id))
+            next_id += 1
+        if sect_pr is not None:
+            sect_pr.addprevious(element)
+        else:
+            body.append(element)
+
+class SectionCache:
+    """Latest rendered FR section per scenario, reused while its section_key is unchanged.
+
+    Sections are kept as parts in tes070_store, so their screenshots share storage
+    with the saved TES-070 versions; entries written before that hold the whole docx.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def get(self, rice_profile, scenario_number, key):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT content FROM tes070_section_cache
+            WHERE rice_profile = ? AND scenario_number = ? AND section_key = ?
+        """, (str(rice_profile), scenario_number, key))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if row[0]:
+            return bytes(row[0])
+        return tes070_store.load_section(cursor, rice_profile, scenario_number)
+    
+    def put(self, rice_profile, scenario_number, key, content):
+        cursor = self.conn.cursor()
+        parts = tes070_store.split_docx(content)
+        if parts:
+            tes070_store.store_section_parts(cursor, rice_profile, scenario_number, parts)
+        else:
+            cursor.execute("DELETE FROM tes070_section_parts WHERE rice_profile = ? AND scenario_number = ?",
+                           (str(rice_profile), scenario_number))
+        cursor.execute("""
+            INSERT OR REPLACE INTO tes070_section_cache (rice_profile, scenario_number, section_key, content)
+            VALUES (?, ?, ?, ?)
+        """, (str(rice_profile), scenario_number, key, b'' if parts else content))
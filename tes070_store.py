@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import zlib
+import hashlib
+import zipfile
+from log_manager import get_logger
+
+logger = get_logger('tes070_store')
+
+# A TES-070 docx is a zip whose parts (document XML, styles, embedded screenshots)
+# barely change between versions. Versions are stored as an ordered list of parts in
+# tes070_version_parts; each distinct part is stored once in tes070_parts, keyed by
+# the sha256 of its bytes. Versions saved before this keep their whole docx in
+# tes070_versions.file_content and are read as-is. Cached scenario sections
+# (tes070_sections) list their parts in tes070_section_parts the same way, so a
+# section's screenshots are stored once however many versions embed them.
+
+def split_docx(file_content):
+    """[(name, compress_type, bytes)] for each zip member, or None when it is not a zip"""
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            return [(info.filename, info.compress_type, archive.read(info)) for info in archive.infolist()]
+    except (zipfile.BadZipFile, ValueError, TypeError):
+        return None
+
+def build_docx(parts):
+    """Reassemble a docx from [(name, compress_type, bytes)] in the stored order"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, compress_type, data in parts:
+            archive.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data,
+                             compress_type=compress_type)
+    return buffer.getvalue()
+
+def _pack(data):
+    """Stored form of a part: zlib when it saves space (XML), raw otherwise (images)"""
+    packed = zlib.compress(data, 6)
+    return (packed, 1) if len(packed) < len(data) else (data, 0)
+
+def _store_contents(cursor, parts):
+    """Write the parts' content not already stored; returns (part hashes, new parts, new bytes written)"""
+    hashes = [hashlib.sha256(data).hexdigest() for _, _, data in parts]
+    
+    existing = set()
+    unique = list(set(hashes))
+    for start in range(0, len(unique), 500):
+        chunk = unique[start:start + 500]
+        cursor.execute(f"SELECT hash FROM tes070_parts WHERE hash IN ({','.join('?' * len(chunk))})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    
+    written = 0
+    new_parts = {}
+    for part_hash, (_, _, data) in zip(hashes, parts):
+        if part_hash not in existing and part_hash not in new_parts:
+            content, compressed = _pack(data)
+            new_parts[part_hash] = (part_hash, len(data), compressed, content)
+            written += len(content)
+    cursor.executemany("INSERT OR IGNORE INTO tes070_parts (hash, size, compressed, content) VALUES (?, ?, ?, ?)",
+                       list(new_parts.values()))
+    return hashes, len(new_parts), written
+
+def store_parts(cursor, version_id, parts):
+    """Record a version's parts, writing only content not already stored; returns new bytes written"""
+    hashes, new_count, written = _store_contents(cursor, parts)
+    cursor.executemany("""
+        INSERT INTO tes070_version_parts (version_id, position, name, compress_type, part_hash)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(version_id, position, name, compress_type, part_hash)
+          for position, ((name, compress_type, _), part_hash) in enumerate(zip(parts, hashes))])
+    
+    logger.debug("TES-070 version %s: %s parts, %s new, %s bytes written",
+                 version_id, len(parts), new_count, written)
+    return written
+
+def store_section_parts(cursor, rice_profile, scenario_number, parts):
+    """Record a cached scenario section's parts in place of its previous ones; returns new bytes written"""
+    cursor.execute("DELETE FROM tes070_section_parts WHERE rice_profile = ? AND scenario_number = ?",
+                   (str(rice_profile), scenario_number))
+    hashes, _, written = _store_contents(cursor, parts)
+    cursor.executemany("""
+        INSERT INTO tes070_section_parts (rice_profile, scenario_number, position, name, compress_type, part_hash)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(str(rice_profile), scenario_number, position, name, compress_type, part_hash)
+          for position, ((name, compress_type, _), part_hash) in enumerate(zip(parts, hashes))])
+    return written
+
+def _build_from_rows(rows):
+    if not rows:
+        return None
+    return build_docx([(name, compress_type, zlib.decompress(content) if compressed else bytes(content))
+                       for name, compress_type, compressed, content in rows])
+
+def load_docx(cursor, version_id):
+    """Rebuild a split version's docx, or None when the version has no parts"""
+    cursor.execute("""
+        SELECT vp.name, vp.compress_type, p.compressed, p.content
+        FROM tes070_version_parts vp
+        JOIN tes070_parts p ON p.hash = vp.part_hash
+        WHERE vp.version_id = ?
+        ORDER BY vp.position
+    """, (version_id,))
+    return _build_from_rows(cursor.fetchall())
+
+def load_section(cursor, rice_profile, scenario_number):
+    """Rebuild a cached section's docx, or None when it has no parts"""
+    cursor.execute("""
+        SELECT sp.name, sp.compress_type, p.compressed, p.content
+        FROM tes070_section_parts sp
+        JOIN tes070_parts p ON p.hash = sp.part_hash
+        WHERE sp.rice_profile = ? AND sp.scenario_number = ?
+        ORDER BY sp.position
+    """, (str(rice_profile), scenario_number))
+    return _build_from_rows(cursor.fetchall())
+
+def delete_versions(cursor, version_ids):
+    """Delete versions and any parts no remaining version uses; returns part bytes freed"""
+    if not version_ids:
+        return 0
+    rows = [(version_id,) for version_id in version_ids]
+    cursor.executemany("DELETE FROM tes070_version_parts WHERE version_id = ?", rows)
+    cursor.executemany("DELETE FROM tes070_versions WHERE id = ?", rows)
+    return collect_garbage(cursor)
+
+def collect_garbage(cursor):
+    """Drop parts no version or cached section references; returns stored bytes freed"""
+    orphaned = ("FROM tes070_parts WHERE hash NOT IN "
+                "(SELECT part_hash FROM tes070_version_parts UNION SELECT part_hash FROM tes070_section_parts)")
+    cursor.execute(f"SELECT COALESCE(SUM(LENGTH(content)), 0) {orphaned}")
+    freed = cursor.fetchone()[0]
+    if freed:
+        cursor.execute(f"DELETE {orphaned}")
+    return freed
+
+def prune_section_cache(cursor):
+    """Drop cached sections of scenarios that no longer exist, then unused parts; returns (sections, bytes freed)"""
+    stale = """
+        FROM tes070_section_cache c
+        WHERE NOT EXISTS (SELECT 1 FROM scenarios s
+                          WHERE s.rice_profile = c.rice_profile AND s.scenario_number = c.scenario_number)
+    """
+    cursor.execute(f"SELECT c.rice_profile, c.scenario_number, LENGTH(c.content) {stale}")
+    rows = cursor.fetchall()
+    keys = [(rice_profile, scenario_number) for rice_profile, scenario_number, _ in rows]
+    cursor.executemany("DELETE FROM tes070_section_parts WHERE rice_profile = ? AND scenario_number = ?", keys)
+    cursor.executemany("DELETE FROM tes070_section_cache WHERE rice_profile = ? AND scenario_number = ?", keys)
+    return len(rows), sum(row[2] or 0 for row in rows) + collect_garbage(cursor)
+
+def split_legacy_versions(cursor, limit=20):
+    """Move up to limit whole-docx versions into part storage; returns (versions, bytes saved)"""
+    # Zip signature check, so blobs that are not a docx are not picked up again every pass
+    cursor.execute("""
+        SELECT id FROM tes070_versions
+        WHERE LENGTH(file_content) > 0 AND SUBSTR(file_content, 1, 2) = X'504B'
+        LIMIT ?
+    """, (limit,))
+    converted = 0
+    saved = 0
+    for (version_id,) in cursor.fetchall():
+        cursor.execute("SELECT file_content FROM tes070_versions WHERE id = ?", (version_id,))
+        file_content = cursor.fetchone()[0]
+        parts = split_docx(file_content)
+        if parts is None:
+            continue  # Not a docx - stays whole
+        saved += len(file_content) - store_parts(cursor, version_id, parts)
+        cursor.execute("UPDATE tes070_versions SET file_content = ? WHERE id = ?", (b'', version_id))
+        converted += 1
+    return converted, saved
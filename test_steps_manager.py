@@ -384,6 +384,10 @@ class TestStepsManager:
                  bg='#6366f1', fg='#ffffff', relief='flat', padx=10, pady=6, 
                  cursor='hand2', bd=0, command=lambda: self._show_bulk_operations(group_id, popup)).pack(side='right', padx=(0, 8))
         
+        tk.Button(actions_frame, text="🧪 Dry Run", font=('Segoe UI', 9, 'bold'), 
+                 bg='#3b82f6', fg='#ffffff', relief='flat', padx=10, pady=6, 
+                 cursor='hand2', bd=0, command=lambda: self._show_locator_dry_run(group_id, group_name, popup)).pack(side='right', padx=(0, 8))
+        
         tk.Button(actions_frame, text="🎯 Picker", font=('Segoe UI', 9, 'bold'), 
                  bg='#f59e0b', fg='#ffffff', relief='flat', padx=10, pady=6, 
                  cursor='hand2', bd=0, command=lambda: self._show_element_picker(group_id, popup)).pack(side='right', padx=(0, 8))
@@ -634,11 +638,6 @@ class TestStepsManager:
     def _reorder_steps(self, step_id, source_index, target_index):
         """Reorder steps by moving step from source to target position"""
         try:
-            cursor = self.db_manager.conn.cursor()
-            
-            # Get all steps for this group
-            all_steps = self.db_manager.get_test_steps_by_group(self.current_group_id)
-            
             # Calculate actual indices considering pagination
             steps_per_page = 10
             page_offset = (self.current_steps_page - 1) * steps_per_page
@@ -648,21 +647,8 @@ class TestStepsManager:
             if actual_source == actual_target:
                 return
             
-            # Reorder the steps list
-            step_to_move = all_steps[actual_source]
-            all_steps.pop(actual_source)
-            all_steps.insert(actual_target, step_to_move)
-            
-            # Update step_order in database
-            for i, step in enumerate(all_steps):
-                step_id_to_update = step[0]
-                new_order = i + 1
-                cursor.execute(
-                    "UPDATE test_steps SET step_order = ? WHERE id = ? AND user_id = ?",
-                    (new_order, step_id_to_update, self.db_manager.user_id)
-                )
-            
-            self.db_manager.conn.commit()
+            # Sparse ordering - normally only the moved step is rewritten
+            self.db_manager.move_test_step(self.current_group_id, step_id, actual_target)
             self._load_group_steps(self.current_group_id)
             
         except Exception as e:
@@ -882,9 +868,7 @@ class TestStepsManager:
             name, step_type, target, description, group_id = step_data
             new_name = f"{name} (Copy)"
             
-            cursor.execute("SELECT COALESCE(MAX(step_order), 0) + 1 FROM test_steps WHERE user_id = ? AND group_id = ?", 
-                          (self.db_manager.user_id, group_id))
-            next_order = cursor.fetchone()[0]
+            next_order = self.db_manager.next_test_step_order(group_id)
             
             rice_profiles = self.db_manager.get_rice_profiles()
             rice_profile_id = rice_profiles[0][0] if rice_profiles else 1
@@ -1093,6 +1077,39 @@ class TestStepsManager:
         except Exception as e:
             self.show_popup("Element Picker", f"🎯 Visual Element Picker\n\nFeatures:\n• Click elements in browser\n• Auto-generate selectors\n• Multiple selector options\n• Real-time element highlighting", "info")
     
+    def _show_locator_dry_run(self, group_id, group_name, parent):
+        """Open the group's pages once and check every locator its steps use"""
+        from locator_dry_run import load_group_steps
+        from selenium_manager import SeleniumManager
+        from step_preview import StepPreview
+        
+        steps = load_group_steps(self.db_manager.conn, self.db_manager.user_id, group_id)
+        if not steps:
+            self.show_popup("Dry Run", "This group has no steps to check", "warning")
+            return
+        
+        config = self.db_manager.get_global_config()
+        selenium_manager = SeleniumManager()
+        try:
+            selenium_manager.create_driver(config[1] if config and config[1] else "chrome",
+                                           bool(config and config[3]), bool(config and config[2]))
+        except Exception as e:
+            self.show_popup("Dry Run", f"Failed to launch browser: {str(e)}", "error")
+            return
+        
+        if config and config[4]:
+            # Steps before the group's first Navigate are checked on the FSM start page
+            selenium_manager.driver.get(config[4])
+        
+        def on_close():
+            selenium_manager.close()
+            if parent.winfo_exists():
+                # Healed targets show up in the step list
+                self._load_group_steps(group_id)
+        
+        preview = StepPreview(selenium_manager, self.show_popup)
+        preview.run_dry_run(steps, group_name, self.db_manager.conn, self.db_manager.user_id, parent, on_close)
+    
     def _show_bulk_operations(self, group_id, parent):
         """Show Bulk Operations - Phase 3 Feature"""
         try:
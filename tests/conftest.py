@@ -0,0 +1,26 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The application modules live at the repository root, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """DatabaseManager on a fresh database file for user 1"""
+    from database_manager import DatabaseManager
+    path = str(tmp_path / 'fsm_tester.db')
+    conn = sqlite3.connect(path)
+    # init_database migrates tables that reference users, which the login system creates
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)")
+    conn.execute("INSERT INTO users (id, username) VALUES (1, 'tester')")
+    conn.commit()
+    conn.close()
+    manager = DatabaseManager(1, db_path=path)
+    yield manager
+    manager.conn.close()
@@ -0,0 +1,173 @@
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+import api_auth  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Token endpoint (POST) and ION API (GET) in one local server"""
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        form = {k: v[0] for k, v in urllib.parse.parse_qs(self.rfile.read(length).decode()).items()}
+        self.server.grants.append(form)
+        if form.get('password') == 'wrong':
+            return self._reply(401, {'error': 'invalid_grant'})
+        if form['grant_type'] == 'refresh_token' and form['refresh_token'] == 'revoked':
+            return self._reply(400, {'error': 'invalid_grant'})
+        payload = {'access_token': f"token{len(self.server.grants)}", 'token_type': 'Bearer',
+                   'expires_in': 3600, 'refresh_token': 'refresh1'}
+        self._reply(200, payload)
+
+    def do_GET(self):
+        self.server.api_calls.append((self.headers['Host'], self.headers.get('Authorization')))
+        self._reply(200, {})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    stub = HTTPServer(('127.0.0.1', 0), StubHandler)
+    stub.grants = []
+    stub.api_calls = []
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def ionapi(server):
+    base = f"http://127.0.0.1:{server.server_port}"
+    return {'pu': f"{base}/", 'ot': 'as/token.oauth2', 'iu': base, 'ti': 'TENANT_TST',
+            'ci': 'client', 'cs': 'secret', 'saak': 'account', 'sask': 'password'}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_is_cached_per_account(server, ionapi):
+    service = api_auth.TokenService(clock=Clock())
+    token = service.get_token(ionapi)
+    assert service.get_token(ionapi) is token
+    assert len(server.grants) == 1
+    assert server.grants[0]['grant_type'] == 'password'
+    assert server.grants[0]['client_secret'] == 'secret'
+
+
+def test_token_refreshed_ahead_of_expiry(server, ionapi):
+    clock = Clock()
+    service = api_auth.TokenService(clock=clock)
+    first = service.get_token(ionapi)
+    clock.now += 3600 - api_auth.REFRESH_AHEAD_SECONDS + 1
+    second = service.get_token(ionapi)
+    assert second['access_token'] != first['access_token']
+    assert server.grants[-1]['grant_type'] == 'refresh_token'
+    assert server.grants[-1]['refresh_token'] == 'refresh1'
+
+
+def test_failed_refresh_falls_back_to_password_grant(server, ionapi):
+    clock = Clock()
+    service = api_auth.TokenService(clock=clock)
+    service.get_token(ionapi)['refresh_token'] = 'revoked'
+    clock.now += 3600 - api_auth.REFRESH_AHEAD_SECONDS + 1
+    assert service.get_token(ionapi)['access_token'] == 'token3'
+    assert [grant['grant_type'] for grant in server.grants] == ['password', 'refresh_token', 'password']
+
+
+def test_concurrent_callers_share_one_request(server, ionapi):
+    service = api_auth.TokenService()
+    threads = [threading.Thread(target=service.get_token, args=(ionapi,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(server.grants) == 1
+
+
+def test_rejected_credentials_raise(server, ionapi):
+    with pytest.raises(ValueError):
+        api_auth.TokenService().get_token(dict(ionapi, sask='wrong'))
+
+
+def test_session_sends_token_to_api_host_only(server, ionapi):
+    clock = Clock()
+    service = api_auth.TokenService(clock=clock)
+    auth = api_auth.IONAPIAuth(service, ionapi)
+    session = api_auth.requests.Session()
+    session.auth = auth
+    port = server.server_port
+
+    session.get(f"http://127.0.0.1:{port}/TENANT_TST/api")
+    session.get(f"http://localhost:{port}/elsewhere")
+    clock.now += 3600
+    session.get(f"http://127.0.0.1:{port}/TENANT_TST/api")
+
+    assert server.api_calls == [
+        (f"127.0.0.1:{port}", 'Bearer token1'),
+        (f"localhost:{port}", None),
+        (f"127.0.0.1:{port}", 'Bearer token2'),
+    ]
+
+
+def test_failed_request_is_not_retried_until_the_backoff_passes(server, ionapi):
+    clock = Clock()
+    service = api_auth.TokenService(clock=clock)
+    rejected = dict(ionapi, sask='wrong')
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            service.get_token(rejected)
+    assert len(server.grants) == 1
+
+    clock.now += api_auth.FAILURE_RETRY_SECONDS
+    with pytest.raises(ValueError):
+        service.get_token(rejected)
+    assert len(server.grants) == 2
+
+
+class Accounts:
+    """get_service_accounts/get_service_account_content over in-memory .ionapi files"""
+
+    def __init__(self, *ionapis):
+        self.files = {index + 1: ionapi for index, ionapi in enumerate(ionapis)}
+
+    def get_service_accounts(self):
+        return [(account_id, f"account{account_id}", None, None) for account_id in self.files]
+
+    def get_service_account_content(self, account_id):
+        return f"account{account_id}", json.dumps(self.files[account_id]).encode('utf-8')
+
+
+def test_scenario_uses_the_account_for_the_profile_tenant(ionapi):
+    db = Accounts(dict(ionapi, ti='TENANT_PRD'), ionapi)
+    auth = api_auth.APIAuthenticator(db)
+    assert auth.select_service_account(tenant='tenant_tst')
+    assert auth.service_account_data['ti'] == 'TENANT_TST'
+    assert auth.select_service_account(account_id=1)
+    assert auth.service_account_data['ti'] == 'TENANT_PRD'
+    assert not auth.select_service_account(tenant='TENANT_DEV')
+    assert auth.service_account_data is None
+    # Two accounts and nothing naming one: no guess
+    assert not auth.select_service_account()
+    assert api_auth.APIAuthenticator(Accounts(ionapi)).select_service_account()
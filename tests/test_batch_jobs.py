@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+import batch_jobs
+from batch_jobs import BatchJobStore, ITEM_FAILED, ITEM_PASSED, ITEM_PENDING, ITEM_RUNNING, RUN_RUNNING
+
+
+def add_scenarios(conn, count):
+    rows = []
+    for number in range(1, count + 1):
+        cursor = conn.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description) "
+                              "VALUES (1, '9', ?, ?)", (number, f"Scenario {number}"))
+        rows.append((cursor.lastrowid, number, f"Scenario {number}"))
+    conn.commit()
+    return rows
+
+
+@pytest.fixture
+def store(db_manager, monkeypatch):
+    # No heartbeat thread: each test decides whether the owner looks alive
+    monkeypatch.setattr(batch_jobs, '_heartbeat_thread', object())
+    monkeypatch.setattr(batch_jobs, '_active_runs', set())
+    return BatchJobStore(db_manager.db_path, 1)
+
+
+def lose_owner(db_path, run_id, stale=True):
+    """What another process sees after the owner died: not in its _active_runs, heartbeat old"""
+    batch_jobs._active_runs.discard((db_path, run_id))
+    if stale:
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE batch_runs SET updated_at = datetime('now', '-1 hour') WHERE id = ?", (run_id,))
+        conn.commit()
+        conn.close()
+
+
+def queued_numbers(store, run_id, failures_only=False):
+    return [scenario[1] for _, scenario in store.get_queue(run_id, failures_only)]
+
+
+def test_interrupted_run_resumes_only_unfinished_items(db_manager, store):
+    run_id = store.create_run('9', add_scenarios(db_manager.conn, 5))
+    queue = store.get_queue(run_id)
+    for item_id, _ in queue[:2]:
+        store.mark_item_running(item_id)
+        store.mark_item_result(item_id, ITEM_PASSED)
+    store.mark_item_running(queue[2][0])    # mid-flight when the process died
+    assert store.find_resumable_run('9') is None
+
+    lose_owner(db_manager.db_path, run_id)
+    run = store.find_resumable_run('9')
+    assert run['run_id'] == run_id
+    assert run['status'] == 'interrupted'
+    assert (run['passed'], run['remaining']) == (2, 3)
+
+    assert store.resume_run(run_id)
+    assert store.get_run(run_id)['status'] == RUN_RUNNING
+    assert queued_numbers(store, run_id) == [3, 4, 5]
+    counts = store.get_counts(run_id)
+    assert (counts[ITEM_PENDING], counts[ITEM_RUNNING]) == (2, 1)
+
+
+def test_run_with_a_live_owner_is_not_resumed(db_manager, store):
+    run_id = store.create_run('9', add_scenarios(db_manager.conn, 2))
+    assert not store.resume_run(run_id)     # this process is executing it
+
+    lose_owner(db_manager.db_path, run_id, stale=False)     # another process, still heartbeating
+    assert store.find_resumable_run('9') is None
+    assert not store.resume_run(run_id)
+
+
+def test_only_one_process_claims_a_stale_run(db_manager, store):
+    run_id = store.create_run('9', add_scenarios(db_manager.conn, 2))
+    lose_owner(db_manager.db_path, run_id)
+    assert store.resume_run(run_id)
+    lose_owner(db_manager.db_path, run_id, stale=False)    # the second claimant runs in another process
+    assert not store.resume_run(run_id)
+
+
+def test_finished_run_with_failures_resumes_its_failures(db_manager, store):
+    run_id = store.create_run('9', add_scenarios(db_manager.conn, 3))
+    for (item_id, _), state in zip(store.get_queue(run_id), (ITEM_PASSED, ITEM_FAILED, ITEM_PASSED)):
+        store.mark_item_result(item_id, state)
+    store.finish_run(run_id, batch_jobs.RUN_COMPLETED)
+
+    run = store.find_resumable_run('9')
+    assert (run['status'], run['failed'], run['remaining']) == ('completed', 1, 0)
+    assert store.resume_run(run_id)
+    assert queued_numbers(store, run_id, failures_only=True) == [2]
@@ -0,0 +1,74 @@
+import json
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from evidence_export import export_evidence
+from screenshot_storage import make_reference
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def png(size, color):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def add_step(conn, step_order, before, after, saved_at='2026-01-05 10:00:00'):
+    conn.execute("""
+        INSERT INTO scenario_steps (user_id, rice_profile, scenario_number, step_order, fsm_page_id, step_name,
+                                    screenshot_before, screenshot_after, screenshot_timestamp)
+        VALUES (1, '3', 1, ?, 1, ?, ?, ?, ?)
+    """, (step_order, f"Step {step_order}", before, after, saved_at))
+
+
+@pytest.fixture
+def scenario(db_manager):
+    conn = db_manager.conn
+    conn.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description, result) "
+                 "VALUES (1, '3', 1, 'Happy path', 'Passed')")
+    return conn
+
+
+def export(conn, tmp_path):
+    path = str(tmp_path / 'evidence.zip')
+    export_evidence(conn, 1, path, rice_profile='3')
+    archive = zipfile.ZipFile(path)
+    steps = [json.loads(line) for line in archive.read('steps.jsonl').decode('utf-8').splitlines()]
+    return archive, {step['step_order']: step for step in steps}
+
+
+def test_reference_to_a_later_frame_copies_that_frame(scenario, tmp_path):
+    after = png((640, 400), (20, 90, 160))
+    # Step 1's before-frame points at its own after-frame, which is written after it
+    add_step(scenario, 1, make_reference(1, 'after', '2026-01-05 10:00:00'), after)
+    scenario.commit()
+
+    archive, steps = export(scenario, tmp_path)
+    assert steps[1]['before']['path'].endswith('step_1_before.png')
+    assert archive.read(steps[1]['before']['path']) == after
+    assert steps[1]['after']['size'] == len(after)
+
+
+def test_reference_to_a_written_frame_points_at_it(scenario, tmp_path):
+    first = png((200, 100), (255, 0, 0))
+    add_step(scenario, 1, png((200, 100), (0, 0, 0)), first)
+    add_step(scenario, 2, make_reference(1, 'after', '2026-01-05 10:00:00'), png((200, 100), (0, 255, 0)))
+    scenario.commit()
+
+    archive, steps = export(scenario, tmp_path)
+    assert steps[2]['before']['path'] == steps[1]['after']['path']
+    assert steps[2]['before']['reference'] is True
+
+
+def test_stale_and_malformed_references_are_dropped(scenario, tmp_path):
+    add_step(scenario, 1, png((200, 100), (0, 0, 0)), png((200, 100), (9, 9, 9)), saved_at='2026-02-01 08:00:00')
+    add_step(scenario, 2, make_reference(1, 'after', '2026-01-05 10:00:00'), None)   # from an older run
+    add_step(scenario, 3, make_reference(1, 'length(x) FROM y --'), None)
+    scenario.commit()
+
+    _, steps = export(scenario, tmp_path)
+    assert steps[2]['before'] is None
+    assert steps[3]['before'] is None
@@ -0,0 +1,69 @@
+import json
+import time
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+
+from headless_runner import HeadlessRunner, write_json, write_junit
+
+
+def result(number, status, duration, message=None, failed_step=None, steps=3):
+    return {'position': number - 1, 'scenario_id': 100 + number, 'scenario_number': number,
+            'description': f"Scenario {number}", 'status': status, 'steps_total': steps,
+            'steps_executed': steps if status == 'passed' else 1, 'failed_step': failed_step,
+            'message': message, 'started_at': '2026-01-05T10:00:00', 'duration_seconds': duration}
+
+
+def report():
+    results = [result(1, 'passed', 4.0),
+               result(2, 'failed', 6.0, "Element not found", {'step': 2, 'name': 'Click Save'}),
+               result(3, 'skipped', 0.0, "No steps found", steps=0)]
+    runner = SimpleNamespace(workers=2)
+    return HeadlessRunner._report(runner, 57, 12, 'full', results, time.time() - 30, 'completed', {2: [2, 3]})
+
+
+def test_report_summary_fields():
+    summary = report()
+    assert (summary['run_id'], summary['rice_profile'], summary['mode'], summary['status']) == \
+        (57, '12', 'full', 'completed')
+    assert summary['visual_changes'] == {'2': [2, 3]}
+    metrics = summary['metrics']
+    assert (metrics['total'], metrics['passed'], metrics['failed'], metrics['skipped']) == (3, 1, 1, 1)
+    assert metrics['workers'] == 2
+    # Skipped scenarios did not run, so they stay out of the timing figures
+    assert (metrics['scenario_seconds_total'], metrics['scenario_seconds_avg'],
+            metrics['scenario_seconds_max']) == (10.0, 5.0, 6.0)
+    assert metrics['steps_executed'] == 3 + 1 + 1
+    assert metrics['duration_seconds'] >= 30
+
+
+def test_json_report_round_trips(tmp_path):
+    path = tmp_path / 'results.json'
+    write_json(report(), str(path))
+    loaded = json.loads(path.read_text(encoding='utf-8'))
+    assert [entry['status'] for entry in loaded['results']] == ['passed', 'failed', 'skipped']
+    assert loaded['results'][1]['failed_step'] == {'step': 2, 'name': 'Click Save'}
+
+
+def test_junit_report_structure(tmp_path):
+    path = tmp_path / 'results.xml'
+    write_junit(report(), str(path))
+    suites = ET.parse(path).getroot()
+    assert suites.tag == 'testsuites'
+    assert (suites.get('tests'), suites.get('failures'), suites.get('skipped')) == ('3', '1', '1')
+
+    suite = suites.find('testsuite')
+    assert suite.get('name') == 'RICE profile 12'
+    assert (suite.get('tests'), suite.get('failures'), suite.get('errors'), suite.get('skipped')) == \
+        ('3', '1', '0', '1')
+    properties = {prop.get('name'): prop.get('value') for prop in suite.iter('property')}
+    assert properties['run_id'] == '57' and properties['metrics.passed'] == '1'
+
+    passed, failed, skipped = suite.findall('testcase')
+    assert passed.get('name') == 'Scenario 1: Scenario 1' and passed.get('classname') == 'rice_profile_12'
+    assert passed.get('time') == '4.0' and len(passed) == 0
+    failure = failed.find('failure')
+    assert failure.get('message') == 'Element not found'
+    assert failure.text == 'Failed at step 2 (Click Save)'
+    assert failed.find('system-out').text == 'Visual change at step(s) 2, 3'
+    assert skipped.find('skipped').get('message') == 'No steps found'
+    assert skipped.find('failure') is None
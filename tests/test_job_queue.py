@@ -0,0 +1,98 @@
+import multiprocessing
+import time
+
+import pytest
+
+from batch_jobs import ITEM_FAILED, ITEM_PASSED, ITEM_PENDING, RUN_COMPLETED
+from job_queue import JobQueue, retry_delay
+
+SCENARIO_COUNT = 40
+
+
+def add_scenarios(conn, count):
+    rows = []
+    for number in range(1, count + 1):
+        cursor = conn.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description) "
+                              "VALUES (1, '9', ?, ?)", (number, f"Scenario {number}"))
+        rows.append((cursor.lastrowid, number, f"Scenario {number}"))
+    conn.commit()
+    return rows
+
+
+@pytest.fixture
+def queue(db_manager):
+    return JobQueue(db_manager.db_path)
+
+
+def claim_until_empty(db_path, worker_id, claimed):
+    """Worker process: claim and pass items until the queue is empty"""
+    queue = JobQueue(db_path)
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            return
+        claimed.put(job['id'])
+        assert queue.complete(job['id'], worker_id, ITEM_PASSED)
+
+
+def test_concurrent_workers_claim_each_item_once(db_manager, queue):
+    run_id = queue.submit(1, '9', add_scenarios(db_manager.conn, SCENARIO_COUNT))
+
+    context = multiprocessing.get_context('spawn')
+    claimed = context.Queue()
+    workers = [context.Process(target=claim_until_empty, args=(db_manager.db_path, f"worker-{n}", claimed))
+               for n in range(4)]
+    for worker in workers:
+        worker.start()
+    item_ids = [claimed.get(timeout=60) for _ in range(SCENARIO_COUNT)]
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    assert len(set(item_ids)) == SCENARIO_COUNT
+    assert claimed.empty()
+    progress = queue.get_progress(run_id)
+    assert progress['status'] == RUN_COMPLETED and progress[ITEM_PASSED] == SCENARIO_COUNT
+    assert db_manager.conn.execute("SELECT COUNT(*) FROM scenarios WHERE result = 'Passed'").fetchone() == \
+        (SCENARIO_COUNT,)
+
+
+def test_expired_lease_is_reclaimed_and_old_result_rejected(db_manager):
+    queue = JobQueue(db_manager.db_path, lease_seconds=0.05)
+    queue.submit(1, '9', add_scenarios(db_manager.conn, 1))
+    first = queue.claim('crashed-worker')
+    time.sleep(0.1)
+
+    second = queue.claim('other-worker')
+    assert second['id'] == first['id'] and second['attempts'] == 2
+    assert not queue.heartbeat(first['id'], 'crashed-worker')
+    assert not queue.complete(first['id'], 'crashed-worker', ITEM_PASSED)
+    assert queue.complete(second['id'], 'other-worker', ITEM_FAILED, error='Step 3 failed')
+    assert db_manager.conn.execute("SELECT result FROM scenarios").fetchone() == ('Failed',)
+
+
+def test_crash_is_retried_with_backoff_until_attempts_run_out(db_manager, queue):
+    run_id = queue.submit(1, '9', add_scenarios(db_manager.conn, 1), max_attempts=2)
+    job = queue.claim('worker')
+    assert queue.retry(job['id'], 'worker', 'browser crashed')
+    assert queue.claim('worker') is None   # backing off
+    assert queue.get_progress(run_id)[ITEM_PENDING] == 1
+
+    db_manager.conn.execute("UPDATE batch_run_items SET available_at = 0")
+    db_manager.conn.commit()
+    job = queue.claim('worker')
+    assert job['attempts'] == 2
+    assert queue.retry(job['id'], 'worker', 'browser crashed again')
+    progress = queue.get_progress(run_id)
+    assert progress['status'] == RUN_COMPLETED and progress[ITEM_FAILED] == 1
+
+
+def test_cancelled_run_hands_out_nothing(db_manager, queue):
+    run_id = queue.submit(1, '9', add_scenarios(db_manager.conn, 3))
+    queue.cancel_run(run_id)
+    assert queue.claim('worker') is None
+
+
+def test_retry_delay_doubles_up_to_the_cap():
+    assert [retry_delay(attempt) for attempt in (1, 2, 3)] == [30, 60, 120]
+    assert retry_delay(20) == 600
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip('selenium')
+
+from locator_dry_run import candidate_to_target  # noqa: E402
+
+
+def candidate(by, value):
+    return {'strategy': 'fallback', 'by': by, 'value': value}
+
+
+@pytest.mark.parametrize('by, value, expected', [
+    ('id', 'username', '#username'),
+    ('id', 'form:user.name', "//*[@id='form:user.name']"),
+    ('class', 'login-field', "//*[contains(concat(' ', normalize-space(@class), ' '), ' login-field ')]"),
+    ('tag', 'input', '//input'),
+    ('xpath', "//input[@name='user']", "//input[@name='user']"),
+    ('css', 'input[name="user"]', None),
+])
+def test_text_input_heals_to_id_or_xpath(by, value, expected):
+    healed = candidate_to_target(candidate(by, value), "Text Input")
+    assert healed == expected
+    assert healed is None or healed.startswith(('#', '//'))
+
+
+@pytest.mark.parametrize('by, value, expected', [
+    ('id', 'submit', '#submit'),
+    ('class', 'btn-primary', '.btn-primary'),
+    ('tag', 'button', 'button'),
+    ('css', 'button[type="submit"]', 'button[type="submit"]'),
+    ('xpath', "//button[text()='Save']", "//button[text()='Save']"),
+])
+def test_element_click_keeps_css_forms(by, value, expected):
+    assert candidate_to_target(candidate(by, value), "Element Click") == expected
+
+
+def test_quotes_in_ids_are_escaped():
+    assert candidate_to_target(candidate('id', "it's \"x\""), "Text Input") == \
+        "//*[@id=concat('it', \"'\", 's \"x\"')]"
@@ -0,0 +1,59 @@
+import pathlib
+
+import pytest
+
+from conftest import FIXTURES
+
+pytest.importorskip('selenium')
+
+from selenium import webdriver  # noqa: E402
+from selenium.common.exceptions import WebDriverException  # noqa: E402
+
+from locator_fallback import LocatorFallback  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    try:
+        browser = webdriver.Chrome(options=options)
+    except WebDriverException as e:
+        pytest.skip(f"Chrome is not available: {e.msg}")
+    yield browser
+    browser.quit()
+
+
+def open_fixture(driver, name, **query):
+    url = pathlib.Path(FIXTURES, name).as_uri()
+    if query:
+        url += '?' + '&'.join(f"{key}={value}" for key, value in query.items())
+    driver.get(url)
+
+
+# The bare "button" tag fallback matches the Cancel button from the first poll
+TARGET = '//button[text()="Submit"]'
+
+
+def test_primary_wins_over_fallback_while_rendering(driver):
+    open_fixture(driver, 'locator_delayed_primary.html', delay=1500)
+    report = LocatorFallback(driver, timeout=6).probe(TARGET)
+    assert report['match']['strategy'] == 'primary'
+    assert report['element'].get_attribute('id') == 'submitBtn'
+
+
+def test_fallback_only_after_grace_period(driver):
+    open_fixture(driver, 'locator_delayed_primary.html', delay=-1)
+    fallback = LocatorFallback(driver, timeout=4)
+    fallback.primary_grace = 1
+    report = fallback.probe(TARGET)
+    assert report['match']['strategy'] == 'tag'
+    assert report['element'].get_attribute('id') == 'cancelBtn'
+    assert report['elapsed'] >= 1
+
+
+def test_missing_element_reports_nothing(driver):
+    open_fixture(driver, 'locator_delayed_primary.html', delay=-1)
+    report = LocatorFallback(driver, timeout=1).probe('#doesNotExist')
+    assert report['element'] is None
+    assert report['match'] is None
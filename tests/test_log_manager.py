@@ -0,0 +1,29 @@
+import logging
+
+from log_manager import RingBufferHandler
+
+
+def record(name, level, message):
+    return logging.LogRecord(name, level, __file__, 1, message, None, None)
+
+
+def test_read_since_returns_only_newer_entries():
+    ring = RingBufferHandler(capacity=10)
+    ring.emit(record('rice_tester.a', logging.INFO, 'one'))
+    start = ring.latest_sequence()
+    ring.emit(record('rice_tester.b', logging.WARNING, 'two'))
+    ring.emit(record('rice_tester.a', logging.ERROR, 'three'))
+
+    entries = ring.read_since(start)
+    assert [(entry[1], entry[2], entry[3]) for entry in entries] == [
+        ('WARNING', 'rice_tester.b', 'two'), ('ERROR', 'rice_tester.a', 'three')]
+    assert ring.read_since(entries[-1][0]) == []
+
+
+def test_read_since_after_the_buffer_wrapped():
+    ring = RingBufferHandler(capacity=3)
+    for index in range(8):
+        ring.emit(record('rice_tester.a', logging.INFO, str(index)))
+    assert [entry[3] for entry in ring.read_since(7)] == ['7']
+    # Entries that fell out of the buffer are gone; the rest still come back
+    assert [entry[3] for entry in ring.read_since(1)] == ['5', '6', '7']
@@ -0,0 +1,63 @@
+from recording_pipeline import coalesce_steps, normalize_recording, rank_selectors, selector_stability
+
+
+def event(action, target, timestamp, **fields):
+    return dict(fields, action=action, target=target, timestamp=timestamp)
+
+
+def test_keystrokes_merge_into_the_final_value():
+    steps, stats = coalesce_steps([
+        event("Click", "#user", 0.0),
+        event("Text Input", "#user", 0.5, value="a"),
+        event("Text Input", "#user", 0.6, value="ad"),
+        event("Text Input", "#user", 0.7, value="admin"),
+        event("Text Input", "#pass", 1.0, value=""),
+    ])
+    assert [(step['action'], step.get('value')) for step in steps] == [("Text Input", "admin")]
+    assert (stats.merged_inputs, stats.no_op_clicks, stats.empty_inputs) == (2, 1, 1)
+
+
+def test_click_driven_page_load_and_redirects_collapse():
+    steps, stats = coalesce_steps([
+        event("Navigate", "https://app.test/login", 0.0),
+        event("Navigate", "https://app.test/sso", 0.2),
+        event("Click", "#submit", 3.0),
+        event("Navigate", "https://app.test/home", 4.0),
+        event("Click", "BODY", 5.0),
+        event("Click", "#menu", 20.0),
+        event("Click", "#menu", 20.2),
+        event("Navigate", "https://app.test/reports", 40.0),
+    ])
+    assert [(step['action'], step['target']) for step in steps] == [
+        ("Navigate", "https://app.test/login"), ("Click", "#submit"), ("Click", "#menu"),
+        ("Navigate", "https://app.test/reports")]
+    assert steps[1]['wait_condition'] == 'page_load'
+    assert (stats.redirects, stats.click_navigations, stats.no_op_clicks) == (1, 1, 2)
+    assert stats.summary().startswith("8 recorded events -> 4 steps")
+
+
+def test_dropdown_click_is_part_of_choosing_an_option():
+    steps, _ = coalesce_steps([
+        event("Click", "#status", 0.0),
+        event("Select Option", "#status", 0.5, value="Open"),
+        event("Click", "#status", 2.0, alternatives=['[name="status"]']),
+        event("Select Option", '[name="status"]', 2.5, value="Closed"),
+    ])
+    assert [(step['action'], step['value']) for step in steps] == [
+        ("Select Option", "Open"), ("Select Option", "Closed")]
+
+
+def test_stable_selectors_rank_first():
+    assert selector_stability('#ext-gen1234') < selector_stability('[name="customer"]') < \
+        selector_stability('#customer')
+    assert rank_selectors('.btn.active', ['#save', '[data-testid="save"]', 'button']) == \
+        ['#save', '[data-testid="save"]', '.btn.active', 'button']
+
+
+def test_recording_becomes_test_step_rows():
+    rows, _ = normalize_recording([
+        event("Navigate", "https://app.test/", 0.0),
+        event("Click", ".btn", 30.0, value="Save", alternatives=['#save']),
+    ])
+    assert rows[0] == ("Step 1: Navigate", "Navigate", "https://app.test/", "Navigate to https://app.test/")
+    assert rows[1] == ("Step 2: Click 'Save'", "Element Click", "#save|.btn", "Click Save")
@@ -0,0 +1,57 @@
+from scenario_plan import (PlanCache, compile_plan, parse_email_check_target, parse_get_attribute_target,
+                           parse_get_text_target, parse_wait_seconds, split_selectors)
+
+
+def step(order, name, step_type, target=None, description=None, manual=0):
+    return (order, name, step_type, target, description, manual)
+
+
+def test_selector_lists():
+    assert split_selectors("#a|//b[@x='1,2']") == ['#a', "//b[@x='1,2']"]
+    assert split_selectors("#a, .b") == ['#a', '.b']
+    assert parse_get_text_target("#total, .sum | CACHE:total") == (['#total', '.sum'], 'total')
+    assert parse_get_attribute_target("#link | title | CACHE:url") == (['#link'], 'title', 'url')
+    assert parse_get_attribute_target("#link") == (['#link'], 'href', None)
+
+
+def test_wait_and_email_parameters():
+    assert parse_wait_seconds('Time (seconds): 3') == 3.0
+    assert parse_wait_seconds('soon') is None
+    assert parse_email_check_target("SEARCH:Invoice | CONTENT:paid, due | TIMEOUT:x") == \
+        {'search': 'Invoice', 'content': ['paid', 'due'], 'timeout': 60}
+
+
+def test_variables_must_be_captured_before_use():
+    steps, errors, _ = compile_plan([
+        step(1, 'Type order', 'Text Input', '#order', '${order_id}'),
+        step(2, 'Get order', 'Get Text', '#order | CACHE:order_id'),
+        step(3, 'Type again', 'Text Input', '#search', 'WO-${order_id}'),
+    ])
+    assert steps[1].produces == 'order_id'
+    assert errors == ["Step 1 (Type order): variable '${order_id}' is not captured by any earlier step"]
+
+
+def test_invalid_and_manual_steps():
+    steps, errors, warnings = compile_plan([
+        step(1, 'Click save', 'Element Click'),
+        step(2, 'Mystery', 'Teleport', '#x'),
+        step(3, 'Check printout', 'Teleport', manual=1),
+        step(4, 'Wait for it', 'Wait', description='later'),
+        step(5, 'Click button', None, '#go'),
+    ])
+    assert errors == ["Step 1 (Click save): 'Element Click' step has no target",
+                      "Step 2 (Mystery): unknown step type 'Teleport'"]
+    assert steps[3].params == {'seconds': 2}
+    assert steps[4].step_type == 'Element Click' and steps[4].type_detected
+    assert len(warnings) == 2
+
+
+def test_plan_cache_reuses_and_evicts():
+    cache = PlanCache(max_entries=1)
+    first = [step(1, 'Open', 'Navigate', 'https://example.test')]
+    second = [step(1, 'Open', 'Navigate', 'https://other.test')]
+    plan = cache.get_plan(first)
+    assert cache.get_plan([list(first[0])]) is plan   # same steps, other container
+    cache.get_plan(second)
+    assert cache.get_plan(first) is not plan
+    assert (cache.hits, cache.misses) == (1, 3)
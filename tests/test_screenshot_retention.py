@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+
+from screenshot_retention import DEFAULT_POLICY, ScreenshotRetention
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def png(size=(1600, 900)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def passed_scenario(db_manager):
+    """A passed scenario whose only run is ten days old; returns its profile id"""
+    conn = db_manager.conn
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO rice_profiles (user_id, rice_id, name, type, client_name) "
+                   "VALUES (1, 'INT001', 'Payroll', 'Interface', 'Acme')")
+    profile_id = cursor.lastrowid
+    cursor.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description, result) "
+                   "VALUES (1, ?, 1, 'Happy path', 'Passed')", (str(profile_id),))
+    cursor.execute("""
+        INSERT INTO scenario_steps (user_id, rice_profile, scenario_number, step_order, fsm_page_id,
+                                    screenshot_before, screenshot_after, screenshot_timestamp)
+        VALUES (1, ?, 1, 1, 1, ?, ?, ?)
+    """, (str(profile_id), png(), png(), str(datetime.now() - timedelta(days=10))))
+    conn.commit()
+    return profile_id
+
+
+def save_tes070(conn, profile_id, created_at=None):
+    conn.execute("""
+        INSERT INTO tes070_versions (user_id, rice_profile_id, version_number, file_content, created_by, created_at)
+        VALUES (1, ?, 1, x'00', 'tester', COALESCE(?, CURRENT_TIMESTAMP))
+    """, (profile_id, created_at))
+    conn.commit()
+
+
+def sizes(conn):
+    return conn.execute("SELECT LENGTH(screenshot_before), LENGTH(screenshot_after) FROM scenario_steps").fetchone()
+
+
+def test_latest_run_keeps_full_size_without_a_saved_tes070(db_manager, passed_scenario):
+    before = sizes(db_manager.conn)
+    report = ScreenshotRetention(db_manager.db_path, dict(DEFAULT_POLICY)).apply()
+    assert report['screenshots_downsampled'] == 0
+    assert sizes(db_manager.conn) == before
+
+
+def test_tes070_saved_before_the_run_does_not_count(db_manager, passed_scenario):
+    save_tes070(db_manager.conn, passed_scenario, created_at='2000-01-01 00:00:00')
+    report = ScreenshotRetention(db_manager.db_path, dict(DEFAULT_POLICY)).apply()
+    assert report['screenshots_downsampled'] == 0
+
+
+def test_downsampled_once_a_tes070_holds_the_run(db_manager, passed_scenario):
+    save_tes070(db_manager.conn, passed_scenario)
+    before = sizes(db_manager.conn)
+    report = ScreenshotRetention(db_manager.db_path, dict(DEFAULT_POLICY)).apply()
+    assert report['screenshots_downsampled'] == 2
+    assert all(after < full for after, full in zip(sizes(db_manager.conn), before))
@@ -0,0 +1,70 @@
+import pytest
+
+from step_analysis import (ISSUE_DEAD_SELECTOR, ISSUE_INVALID_SELECTOR, ISSUE_MISSING_TARGET,
+                           ISSUE_UNRESOLVED_VARIABLE, ISSUE_UNUSED, StepRecord, analyze_library,
+                           normalize_target, selector_problem, value_template)
+
+
+def record(step_id, step_type, target, description='', group_id=1):
+    return StepRecord(step_id, group_id, 'Group', f"Step {step_id}", step_type, target, description)
+
+
+def test_formatting_differences_are_exact_duplicates():
+    assert record(1, "Element Click", "//button[@id='save']").exact_key == \
+        record(2, "Element Click", ' //button[@id="save"] ').exact_key
+    assert record(1, "Navigate", "HTTPS://App.test/home/").exact_key == \
+        record(2, "Web Navigation", "https://app.test/home").exact_key
+    assert normalize_target("Get Attribute", "#a | title") == ('#a', 'title', 'CACHE:')
+
+
+def test_literal_values_are_near_duplicates():
+    assert value_template("WO-${order} for Acme") == "*${order}*"
+    typed_acme = record(1, "Text Input", "#customer", "Acme")
+    typed_globex = record(2, "Text Input", "#customer", "Globex")
+    assert typed_acme.exact_key != typed_globex.exact_key
+    assert typed_acme.near_key == typed_globex.near_key
+
+
+@pytest.mark.parametrize('selector, problem', [
+    ("//div[@id='x'", "unbalanced '['"),
+    ("//div[text()='it]", "unterminated quote"),
+    ("/html/body/div/div/div/form/input", "absolute XPath - breaks on any layout change"),
+    ("#save", None),
+])
+def test_selector_problems(selector, problem):
+    assert selector_problem(selector) == problem
+
+
+def add_step(conn, step_id, step_type, target, description=''):
+    conn.execute("""
+        INSERT INTO test_steps (id, user_id, rice_profile_id, group_id, name, step_type, target, description)
+        VALUES (?, 1, 1, 1, ?, ?, ?, ?)
+    """, (step_id, f"Step {step_id}", step_type, target, description))
+
+
+def use_step(conn, step_id, status):
+    conn.execute("""
+        INSERT INTO scenario_steps (user_id, rice_profile, scenario_number, step_order, fsm_page_id, test_step_id,
+                                    execution_status)
+        VALUES (1, '1', 1, ?, 1, ?, ?)
+    """, (step_id, step_id, status))
+
+
+def test_library_report(db_manager):
+    conn = db_manager.conn
+    add_step(conn, 1, "Element Click", "#save")
+    add_step(conn, 2, "Element Click", "#save")
+    add_step(conn, 3, "Element Click", "")
+    add_step(conn, 4, "Text Input", "#search", "${order_no}")
+    add_step(conn, 5, "Get Text", "#total | CACHE:total")
+    add_step(conn, 6, "Element Click", "//a[@id='gone'")
+    for step_id, status in ((1, 'completed'), (3, 'failed'), (4, 'completed'), (5, 'failed'), (6, 'failed')):
+        use_step(conn, step_id, status)
+    conn.commit()
+
+    report = analyze_library(conn, 1)
+    assert report.merges() == {1: [2]}
+    kinds = {(issue.kind, issue.step.id) for issue in report.issues}
+    assert kinds == {(ISSUE_MISSING_TARGET, 3), (ISSUE_DEAD_SELECTOR, 3), (ISSUE_UNRESOLVED_VARIABLE, 4),
+                     (ISSUE_DEAD_SELECTOR, 5), (ISSUE_INVALID_SELECTOR, 6), (ISSUE_DEAD_SELECTOR, 6)}
+    assert not report.issues_of(ISSUE_UNUSED)   # step 2 is a duplicate of a used step, not unused
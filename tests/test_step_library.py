@@ -0,0 +1,63 @@
+import step_library
+
+
+def seed(conn):
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO rice_profiles (user_id, rice_id, name, type, client_name) "
+                   "VALUES (1, 'INT001', 'Payroll', 'Interface', 'Acme')")
+    profile_id = cursor.lastrowid
+    cursor.execute("INSERT INTO test_step_groups (user_id, group_name, description) VALUES (1, 'Login', 'Sign in')")
+    group_id = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO test_steps (user_id, rice_profile_id, group_id, name, step_type, target, description, step_order)
+        VALUES (1, ?, ?, 'User name', 'Text Input', '#username', 'Type the user', 1)
+    """, (profile_id, group_id))
+    step_id = cursor.lastrowid
+    cursor.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description, auto_login) "
+                   "VALUES (1, '7', 1, 'Happy path', 1)")
+    cursor.execute("""
+        INSERT INTO scenario_steps (user_id, rice_profile, scenario_number, step_order, fsm_page_id,
+                                    test_step_id, custom_value, user_input_required)
+        VALUES (1, '7', 1, 1, 1, ?, 'admin', 0)
+    """, (step_id,))
+    cursor.execute("""
+        INSERT INTO scenario_steps (user_id, rice_profile, scenario_number, step_order, fsm_page_id,
+                                    step_name, step_type, step_target, user_input_required)
+        VALUES (1, '7', 1, 2, 1, 'Approve', 'Element Click', '#approve', 1)
+    """)
+    conn.commit()
+    return group_id
+
+
+def test_round_trip_keeps_steps_and_manual_flags(db_manager, tmp_path):
+    conn = db_manager.conn
+    group_id = seed(conn)
+    archive = str(tmp_path / 'library.zip')
+
+    counts = step_library.export_library(conn, 1, archive, group_ids=[group_id], rice_profiles=['7'])
+    assert counts == dict(counts, groups=1, steps=1, scenarios=1, scenario_steps=2)
+
+    summary = step_library.import_library(conn, 1, archive, rice_profile='8')
+    assert summary['groups'] == 1 and summary['steps'] == 1 and summary['scenario_steps'] == 2
+
+    rows = conn.execute("""
+        SELECT ss.step_order, ss.custom_value, ss.user_input_required, ss.step_name, ts.target, ts.group_id
+        FROM scenario_steps ss LEFT JOIN test_steps ts ON ts.id = ss.test_step_id
+        WHERE ss.rice_profile = '8' ORDER BY ss.step_order
+    """).fetchall()
+    assert rows[0][:3] == (1, 'admin', 0)
+    assert rows[0][4] == '#username' and rows[0][5] != group_id  # relinked to the imported copy
+    assert rows[1][:4] == (2, None, 1, 'Approve')
+    assert conn.execute("SELECT auto_login FROM scenarios WHERE rice_profile = '8'").fetchone() == (1,)
+
+
+def test_skip_policy_keeps_existing_group(db_manager, tmp_path):
+    conn = db_manager.conn
+    group_id = seed(conn)
+    archive = str(tmp_path / 'library.zip')
+    step_library.export_library(conn, 1, archive, group_ids=[group_id])
+    groups_before = conn.execute("SELECT COUNT(*) FROM test_step_groups").fetchone()
+
+    summary = step_library.import_library(conn, 1, archive, conflict=step_library.CONFLICT_SKIP)
+    assert summary['groups'] == 0 and summary['steps'] == 0 and summary['skipped'] == 2  # the group and its step
+    assert conn.execute("SELECT COUNT(*) FROM test_step_groups").fetchone() == groups_before
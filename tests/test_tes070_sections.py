@@ -0,0 +1,115 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip('docx')
+
+from docx import Document  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+from docx.shared import Inches  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import tes070_store  # noqa: E402
+from tes070_sections import SectionCache, append_section, section_key, save_section  # noqa: E402
+
+
+def screenshot(color):
+    buffer = BytesIO()
+    Image.new('RGB', (320, 200), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def section(title, image):
+    doc = Document()
+    doc.add_heading(title, 2)
+    doc.add_picture(BytesIO(image), width=Inches(3))
+    return save_section(doc)
+
+
+def images(section_bytes):
+    doc = Document(BytesIO(section_bytes))
+    return [part.blob for part in doc.part.related_parts.values() if 'image' in part.content_type]
+
+
+def add_scenario(conn, number):
+    conn.execute("INSERT INTO scenarios (user_id, rice_profile, scenario_number, description) VALUES (1, '5', ?, 'x')",
+                 (number,))
+
+
+def test_sections_share_stored_screenshots(db_manager):
+    conn = db_manager.conn
+    cache = SectionCache(conn)
+    image = screenshot((10, 120, 200))
+    cache.put('5', 1, 'key-1', section('FR 1.1', image))
+    cache.put('5', 2, 'key-2', section('FR 1.2', image))
+
+    assert conn.execute("SELECT COUNT(*) FROM tes070_section_cache WHERE LENGTH(content) > 0").fetchone() == (0,)
+    assert conn.execute("SELECT COUNT(*) FROM tes070_section_parts WHERE part_hash = ?",
+                        (digest(image),)).fetchone() == (2,)
+    assert conn.execute("SELECT COUNT(*) FROM tes070_parts WHERE hash = ?", (digest(image),)).fetchone() == (1,)
+    assert images(cache.get('5', 1, 'key-1')) == [image]
+    assert cache.get('5', 1, 'stale-key') is None
+
+
+def test_replaced_and_deleted_sections_are_pruned(db_manager):
+    conn = db_manager.conn
+    cache = SectionCache(conn)
+    add_scenario(conn, 1)
+    first, second, gone = screenshot((200, 0, 0)), screenshot((0, 200, 0)), screenshot((0, 0, 200))
+    cache.put('5', 1, 'old', section('FR 1.1', first))
+    cache.put('5', 1, 'new', section('FR 1.1', second))   # the scenario was re-run
+    cache.put('5', 2, 'key', section('FR 1.2', gone))     # scenario 2 has been deleted
+    conn.commit()
+
+    removed, freed = tes070_store.prune_section_cache(conn.cursor())
+    stored = {row[0] for row in conn.execute("SELECT hash FROM tes070_parts")}
+    assert removed == 1 and freed > 0
+    assert digest(second) in stored
+    assert digest(first) not in stored and digest(gone) not in stored
+    assert images(cache.get('5', 1, 'new')) == [second]
+
+
+def test_legacy_whole_docx_entries_still_read(db_manager):
+    conn = db_manager.conn
+    content = section('FR 1.1', screenshot((1, 2, 3)))
+    conn.execute("INSERT INTO tes070_section_cache (rice_profile, scenario_number, section_key, content) "
+                 "VALUES ('5', 1, 'key', ?)", (content,))
+    assert SectionCache(conn).get('5', 1, 'key') == content
+
+
+def render_cached(cache, number, image):
+    """A scenario section the way the generator gets it: rendered once, then read back from the cache"""
+    from tes070_generator_new import render_scenario_section
+    steps = [(1, 'Click the Submit button', image, 'Element Click', None, None),
+             (2, 'Navigate to the Work Units page', image, 'Navigate', None, None)]
+    key = section_key(f"FR 1.{number}", 'TENANT', f"Scenario {number}", 'Passed', None, steps)
+    section_doc = Document()
+    render_scenario_section(section_doc, f"FR 1.{number}", f"Scenario {number}", 'Passed', None, steps, 'TENANT')
+    cache.put('5', number, key, save_section(section_doc))
+    return cache.get('5', number, key)
+
+
+def test_document_built_from_cached_sections_is_consistent(db_manager):
+    pytest.importorskip('tkinter')
+    cache = SectionCache(db_manager.conn)
+    first, second = screenshot((250, 0, 0)), screenshot((0, 0, 250))
+    doc = Document()
+    doc.add_picture(BytesIO(screenshot((0, 250, 0))), width=Inches(1))   # the template's own drawing
+    append_section(doc, render_cached(cache, 1, first))
+    append_section(doc, render_cached(cache, 2, second))
+    doc.add_picture(BytesIO(first), width=Inches(1))
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    saved = Document(BytesIO(buffer.getvalue()))
+    body = saved.element.body
+    blobs = [saved.part.related_parts[blip.get(qn('r:embed'))].blob for blip in body.iter(qn('a:blip'))]
+    assert len(blobs) == 6
+    assert {digest(blob) for blob in blobs} == {digest(first), digest(second), digest(screenshot((0, 250, 0)))}
+    ids = [doc_pr.get('id') for doc_pr in body.iter(qn('wp:docPr'))]
+    assert len(set(ids)) == len(ids) == 6
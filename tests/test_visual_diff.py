@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from visual_diff import DEFAULT_SETTINGS, build_mask, compare_frames, decode_frame, encode_frame, prepare_frame
+
+
+def frame(height=64, width=96, level=200):
+    return np.full((height, width), level, dtype=np.uint8)
+
+
+def changed_cells(result):
+    """(row, col) bounds of the heatmap cells counted as changed"""
+    rows, cols = np.nonzero(decode_frame(result['heatmap']) > DEFAULT_SETTINGS['block_threshold'] * 255)
+    return (rows.min(), rows.max()), (cols.min(), cols.max())
+
+
+def test_identical_frames_have_no_diff():
+    result = compare_frames(frame(), frame())
+    assert (result['score'], result['changed_ratio'], result['flagged']) == (0.0, 0.0, False)
+    heatmap = decode_frame(result['heatmap'])
+    assert heatmap.shape == (8, 12) and not heatmap.any()
+
+
+def test_noise_below_the_pixel_threshold_is_ignored():
+    current = frame(level=200 + DEFAULT_SETTINGS['pixel_threshold'])
+    result = compare_frames(frame(), current)
+    assert result['changed_ratio'] == 0.0 and not result['flagged']
+    assert result['score'] > 0
+
+
+def test_changed_block_is_located():
+    current = frame()
+    current[16:32, 40:64] = 0      # heatmap rows 2-3, columns 5-7
+    result = compare_frames(frame(), current)
+    assert changed_cells(result) == ((2, 3), (5, 7))
+    assert result['changed_ratio'] == pytest.approx(6 / 96, abs=1e-5)
+    assert result['flagged']
+
+
+def test_masked_region_is_not_compared():
+    current = frame()
+    current[0:8, 0:96] = 0          # a clock in the header
+    assert not compare_frames(frame(), current, boxes=[(0, 0, 1, 0.125)])['flagged']
+    mask = build_mask((64, 96), [(0, 0, 1, 0.125)])
+    assert not mask[:8].any() and mask[8:].all()
+
+
+def test_size_mismatch_is_compared_at_the_baseline_geometry():
+    current = frame(128, 192)
+    current[32:64, 80:128] = 0     # the same block at twice the size
+    result = compare_frames(frame(), current)
+    assert decode_frame(result['heatmap']).shape == (8, 12)
+    assert changed_cells(result) == ((2, 3), (5, 7))
+
+
+def test_prepare_frame_scales_the_longest_edge():
+    png = encode_frame(frame(400, 1000))
+    assert prepare_frame(png, 640).shape == (256, 640)
+    assert prepare_frame(None, 640) is None
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import sqlite3
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+from screenshot_storage import screenshot_bytes, parse_reference
+from log_manager import get_logger
+
+logger = get_logger('visual_diff')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+VISUAL_DIFF_CONFIG_FILE = os.path.join(APP_DIR, 'visual_diff_config.json')
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'compare_size': 640,        # longest edge (px) frames are compared at
+    'block_size': 8,            # heatmap cell size in compare pixels
+    'pixel_threshold': 24,      # grey-level change (0-255) that counts as a changed pixel
+    'block_threshold': 0.15,    # share of changed pixels before a cell counts as changed
+    'flag_ratio': 0.01,         # share of changed cells that flags the step as a UI change
+    'workers': None,            # processes for batch comparisons (None = CPU count)
+    'parallel_min_jobs': 8,     # smaller batches are compared in-process
+    'chunk_size': 64,           # steps loaded and compared per round trip
+    # Volatile regions (timestamps, user names) as fractional boxes [x0, y0, x1, y1];
+    # rice_profile / scenario_number / step_order narrow a mask, omitted keys match everything
+    'masks': []
+}
+
+def load_settings():
+    """Defaults overlaid with visual_diff_config.json"""
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(VISUAL_DIFF_CONFIG_FILE):
+        try:
+            with open(VISUAL_DIFF_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                settings.update(json.load(f))
+        except Exception as e:
+            logger.warning("Failed to read %s: %s", VISUAL_DIFF_CONFIG_FILE, e)
+    return settings
+
+def prepare_frame(value, compare_size):
+    """Decode a stored screenshot to a greyscale uint8 array with its longest edge at compare_size"""
+    data = screenshot_bytes(value)
+    if not data:
+        return None
+    image = Image.open(BytesIO(data)).convert('L')
+    image.thumbnail((compare_size, compare_size), Image.Resampling.BILINEAR)
+    return np.asarray(image, dtype=np.uint8)
+
+def encode_frame(frame):
+    output = BytesIO()
+    Image.fromarray(frame).save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+def decode_frame(data):
+    return np.asarray(Image.open(BytesIO(data)).convert('L'), dtype=np.uint8)
+
+def build_mask(shape, boxes):
+    """Boolean array, True where pixels take part in the comparison"""
+    mask = np.ones(shape, dtype=bool)
+    height, width = shape
+    for x0, y0, x1, y1 in boxes:
+        mask[int(y0 * height):int(np.ceil(y1 * height)), int(x0 * width):int(np.ceil(x1 * width))] = False
+    return mask
+
+def compare_frames(baseline, current, boxes=(), settings=None):
+    """Compare two greyscale frames; returns score, changed_ratio, flagged and a PNG heatmap"""
+    settings = settings or DEFAULT_SETTINGS
+    if current.shape != baseline.shape:
+        # Window size changed between runs - compare at the baseline geometry
+        current = np.asarray(Image.fromarray(current).resize(baseline.shape[::-1], Image.Resampling.BILINEAR))
+    
+    block = settings['block_size']
+    rows, cols = baseline.shape[0] // block, baseline.shape[1] // block
+    height, width = rows * block, cols * block
+    
+    diff = np.abs(baseline[:height, :width].astype(np.int16) - current[:height, :width].astype(np.int16))
+    mask = build_mask((height, width), boxes)
+    changed = (diff > settings['pixel_threshold']) & mask
+    
+    # Per-cell share of changed / comparable pixels via a block reshape (no Python loops)
+    cell_changed = changed.reshape(rows, block, cols, block).mean(axis=(1, 3))
+    cell_valid = mask.reshape(rows, block, cols, block).mean(axis=(1, 3)) >= 0.5
+    changed_cells = (cell_changed > settings['block_threshold']) & cell_valid
+    
+    valid_cells = int(cell_valid.sum())
+    changed_ratio = float(changed_cells.sum()) / valid_cells if valid_cells else 0.0
+    score = float(diff[mask].mean()) / 255.0 if mask.any() else 0.0
+    
+    heatmap = np.where(cell_valid, cell_changed * 255, 0).astype(np.uint8)
+    return {
+        'score': round(score, 5),
+        'changed_ratio': round(changed_ratio, 5),
+        'flagged': changed_ratio > settings['flag_ratio'],
+        'heatmap': encode_frame(heatmap)
+    }
+
+def _compare_job(job):
+    """Process-pool entry point: (key, baseline_png, current_screenshot, boxes, settings)"""
+    key, baseline_png, current_value, boxes, settings = job
+    try:
+        current = prepare_frame(current_value, settings['compare_size'])
+        if current is None:
+            return key, None, None
+        result = compare_frames(decode_frame(baseline_png), current, boxes, settings) if baseline_png else None
+        return key, result, encode_frame(current)
+    except Exception as e:
+        return key, {'error': str(e)}, None
+
+def compare_many(jobs, settings, pool=None):
+    """Run comparison jobs, on the process pool when one is given and the batch is large enough"""
+    if pool is None or len(jobs) < settings['parallel_min_jobs']:
+        return [_compare_job(job) for job in jobs]
+    workers = settings.get('workers') or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    return list(pool.map(_compare_job, jobs, chunksize=chunksize))
+
+class VisualRegression:
+    """Compares each step's after screenshot with the one from the last passing run.
+
+    Baselines are stored as small greyscale frames in visual_baselines and are
+    refreshed whenever a scenario passes; every comparison writes a score and a
+    diff heatmap to visual_diffs so a passing run can still flag UI changes.
+    """
+    
+    def __init__(self, db_path, user_id, settings=None):
+        self.db_path = db_path
+        self.user_id = user_id
+        self.settings = settings or load_settings()
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _masks_for(self, rice_profile, scenario_number, step_order):
+        boxes = []
+        for mask in self.settings.get('masks', []):
+            if 'rice_profile' in mask and str(mask['rice_profile']) != str(rice_profile):
+                continue
+            if 'scenario_number' in mask and mask['scenario_number'] != scenario_number:
+                continue
+            if 'step_order' in mask and mask['step_order'] != step_order:
+                continue
+            boxes.append(tuple(mask['box']))
+        return tuple(boxes)
+    
+    def _resolve_frame(self, cursor, profile, scenario_number, value):
+        """Follow a deduplicated frame reference to the stored screenshot it points at"""
+        reference = parse_reference(value)
+        if not reference:
+            return value
+        step_order, slot = reference
+        column = 'screenshot_before' if slot == 'before' else 'screenshot_after'
+        cursor.execute(f"""
+            SELECT {column} FROM scenario_steps
+            WHERE user_id = ? AND rice_profile = ? AND scenario_number = ? AND step_order = ?
+        """, (self.user_id, profile, scenario_number, step_order))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def check_scenarios(self, rice_profile, scenario_numbers=None, run_id=None):
+        """Diff the latest screenshots of the given scenarios (all when None).
+
+        Steps are processed in chunks so only one chunk of full-size screenshots is
+        in memory at a time; each chunk is spread across worker processes.
+        Returns {scenario_number: [flagged step_order, ...]} for scenarios with UI changes.
+        """
+        if not self.settings.get('enabled', True):
+            return {}
+        if scenario_numbers is not None and not scenario_numbers:
+            return {}
+        
+        profile = str(rice_profile)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            params = [self.user_id, profile]
+            scenario_filter = ""
+            if scenario_numbers is not None:
+                scenario_filter = f"AND ss.scenario_number IN ({','.join('?' * len(scenario_numbers))})"
+                params.extend(scenario_numbers)
+            
+            cursor.execute(f"""
+                SELECT ss.scenario_number, ss.step_order, s.result
+                FROM scenario_steps ss
+                LEFT JOIN scenarios s ON s.user_id = ss.user_id AND s.rice_profile = ss.rice_profile
+                     AND s.scenario_number = ss.scenario_number
+                WHERE ss.user_id = ? AND ss.rice_profile = ? {scenario_filter}
+                  AND ss.screenshot_after IS NOT NULL
+                ORDER BY ss.scenario_number, ss.step_order
+            """, params)
+            steps = cursor.fetchall()
+            passed = {scenario_number: result == 'Passed' for scenario_number, _, result in steps}
+            
+            chunk_size = self.settings.get('chunk_size', 64)
+            compared = 0
+            baselines_updated = 0
+            flagged = {}
+            
+            workers = self.settings.get('workers') or os.cpu_count() or 1
+            pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(steps) >= self.settings['parallel_min_jobs'] else None
+            try:
+                for start in range(0, len(steps), chunk_size):
+                    chunk = steps[start:start + chunk_size]
+                    keys = [(scenario_number, step_order) for scenario_number, step_order, _ in chunk]
+                    
+                    cursor.execute(f"""
+                        SELECT ss.scenario_number, ss.step_order, ss.screenshot_after, vb.frame
+                        FROM scenario_steps ss
+                        LEFT JOIN visual_baselines vb ON vb.user_id = ss.user_id AND vb.rice_profile = ss.rice_profile
+                             AND vb.scenario_number = ss.scenario_number AND vb.step_order = ss.step_order
+                        WHERE ss.user_id = ? AND ss.rice_profile = ?
+                          AND (ss.scenario_number, ss.step_order) IN ({','.join(['(?, ?)'] * len(keys))})
+                    """, [self.user_id, profile] + [value for key in keys for value in key])
+                    jobs = [((scenario_number, step_order), baseline,
+                             self._resolve_frame(cursor, profile, scenario_number, screenshot),
+                             self._masks_for(rice_profile, scenario_number, step_order), self.settings)
+                            for scenario_number, step_order, screenshot, baseline in cursor.fetchall()]
+                    
+                    diff_rows = []
+                    baseline_rows = []
+                    for (scenario_number, step_order), result, frame in compare_many(jobs, self.settings, pool):
+                        if result and 'error' in result:
+                            logger.warning("Visual diff failed for scenario %s step %s: %s",
+                                           scenario_number, step_order, result['error'])
+                            continue
+                        if result:
+                            diff_rows.append((self.user_id, profile, scenario_number, step_order, run_id,
+                                              result['score'], result['changed_ratio'], int(result['flagged']),
+                                              result['heatmap']))
+                            if result['flagged']:
+                                flagged.setdefault(scenario_number, []).append(step_order)
+                        # A passing run becomes the new reference for its steps
+                        if frame is not None and passed.get(scenario_number):
+                            baseline_rows.append((self.user_id, profile, scenario_number, step_order, frame))
+                    
+                    cursor.executemany("""
+                        INSERT OR REPLACE INTO visual_diffs
+                            (user_id, rice_profile, scenario_number, step_order, run_id, score, changed_ratio, flagged, heatmap)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, diff_rows)
+                    cursor.executemany("""
+                        INSERT OR REPLACE INTO visual_baselines (user_id, rice_profile, scenario_number, step_order, frame)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, baseline_rows)
+                    conn.commit()
+                    compared += len(diff_rows)
+                    baselines_updated += len(baseline_rows)
+            finally:
+                if pool:
+                    pool.shutdown()
+        finally:
+            conn.close()
+        
+        logger.info("Visual diff for profile %s: %s steps compared, %s baselines updated, %s scenarios flagged",
+                    rice_profile, compared, baselines_updated, len(flagged))
+        return flagged
+    
+    def get_step_diff(self, rice_profile, scenario_number, step_order):
+        """Latest (score, changed_ratio, flagged, heatmap_png, created_at) for a step, or None"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT score, changed_ratio, flagged, heatmap, created_at FROM visual_diffs
+                WHERE user_id = ? AND rice_profile = ? AND scenario_number = ? AND step_order = ?
+            """, (self.user_id, str(rice_profile), scenario_number, step_order))
+            return cursor.fetchone()
+        finally:
+            conn.close()